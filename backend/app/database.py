@@ -1,21 +1,42 @@
 """
 Database initialization and connection management
 """
+import os
 import sqlite3
 from pathlib import Path
+from typing import Any, Iterator
+from app.services.profiling_service import profiled
 
 DB_PATH = Path(__file__).parent.parent / "auditchain.db"
+# Rows per fetchmany() when streaming large result sets
+DB_FETCH_SIZE = int(os.getenv("DB_FETCH_SIZE", "1000"))
 
+@profiled("get_db")
 def get_db():
     """Get database connection"""
     conn = sqlite3.connect(DB_PATH)
     conn.row_factory = sqlite3.Row  # Enable column access by name
     return conn
 
-def init_db():
-    """Initialize database tables"""
-    conn = get_db()
-    cursor = conn.cursor()
+def iter_rows(cursor, size: int = DB_FETCH_SIZE) -> Iterator[Any]:
+    """Rows of an executed query, fetched size at a time"""
+    while True:
+        rows = cursor.fetchmany(size)
+        if not rows:
+            return
+        yield from rows
+
+def _add_column(cursor, table: str, column: str):
+    """Add a column unless it already exists (databases created before versioning)"""
+    try:
+        cursor.execute(f"ALTER TABLE {table} ADD COLUMN {column}")
+    except sqlite3.OperationalError:
+        pass  # Column already exists
+
+def _baseline_schema(cursor):
+    """Schema as of the introduction of schema_version"""
+    # Imported here: the state tree service depends on this module
+    from app.services.sparse_merkle_service import rebuild_state_tree
     
     # Audit events table (append-only)
     cursor.execute("""
@@ -38,70 +59,27 @@ def init_db():
             merkle_leaf_hash TEXT,
             batch_id TEXT,
             status TEXT DEFAULT 'Pending',
+            prev_chain_hash TEXT,
+            chain_hash TEXT,
             created_at TEXT NOT NULL DEFAULT CURRENT_TIMESTAMP
         )
     """)
     
     # Add new columns to existing table if they don't exist (migration)
-    try:
-        cursor.execute("ALTER TABLE audit_events ADD COLUMN model_name TEXT")
-    except sqlite3.OperationalError:
-        pass  # Column already exists
-    
-    try:
-        cursor.execute("ALTER TABLE audit_events ADD COLUMN model_version TEXT")
-    except sqlite3.OperationalError:
-        pass
-    
-    try:
-        cursor.execute("ALTER TABLE audit_events ADD COLUMN framework TEXT")
-    except sqlite3.OperationalError:
-        pass
-    
-    try:
-        cursor.execute("ALTER TABLE audit_events ADD COLUMN dataset_name TEXT")
-    except sqlite3.OperationalError:
-        pass
-    
-    try:
-        cursor.execute("ALTER TABLE audit_events ADD COLUMN dataset_version TEXT")
-    except sqlite3.OperationalError:
-        pass
-    
-    try:
-        cursor.execute("ALTER TABLE audit_events ADD COLUMN dataset_hash TEXT")
-    except sqlite3.OperationalError:
-        pass
-    
-    try:
-        cursor.execute("ALTER TABLE audit_events ADD COLUMN source TEXT")
-    except sqlite3.OperationalError:
-        pass
-    
-    try:
-        cursor.execute("ALTER TABLE audit_events ADD COLUMN actor TEXT")
-    except sqlite3.OperationalError:
-        pass
-    
-    try:
-        cursor.execute("ALTER TABLE audit_events ADD COLUMN environment TEXT")
-    except sqlite3.OperationalError:
-        pass
-    
-    try:
-        cursor.execute("ALTER TABLE audit_events ADD COLUMN merkle_leaf_hash TEXT")
-    except sqlite3.OperationalError:
-        pass
-    
-    try:
-        cursor.execute("ALTER TABLE audit_events ADD COLUMN batch_id TEXT")
-    except sqlite3.OperationalError:
-        pass
-    
-    try:
-        cursor.execute("ALTER TABLE audit_events ADD COLUMN status TEXT DEFAULT 'Pending'")
-    except sqlite3.OperationalError:
-        pass
+    _add_column(cursor, "audit_events", "model_name TEXT")
+    _add_column(cursor, "audit_events", "model_version TEXT")
+    _add_column(cursor, "audit_events", "framework TEXT")
+    _add_column(cursor, "audit_events", "dataset_name TEXT")
+    _add_column(cursor, "audit_events", "dataset_version TEXT")
+    _add_column(cursor, "audit_events", "dataset_hash TEXT")
+    _add_column(cursor, "audit_events", "source TEXT")
+    _add_column(cursor, "audit_events", "actor TEXT")
+    _add_column(cursor, "audit_events", "environment TEXT")
+    _add_column(cursor, "audit_events", "merkle_leaf_hash TEXT")
+    _add_column(cursor, "audit_events", "batch_id TEXT")
+    _add_column(cursor, "audit_events", "status TEXT DEFAULT 'Pending'")
+    _add_column(cursor, "audit_events", "prev_chain_hash TEXT")
+    _add_column(cursor, "audit_events", "chain_hash TEXT")
     
     # Merkle batches table
     cursor.execute("""
@@ -116,10 +94,7 @@ def init_db():
     """)
     
     # Add status column if it doesn't exist
-    try:
-        cursor.execute("ALTER TABLE merkle_batches ADD COLUMN status TEXT DEFAULT 'Pending'")
-    except sqlite3.OperationalError:
-        pass
+    _add_column(cursor, "merkle_batches", "status TEXT DEFAULT 'Pending'")
     
     # Blockchain anchors table
     cursor.execute("""
@@ -137,22 +112,329 @@ def init_db():
     """)
     
     # Add new columns if they don't exist
-    try:
-        cursor.execute("ALTER TABLE blockchain_anchors ADD COLUMN anchor_id INTEGER")
-    except sqlite3.OperationalError:
-        pass
+    _add_column(cursor, "blockchain_anchors", "anchor_id INTEGER")
+    _add_column(cursor, "blockchain_anchors", "batch_id TEXT")
+    _add_column(cursor, "blockchain_anchors", "block_number INTEGER")
     
-    try:
-        cursor.execute("ALTER TABLE blockchain_anchors ADD COLUMN batch_id TEXT")
-    except sqlite3.OperationalError:
-        pass
+    # Per-model state index (latest event per key) and its sparse Merkle tree
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS model_state (
+            key_hash TEXT PRIMARY KEY,
+            model_id TEXT NOT NULL,
+            event_type TEXT,
+            event_id INTEGER NOT NULL,
+            event_hash TEXT NOT NULL,
+            updated_at TEXT NOT NULL DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
     
-    try:
-        cursor.execute("ALTER TABLE blockchain_anchors ADD COLUMN block_number INTEGER")
-    except sqlite3.OperationalError:
-        pass
+    # Compact, versioned tree nodes: a subtree holding a single leaf is one
+    # row carrying that leaf
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS smt_nodes (
+            node_id TEXT PRIMARY KEY,
+            version INTEGER NOT NULL,
+            hash TEXT NOT NULL,
+            leaf_key TEXT,
+            leaf_event_id INTEGER,
+            leaf_event_hash TEXT
+        )
+    """)
+    _add_column(cursor, "smt_nodes", "version INTEGER NOT NULL DEFAULT 0")
+    _add_column(cursor, "smt_nodes", "leaf_key TEXT")
+    _add_column(cursor, "smt_nodes", "leaf_event_id INTEGER")
+    _add_column(cursor, "smt_nodes", "leaf_event_hash TEXT")
+    
+    # Nodes as they were at earlier versions, copied before being overwritten
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS smt_node_history (
+            node_id TEXT NOT NULL,
+            version INTEGER NOT NULL,
+            hash TEXT NOT NULL,
+            leaf_key TEXT,
+            leaf_event_id INTEGER,
+            leaf_event_hash TEXT,
+            PRIMARY KEY (node_id, version)
+        )
+    """)
+    
+    # Batches record the state root they were sealed with and the tree
+    # version that keeps it provable
+    _add_column(cursor, "merkle_batches", "state_root TEXT")
+    _add_column(cursor, "merkle_batches", "state_version INTEGER")
+    cursor.execute("""
+        CREATE INDEX IF NOT EXISTS idx_merkle_batches_state_version
+        ON merkle_batches (state_version)
+    """)
+    
+    # Nodes written by the uncompacted tree are replaced from model_state;
+    # batches sealed before this keep their state root, with no history
+    # to prove against it
+    rebuild_state_tree(cursor)
+    
+    # First and last event id of each batch, bounding the partitions its
+    # leaves are read from, and its size
+    _add_column(cursor, "merkle_batches", "first_event_id INTEGER")
+    _add_column(cursor, "merkle_batches", "last_event_id INTEGER")
+    _add_column(cursor, "merkle_batches", "event_count INTEGER")
+    cursor.execute("""
+        UPDATE merkle_batches
+        SET (first_event_id, last_event_id, event_count) = (
+            SELECT MIN(id), MAX(id), COUNT(*) FROM audit_events WHERE audit_events.batch_id = merkle_batches.batch_id
+        )
+        WHERE first_event_id IS NULL
+    """)
     
-    conn.commit()
-    conn.close()
+    # Catalog of sealed (archived) monthly event partitions
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS event_partitions (
+            partition_key TEXT PRIMARY KEY,
+            file_path TEXT NOT NULL,
+            status TEXT NOT NULL DEFAULT 'Sealed',
+            first_event_id INTEGER NOT NULL,
+            last_event_id INTEGER NOT NULL,
+            event_count INTEGER NOT NULL,
+            merkle_root TEXT NOT NULL,
+            chain_head TEXT,
+            batch_count INTEGER,
+            last_anchor_id INTEGER,
+            sealed_at TEXT NOT NULL
+        )
+    """)
+    
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_audit_events_created_at ON audit_events (created_at)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_audit_events_batch_id ON audit_events (batch_id)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_audit_events_status ON audit_events (status)")
+
+def _anchor_costs(cursor):
+    """Gas used, effective gas price and event count per anchor"""
+    _add_column(cursor, "blockchain_anchors", "event_count INTEGER")
+    _add_column(cursor, "blockchain_anchors", "gas_used INTEGER")
+    _add_column(cursor, "blockchain_anchors", "effective_gas_price INTEGER")
+
+def _anchor_confirmations(cursor):
+    """Confirmation depth and reorg status per anchor"""
+    _add_column(cursor, "blockchain_anchors", "confirmations INTEGER")
+    _add_column(cursor, "blockchain_anchors", "confirmation_status TEXT")
+    cursor.execute("""
+        CREATE INDEX IF NOT EXISTS idx_blockchain_anchors_confirmation_status
+        ON blockchain_anchors (confirmation_status)
+    """)
+
+def _event_hash_versions(cursor):
+    """Hash format per event; NULL for events hashed before versioning"""
+    _add_column(cursor, "audit_events", "hash_version INTEGER")
 
+def _event_deduplication(cursor):
+    """Unique event hashes and client idempotency keys"""
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS idempotency_keys (
+            key TEXT PRIMARY KEY,
+            event_id INTEGER NOT NULL,
+            created_at TEXT NOT NULL DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+    
+    # The log is append-only, so duplicates already in it cannot be dropped
+    # here; the upgrade stops until they have been dealt with
+    cursor.execute("""
+        SELECT metadata_hash, GROUP_CONCAT(id) as event_ids
+        FROM audit_events
+        GROUP BY metadata_hash
+        HAVING COUNT(*) > 1
+        LIMIT 10
+    """)
+    duplicates = cursor.fetchall()
+    if duplicates:
+        raise sqlite3.IntegrityError(
+            "audit_events has duplicate metadata_hash values, cannot add the unique index: "
+            + "; ".join(f"{row['metadata_hash']} (events {row['event_ids']})" for row in duplicates)
+        )
+    cursor.execute("CREATE UNIQUE INDEX IF NOT EXISTS idx_audit_events_metadata_hash ON audit_events (metadata_hash)")
+
+def _lineage_index(cursor):
+    """Model/dataset lineage adjacency, backfilled from the hot event table"""
+    # Imported here: the lineage service depends on this module
+    from app.services.lineage_service import update_lineage
+    
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS lineage_edges (
+            event_id INTEGER PRIMARY KEY,
+            event_hash TEXT NOT NULL,
+            event_type TEXT,
+            timestamp TEXT,
+            model_id TEXT NOT NULL,
+            model_version TEXT,
+            relation TEXT NOT NULL,
+            target_kind TEXT NOT NULL,
+            target TEXT NOT NULL,
+            dataset_name TEXT,
+            dataset_version TEXT
+        )
+    """)
+    cursor.execute("""
+        CREATE INDEX IF NOT EXISTS idx_lineage_edges_model
+        ON lineage_edges (model_id, model_version, event_id)
+    """)
+    cursor.execute("""
+        CREATE INDEX IF NOT EXISTS idx_lineage_edges_target
+        ON lineage_edges (target_kind, target, relation, event_id)
+    """)
+    
+    # Sealed partitions cannot be attached inside the migration transaction;
+    # events archived before this version are not in the index
+    cursor.execute("""
+        SELECT id, model_id, model_version, dataset_name, dataset_version, dataset_hash,
+               event_type, environment, timestamp, metadata_hash
+        FROM audit_events
+        ORDER BY id
+    """)
+    writer = cursor.connection.cursor()
+    while True:
+        rows = cursor.fetchmany(DB_FETCH_SIZE)
+        if not rows:
+            break
+        update_lineage(writer, [(dict(row), row["id"]) for row in rows])
+
+def _event_search_index(cursor):
+    """Full-text index over event text fields, kept in sync by triggers"""
+    # Imported here: the search service depends on this module
+    from app.services.search_service import FTS_COLUMNS
+    
+    columns = ", ".join(FTS_COLUMNS)
+    values = ", ".join("new." + column for column in FTS_COLUMNS)
+    old_values = ", ".join("old." + column for column in FTS_COLUMNS)
+    
+    cursor.execute(f"""
+        CREATE VIRTUAL TABLE IF NOT EXISTS audit_events_fts USING fts5(
+            {columns},
+            content='audit_events',
+            content_rowid='id'
+        )
+    """)
+    cursor.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS audit_events_fts_insert AFTER INSERT ON audit_events BEGIN
+            INSERT INTO audit_events_fts (rowid, {columns}) VALUES (new.id, {values});
+        END
+    """)
+    cursor.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS audit_events_fts_delete AFTER DELETE ON audit_events BEGIN
+            INSERT INTO audit_events_fts (audit_events_fts, rowid, {columns})
+            VALUES ('delete', old.id, {old_values});
+        END
+    """)
+    # Status and batch updates do not touch indexed columns, so they skip this
+    cursor.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS audit_events_fts_update AFTER UPDATE OF {columns} ON audit_events BEGIN
+            INSERT INTO audit_events_fts (audit_events_fts, rowid, {columns})
+            VALUES ('delete', old.id, {old_values});
+            INSERT INTO audit_events_fts (rowid, {columns}) VALUES (new.id, {values});
+        END
+    """)
+    cursor.execute("INSERT INTO audit_events_fts (audit_events_fts) VALUES ('rebuild')")
+
+def _verification_results(cursor):
+    """Persisted verification cache entries (VERIFY_CACHE_PERSIST), keyed by the stored state they were derived from"""
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS verification_results (
+            kind TEXT NOT NULL,
+            subject TEXT NOT NULL,
+            event_id INTEGER,
+            hash_version INTEGER,
+            metadata_hash TEXT,
+            fields_digest TEXT,
+            batch_root TEXT,
+            state_root TEXT,
+            anchor_id INTEGER,
+            block_hash TEXT,
+            confirmation_status TEXT,
+            batch_id TEXT,
+            result TEXT NOT NULL,
+            verified_at TEXT NOT NULL DEFAULT CURRENT_TIMESTAMP,
+            PRIMARY KEY (kind, subject)
+        )
+    """)
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_verification_results_event_id ON verification_results (event_id)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_verification_results_batch_id ON verification_results (batch_id)")
+
+def _worker_leases(cursor):
+    """Leases coordinating workers that share the database"""
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS worker_leases (
+            name TEXT PRIMARY KEY,
+            holder TEXT NOT NULL,
+            expires_at REAL NOT NULL,
+            acquired_at REAL NOT NULL
+        )
+    """)
+    _add_column(cursor, "merkle_batches", "lease_holder TEXT")
+    _add_column(cursor, "merkle_batches", "lease_expires_at REAL")
+    _add_column(cursor, "merkle_batches", "urgent INTEGER NOT NULL DEFAULT 0")
+
+def _verification_invalidations(cursor):
+    """Invalidation log shared by the verification caches of every worker"""
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS verification_invalidations (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            event_id INTEGER,
+            batch_id TEXT,
+            batch_root TEXT,
+            created_at TEXT NOT NULL DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+
+# Ordered schema migrations: (version, description, apply(cursor)).
+# Append new steps; never edit or reorder applied ones.
+MIGRATIONS = [
+    (1, "Baseline schema", _baseline_schema),
+    (2, "Anchor gas and event counts", _anchor_costs),
+    (3, "Anchor confirmation tracking", _anchor_confirmations),
+    (4, "Event hash versions", _event_hash_versions),
+    (5, "Event deduplication", _event_deduplication),
+    (6, "Lineage index", _lineage_index),
+    (7, "Event search index", _event_search_index),
+    (8, "Verification result cache", _verification_results),
+    (9, "Worker leases", _worker_leases),
+    (10, "Verification invalidation log", _verification_invalidations),
+]
+
+def init_db():
+    """
+    Bring the database schema up to date
+    
+    Applied migrations are recorded in schema_version, so a database that is
+    already current costs a single query at startup.
+    """
+    conn = get_db()
+    cursor = conn.cursor()
+    
+    try:
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS schema_version (
+                version INTEGER PRIMARY KEY,
+                description TEXT NOT NULL,
+                applied_at TEXT NOT NULL DEFAULT CURRENT_TIMESTAMP
+            )
+        """)
+        conn.commit()
+        
+        if _current_version(cursor) >= MIGRATIONS[-1][0]:
+            return
+        
+        # Re-check under the write lock in case another worker migrated first
+        cursor.execute("BEGIN IMMEDIATE")
+        current = _current_version(cursor)
+        for version, description, apply in MIGRATIONS:
+            if version <= current:
+                continue
+            apply(cursor)
+            cursor.execute("""
+                INSERT INTO schema_version (version, description) VALUES (?, ?)
+            """, (version, description))
+        conn.commit()
+    finally:
+        conn.close()
 
+def _current_version(cursor) -> int:
+    cursor.execute("SELECT MAX(version) as version FROM schema_version")
+    return cursor.fetchone()["version"] or 0
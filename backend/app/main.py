@@ -2,9 +2,21 @@
 AuditChain - Main FastAPI Application
 Blockchain-Backed Audit Logging for Machine Learning Systems
 """
-from fastapi import FastAPI
+import time
+import asyncio
+from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import PlainTextResponse
 from app.database import init_db
+from app.storage import get_storage
+from app.services.metrics_service import HTTP_REQUEST_SECONDS, register_backlog_gauges, render_metrics
+from app.services.profiling_service import should_profile, profile_request
+from app.services.blockchain_service import get_blockchain_service
+from app.services.anchor_scheduler import run_anchor_scheduler
+from app.services.confirmation_tracker import run_confirmation_tracker
+from app.services.coordination_service import get_anchor_leadership
+from app.services.idempotency_service import get_deduplicator
+from app.services.verification_cache import get_verification_cache
 
 app = FastAPI(
     title="AuditChain API",
@@ -21,13 +33,70 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+@app.middleware("http")
+async def record_request_latency(request: Request, call_next):
+    started = time.perf_counter()
+    response = await call_next(request)
+    # Label by route template, not raw path, to keep cardinality bounded
+    route = request.scope.get("route")
+    HTTP_REQUEST_SECONDS.observe(
+        time.perf_counter() - started,
+        method=request.method,
+        route=route.path if route is not None else "unmatched",
+        status=response.status_code
+    )
+    return response
+
+@app.middleware("http")
+async def profile_opted_in_requests(request: Request, call_next):
+    # Opt-in only: PROFILING_ENABLED plus the X-Profile header or sampling
+    if not should_profile(request.headers):
+        return await call_next(request)
+    
+    with profile_request(request.method, request.url.path) as profile:
+        response = await call_next(request)
+        profile.finish(response.status_code)
+    
+    response.headers["X-Profile-Id"] = profile.profile_id
+    response.headers["X-Profile-Url"] = f"/profiles/{profile.profile_id}"
+    return response
+
+register_backlog_gauges(
+    lambda: get_storage().events.count_pending(),
+    lambda: get_storage().batches.count_unanchored()
+)
+
 # Initialize database on startup
 @app.on_event("startup")
 async def startup_event():
     init_db()
+    get_storage().init_schema()
+    
+    # web3 import and RPC connection happen in the background so the first
+    # request is not held up by them
+    blockchain = get_blockchain_service()
+    blockchain.connect_in_background()
+    app.state.rpc_health_probe = asyncio.create_task(blockchain.run_health_probe())
+    app.state.anchor_scheduler = asyncio.create_task(run_anchor_scheduler())
+    app.state.confirmation_tracker = asyncio.create_task(run_confirmation_tracker())
+    
+    # Fill the dedup Bloom filter from stored hashes; lookups fall back to
+    # the index until it is done
+    app.state.dedup_warm_up = asyncio.create_task(asyncio.to_thread(get_deduplicator().warm_up))
+    # Reload persisted verification results (VERIFY_CACHE_PERSIST)
+    app.state.verify_cache_warm_up = asyncio.create_task(asyncio.to_thread(get_verification_cache().warm_up))
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    for name in ("rpc_health_probe", "anchor_scheduler", "confirmation_tracker", "dedup_warm_up", "verify_cache_warm_up"):
+        task = getattr(app.state, name, None)
+        if task is not None:
+            task.cancel()
+    # Let another worker take over anchoring now rather than after the lease expires
+    await asyncio.to_thread(get_anchor_leadership().release)
 
 # Import routers
-from app.routers import auth, events, hashing, merkle, verify, blockchain
+from app.routers import auth, events, hashing, merkle, verify, blockchain, state, partitions, profiles, stream, lineage
 
 app.include_router(auth.router, prefix="/auth", tags=["authentication"])
 app.include_router(events.router, prefix="/events", tags=["events"])
@@ -35,6 +104,11 @@ app.include_router(hashing.router, prefix="/hash", tags=["hashing"])
 app.include_router(merkle.router, prefix="/merkle", tags=["merkle"])
 app.include_router(verify.router, prefix="/verify", tags=["verification"])
 app.include_router(blockchain.router, prefix="/blockchain", tags=["blockchain"])
+app.include_router(state.router, prefix="/state", tags=["state"])
+app.include_router(partitions.router, prefix="/partitions", tags=["partitions"])
+app.include_router(profiles.router, prefix="/profiles", tags=["profiling"])
+app.include_router(stream.router, prefix="/stream", tags=["stream"])
+app.include_router(lineage.router, prefix="/lineage", tags=["lineage"])
 
 @app.get("/")
 async def root():
@@ -48,6 +122,10 @@ async def root():
 async def health():
     return {"status": "healthy"}
 
+@app.get("/metrics", include_in_schema=False)
+async def metrics():
+    return PlainTextResponse(render_metrics(), media_type="text/plain; version=0.0.4")
+
 
 
 
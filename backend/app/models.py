@@ -2,7 +2,7 @@
 Pydantic models for request/response validation
 """
 from pydantic import BaseModel
-from typing import Optional, List
+from typing import Optional, List, Dict
 from datetime import datetime
 
 # Authentication models
@@ -16,6 +16,21 @@ class LoginResponse(BaseModel):
     username: str
 
 # Event models
+
+# Accepted event_type spellings (case-insensitive) and the stored form
+EVENT_TYPE_ALIASES = {
+    "train": "Train",
+    "training": "Train",
+    "evaluate": "Evaluate",
+    "evaluation": "Evaluate",
+    "deploy": "Deploy",
+    "deployment": "Deploy"
+}
+
+def normalize_event_type(event_type: str) -> Optional[str]:
+    """Stored form of an event type, or None if it is not a known one"""
+    return EVENT_TYPE_ALIASES.get(event_type.lower())
+
 class EventCreate(BaseModel):
     model_id: str
     model_name: Optional[str] = None
@@ -48,10 +63,31 @@ class EventResponse(BaseModel):
     summary: Optional[str] = None
     metadata_hash: str
     merkle_leaf_hash: Optional[str] = None
+    hash_version: Optional[int] = None  # None: hashed before versioning (format 1)
     batch_id: Optional[str] = None
     status: str
+    prev_chain_hash: Optional[str] = None
+    chain_hash: Optional[str] = None
     created_at: str
 
+# Search models
+class EventSearchHit(EventResponse):
+    score: float  # bm25; lower is more relevant
+    snippet: Optional[str] = None
+
+class FacetCount(BaseModel):
+    value: Optional[str] = None
+    count: int
+
+class EventSearchResponse(BaseModel):
+    match: str
+    total: int
+    total_is_estimate: bool
+    limit: int
+    offset: int
+    results: List[EventSearchHit]
+    facets: Dict[str, List[FacetCount]]
+
 # Hashing models
 class HashRequest(BaseModel):
     metadata: dict
@@ -62,32 +98,161 @@ class HashResponse(BaseModel):
 # Merkle models
 class MerkleBuildRequest(BaseModel):
     event_ids: Optional[List[int]] = None  # If None, use all events
+    max_events: Optional[int] = None  # Oldest pending events to seal; default MERKLE_BATCH_SIZE
+    urgent: bool = True  # False: anchor in a cheap gas window, within ANCHOR_MAX_DELAY_SECONDS
 
 class MerkleProof(BaseModel):
     event_id: int
     proof: List[str]
     leaf_hash: str
 
+class MerkleEventProofResponse(MerkleProof):
+    batch_id: str
+    merkle_root: str
+    leaf_index: int
+    leaf_count: int
+
 class MerkleResponse(BaseModel):
     merkle_root: str
     batch_id: str
-    proofs: List[MerkleProof]
     event_count: int
+    proof_url_template: str  # GET with {event_id} filled in for one event's proof
+    anchor_status: Optional[str] = None  # "success", "simulated", "queued", ...
+
+class MerkleMultiProofRequest(BaseModel):
+    batch_id: str
+    event_ids: List[int]
+
+class MultiProofLeaf(BaseModel):
+    event_id: int
+    leaf_index: int
+    leaf_hash: str
+
+class MerkleMultiProofResponse(BaseModel):
+    batch_id: str
+    merkle_root: str
+    leaf_count: int
+    leaves: List[MultiProofLeaf]
+    proof: List[str]
+
+# Model state models
+class StateProofNode(BaseModel):
+    depth: int
+    hash: str
+
+class StateProofResponse(BaseModel):
+    model_id: str
+    event_type: Optional[str] = None
+    batch_id: Optional[str] = None  # Set when proving against a sealed batch's root
+    key_hash: str
+    included: bool
+    event_id: Optional[int] = None
+    event_hash: Optional[str] = None
+    state_root: str
+    proof: List[StateProofNode]
+
+class StateRootResponse(BaseModel):
+    state_root: str
+    key_count: int
+
+# Lineage models
+class LineageEventReference(BaseModel):
+    event_id: int
+    event_hash: str
+    event_type: Optional[str] = None
+    timestamp: Optional[str] = None
+    batch_id: Optional[str] = None  # None until the event is sealed
+    merkle_root: Optional[str] = None
+    batch_status: Optional[str] = None
+    proof_url: Optional[str] = None
+
+class LineageEdge(BaseModel):
+    model_id: str
+    model_version: Optional[str] = None
+    relation: str
+    target: str
+    dataset_name: Optional[str] = None
+    dataset_version: Optional[str] = None
+    event: LineageEventReference
+
+class ModelVersionLineage(BaseModel):
+    model_version: Optional[str] = None
+    trained_on: List[LineageEdge]
+    evaluated_on: List[LineageEdge]
+    deployed_to: List[LineageEdge]
+
+class ModelLineageResponse(BaseModel):
+    model_id: str
+    versions: List[ModelVersionLineage]
+    truncated: bool
+
+class DatasetLineageResponse(BaseModel):
+    dataset: str
+    relation: Optional[str] = None
+    models: List[LineageEdge]
+    truncated: bool
+
+# Partition models
+class PartitionResponse(BaseModel):
+    partition_key: str
+    file_path: str
+    status: str
+    first_event_id: int
+    last_event_id: int
+    event_count: int
+    merkle_root: str
+    chain_head: Optional[str] = None
+    batch_count: Optional[int] = None
+    last_anchor_id: Optional[int] = None
+    sealed_at: Optional[str] = None
+
+# Profiling models
+class ProfileSpanTotal(BaseModel):
+    calls: int
+    total_ms: float
+
+class ProfileSummary(BaseModel):
+    profile_id: str
+    method: str
+    path: str
+    status_code: Optional[int] = None
+    duration_ms: float
+    sample_count: int
+    spans: Dict[str, ProfileSpanTotal]
+    created_at: str
 
 # Verification models
 class VerifyRequest(BaseModel):
     event_id: Optional[int] = None
     model_id: Optional[str] = None
+    model_name: Optional[str] = None
+    model_version: Optional[str] = None
+    framework: Optional[str] = None
+    dataset_name: Optional[str] = None
+    dataset_version: Optional[str] = None
+    dataset_hash: Optional[str] = None
+    source: Optional[str] = None
     event_type: Optional[str] = None
+    actor: Optional[str] = None
+    environment: Optional[str] = None
     timestamp: Optional[str] = None
     summary: Optional[str] = None
     metadata_hash: Optional[str] = None
+    hash_version: Optional[int] = None  # If None, every known version is tried
 
 class VerifyResponse(BaseModel):
     valid: bool
     message: str
     details: Optional[dict] = None
 
+class ChainVerifyResponse(BaseModel):
+    valid: bool
+    checked: int
+    unchained: int
+    head: Optional[str] = None
+    broken_at: Optional[int] = None
+    reason: Optional[str] = None
+
 # Batch models
 class BatchResponse(BaseModel):
     batch_id: str
@@ -95,5 +260,6 @@ class BatchResponse(BaseModel):
     event_count: int
     status: str
     created_at: str
+    state_root: Optional[str] = None
 
 
@@ -1,8 +1,13 @@
 # Router module
-
-
-
-
-
-
-
+from fastapi import HTTPException
+from app.storage import get_storage
+
+
+def require_sqlite():
+    """
+    Route dependency for features only the SQLite backend has (partition
+    archive, lineage index, full-text search): 501 on other backends
+    """
+    storage = get_storage()
+    if storage.name != "sqlite":
+        raise HTTPException(status_code=501, detail=f"Not available with the {storage.name} storage backend")
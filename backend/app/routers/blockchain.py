@@ -1,11 +1,15 @@
 """
 Blockchain router - API endpoints for blockchain anchoring and verification
 """
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, HTTPException, Request, Response
 from pydantic import BaseModel
 from typing import Optional
 from app.services.blockchain_service import get_blockchain_service, BlockchainService
-from app.database import get_db
+from app.services.confirmation_tracker import FINAL, get_confirmation_tracker
+from app.services.coordination_service import get_anchor_leadership
+from app.services.http_cache import cached_response, immutable_response, revalidated_response
+from app.services.verification_cache import ANCHORED_ROOT, VerificationKey, get_verification_cache
+from app.storage import get_storage
 
 router = APIRouter()
 
@@ -57,7 +61,18 @@ async def anchor_merkle_root(request: AnchorRequest):
     2. Submits transaction to blockchain
     3. Waits for confirmation
     4. Stores anchor information in database
+    
+    Only the anchor leader sends transactions; other workers answer 503 so
+    the client retries, usually reaching another worker.
     """
+    leadership = get_anchor_leadership()
+    if not leadership.is_leader():
+        raise HTTPException(
+            status_code=503,
+            detail=f"Anchoring is handled by the anchor leader ({leadership.stats()['holder']})",
+            headers={"Retry-After": "1"}
+        )
+    
     try:
         service = get_blockchain_service()
         result = service.anchor_merkle_root(request.merkle_root, request.batch_id)
@@ -79,20 +94,34 @@ async def anchor_merkle_root(request: AnchorRequest):
 
 
 @router.get("/anchor/{anchor_id}", response_model=AnchorInfoResponse)
-async def get_anchor(anchor_id: int):
+async def get_anchor(anchor_id: int, request: Request):
     """
     Get anchor information from blockchain by anchor ID
+    
+    Once the anchor is final it can no longer be reorganised away, so it is
+    served as immutable and from the response cache without asking the chain
+    again; until then clients revalidate.
     """
+    cache_key = f"blockchain.anchor:{anchor_id}"
+    cached = cached_response(request, cache_key)
+    if cached is not None:
+        return cached
+    
     try:
         service = get_blockchain_service()
         result = service.get_anchor(anchor_id)
         
-        return AnchorInfoResponse(
+        content = AnchorInfoResponse(
             merkle_root=result["merkle_root"],
             timestamp=result["timestamp"],
             submitted_by=result["submitted_by"],
             anchor_id=result["anchor_id"]
-        )
+        ).model_dump()
+        
+        anchor_row = get_storage().anchors.get(anchor_id)
+        if anchor_row and anchor_row["confirmation_status"] == FINAL:
+            return immutable_response(request, cache_key, content)
+        return revalidated_response(request, content)
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
@@ -100,7 +129,7 @@ async def get_anchor(anchor_id: int):
 
 
 @router.post("/verify", response_model=BlockchainVerifyResponse)
-async def verify_on_blockchain(request: BlockchainVerifyRequest):
+async def verify_on_blockchain(request: BlockchainVerifyRequest, response: Response, refresh: bool = False):
     """
     Verify an audit event using blockchain-anchored Merkle roots
     
@@ -109,58 +138,47 @@ async def verify_on_blockchain(request: BlockchainVerifyRequest):
     2. Recompute Merkle root from event data
     3. Retrieve on-chain Merkle root for the batch
     4. Compare and return verification result
+    
+    Batches sealed with a state root are anchored as the commitment to both
+    roots, which is what the on-chain value is checked against. Anchors sent
+    before the commitment was introduced hold the Merkle root alone; they
+    still pass, with details.state_root_anchored false.
+    
+    A pass against a final anchor is answered from the verification cache,
+    without the RPC call, while the batch roots and the anchor record are
+    unchanged and no root mismatch has been detected; refresh=true
+    re-verifies it.
     """
-    from app.services.merkle_service import build_merkle_tree
-    from app.services.hashing_service import hash_metadata
+    from app.services.merkle_service import anchor_commitment
     
-    conn = get_db()
-    cursor = conn.cursor()
+    cache = get_verification_cache()
+    storage = get_storage()
     
     try:
+        hash_version = None
+        
         # Get event information
         if request.event_id:
-            cursor.execute("""
-                SELECT id, model_id, model_name, model_version, framework,
-                       dataset_name, dataset_version, dataset_hash, source,
-                       event_type, actor, environment, timestamp, summary,
-                       metadata_hash, merkle_leaf_hash, batch_id, status
-                FROM audit_events
-                WHERE id = ?
-            """, (request.event_id,))
-            
-            event_row = cursor.fetchone()
+            event_row = storage.events.get(request.event_id)
             if not event_row:
                 raise HTTPException(status_code=404, detail="Event not found")
             
             batch_id = event_row["batch_id"]
+            hash_version = event_row["hash_version"]
         elif request.batch_id:
             batch_id = request.batch_id
         else:
             raise HTTPException(status_code=400, detail="Either event_id or batch_id must be provided")
         
         # Get batch information
-        cursor.execute("""
-            SELECT batch_id, merkle_root, event_ids, status
-            FROM merkle_batches
-            WHERE batch_id = ?
-        """, (batch_id,))
-        
-        batch_row = cursor.fetchone()
+        batch_row = storage.batches.get(batch_id)
         if not batch_row:
             raise HTTPException(status_code=404, detail="Batch not found")
         
         stored_merkle_root = batch_row["merkle_root"]
         
         # Get blockchain anchor for this batch
-        cursor.execute("""
-            SELECT anchor_id, transaction_hash, block_number, merkle_root
-            FROM blockchain_anchors
-            WHERE batch_id = ? OR merkle_root = ?
-            ORDER BY created_at DESC
-            LIMIT 1
-        """, (batch_id, stored_merkle_root))
-        
-        anchor_row = cursor.fetchone()
+        anchor_row = storage.anchors.latest_for_batch(batch_id, stored_merkle_root)
         
         if not anchor_row or not anchor_row["anchor_id"]:
             return BlockchainVerifyResponse(
@@ -169,6 +187,22 @@ async def verify_on_blockchain(request: BlockchainVerifyRequest):
                 details={"error": "No blockchain anchor found for this batch"}
             )
         
+        key = VerificationKey(
+            event_id=request.event_id,
+            hash_version=hash_version,
+            batch_root=stored_merkle_root,
+            state_root=batch_row["state_root"],
+            anchor_id=anchor_row["anchor_id"],
+            block_hash=anchor_row["block_hash"],
+            confirmation_status=anchor_row["confirmation_status"]
+        )
+        subject = request.event_id or batch_id
+        if not refresh:
+            cached = cache.get(ANCHORED_ROOT, subject, key)
+            if cached is not None:
+                response.headers["X-Verification-Cache"] = "hit"
+                return BlockchainVerifyResponse(**cached)
+        
         # Get on-chain Merkle root
         try:
             service = get_blockchain_service()
@@ -184,10 +218,13 @@ async def verify_on_blockchain(request: BlockchainVerifyRequest):
         # Normalize roots for comparison
         stored_normalized = stored_merkle_root.lower().replace("0x", "")
         onchain_normalized = onchain_merkle_root.lower().replace("0x", "")
+        state_root = batch_row["state_root"]
+        anchored_root = anchor_commitment(stored_merkle_root, state_root)
+        state_root_anchored = state_root is not None and onchain_normalized == anchored_root
         
         # Compare roots
-        if stored_normalized == onchain_normalized:
-            return BlockchainVerifyResponse(
+        if state_root_anchored or stored_normalized == onchain_normalized:
+            result = BlockchainVerifyResponse(
                 status="PASS",
                 computed_merkle_root=stored_merkle_root,
                 onchain_merkle_root=onchain_merkle_root,
@@ -196,11 +233,22 @@ async def verify_on_blockchain(request: BlockchainVerifyRequest):
                 block_number=anchor_row["block_number"],
                 message="Verification successful: Merkle roots match",
                 details={
+                    "state_root": state_root,
+                    "anchored_root": anchored_root if state_root_anchored else stored_merkle_root,
+                    "state_root_anchored": state_root_anchored,
                     "network": service.get_network_name(),
+                    "confirmations": anchor_row["confirmations"],
+                    "confirmation_status": anchor_row["confirmation_status"],
                     "explorer_url": service.get_explorer_url(anchor_row["transaction_hash"]) if anchor_row["transaction_hash"] else None
                 }
             )
+            # Until the anchor is final its depth changes and a reorg may drop it
+            if anchor_row["confirmation_status"] == FINAL:
+                cache.put(ANCHORED_ROOT, subject, key, result.model_dump(), batch_id=batch_id)
+                response.headers["X-Verification-Cache"] = "miss"
+            return result
         else:
+            cache.invalidate(batch_id=batch_id, batch_root=stored_merkle_root)
             return BlockchainVerifyResponse(
                 status="FAIL",
                 computed_merkle_root=stored_merkle_root,
@@ -209,17 +257,17 @@ async def verify_on_blockchain(request: BlockchainVerifyRequest):
                 message="Verification failed: Merkle root mismatch",
                 details={
                     "stored_root": stored_merkle_root,
+                    "state_root": state_root,
+                    "expected_onchain_root": anchored_root,
                     "onchain_root": onchain_merkle_root,
                     "mismatch": "Roots do not match - possible tampering detected"
                 }
             )
-            
+    
     except HTTPException:
         raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Verification error: {str(e)}")
-    finally:
-        conn.close()
 
 
 @router.get("/status")
@@ -229,8 +277,20 @@ async def get_blockchain_status():
     """
     try:
         service = get_blockchain_service()
+        service.connect_in_background()
+        if not service.ready:
+            mode = "initializing"
+        else:
+            mode = "simulated" if service.simulated else "rpc"
+        
         return {
-            "connected": True,
+            "connected": service.ready and service.is_healthy(),
+            "mode": mode,
+            "endpoints": [] if service.simulated else service.pool.stats(),
+            "simulator": service.chain.stats() if service.simulated else None,
+            "confirmations": get_confirmation_tracker().stats(),
+            "leadership": get_anchor_leadership().stats(),
+            "last_probe_at": service.last_probe_at,
             "network": service.get_network_name(),
             "chain_id": service.chain_id,
             "contract_address": service.contract_address,
@@ -243,3 +303,29 @@ async def get_blockchain_status():
         }
 
 
+
+
+@router.get("/costs")
+async def get_anchoring_costs():
+    """
+    Gas spent on anchoring and the cost per anchored event
+    
+    Covers anchors with a receipt; database fallback anchors cost nothing.
+    """
+    from app.services.anchor_scheduler import ANCHOR_MAX_DELAY_SECONDS, QUEUED
+    
+    storage = get_storage()
+    summary = dict(storage.anchors.cost_summary())
+    cost_wei = int(summary["cost_wei"])
+    anchored_events = int(summary["anchored_events"])
+    
+    return {
+        "anchors": summary["anchors"],
+        "anchored_events": anchored_events,
+        "gas_used": int(summary["gas_used"]),
+        "cost_wei": cost_wei,
+        "cost_per_event_wei": cost_wei // anchored_events if anchored_events else None,
+        "queued_batches": len(storage.batches.list_by_status(QUEUED)),
+        "max_anchor_delay_seconds": ANCHOR_MAX_DELAY_SECONDS,
+        "gas": get_blockchain_service().gas.stats()
+    }
@@ -1,229 +1,196 @@
 """
 Event logging router - Append-only audit event storage
 """
-from fastapi import APIRouter, HTTPException
-from typing import List
-from app.models import EventCreate, EventResponse
+from fastapi import APIRouter, Depends, Header, HTTPException
+from typing import List, Optional
+from app.models import EventCreate, EventResponse, EventSearchHit, EventSearchResponse, normalize_event_type
 from app.database import get_db
-from app.services.hashing_service import hash_metadata
+from app.services.hashing_service import hash_event, CURRENT_HASH_VERSION
+from app.services.idempotency_service import IdempotencyConflict, get_deduplicator
+from app.services.ingest_service import IngestRejected, get_ingest_queue, get_rate_limiter, producer_key
+from app.services.metrics_service import INGEST_SECONDS
+from app.services.search_service import search_events
+from app.services.serialization_service import RowSerializer, json_response
+from app.services.stream_service import EVENT_CREATED, publish
+from app.storage import get_storage
+from app.storage.base import DuplicateEvent
+from app.routers import require_sqlite
+import asyncio
 import json
+import time
 
 router = APIRouter()
 
+# Rows carry every EventResponse field under the same name
+EVENT_SERIALIZER = RowSerializer(EventResponse, defaults={"status": "Pending"})
+SEARCH_HIT_SERIALIZER = RowSerializer(EventSearchHit, defaults={"status": "Pending"})
+
+SEARCH_MAX_LIMIT = 100
+
+def _too_many_requests(rejected: IngestRejected) -> HTTPException:
+    return HTTPException(
+        status_code=429,
+        detail=str(rejected),
+        headers={"Retry-After": rejected.retry_after_header}
+    )
+
 @router.post("", response_model=EventResponse)
-async def create_event(event: EventCreate):
+async def create_event(
+    event: EventCreate,
+    idempotency_key: Optional[str] = Header(None),
+    authorization: Optional[str] = Header(None)
+):
     """
     Create a new audit event
     This is append-only - events cannot be modified or deleted
+    
+    A retry (same Idempotency-Key, or same content without one) returns the
+    event stored by the first attempt, marked with Idempotent-Replayed: true.
+    Producers over their rate, or arriving while the ingest queue is full,
+    get 429 with Retry-After.
     """
-    # Validate event_type (case-insensitive)
-    valid_types = ["train", "evaluate", "deploy", "training", "evaluation", "deployment"]
-    event_type_normalized = event.event_type.lower()
-    if event_type_normalized not in [vt.lower() for vt in valid_types]:
+    started = time.perf_counter()
+    
+    if idempotency_key is not None and not 0 < len(idempotency_key) <= 255:
+        raise HTTPException(status_code=400, detail="Idempotency-Key must be 1 to 255 characters")
+    
+    # Validate and normalize event_type (case-insensitive) to title case
+    normalized_type = normalize_event_type(event.event_type)
+    if normalized_type is None:
         raise HTTPException(
             status_code=400,
             detail=f"Invalid event_type. Must be one of: Train, Evaluate, Deploy"
         )
     
-    # Normalize event type to title case
-    event_type_map = {
-        "train": "Train",
-        "training": "Train",
-        "evaluate": "Evaluate",
-        "evaluation": "Evaluate",
-        "deploy": "Deploy",
-        "deployment": "Deploy"
-    }
-    normalized_type = event_type_map.get(event_type_normalized, event.event_type)
-    
-    # Create metadata dict for hashing (include all fields)
-    metadata = {
+    record = {
         "model_id": event.model_id,
-        "model_name": event.model_name or "",
-        "model_version": event.model_version or "",
-        "framework": event.framework or "",
-        "dataset_name": event.dataset_name or "",
-        "dataset_version": event.dataset_version or "",
-        "dataset_hash": event.dataset_hash or "",
-        "source": event.source or "",
+        "model_name": event.model_name,
+        "model_version": event.model_version,
+        "framework": event.framework,
+        "dataset_name": event.dataset_name,
+        "dataset_version": event.dataset_version,
+        "dataset_hash": event.dataset_hash,
+        "source": event.source,
         "event_type": normalized_type,
-        "actor": event.actor or "",
-        "environment": event.environment or "",
+        "actor": event.actor,
+        "environment": event.environment,
         "timestamp": event.timestamp,
-        "summary": event.summary or ""
+        "summary": event.summary
     }
     
-    # Compute event hash (SHA-256)
-    metadata_hash = hash_metadata(metadata)
+    try:
+        get_rate_limiter().acquire(producer_key(authorization, record))
+    except IngestRejected as e:
+        raise _too_many_requests(e)
+    
+    # Compute event hash (SHA-256) over all fields with the canonical encoder
+    metadata_hash = hash_event(record, CURRENT_HASH_VERSION)
     
     # Merkle leaf hash is the same as metadata_hash for now
     # (In a real system, this might be computed differently)
-    merkle_leaf_hash = metadata_hash
-    
-    # Store in database
-    conn = get_db()
-    cursor = conn.cursor()
+    record["metadata_hash"] = metadata_hash
+    record["merkle_leaf_hash"] = metadata_hash
+    record["hash_version"] = CURRENT_HASH_VERSION
     
+    # Retries return the original event instead of appending a copy
+    dedup = get_deduplicator()
     try:
-        cursor.execute("""
-            INSERT INTO audit_events (
-                model_id, model_name, model_version, framework,
-                dataset_name, dataset_version, dataset_hash, source,
-                event_type, actor, environment, timestamp, summary,
-                metadata_hash, merkle_leaf_hash, status
-            )
-            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-        """, (
-            event.model_id,
-            event.model_name,
-            event.model_version,
-            event.framework,
-            event.dataset_name,
-            event.dataset_version,
-            event.dataset_hash,
-            event.source,
-            normalized_type,
-            event.actor,
-            event.environment,
-            event.timestamp,
-            event.summary,
-            metadata_hash,
-            merkle_leaf_hash,
-            "Pending"
-        ))
-        
-        event_id = cursor.lastrowid
-        conn.commit()
-        
-        # Fetch created event
-        cursor.execute("""
-            SELECT id, model_id, model_name, model_version, framework,
-                   dataset_name, dataset_version, dataset_hash, source,
-                   event_type, actor, environment, timestamp, summary,
-                   metadata_hash, merkle_leaf_hash, batch_id, status, created_at
-            FROM audit_events
-            WHERE id = ?
-        """, (event_id,))
-        
-        row = cursor.fetchone()
-        
-        return EventResponse(
-            id=row["id"],
-            model_id=row["model_id"],
-            model_name=row["model_name"],
-            model_version=row["model_version"],
-            framework=row["framework"],
-            dataset_name=row["dataset_name"],
-            dataset_version=row["dataset_version"],
-            dataset_hash=row["dataset_hash"],
-            source=row["source"],
-            event_type=row["event_type"],
-            actor=row["actor"],
-            environment=row["environment"],
-            timestamp=row["timestamp"],
-            summary=row["summary"],
-            metadata_hash=row["metadata_hash"],
-            merkle_leaf_hash=row["merkle_leaf_hash"],
-            batch_id=row["batch_id"],
-            status=row["status"] or "Pending",
-            created_at=row["created_at"]
-        )
-    finally:
-        conn.close()
+        original = dedup.find_original(metadata_hash, idempotency_key)
+        if original is None:
+            try:
+                row = await asyncio.wrap_future(get_ingest_queue().submit(record, idempotency_key))
+            except DuplicateEvent as e:
+                # A concurrent request stored it between the lookup and the insert
+                original = dedup.replay(e.existing, metadata_hash, idempotency_key)
+    except IdempotencyConflict as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    except IngestRejected as e:
+        raise _too_many_requests(e)
+    
+    if original is not None:
+        response = EVENT_SERIALIZER.response(original)
+        response.headers["Idempotent-Replayed"] = "true"
+        return response
+    
+    content = EVENT_SERIALIZER.to_dict(row)
+    dedup.remember(content, idempotency_key)
+    publish(EVENT_CREATED, content)
+    INGEST_SECONDS.observe(time.perf_counter() - started)
+    
+    return json_response(content)
 
 @router.get("", response_model=List[EventResponse])
 async def get_events(limit: int = 100, offset: int = 0):
     """
     Get all audit events (paginated)
     """
-    conn = get_db()
-    cursor = conn.cursor()
+    rows = get_storage().events.list(limit, offset)
     
-    try:
-        cursor.execute("""
-            SELECT id, model_id, model_name, model_version, framework,
-                   dataset_name, dataset_version, dataset_hash, source,
-                   event_type, actor, environment, timestamp, summary,
-                   metadata_hash, merkle_leaf_hash, batch_id, status, created_at
-            FROM audit_events
-            ORDER BY created_at DESC
-            LIMIT ? OFFSET ?
-        """, (limit, offset))
-        
-        rows = cursor.fetchall()
-        
-        return [
-            EventResponse(
-                id=row["id"],
-                model_id=row["model_id"],
-                model_name=row["model_name"],
-                model_version=row["model_version"],
-                framework=row["framework"],
-                dataset_name=row["dataset_name"],
-                dataset_version=row["dataset_version"],
-                dataset_hash=row["dataset_hash"],
-                source=row["source"],
-                event_type=row["event_type"],
-                actor=row["actor"],
-                environment=row["environment"],
-                timestamp=row["timestamp"],
-                summary=row["summary"],
-                metadata_hash=row["metadata_hash"],
-                merkle_leaf_hash=row["merkle_leaf_hash"],
-                batch_id=row["batch_id"],
-                status=row["status"] or "Pending",
-                created_at=row["created_at"]
-            )
-            for row in rows
-        ]
-    finally:
-        conn.close()
+    return EVENT_SERIALIZER.list_response(rows)
 
-@router.get("/{event_id}", response_model=EventResponse)
-async def get_event(event_id: int):
+@router.get("/search", response_model=EventSearchResponse, dependencies=[Depends(require_sqlite)])
+async def search(
+    q: Optional[str] = None,
+    framework: Optional[str] = None,
+    environment: Optional[str] = None,
+    actor: Optional[str] = None,
+    limit: int = 20,
+    offset: int = 0
+):
     """
-    Get a specific audit event by ID
+    Full-text search over event summaries and text fields
+    
+    Every word of q must match (the last may be a prefix); framework,
+    environment and actor filter exactly. Results are ranked by relevance
+    and come with the total and per-facet counts of all matches. Covers the
+    hot event table, not sealed partitions.
     """
+    if limit < 1 or limit > SEARCH_MAX_LIMIT:
+        raise HTTPException(status_code=400, detail=f"limit must be between 1 and {SEARCH_MAX_LIMIT}")
+    if offset < 0:
+        raise HTTPException(status_code=400, detail="offset must not be negative")
+    
     conn = get_db()
     cursor = conn.cursor()
     
     try:
-        cursor.execute("""
-            SELECT id, model_id, model_name, model_version, framework,
-                   dataset_name, dataset_version, dataset_hash, source,
-                   event_type, actor, environment, timestamp, summary,
-                   metadata_hash, merkle_leaf_hash, batch_id, status, created_at
-            FROM audit_events
-            WHERE id = ?
-        """, (event_id,))
-        
-        row = cursor.fetchone()
-        
-        if not row:
-            raise HTTPException(status_code=404, detail="Event not found")
-        
-        return EventResponse(
-            id=row["id"],
-            model_id=row["model_id"],
-            model_name=row["model_name"],
-            model_version=row["model_version"],
-            framework=row["framework"],
-            dataset_name=row["dataset_name"],
-            dataset_version=row["dataset_version"],
-            dataset_hash=row["dataset_hash"],
-            source=row["source"],
-            event_type=row["event_type"],
-            actor=row["actor"],
-            environment=row["environment"],
-            timestamp=row["timestamp"],
-            summary=row["summary"],
-            metadata_hash=row["metadata_hash"],
-            merkle_leaf_hash=row["merkle_leaf_hash"],
-            batch_id=row["batch_id"],
-            status=row["status"] or "Pending",
-            created_at=row["created_at"]
+        result = search_events(
+            cursor, q, {"framework": framework, "environment": environment, "actor": actor}, limit, offset
         )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     finally:
         conn.close()
+    
+    return json_response({
+        "match": result["match"],
+        "total": result["total"],
+        "total_is_estimate": result["total_is_estimate"],
+        "limit": limit,
+        "offset": offset,
+        "results": SEARCH_HIT_SERIALIZER.to_list(result["hits"]),
+        "facets": result["facets"]
+    })
 
+@router.get("/ingest/stats")
+async def get_ingest_stats():
+    """
+    Get admission control, write queue and deduplication stats
+    """
+    return {
+        "queue": get_ingest_queue().stats(),
+        "rate_limiter": get_rate_limiter().stats(),
+        "deduplication": get_deduplicator().stats()
+    }
 
+@router.get("/{event_id}", response_model=EventResponse)
+async def get_event(event_id: int):
+    """
+    Get a specific audit event by ID
+    """
+    row = get_storage().events.get(event_id)
+    
+    if not row:
+        raise HTTPException(status_code=404, detail="Event not found")
+    
+    return EVENT_SERIALIZER.response(row)
@@ -0,0 +1,97 @@
+"""
+Lineage router - Model and dataset lineage from the ingest-time adjacency index
+"""
+from fastapi import APIRouter, Depends, HTTPException
+from typing import Dict, List, Optional
+from app.models import DatasetLineageResponse, LineageEdge, ModelLineageResponse, ModelVersionLineage
+from app.database import get_db
+from app.services.lineage_service import (
+    DATASET_RELATIONS, edges_for_model, event_references, models_for_dataset
+)
+from app.routers import require_sqlite
+
+router = APIRouter(dependencies=[Depends(require_sqlite)])
+
+LINEAGE_MAX_EDGES = 10000
+
+def _check_limit(limit: int):
+    if limit < 1 or limit > LINEAGE_MAX_EDGES:
+        raise HTTPException(status_code=400, detail=f"limit must be between 1 and {LINEAGE_MAX_EDGES}")
+
+def _edges(conn, rows) -> List[LineageEdge]:
+    references = event_references(conn, rows)
+    return [
+        LineageEdge(
+            model_id=row["model_id"],
+            model_version=row["model_version"],
+            relation=row["relation"],
+            target=row["target"],
+            dataset_name=row["dataset_name"],
+            dataset_version=row["dataset_version"],
+            event=references[row["event_id"]]
+        )
+        for row in rows
+    ]
+
+@router.get("/datasets/{dataset}/models", response_model=DatasetLineageResponse)
+async def get_dataset_models(dataset: str, relation: Optional[str] = None, limit: int = 1000):
+    """
+    Model versions linked to a dataset, e.g. every version trained on it
+    
+    The dataset is its dataset_hash, or name@version for events recorded
+    without a hash. Filter with relation=trained_on or evaluated_on.
+    Each edge references the recording event with its batch root and proof URL.
+    """
+    _check_limit(limit)
+    if relation is not None and relation not in DATASET_RELATIONS.values():
+        raise HTTPException(
+            status_code=400,
+            detail=f"Invalid relation: {relation}. Must be one of: {', '.join(DATASET_RELATIONS.values())}"
+        )
+    
+    conn = get_db()
+    cursor = conn.cursor()
+    
+    try:
+        rows = models_for_dataset(cursor, dataset, relation, limit + 1)
+        return DatasetLineageResponse(
+            dataset=dataset,
+            relation=relation,
+            models=_edges(conn, rows[:limit]),
+            truncated=len(rows) > limit
+        )
+    finally:
+        conn.close()
+
+@router.get("/models/{model_id}", response_model=ModelLineageResponse)
+async def get_model_lineage(model_id: str, model_version: Optional[str] = None, limit: int = 1000):
+    """
+    Training ancestry and deploy history of a model, per version
+    
+    Versions appear in the order they were first recorded; within a version
+    each relation lists its events oldest first.
+    """
+    _check_limit(limit)
+    conn = get_db()
+    cursor = conn.cursor()
+    
+    try:
+        rows = edges_for_model(cursor, model_id, model_version, limit + 1)
+        
+        versions: Dict[Optional[str], ModelVersionLineage] = {}
+        for edge in _edges(conn, rows[:limit]):
+            lineage = versions.get(edge.model_version)
+            if lineage is None:
+                lineage = versions[edge.model_version] = ModelVersionLineage(
+                    model_version=edge.model_version,
+                    trained_on=[], evaluated_on=[], deployed_to=[]
+                )
+            getattr(lineage, edge.relation).append(edge)
+        
+        return ModelLineageResponse(
+            model_id=model_id,
+            versions=list(versions.values()),
+            truncated=len(rows) > limit
+        )
+    finally:
+        conn.close()
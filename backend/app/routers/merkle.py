@@ -1,10 +1,20 @@
 """
 Merkle tree router - Build and manage Merkle batches
 """
-from fastapi import APIRouter, HTTPException
-from app.models import MerkleBuildRequest, MerkleResponse, MerkleProof
-from app.database import get_db
-from app.services.merkle_service import build_merkle_tree, get_merkle_proof
+from fastapi import APIRouter, HTTPException, Request
+from app.models import (
+    MerkleBuildRequest, MerkleResponse, MerkleEventProofResponse,
+    MerkleMultiProofRequest, MerkleMultiProofResponse, MultiProofLeaf
+)
+from app.services.merkle_service import (
+    stream_merkle_root, stream_merkle_proof, stream_merkle_multiproof,
+    MERKLE_BATCH_SIZE, MERKLE_MAX_BATCH_SIZE
+)
+from app.services.anchor_scheduler import anchor_batch, claim_batch
+from app.services.coordination_service import get_anchor_leadership
+from app.services.http_cache import cached_response, immutable_response, revalidated_response
+from app.services.stream_service import BATCH_SEALED, publish
+from app.storage import get_storage
 import uuid
 from typing import List
 
@@ -16,159 +26,150 @@ async def build_merkle_batch(request: MerkleBuildRequest):
     Build Merkle tree from audit events
     
     If event_ids is provided, use only those events.
-    Otherwise, use all events not yet in a batch.
+    Otherwise, seal up to max_events (MERKLE_BATCH_SIZE) of the oldest
+    pending events. Leaves are streamed, so the response carries the root
+    and a URL template for per-event proofs rather than every proof.
+    Non-urgent batches are queued and anchored by the scheduler within
+    ANCHOR_MAX_DELAY_SECONDS. Urgent ones are anchored at once when this
+    worker is the anchor leader, else queued for the leader's next pass.
     """
-    conn = get_db()
-    cursor = conn.cursor()
-    
-    try:
-        # Get event hashes (use merkle_leaf_hash if available, otherwise metadata_hash)
-        if request.event_ids:
-            # Use specific event IDs
-            placeholders = ','.join('?' * len(request.event_ids))
-            cursor.execute(f"""
-                SELECT id, COALESCE(merkle_leaf_hash, metadata_hash) as leaf_hash
-                FROM audit_events
-                WHERE id IN ({placeholders}) AND (status = 'Pending' OR batch_id IS NULL)
-                ORDER BY id
-            """, request.event_ids)
-        else:
-            # Get all events not in any batch yet (status is Pending)
-                cursor.execute("""
-                SELECT id, COALESCE(merkle_leaf_hash, metadata_hash) as leaf_hash
-                    FROM audit_events
-                WHERE status = 'Pending' OR batch_id IS NULL
-                    ORDER BY id
-                LIMIT 16
-                """)
-        
-        events = cursor.fetchall()
-        
-        if not events:
-            raise HTTPException(
-                status_code=400,
-                detail="No events available for batch creation"
-            )
-        
-        # Extract hashes
-        event_hashes = [(row["id"], row["leaf_hash"]) for row in events]
-        hashes = [hash for _, hash in event_hashes]
-        event_ids = [event_id for event_id, _ in event_hashes]
-        
-        # Build Merkle tree
-        merkle_root, tree_levels = build_merkle_tree(hashes)
-        
-        # Generate proofs for all events
-        proofs = []
-        for idx, (event_id, leaf_hash) in enumerate(event_hashes):
-            proof = get_merkle_proof(tree_levels, idx, leaf_hash)
-            proofs.append(MerkleProof(
-                event_id=event_id,
-                proof=proof,
-                leaf_hash=leaf_hash
-            ))
-        
-        # Create batch
-        batch_id = f"BATCH-{str(uuid.uuid4())[:8].upper()}"
-        event_ids_json = str(event_ids)  # Simple string representation
-        
-        cursor.execute("""
-            INSERT INTO merkle_batches (batch_id, merkle_root, event_ids, status)
-            VALUES (?, ?, ?, ?)
-        """, (batch_id, merkle_root, event_ids_json, "Pending"))
-        
-        # Update event statuses to "Batched" and set batch_id
-        for event_id in event_ids:
-            cursor.execute("""
-                UPDATE audit_events
-                SET status = 'Batched', batch_id = ?
-                WHERE id = ?
-            """, (batch_id, event_id))
-        
-        conn.commit()
-        
-        # Anchor to blockchain
-        try:
-            from app.services.blockchain_service import anchor_merkle_root
-            anchor_result = anchor_merkle_root(merkle_root, batch_id)
-            
-            # Update batch status to "Anchored" if blockchain anchoring succeeded
-            if anchor_result.get("status") == "success":
-                cursor.execute("""
-                    UPDATE merkle_batches
-                    SET status = 'Anchored'
-                    WHERE batch_id = ?
-                """, (batch_id,))
-                
-                # Update event statuses to "Anchored"
-                for event_id in event_ids:
-                    cursor.execute("""
-                        UPDATE audit_events
-                        SET status = 'Anchored'
-                        WHERE id = ?
-                    """, (event_id,))
-            else:
-                # Keep as "Batched" if blockchain anchoring failed
-                cursor.execute("""
-                    UPDATE merkle_batches
-                    SET status = 'Batched'
-                    WHERE batch_id = ?
-                """, (batch_id,))
-        except Exception as e:
-            # If blockchain service is unavailable, just mark as "Batched"
-            print(f"Warning: Blockchain anchoring failed: {e}")
-            cursor.execute("""
-                UPDATE merkle_batches
-                SET status = 'Batched'
-                WHERE batch_id = ?
-            """, (batch_id,))
-        
-        conn.commit()
-        
-        return MerkleResponse(
-            merkle_root=merkle_root,
-            batch_id=batch_id,
-            proofs=proofs,
-            event_count=len(events)
+    limit = MERKLE_BATCH_SIZE if request.max_events is None else request.max_events
+    if limit < 1 or limit > MERKLE_MAX_BATCH_SIZE:
+        raise HTTPException(
+            status_code=400,
+            detail=f"max_events must be between 1 and {MERKLE_MAX_BATCH_SIZE}"
         )
-    finally:
-        conn.close()
+    
+    batch_id = f"BATCH-{str(uuid.uuid4())[:8].upper()}"
+    
+    # Claim events, build the root and record the batch in one transaction
+    sealed = get_storage().batches.seal(batch_id, request.event_ids, limit, stream_merkle_root)
+    
+    if not sealed:
+        raise HTTPException(
+            status_code=400,
+            detail="No events available for batch creation"
+        )
+    
+    merkle_root, event_count = sealed
+    publish(BATCH_SEALED, {
+        "batch_id": batch_id,
+        "merkle_root": merkle_root,
+        "event_count": event_count,
+        "urgent": request.urgent
+    })
+    
+    # Anchor now, or leave it to the scheduler for a cheaper gas window.
+    # Only the anchor leader sends transactions, so signer nonces never race.
+    get_storage().batches.queue(batch_id, urgent=request.urgent)
+    if request.urgent and get_anchor_leadership().is_leader() and claim_batch(batch_id):
+        anchor_result = anchor_batch(batch_id, merkle_root, event_count)
+        anchor_status = anchor_result.get("status") if anchor_result else "failed"
+    else:
+        anchor_status = "queued"
+    
+    return MerkleResponse(
+        merkle_root=merkle_root,
+        batch_id=batch_id,
+        event_count=event_count,
+        proof_url_template=f"/merkle/batches/{batch_id}/proof/{{event_id}}",
+        anchor_status=anchor_status
+    )
 
 @router.get("/batches")
-async def get_batches():
+async def get_batches(request: Request):
     """
     Get all Merkle batches
+    
+    The list changes as batches are sealed and anchored, so it carries an
+    ETag to revalidate against rather than being cached.
+    """
+    rows = get_storage().batches.list()
+    
+    batches = []
+    for row in rows:
+        batches.append({
+            "batch_id": row["batch_id"],
+            "merkle_root": row["merkle_root"],
+            "event_count": row["event_count"] or 0,
+            "status": row["status"] or "Pending",
+            "created_at": row["created_at"],
+            "state_root": row["state_root"]
+        })
+    
+    return revalidated_response(request, batches)
+
+@router.get("/batches/{batch_id}/proof/{event_id}", response_model=MerkleEventProofResponse)
+async def get_batch_proof(batch_id: str, event_id: int, request: Request):
+    """
+    Merkle proof for one event of a batch
+    
+    The batch leaves are streamed through the tree builder, keeping only the
+    nodes on the event's path, and the rebuilt root is checked against the
+    stored one. A sealed batch never changes, so the proof is served with a
+    strong ETag as immutable and answered from the response cache afterwards.
     """
-    conn = get_db()
-    cursor = conn.cursor()
-    
-    try:
-        cursor.execute("""
-            SELECT batch_id, merkle_root, event_ids, status, created_at
-            FROM merkle_batches
-            ORDER BY created_at DESC
-        """)
-        
-        rows = cursor.fetchall()
-        
-        batches = []
-        for row in rows:
-            try:
-                import ast
-                event_ids_list = ast.literal_eval(row["event_ids"]) if row["event_ids"] else []
-                event_count = len(event_ids_list)
-            except:
-                event_count = 0
-            
-            batches.append({
-                "batch_id": row["batch_id"],
-                "merkle_root": row["merkle_root"],
-                "event_count": event_count,
-                "status": row["status"] or "Pending",
-                "created_at": row["created_at"]
-            })
-        
-        return batches
-    finally:
-        conn.close()
+    cache_key = f"merkle.proof:{batch_id}:{event_id}"
+    cached = cached_response(request, cache_key)
+    if cached is not None:
+        return cached
+    
+    storage = get_storage()
+    batch = storage.batches.get(batch_id)
+    if not batch:
+        raise HTTPException(status_code=404, detail="Batch not found")
+    
+    result = stream_merkle_proof(storage.batches.leaves(batch_id), event_id)
+    if result is None:
+        raise HTTPException(status_code=404, detail=f"Event {event_id} not in batch {batch_id}")
+    
+    if result["merkle_root"] != batch["merkle_root"]:
+        raise HTTPException(
+            status_code=409,
+            detail="Recomputed Merkle root does not match stored batch root"
+        )
+    
+    proof = MerkleEventProofResponse(batch_id=batch_id, event_id=event_id, **result)
+    return immutable_response(request, cache_key, proof.model_dump())
 
+@router.post("/multiproof", response_model=MerkleMultiProofResponse)
+async def get_batch_multiproof(request: MerkleMultiProofRequest):
+    """
+    Generate a single compact proof for many events of one batch
+    
+    Returns the minimal set of tree nodes needed to rebuild the batch root
+    from the requested leaves, instead of one sibling list per event.
+    """
+    if not request.event_ids:
+        raise HTTPException(status_code=400, detail="event_ids must not be empty")
+    
+    storage = get_storage()
+    batch = storage.batches.get(request.batch_id)
+    if not batch:
+        raise HTTPException(status_code=404, detail="Batch not found")
+    
+    # Leaves stream in event id order, matching build_merkle_batch, so only
+    # the requested leaves' paths are held rather than the whole tree
+    result = stream_merkle_multiproof(storage.batches.leaves(request.batch_id), request.event_ids)
+    if result["missing"]:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Events not in batch {request.batch_id}: {result['missing']}"
+        )
+    
+    if result["merkle_root"] != batch["merkle_root"]:
+        raise HTTPException(
+            status_code=409,
+            detail="Recomputed Merkle root does not match stored batch root"
+        )
+    
+    return MerkleMultiProofResponse(
+        batch_id=request.batch_id,
+        merkle_root=result["merkle_root"],
+        leaf_count=result["leaf_count"],
+        leaves=[
+            MultiProofLeaf(event_id=event_id, leaf_index=idx, leaf_hash=leaf_hash)
+            for event_id, idx, leaf_hash in result["leaves"]
+        ],
+        proof=result["proof"]
+    )
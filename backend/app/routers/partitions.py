@@ -0,0 +1,47 @@
+"""
+Partition router - Catalog and sealing of archived event partitions
+"""
+from fastapi import APIRouter, Depends, HTTPException
+from typing import List
+from app.models import PartitionResponse
+from app.database import get_db
+from app.services.partition_service import seal_partition
+from app.routers import require_sqlite
+
+router = APIRouter(dependencies=[Depends(require_sqlite)])
+
+@router.get("", response_model=List[PartitionResponse])
+async def get_partitions():
+    """
+    List sealed partitions with their Merkle/anchor summary
+    """
+    conn = get_db()
+    cursor = conn.cursor()
+    
+    try:
+        cursor.execute("""
+            SELECT partition_key, file_path, status, first_event_id, last_event_id,
+                   event_count, merkle_root, chain_head, batch_count, last_anchor_id, sealed_at
+            FROM event_partitions
+            ORDER BY partition_key DESC
+        """)
+        
+        return [PartitionResponse(**dict(row)) for row in cursor.fetchall()]
+    finally:
+        conn.close()
+
+@router.post("/{partition_key}/seal", response_model=PartitionResponse)
+async def seal_event_partition(partition_key: str):
+    """
+    Seal a past month (YYYY-MM) whose events are all anchored
+    
+    Its events move to a compacted read-only file and leave the hot table.
+    """
+    conn = get_db()
+    
+    try:
+        return PartitionResponse(**seal_partition(conn, partition_key))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    finally:
+        conn.close()
@@ -0,0 +1,46 @@
+"""
+Profiling router - Download captured request profiles
+"""
+import json
+from fastapi import APIRouter, HTTPException
+from fastapi.responses import Response
+from typing import List
+from app.models import ProfileSummary
+from app.services.profiling_service import get_profile, list_profiles
+
+router = APIRouter()
+
+@router.get("", response_model=List[ProfileSummary])
+async def get_profiles():
+    """
+    List captured request profiles, newest first
+    """
+    return [ProfileSummary(**summary) for summary in list_profiles()]
+
+@router.get("/{profile_id}")
+async def download_profile(profile_id: str, format: str = "speedscope"):
+    """
+    Download one profile as a speedscope file or collapsed stacks
+    
+    Open speedscope files at https://www.speedscope.app; collapsed stacks
+    feed flamegraph.pl or speedscope directly.
+    """
+    profile = get_profile(profile_id)
+    if not profile:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    
+    if format == "speedscope":
+        return Response(
+            content=json.dumps(profile.speedscope()),
+            media_type="application/json",
+            headers={"Content-Disposition": f'attachment; filename="{profile_id}.speedscope.json"'}
+        )
+    
+    if format == "collapsed":
+        return Response(
+            content=profile.collapsed(),
+            media_type="text/plain",
+            headers={"Content-Disposition": f'attachment; filename="{profile_id}.collapsed.txt"'}
+        )
+    
+    raise HTTPException(status_code=400, detail="format must be one of: speedscope, collapsed")
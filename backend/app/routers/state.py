@@ -0,0 +1,61 @@
+"""
+Model state router - Sparse Merkle proofs for the latest event per model
+"""
+from fastapi import APIRouter, HTTPException
+from typing import Optional
+from app.models import StateProofResponse, StateProofNode, StateRootResponse, normalize_event_type
+from app.services.sparse_merkle_service import state_key_hash
+from app.storage import get_storage
+
+router = APIRouter()
+
+@router.get("/root", response_model=StateRootResponse)
+async def get_model_state_root():
+    """
+    Get the current root of the model state tree
+    """
+    state_root, key_count = get_storage().state.root()
+    return StateRootResponse(state_root=state_root, key_count=key_count)
+
+@router.get("/{model_id}/proof", response_model=StateProofResponse)
+async def get_model_state_proof(model_id: str, event_type: Optional[str] = None, batch_id: Optional[str] = None):
+    """
+    Prove the latest event for a model (optionally for one event type)
+    
+    If the model has no such event, the returned proof demonstrates
+    non-inclusion against the same root. The proof is against the current
+    root, or with batch_id against the state root recorded when that batch
+    was sealed (and anchored with it).
+    """
+    if event_type is not None:
+        stored_type = normalize_event_type(event_type)
+        if stored_type is None:
+            raise HTTPException(status_code=400, detail="Invalid event_type. Must be one of: Train, Evaluate, Deploy")
+        event_type = stored_type
+    
+    version = None
+    if batch_id is not None:
+        batch = get_storage().batches.get(batch_id)
+        if not batch:
+            raise HTTPException(status_code=404, detail="Batch not found")
+        if batch["state_version"] is None:
+            raise HTTPException(
+                status_code=409,
+                detail=f"Batch {batch_id} was sealed before state tree versions were kept; its state root cannot be proven"
+            )
+        version = batch["state_version"]
+    
+    key_hash = state_key_hash(model_id, event_type)
+    state_root, proof, leaf = get_storage().state.proof(key_hash, version)
+    
+    return StateProofResponse(
+        model_id=model_id,
+        event_type=event_type,
+        batch_id=batch_id,
+        key_hash=key_hash,
+        included=leaf is not None,
+        event_id=leaf.leaf_event_id if leaf else None,
+        event_hash=leaf.leaf_event_hash if leaf else None,
+        state_root=state_root,
+        proof=[StateProofNode(depth=depth, hash=node_hash) for depth, node_hash in sorted(proof.items())]
+    )
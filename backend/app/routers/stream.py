@@ -0,0 +1,145 @@
+"""
+Stream router - Live ledger changes over Server-Sent Events or WebSocket
+"""
+from fastapi import APIRouter, Header, HTTPException, Request, WebSocket, WebSocketDisconnect
+from fastapi.responses import StreamingResponse
+from typing import AsyncIterator, FrozenSet, Optional
+from app.services.stream_service import (
+    Message, MESSAGE_TYPES, STREAM_HEARTBEAT_SECONDS, STREAM_LAGGED, get_stream_hub
+)
+import asyncio
+import json
+
+router = APIRouter()
+
+def _parse_types(types: Optional[str]) -> FrozenSet[str]:
+    if not types:
+        return frozenset()
+    
+    selected = frozenset(t.strip() for t in types.split(",") if t.strip())
+    unknown = selected - set(MESSAGE_TYPES)
+    if unknown:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Unknown message type(s): {', '.join(sorted(unknown))}. Must be among: {', '.join(MESSAGE_TYPES)}"
+        )
+    return selected
+
+def _resume_offset(offset: Optional[str], last_event_id: Optional[str]) -> Optional[str]:
+    # An explicit offset wins over the header EventSource sends on reconnect
+    return offset or last_event_id or None
+
+def _sse(message: Message) -> str:
+    offset, message_type, data = message
+    lines = [] if offset is None else [f"id: {offset}"]
+    lines.append(f"event: {message_type}")
+    lines.append(f"data: {json.dumps(data, default=str, separators=(',', ':'))}")
+    return "\n".join(lines) + "\n\n"
+
+def _ws_text(message: Message) -> str:
+    offset, message_type, data = message
+    return json.dumps({"offset": offset, "type": message_type, "data": data}, default=str)
+
+async def _event_stream(request: Request, after: Optional[str], types: FrozenSet[str]) -> AsyncIterator[str]:
+    hub = get_stream_hub()
+    subscription, backlog = hub.subscribe(after, types)
+    try:
+        # Tell EventSource to wait a second before reconnecting
+        yield "retry: 1000\n\n"
+        for message in backlog:
+            if message[0] is not None:
+                subscription.last_offset = message[0]
+            yield _sse(message)
+        
+        while True:
+            message = await subscription.next(STREAM_HEARTBEAT_SECONDS)
+            if message is None:
+                if await request.is_disconnected():
+                    return
+                yield ": keepalive\n\n"
+                continue
+            yield _sse(message)
+            if message[1] == STREAM_LAGGED:
+                return
+    finally:
+        hub.unsubscribe(subscription)
+
+@router.get("")
+async def stream_changes(
+    request: Request,
+    offset: Optional[str] = None,
+    types: Optional[str] = None,
+    last_event_id: Optional[str] = Header(None)
+):
+    """
+    Server-Sent Events stream of ledger changes
+    
+    Message types: event.created, batch.sealed, batch.anchored,
+    anchor.finalized and anchor.orphaned (filter with types=a,b). Each
+    message's id is its offset, "<epoch>-<n>"; reconnecting with
+    Last-Event-ID, or ?offset=, replays buffered messages after it before
+    going live. Offsets belong to one worker: another worker's, or one from
+    before a restart, get stream.reset and the whole buffer.
+    """
+    after = _resume_offset(offset, last_event_id)
+    return StreamingResponse(
+        _event_stream(request, after, _parse_types(types)),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@router.get("/stats")
+async def get_stream_stats():
+    """
+    Get stream offsets, replay buffer and subscriber counts
+    """
+    return get_stream_hub().stats()
+
+async def _wait_for_close(websocket: WebSocket) -> None:
+    while (await websocket.receive())["type"] != "websocket.disconnect":
+        pass
+
+@router.websocket("/ws")
+async def stream_changes_ws(websocket: WebSocket, offset: Optional[str] = None, types: Optional[str] = None):
+    """
+    The same stream over WebSocket, one JSON object per message:
+    {"offset", "type", "data"}
+    """
+    try:
+        selected = _parse_types(types)
+    except HTTPException as e:
+        await websocket.close(code=1008, reason=e.detail[:120])
+        return
+    
+    await websocket.accept()
+    hub = get_stream_hub()
+    subscription, backlog = hub.subscribe(offset, selected)
+    # Clients only ever close; notice it without waiting for the next send
+    closed = asyncio.ensure_future(_wait_for_close(websocket))
+    try:
+        for message in backlog:
+            if message[0] is not None:
+                subscription.last_offset = message[0]
+            await websocket.send_text(_ws_text(message))
+        
+        while True:
+            pending = asyncio.ensure_future(subscription.next(STREAM_HEARTBEAT_SECONDS))
+            await asyncio.wait({pending, closed}, return_when=asyncio.FIRST_COMPLETED)
+            if closed.done():
+                pending.cancel()
+                return
+            
+            message = pending.result()
+            if message is None:
+                # Keeps proxies from closing an idle connection
+                await websocket.send_json({"offset": None, "type": "stream.keepalive", "data": {}})
+                continue
+            await websocket.send_text(_ws_text(message))
+            if message[1] == STREAM_LAGGED:
+                await websocket.close()
+                return
+    except WebSocketDisconnect:
+        pass
+    finally:
+        closed.cancel()
+        hub.unsubscribe(subscription)
@@ -1,138 +1,162 @@
 """
 Verification router - Verify audit event integrity
 """
-from fastapi import APIRouter, HTTPException
-from app.models import VerifyRequest, VerifyResponse
-from app.database import get_db
-from app.services.hashing_service import hash_metadata
+from fastapi import APIRouter, HTTPException, Response
+from app.models import VerifyRequest, VerifyResponse, ChainVerifyResponse
+from app.services.hashing_service import (
+    hash_event, EVENT_HASH_FIELDS, HASH_VERSIONS
+)
 from app.services.merkle_service import verify_merkle_proof
+from app.services.event_chain_service import verify_event_chain
+from app.services.verification_cache import EVENT_HASH, event_key, get_verification_cache
+from app.storage import get_storage
 import json
 
 router = APIRouter()
 
 @router.post("", response_model=VerifyResponse)
-async def verify_event(request: VerifyRequest):
+async def verify_event(request: VerifyRequest, response: Response, refresh: bool = False):
     """
     Verify the integrity of an audit event
     
     Can verify by:
     1. Event ID - fetches event and verifies hash
     2. Metadata - reconstructs event and verifies hash matches provided hash
+    
+    A verified event ID is answered from the verification cache while its
+    stored hash and hashed fields are unchanged and no mismatch has been detected
+    (X-Verification-Cache: hit); refresh=true re-verifies it.
     """
-    conn = get_db()
-    cursor = conn.cursor()
+    cache = get_verification_cache()
+    storage = get_storage()
     
-    try:
-        # Case 1: Verify by event ID
-        if request.event_id:
-            cursor.execute("""
-                SELECT id, model_id, event_type, timestamp, summary, metadata_hash
-                FROM audit_events
-                WHERE id = ?
-            """, (request.event_id,))
-            
-            row = cursor.fetchone()
-            
-            if not row:
-                return VerifyResponse(
-                    valid=False,
-                    message=f"Event ID {request.event_id} not found"
-                )
-            
-            # Reconstruct metadata
-            metadata = {
-                "model_id": row["model_id"],
-                "event_type": row["event_type"],
-                "timestamp": row["timestamp"],
-                "summary": row["summary"] or ""
-            }
-            
-            # Recompute hash
-            computed_hash = hash_metadata(metadata)
-            stored_hash = row["metadata_hash"]
-            
-            if computed_hash != stored_hash:
-                return VerifyResponse(
-                    valid=False,
-                    message="Hash mismatch - event may have been tampered with",
-                    details={
-                        "event_id": request.event_id,
-                        "computed_hash": computed_hash,
-                        "stored_hash": stored_hash
-                    }
-                )
-            
+    # Case 1: Verify by event ID
+    if request.event_id:
+        row = storage.events.get(request.event_id)
+        
+        if not row:
             return VerifyResponse(
-                valid=True,
-                message="Event integrity verified",
+                valid=False,
+                message=f"Event ID {request.event_id} not found"
+            )
+        
+        key = event_key(row)
+        hash_version = key.hash_version
+        if not refresh:
+            cached = cache.get(EVENT_HASH, request.event_id, key)
+            if cached is not None:
+                response.headers["X-Verification-Cache"] = "hit"
+                return VerifyResponse(**cached)
+        
+        # Recompute hash over every hashed field, in the row's hash format
+        computed_hash = hash_event(row, hash_version)
+        stored_hash = row["metadata_hash"]
+        
+        if computed_hash != stored_hash:
+            cache.invalidate(event_id=request.event_id)
+            return VerifyResponse(
+                valid=False,
+                message="Hash mismatch - event may have been tampered with",
                 details={
                     "event_id": request.event_id,
-                    "hash": computed_hash
+                    "computed_hash": computed_hash,
+                    "stored_hash": stored_hash,
+                    "hash_version": hash_version
                 }
             )
         
-        # Case 2: Verify by provided metadata
-        if request.metadata_hash and request.model_id and request.event_type and request.timestamp:
-            # Reconstruct metadata from request
-            metadata = {
-                "model_id": request.model_id,
-                "event_type": request.event_type,
-                "timestamp": request.timestamp,
-                "summary": request.summary or ""
+        result = VerifyResponse(
+            valid=True,
+            message="Event integrity verified",
+            details={
+                "event_id": request.event_id,
+                "hash": computed_hash,
+                "hash_version": hash_version
             }
-            
-            # Compute hash
-            computed_hash = hash_metadata(metadata)
-            
-            # Compare with provided hash
-            if computed_hash != request.metadata_hash:
-                return VerifyResponse(
-                    valid=False,
-                    message="Hash mismatch - metadata does not match provided hash",
-                    details={
-                        "computed_hash": computed_hash,
-                        "provided_hash": request.metadata_hash
-                    }
-                )
-            
-            # Check if event exists in database
-            cursor.execute("""
-                SELECT id, metadata_hash
-                FROM audit_events
-                WHERE metadata_hash = ?
-            """, (computed_hash,))
-            
-            row = cursor.fetchone()
-            
-            if row:
-                return VerifyResponse(
-                    valid=True,
-                    message="Event verified and found in database",
-                    details={
-                        "event_id": row["id"],
-                        "hash": computed_hash
-                    }
-                )
-            else:
-                return VerifyResponse(
-                    valid=False,
-                    message="Hash is valid but event not found in database",
-                    details={
-                        "hash": computed_hash
-                    }
-                )
+        )
+        cache.put(EVENT_HASH, request.event_id, key, result.model_dump())
+        response.headers["X-Verification-Cache"] = "miss"
+        return result
+    
+    # Case 2: Verify by provided metadata
+    if request.metadata_hash and request.model_id and request.event_type and request.timestamp:
+        # Hash the provided fields in the requested format, or find the
+        # format that reproduces the provided hash
+        versions = [request.hash_version] if request.hash_version else HASH_VERSIONS
+        fields = request.model_dump(include=set(EVENT_HASH_FIELDS))
+        try:
+            hashes = {version: hash_event(fields, version) for version in versions}
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
         
-        # Invalid request
-        raise HTTPException(
-            status_code=400,
-            detail="Either provide event_id OR provide metadata_hash with model_id, event_type, and timestamp"
+        hash_version = next(
+            (version for version, value in hashes.items() if value == request.metadata_hash),
+            None
         )
-    finally:
-        conn.close()
-
-
-
-
-
+        
+        if hash_version is None:
+            return VerifyResponse(
+                valid=False,
+                message="Hash mismatch - metadata does not match provided hash",
+                details={
+                    "computed_hash": hashes[versions[0]],
+                    "provided_hash": request.metadata_hash,
+                    "hash_version": versions[0]
+                }
+            )
+        computed_hash = hashes[hash_version]
+        
+        # Check if event exists in database, archived events included
+        row = storage.events.find_by_hash(computed_hash, include_sealed=True)
+        
+        if row:
+            return VerifyResponse(
+                valid=True,
+                message="Event verified and found in database",
+                details={
+                    "event_id": row["id"],
+                    "hash": computed_hash,
+                    "hash_version": hash_version
+                }
+            )
+        else:
+            return VerifyResponse(
+                valid=False,
+                message="Hash is valid but event not found in database",
+                details={
+                    "hash": computed_hash
+                }
+            )
+    
+    # Invalid request
+    raise HTTPException(
+        status_code=400,
+        detail="Either provide event_id OR provide metadata_hash with model_id, event_type, and timestamp"
+    )
 
+@router.get("/chain", response_model=ChainVerifyResponse)
+async def verify_chain():
+    """
+    Verify the hash chain linking all audit events
+    
+    Detects rows that were modified, removed or reordered after insert,
+    including events that have not been batched yet. A broken chain empties
+    the verification cache.
+    """
+    rows = get_storage().events.iter_chain()
+    try:
+        result = ChainVerifyResponse(**verify_event_chain(rows))
+    finally:
+        # Release the connection when a broken link stops the walk early
+        rows.close()
+    
+    if not result.valid:
+        get_verification_cache().clear()
+    return result
 
+@router.get("/cache")
+async def get_verification_cache_stats():
+    """
+    Get verification cache size, hit rate and invalidations
+    """
+    return get_verification_cache().stats()
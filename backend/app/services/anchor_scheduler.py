@@ -0,0 +1,154 @@
+"""
+Anchor scheduler - Cost-aware anchoring of sealed Merkle batches
+
+Urgent batches are anchored as soon as they are sealed. Non-urgent ones are
+left in the "Queued" status and anchored by a background loop when the gas
+oracle reports a cheap window, or unconditionally once they have waited
+ANCHOR_MAX_DELAY_SECONDS, so no batch misses the latency SLA.
+
+With several workers only the anchor leader (see coordination_service) runs
+the loop. Urgent batches sealed on another worker are queued as urgent and
+go out on the leader's next pass whatever the gas price.
+"""
+import os
+import time
+import asyncio
+from datetime import datetime
+from typing import Any, Dict, Optional
+from app.services.coordination_service import BATCH_LEASE_SECONDS, get_anchor_leadership, worker_id
+from app.services.merkle_service import anchor_commitment
+from app.services.metrics_service import ANCHOR_FAILURES
+from app.services.stream_service import BATCH_ANCHORED, publish
+from app.storage import get_storage
+
+ANCHOR_MAX_DELAY_SECONDS = float(os.getenv("ANCHOR_MAX_DELAY_SECONDS", "3600"))
+ANCHOR_SCHEDULER_INTERVAL = float(os.getenv("ANCHOR_SCHEDULER_INTERVAL", "30"))
+
+QUEUED = "Queued"
+ANCHORING = "Anchoring"
+
+# Anchor result fields carried by batch.anchored stream messages
+ANCHOR_MESSAGE_FIELDS = ("anchor_id", "transaction_hash", "block_number", "block_hash", "status")
+
+
+def anchor_batch(batch_id: str, merkle_root: str, event_count: Optional[int] = None) -> Optional[Dict[str, Any]]:
+    """
+    Anchor one sealed batch and update its status
+    
+    What goes on chain is the batch's anchor_commitment, binding its state
+    root as well when it has one.
+    
+    Returns:
+        The anchor result, or None if anchoring raised
+    """
+    try:
+        from app.services.blockchain_service import anchor_merkle_root
+        batch = get_storage().batches.get(batch_id)
+        state_root = batch["state_root"] if batch else None
+        anchor_result = anchor_merkle_root(anchor_commitment(merkle_root, state_root), batch_id, event_count)
+        
+        # Update batch and event statuses to "Anchored" if anchoring (real or simulated chain) succeeded
+        if anchor_result.get("status") in ("success", "simulated"):
+            get_storage().batches.set_status(batch_id, "Anchored", event_status="Anchored")
+            publish(BATCH_ANCHORED, {
+                "batch_id": batch_id,
+                "merkle_root": merkle_root,
+                "state_root": state_root,
+                "event_count": event_count,
+                **{key: anchor_result.get(key) for key in ANCHOR_MESSAGE_FIELDS}
+            })
+        else:
+            # Keep as "Batched" if blockchain anchoring failed
+            get_storage().batches.set_status(batch_id, "Batched")
+        return anchor_result
+    except Exception as e:
+        # If blockchain service is unavailable, just mark as "Batched"
+        print(f"Warning: Blockchain anchoring failed: {e}")
+        ANCHOR_FAILURES.inc()
+        get_storage().batches.set_status(batch_id, "Batched")
+        return None
+
+
+def _age_seconds(created_at: Any, now: datetime) -> float:
+    if isinstance(created_at, str):
+        created_at = datetime.fromisoformat(created_at.replace("Z", ""))
+    if created_at.tzinfo is not None:
+        created_at = created_at.replace(tzinfo=None) - created_at.utcoffset()
+    return (now - created_at).total_seconds()
+
+
+def claim_batch(batch_id: str) -> bool:
+    """Lease a queued batch (or one whose anchoring worker died) to this worker for anchoring"""
+    return get_storage().batches.claim(batch_id, QUEUED, ANCHORING, worker_id(), BATCH_LEASE_SECONDS)
+
+
+def run_scheduler_once() -> int:
+    """
+    Anchor queued batches that are due, if this worker is the anchor leader
+    
+    All queued batches go out in a cheap gas window; otherwise urgent ones
+    and those that would exceed ANCHOR_MAX_DELAY_SECONDS before the next
+    pass. Batches whose anchoring lease expired are taken over first; if
+    their anchor was already recorded on chain they are only marked anchored.
+    
+    Returns:
+        Number of batches anchored (or attempted)
+    """
+    from app.services.blockchain_service import get_blockchain_service
+    
+    leadership = get_anchor_leadership()
+    if not leadership.renew():
+        return 0
+    
+    storage = get_storage()
+    now_epoch = time.time()
+    stalled = [
+        row for row in storage.batches.list_by_status(ANCHORING)
+        if (row["lease_expires_at"] or 0) < now_epoch
+    ]
+    queued = storage.batches.list_by_status(QUEUED)
+    if not stalled and not queued:
+        return 0
+    
+    window_open = False
+    if any(not row["urgent"] for row in queued):
+        try:
+            window_open = get_blockchain_service().gas_window_open()
+        except Exception as e:
+            print(f"Warning: Gas oracle unavailable: {e}")
+    
+    now = datetime.utcnow()
+    deadline = ANCHOR_MAX_DELAY_SECONDS - ANCHOR_SCHEDULER_INTERVAL
+    anchored = 0
+    for row in stalled + queued:
+        due = window_open or row["urgent"] or _age_seconds(row["created_at"], now) >= deadline
+        if row["status"] == QUEUED and not due:
+            continue
+        # Renewed per batch, as anchoring a long queue can outlast one lease
+        if anchored and not leadership.renew():
+            break
+        # Claim the batch so no other pass or worker anchors it twice
+        if not claim_batch(row["batch_id"]):
+            continue
+        
+        if row["status"] == ANCHORING:
+            print(f"Warning: Anchoring lease on {row['batch_id']} expired ({row['lease_holder']}); taking over")
+            # Database-fallback rows (no anchor id) never reached the chain
+            anchor = storage.anchors.latest_for_batch(row["batch_id"], row["merkle_root"])
+            if anchor and anchor["anchor_id"] is not None:
+                storage.batches.set_status(row["batch_id"], "Anchored", event_status="Anchored")
+                continue
+        
+        anchor_batch(row["batch_id"], row["merkle_root"], row["event_count"])
+        anchored += 1
+    return anchored
+
+
+async def run_anchor_scheduler() -> None:
+    """Anchor due batches every ANCHOR_SCHEDULER_INTERVAL seconds off the event loop"""
+    while True:
+        try:
+            await asyncio.to_thread(run_scheduler_once)
+        except Exception as e:
+            print(f"Warning: Anchor scheduler pass failed: {e}")
+        await asyncio.sleep(ANCHOR_SCHEDULER_INTERVAL)
@@ -0,0 +1,221 @@
+"""
+Chain backends - One anchoring interface over a real or simulated chain
+
+BlockchainService talks to the chain only through ChainBackend: raw JSON-RPC
+reads (head, blocks, fees, receipts) plus the few contract operations that
+anchoring needs. RpcChain implements it with web3 over the RpcPool;
+SimulatedChain (simulated_chain.py) implements it in process, so nonce
+handling, gas scheduling and recovery code run unchanged in both modes.
+"""
+from abc import ABC, abstractmethod
+from typing import Any, Dict, List, Mapping, Optional, Sequence, Tuple
+from app.services.rpc_pool import RpcPool
+
+ROOT_ANCHORED_SIGNATURE = "RootAnchored(uint256,bytes32,uint256,address)"
+
+
+class NonceError(Exception):
+    """The chain rejected a transaction nonce (too low, too high or replaced)"""
+
+
+class TransactionDropped(TimeoutError):
+    """A submitted transaction was not mined and is no longer pending"""
+
+
+def is_nonce_error(error: Exception) -> bool:
+    message = str(error).lower()
+    return "nonce" in message or "replacement transaction underpriced" in message
+
+
+def logged_anchor_id(receipt: Mapping[str, Any], address: str, topic: str) -> Optional[int]:
+    """
+    anchorId (the first indexed argument) of the first RootAnchored log a
+    contract emitted in a raw eth_getTransactionReceipt result
+    """
+    def normalized(value: Any) -> str:
+        return (value.hex() if isinstance(value, bytes) else str(value)).lower().removeprefix("0x")
+    
+    for log in receipt.get("logs") or []:
+        topics = log.get("topics") or []
+        if (
+            len(topics) > 1
+            and normalized(log.get("address", "")) == normalized(address)
+            and normalized(topics[0]) == normalized(topic)
+        ):
+            return int(normalized(topics[1]), 16)
+    return None
+
+
+class ChainBackend(ABC):
+    """Operations BlockchainService needs from a chain"""
+    
+    simulated = False
+    
+    @abstractmethod
+    def call(self, method: str, params: Sequence[Any] = ()) -> Any:
+        """One JSON-RPC read, returning the raw (hex-encoded) result"""
+    
+    @abstractmethod
+    def batch(self, calls: Sequence[Tuple[str, Sequence[Any]]]) -> List[Any]:
+        """Several JSON-RPC reads in one round trip; per call a result or an exception"""
+    
+    @abstractmethod
+    def probe(self) -> bool:
+        """Refresh endpoint health; True if the chain answered"""
+    
+    @abstractmethod
+    def check_configured(self) -> None:
+        """
+        Raises:
+            ValueError: if anchoring is not possible with the current configuration
+        """
+    
+    @abstractmethod
+    def account_address(self) -> str:
+        """Address anchor transactions are sent from"""
+    
+    @abstractmethod
+    def estimate_anchor_gas(self, merkle_root: bytes) -> int:
+        """Gas needed for anchorMerkleRoot"""
+    
+    @abstractmethod
+    def send_anchor(self, merkle_root: bytes, nonce: int, gas_limit: int, fees: Mapping[str, int]) -> str:
+        """
+        Sign and submit anchorMerkleRoot, returning the transaction hash
+        
+        Raises:
+            NonceError: if the nonce was rejected
+        """
+    
+    @abstractmethod
+    def wait_for_receipt(self, tx_hash: str, timeout: float) -> Dict[str, Any]:
+        """
+        Wait until the transaction is mined
+        
+        Returns:
+            status, block_number, block_hash, transaction_hash, gas_used,
+            effective_gas_price and anchor_id (None if not in the logs)
+        
+        Raises:
+            TransactionDropped: if the transaction is no longer pending
+            TimeoutError: if it was not mined within timeout seconds
+        """
+    
+    @abstractmethod
+    def receipt_anchor_id(self, receipt: Mapping[str, Any]) -> Optional[int]:
+        """anchorId logged in a raw eth_getTransactionReceipt result, or None"""
+    
+    @abstractmethod
+    def anchor_count(self) -> int:
+        """Current getAnchorCount() of the contract"""
+    
+    @abstractmethod
+    def get_anchor(self, anchor_id: int) -> Optional[Dict[str, Any]]:
+        """On-chain anchor (merkle_root, timestamp, submitted_by), or None if unavailable"""
+    
+    def stats(self) -> Dict[str, Any]:
+        return {}
+
+
+class RpcChain(ChainBackend):
+    """AuditAnchor contract on a JSON-RPC chain, via web3 and the RpcPool"""
+    
+    def __init__(self, w3, contract, pool: RpcPool, private_key: str, chain_id: int):
+        self.w3 = w3
+        self.contract = contract
+        self.pool = pool
+        self.private_key = private_key
+        self.chain_id = chain_id
+        self._account = None
+    
+    def call(self, method: str, params: Sequence[Any] = ()) -> Any:
+        return self.pool.call(method, params)
+    
+    def batch(self, calls: Sequence[Tuple[str, Sequence[Any]]]) -> List[Any]:
+        return self.pool.batch(calls)
+    
+    def probe(self) -> bool:
+        return self.pool.probe()
+    
+    def check_configured(self) -> None:
+        if not self.contract:
+            raise ValueError("Contract address not configured. Set BLOCKCHAIN_CONTRACT_ADDRESS env var.")
+        
+        if not self.private_key:
+            raise ValueError("Private key not configured. Set BLOCKCHAIN_PRIVATE_KEY env var.")
+    
+    def account_address(self) -> str:
+        if self._account is None:
+            self._account = self.w3.eth.account.from_key(self.private_key)
+        return self._account.address
+    
+    def estimate_anchor_gas(self, merkle_root: bytes) -> int:
+        call_data = self.contract.encodeABI(fn_name="anchorMerkleRoot", args=[merkle_root])
+        return int(self.pool.call(
+            "eth_estimateGas",
+            [{"from": self.account_address(), "to": self.contract.address, "data": call_data}]
+        ), 16)
+    
+    def send_anchor(self, merkle_root: bytes, nonce: int, gas_limit: int, fees: Mapping[str, int]) -> str:
+        transaction = self.contract.functions.anchorMerkleRoot(merkle_root).build_transaction({
+            "from": self.account_address(),
+            "nonce": nonce,
+            "gas": gas_limit,
+            "chainId": self.chain_id,
+            **fees,
+        })
+        signed_txn = self.w3.eth.account.sign_transaction(transaction, self.private_key)
+        try:
+            return self.w3.eth.send_raw_transaction(signed_txn.rawTransaction).hex()
+        except ValueError as e:
+            if is_nonce_error(e):
+                raise NonceError(str(e)) from e
+            raise
+    
+    def wait_for_receipt(self, tx_hash: str, timeout: float) -> Dict[str, Any]:
+        from web3.exceptions import TimeExhausted
+        
+        try:
+            receipt = self.w3.eth.wait_for_transaction_receipt(tx_hash, timeout=timeout)
+        except TimeExhausted as e:
+            raise TimeoutError(str(e)) from e
+        
+        # Extract anchor ID from the RootAnchored event
+        anchor_id = None
+        for log in receipt.logs or []:
+            try:
+                anchor_id = self.contract.events.RootAnchored().process_log(log).args.anchorId
+                break
+            except Exception:
+                continue
+        
+        return {
+            "status": receipt.status,
+            "block_number": receipt.blockNumber,
+            "block_hash": receipt.blockHash.hex(),
+            "transaction_hash": receipt.transactionHash.hex(),
+            "gas_used": receipt.gasUsed,
+            "effective_gas_price": receipt.get("effectiveGasPrice"),
+            "anchor_id": anchor_id,
+        }
+    
+    def receipt_anchor_id(self, receipt: Mapping[str, Any]) -> Optional[int]:
+        if not self.contract:
+            return None
+        topic = self.w3.keccak(text=ROOT_ANCHORED_SIGNATURE)
+        return logged_anchor_id(receipt, self.contract.address, topic)
+    
+    def anchor_count(self) -> int:
+        return self.contract.functions.getAnchorCount().call()
+    
+    def get_anchor(self, anchor_id: int) -> Optional[Dict[str, Any]]:
+        if not self.contract:
+            return None
+        
+        result = self.contract.functions.getAnchor(anchor_id).call()
+        return {
+            "merkle_root": result[0].hex(),
+            "timestamp": result[1],
+            "submitted_by": result[2],
+            "anchor_id": anchor_id
+        }
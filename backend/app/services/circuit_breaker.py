@@ -0,0 +1,56 @@
+"""
+Circuit breaker - Fail fast on an unhealthy dependency
+
+After failure_threshold consecutive failures the circuit opens and calls are
+rejected without touching the dependency. Once reset_timeout has passed a
+single trial call is let through (half-open): success closes the circuit,
+failure opens it again for another reset_timeout.
+"""
+import threading
+import time
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class CircuitBreaker:
+    """Consecutive-failure circuit breaker"""
+    
+    def __init__(self, failure_threshold: int = 3, reset_timeout: float = 30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self._lock = threading.Lock()
+    
+    def allow(self) -> bool:
+        """Whether a call may go through now"""
+        with self._lock:
+            if self.state == CLOSED:
+                return True
+            if self.state == OPEN and time.monotonic() - self.opened_at >= self.reset_timeout:
+                self.state = HALF_OPEN
+                return True
+            # Open, or half-open with the trial call still in flight
+            return False
+    
+    def record_success(self) -> None:
+        with self._lock:
+            self.state = CLOSED
+            self.failures = 0
+    
+    def record_failure(self) -> None:
+        with self._lock:
+            self.failures += 1
+            if self.state == HALF_OPEN or self.failures >= self.failure_threshold:
+                self.state = OPEN
+                self.opened_at = time.monotonic()
+    
+    def retry_in(self) -> float:
+        """Seconds until an open circuit lets a trial call through"""
+        with self._lock:
+            if self.state != OPEN:
+                return 0.0
+            return max(self.reset_timeout - (time.monotonic() - self.opened_at), 0.0)
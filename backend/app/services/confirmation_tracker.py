@@ -0,0 +1,196 @@
+"""
+Confirmation tracker - Confirmation depth and reorg detection for anchors
+
+One background loop follows the chain head. Each pass costs one
+eth_blockNumber call, and nothing more when no block arrived. Otherwise one
+batched eth_getBlockByNumber request covers the distinct blocks holding
+anchors that are not final yet. Cost grows with blocks, not with anchors.
+
+An anchor whose stored block hash is no longer canonical was reorged out.
+If its transaction was mined again, the anchor moves to the new block and
+takes the anchor id logged in the new receipt (the contract numbers anchors
+in inclusion order, so it may differ). Otherwise it is marked Orphaned and its batch goes back to "Queued" for
+the anchor scheduler.
+"""
+import os
+import asyncio
+import threading
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+from app.services.coordination_service import get_anchor_leadership
+from app.services.metrics_service import REORGED_ANCHORS
+from app.services.rpc_pool import RPC_MAX_BATCH
+from app.services.stream_service import ANCHOR_FINALIZED, ANCHOR_ORPHANED, publish
+from app.storage import get_storage
+
+ANCHOR_CONFIRMATIONS = int(os.getenv("ANCHOR_CONFIRMATIONS", "12"))
+CONFIRMATION_POLL_INTERVAL = float(os.getenv("CONFIRMATION_POLL_INTERVAL", "15"))
+
+CONFIRMING = "Confirming"
+FINAL = "Final"
+ORPHANED = "Orphaned"
+
+
+def _same_hash(a: Optional[str], b: Optional[str]) -> bool:
+    return bool(a and b) and a.lower().removeprefix("0x") == b.lower().removeprefix("0x")
+
+
+class ConfirmationTracker:
+    """Follows new heads and updates confirmation depth of unconfirmed anchors"""
+    
+    def __init__(self):
+        self.last_head: Optional[int] = None
+        self.last_poll_at: Optional[str] = None
+        self.tracked = 0
+        self.finalized = 0
+        self.reincluded = 0
+        self.orphaned = 0
+        self._lock = threading.Lock()
+    
+    def _batched(self, service, chain, method: str, params: List[List[Any]]) -> List[Any]:
+        """Results of one method over many params, RPC_MAX_BATCH calls per request"""
+        results: List[Any] = []
+        for start in range(0, len(params), RPC_MAX_BATCH):
+            calls = [(method, p) for p in params[start:start + RPC_MAX_BATCH]]
+            results.extend(service.rpc(method, chain.batch, calls))
+        return results
+    
+    def poll_once(self) -> Dict[str, Any]:
+        """
+        Check unconfirmed anchors against the current head, once
+        
+        Returns:
+            Tracker stats after the pass
+        """
+        from app.services.blockchain_service import get_blockchain_service
+        
+        with self._lock:
+            service = get_blockchain_service()
+            chain = service.get_chain()
+            head = int(service.rpc("eth_blockNumber", chain.call, "eth_blockNumber", []), 16)
+            self.last_poll_at = datetime.utcnow().isoformat()
+            if head == self.last_head:
+                return self.stats()
+            
+            storage = get_storage()
+            rows = storage.anchors.list_unconfirmed()
+            self.tracked = len(rows)
+            if not rows:
+                self.last_head = head
+                return self.stats()
+            
+            numbers = sorted({row["block_number"] for row in rows})
+            blocks = dict(zip(numbers, self._batched(
+                service, chain, "eth_getBlockByNumber", [[hex(number), False] for number in numbers]
+            )))
+            
+            updates: List[Tuple[int, int, str, int, str]] = []
+            reorged = []
+            for row in rows:
+                block = blocks.get(row["block_number"])
+                if isinstance(block, Exception):
+                    continue  # Try again next pass
+                if block is None or not _same_hash(block.get("hash"), row["block_hash"]):
+                    reorged.append(row)
+                    continue
+                updates.append(self._depth_update(row["id"], row["block_number"], row["block_hash"], head))
+            
+            if reorged:
+                updates.extend(self._resolve_reorged(service, chain, reorged, head))
+            
+            storage.anchors.update_confirmations(updates)
+            batch_ids = {row["id"]: row["batch_id"] for row in rows}
+            for row_id, number, block_hash, depth, status in updates:
+                if status == FINAL:
+                    self.finalized += 1
+                    publish(ANCHOR_FINALIZED, {
+                        "anchor_row_id": row_id,
+                        "batch_id": batch_ids.get(row_id),
+                        "block_number": number,
+                        "block_hash": block_hash,
+                        "confirmations": depth
+                    })
+            self.last_head = head
+            return self.stats()
+    
+    def _depth_update(self, row_id: int, number: int, block_hash: str, head: int) -> Tuple[int, int, str, int, str]:
+        depth = max(head - number + 1, 0)
+        return row_id, number, block_hash, depth, FINAL if depth >= ANCHOR_CONFIRMATIONS else CONFIRMING
+    
+    def _resolve_reorged(self, service, chain, rows, head: int) -> List[Tuple[int, int, str, int, str]]:
+        """Follow reorged anchors to their new block, or orphan them and re-queue the batch"""
+        receipts = self._batched(
+            service, chain, "eth_getTransactionReceipt", [[row["transaction_id"]] for row in rows]
+        )
+        
+        updates = []
+        renumbered = []
+        storage = get_storage()
+        for row, receipt in zip(rows, receipts):
+            if isinstance(receipt, Exception):
+                continue
+            
+            if receipt and int(receipt.get("status", "0x0"), 16) == 1:
+                REORGED_ANCHORS.inc(outcome="reincluded")
+                self.reincluded += 1
+                updates.append(self._depth_update(
+                    row["id"], int(receipt["blockNumber"], 16), receipt["blockHash"], head
+                ))
+                anchor_id = chain.receipt_anchor_id(receipt)
+                if anchor_id is not None and anchor_id != row["anchor_id"]:
+                    renumbered.append((row["id"], anchor_id))
+                continue
+            
+            REORGED_ANCHORS.inc(outcome="orphaned")
+            self.orphaned += 1
+            updates.append((row["id"], row["block_number"], row["block_hash"], 0, ORPHANED))
+            requeued = bool(row["batch_id"]) and storage.batches.transition(row["batch_id"], "Anchored", "Queued")
+            if requeued:
+                print(f"Warning: Anchor for {row['batch_id']} orphaned by a reorg; re-queued")
+                storage.batches.set_status(row["batch_id"], "Queued", event_status="Batched")
+            publish(ANCHOR_ORPHANED, {
+                "anchor_row_id": row["id"],
+                "batch_id": row["batch_id"],
+                "transaction_hash": row["transaction_id"],
+                "requeued": requeued
+            })
+        
+        storage.anchors.update_anchor_ids(renumbered)
+        return updates
+    
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "head_block": self.last_head,
+            "last_poll_at": self.last_poll_at,
+            "required_confirmations": ANCHOR_CONFIRMATIONS,
+            "tracked": self.tracked,
+            "finalized": self.finalized,
+            "reincluded": self.reincluded,
+            "orphaned": self.orphaned
+        }
+
+
+# Global instance
+_tracker: Optional[ConfirmationTracker] = None
+
+
+def get_confirmation_tracker() -> ConfirmationTracker:
+    """Get or create the confirmation tracker"""
+    global _tracker
+    if _tracker is None:
+        _tracker = ConfirmationTracker()
+    return _tracker
+
+
+async def run_confirmation_tracker() -> None:
+    """Poll the head every CONFIRMATION_POLL_INTERVAL seconds off the event loop, on the anchor leader"""
+    tracker = get_confirmation_tracker()
+    leadership = get_anchor_leadership()
+    while True:
+        try:
+            # The leader tracks the anchors; others would repeat its RPC calls and re-queues
+            if await asyncio.to_thread(leadership.is_leader):
+                await asyncio.to_thread(tracker.poll_once)
+        except Exception as e:
+            print(f"Warning: Confirmation tracker pass failed: {e}")
+        await asyncio.sleep(CONFIRMATION_POLL_INTERVAL)
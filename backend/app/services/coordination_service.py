@@ -0,0 +1,124 @@
+"""
+Coordination service - Leases between workers sharing one database
+
+Several API workers (uvicorn --workers N, or replicas on PostgreSQL) can
+serve the same ledger. Sealing needs no extra coordination: each batch build
+claims its pending events in a single transaction. Anchoring does: every
+anchor is a transaction from the same signer, and workers sending at once
+race for nonces. So one worker, the anchor leader, runs the anchor scheduler
+and the confirmation tracker and accepts direct anchor requests; the others
+leave urgent batches queued for it.
+
+Leadership is a worker_leases row held for ANCHOR_LEADER_TTL seconds and
+renewed on every scheduler pass; request handlers reuse a recent renewal.
+When the leader stops renewing (a crash) a worker takes over once the lease
+expires; a clean shutdown releases it at once. Each batch being anchored is
+also leased to its worker for BATCH_LEASE_SECONDS, so a batch left in
+"Anchoring" by a crashed worker is picked up again instead of being stuck.
+
+Expiry compares the workers' wall clocks, which must agree to well within
+these TTLs.
+"""
+import os
+import time
+import socket
+from typing import Any, Dict, Optional
+from app.services.metrics_service import ANCHOR_LEADER
+from app.storage import get_storage
+
+# Both exceed the longest single anchor (receipt wait and nonce retries), so
+# a slow send never outlives its lease
+ANCHOR_LEADER_TTL = float(os.getenv("ANCHOR_LEADER_TTL", "300"))
+BATCH_LEASE_SECONDS = float(os.getenv("BATCH_LEASE_SECONDS", "600"))
+
+ANCHOR_LEADER_LEASE = "anchor-leader"
+
+# Request paths trust a renewal younger than this share of the TTL instead
+# of writing the lease again; the lease is then still valid for the rest
+LEASE_REUSE_FRACTION = 1 / 3
+
+
+def worker_id() -> str:
+    """WORKER_ID, else host:pid (read per call, as workers may be forked)"""
+    return os.getenv("WORKER_ID") or f"{socket.gethostname()}:{os.getpid()}"
+
+
+class Leadership:
+    """A named lease this worker competes for"""
+    
+    def __init__(self, name: str, ttl: float):
+        self.name = name
+        self.ttl = ttl
+        self.leader = False
+        self.leader_since: Optional[float] = None
+        self.last_checked_at: Optional[float] = None
+    
+    def is_leader(self) -> bool:
+        """
+        True while this worker holds the lease
+        
+        Reuses the outcome of the last renewal while it is well inside the
+        TTL, so request handlers do not write the lease row on every call.
+        """
+        if self.last_checked_at is not None and time.time() - self.last_checked_at < self.ttl * LEASE_REUSE_FRACTION:
+            return self.leader
+        return self.renew()
+    
+    def renew(self) -> bool:
+        """Acquire or renew the lease now; True while this worker holds it"""
+        try:
+            held = get_storage().leases.acquire(self.name, worker_id(), self.ttl)
+        except Exception as e:
+            print(f"Warning: Lease {self.name} could not be renewed: {e}")
+            held = False
+        
+        if held and not self.leader:
+            self.leader_since = time.time()
+        elif self.leader and not held:
+            print(f"Warning: Lease {self.name} lost by {worker_id()}")
+            self.leader_since = None
+        self.leader = held
+        self.last_checked_at = time.time()
+        ANCHOR_LEADER.set(1 if held else 0)
+        return held
+    
+    def release(self) -> None:
+        """Hand the lease over at shutdown rather than letting it expire"""
+        if not self.leader:
+            return
+        try:
+            get_storage().leases.release(self.name, worker_id())
+        except Exception as e:
+            print(f"Warning: Lease {self.name} could not be released: {e}")
+        self.leader = False
+        self.leader_since = None
+        self.last_checked_at = None
+        ANCHOR_LEADER.set(0)
+    
+    def stats(self) -> Dict[str, Any]:
+        try:
+            lease = get_storage().leases.get(self.name)
+        except Exception:
+            lease = None
+        return {
+            "lease": self.name,
+            "worker_id": worker_id(),
+            "is_leader": self.leader,
+            "leader_since": self.leader_since,
+            "holder": lease["holder"] if lease else None,
+            "expires_at": lease["expires_at"] if lease else None,
+            "ttl_seconds": self.ttl,
+            "last_checked_at": self.last_checked_at,
+        }
+
+
+# Global instance
+_anchor_leadership: Optional[Leadership] = None
+
+
+def get_anchor_leadership() -> Leadership:
+    """Get or create this worker's anchor leader election"""
+    global _anchor_leadership
+    if _anchor_leadership is None:
+        _anchor_leadership = Leadership(ANCHOR_LEADER_LEASE, ANCHOR_LEADER_TTL)
+    return _anchor_leadership
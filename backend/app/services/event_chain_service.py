@@ -0,0 +1,114 @@
+"""
+Event chain service - Hash-chained append log over audit_events
+
+Each event stores prev_chain_hash and chain_hash = H(prev_chain_hash || metadata_hash),
+so changing or deleting any row breaks every later link. Appends are serialized
+by SQLite's single write lock, taken before the chain head is read.
+"""
+from typing import Any, Dict, Iterable, Mapping
+from app.services.hashing_service import (
+    compute_chain_hash, event_encoder, stored_hash_version, EVENT_HASH_FIELDS, GENESIS_CHAIN_HASH
+)
+
+def lock_chain_head(cursor) -> str:
+    """
+    Start the write transaction and return the current chain head
+    
+    The head read and the following inserts happen under the same write
+    lock, so concurrent writers can never link to the same predecessor.
+    Looking up the head is two index seeks: the newest hot row and the newest
+    sealed partition, whichever holds the higher event id.
+    """
+    if not cursor.connection.in_transaction:
+        cursor.execute("BEGIN IMMEDIATE")
+    
+    cursor.execute("""
+        SELECT id, chain_hash
+        FROM audit_events
+        ORDER BY id DESC
+        LIMIT 1
+    """)
+    hot = cursor.fetchone()
+    
+    # The hot table is empty once everything is sealed
+    cursor.execute("""
+        SELECT last_event_id, chain_head
+        FROM event_partitions
+        WHERE status = 'Sealed'
+        ORDER BY last_event_id DESC
+        LIMIT 1
+    """)
+    sealed = cursor.fetchone()
+    
+    if sealed and sealed["chain_head"] and (hot is None or sealed["last_event_id"] > hot["id"]):
+        return sealed["chain_head"]
+    if hot:
+        return hot["chain_hash"] or GENESIS_CHAIN_HASH
+    return GENESIS_CHAIN_HASH
+
+# Columns verify_event_chain reads from each event row
+CHAIN_COLUMNS = f"id, {', '.join(EVENT_HASH_FIELDS)}, metadata_hash, hash_version, prev_chain_hash, chain_hash"
+
+def verify_event_chain(rows: Iterable[Mapping[str, Any]]) -> Dict[str, Any]:
+    """
+    Verify the whole event chain in one sequential pass
+    
+    rows are every event (CHAIN_COLUMNS) in id order, streamed by the
+    storage backend (EventRepository.iter_chain), so memory stays constant
+    regardless of ledger size. Besides the links, each chained event's
+    metadata_hash is recomputed from its fields in the row's hash format.
+    Events inserted before chaining was introduced (NULL chain_hash) form an
+    unchained prefix and are skipped.
+    
+    Returns:
+        Dictionary with valid flag, counts, head hash and first broken link
+    """
+    expected_prev = GENESIS_CHAIN_HASH
+    checked = 0
+    unchained = 0
+    
+    for row in rows:
+        event_id, metadata_hash = row["id"], row["metadata_hash"]
+        prev_chain_hash, chain_hash = row["prev_chain_hash"], row["chain_hash"]
+        if chain_hash is None and checked == 0:
+            unchained += 1
+            continue
+        
+        if prev_chain_hash != expected_prev:
+            return {
+                "valid": False,
+                "checked": checked,
+                "unchained": unchained,
+                "broken_at": event_id,
+                "reason": "prev_chain_hash does not link to the preceding event (row removed or reordered)"
+            }
+        
+        if chain_hash != compute_chain_hash(prev_chain_hash, metadata_hash):
+            return {
+                "valid": False,
+                "checked": checked,
+                "unchained": unchained,
+                "broken_at": event_id,
+                "reason": "chain_hash does not match metadata_hash (row modified)"
+            }
+        
+        if metadata_hash != event_encoder(stored_hash_version(row))(row):
+            return {
+                "valid": False,
+                "checked": checked,
+                "unchained": unchained,
+                "broken_at": event_id,
+                "reason": "metadata_hash does not match the event fields (row modified)"
+            }
+        
+        expected_prev = chain_hash
+        checked += 1
+    
+    return {
+        "valid": True,
+        "checked": checked,
+        "unchained": unchained,
+        "head": expected_prev,
+        "broken_at": None,
+        "reason": None
+    }
@@ -0,0 +1,143 @@
+"""
+Gas service - EIP-1559 fee selection and cached gas estimates for anchoring
+
+Keeps a rolling window of recent base fees (fed incrementally from
+eth_feeHistory), picks maxFeePerGas / maxPriorityFeePerGas from it, and
+caches the eth_estimateGas result for anchorMerkleRoot, whose cost does not
+depend on the root being anchored. Chains without EIP-1559 base fees fall
+back to legacy gasPrice transactions.
+"""
+import os
+import threading
+import time
+from collections import OrderedDict
+from statistics import median
+from typing import Any, Callable, Dict, List, Optional
+from app.services.rpc_pool import RpcError
+
+GAS_HISTORY_BLOCKS = int(os.getenv("GAS_HISTORY_BLOCKS", "120"))
+GAS_REFRESH_SECONDS = float(os.getenv("GAS_REFRESH_SECONDS", "12"))
+# A window is "cheap" when the next base fee is at or below this percentile of recent ones
+GAS_TARGET_PERCENTILE = float(os.getenv("GAS_TARGET_PERCENTILE", "30"))
+GAS_PRIORITY_PERCENTILE = float(os.getenv("GAS_PRIORITY_PERCENTILE", "50"))
+GAS_ESTIMATE_TTL = float(os.getenv("GAS_ESTIMATE_TTL", "3600"))
+GAS_LIMIT_BUFFER = 1.2
+FALLBACK_GAS_ESTIMATE = 100000
+# Fewer samples than this and every window counts as cheap
+MIN_HISTORY_FOR_SCHEDULING = 10
+
+
+def _percentile(values: List[int], percent: float) -> int:
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, int(round(percent / 100 * (len(ordered) - 1)))))
+    return ordered[index]
+
+
+class GasOracle:
+    """Recent base fees, fee field selection and a cached anchor gas estimate"""
+    
+    def __init__(self, rpc_call: Callable[[str, List[Any]], Any]):
+        self._rpc_call = rpc_call
+        self._lock = threading.Lock()
+        # block number -> base fee (wei), oldest first
+        self.base_fees: "OrderedDict[int, int]" = OrderedDict()
+        self.next_base_fee: Optional[int] = None
+        self.priority_fee: Optional[int] = None
+        self.gas_price: Optional[int] = None
+        self.eip1559: Optional[bool] = None
+        self.refreshed_at: Optional[float] = None
+        self._estimate: Optional[int] = None
+        self._estimated_at = 0.0
+    
+    def refresh(self, force: bool = False) -> None:
+        """Pull fee history for blocks not seen yet, at most every GAS_REFRESH_SECONDS"""
+        with self._lock:
+            if not force and self.refreshed_at and time.monotonic() - self.refreshed_at < GAS_REFRESH_SECONDS:
+                return
+            
+            if self.eip1559 is not False:
+                try:
+                    self._refresh_fee_history()
+                except (RpcError, ValueError):
+                    # Pre-London chain or a provider without eth_feeHistory
+                    self.eip1559 = False
+            
+            if self.eip1559 is False:
+                self.gas_price = int(self._rpc_call("eth_gasPrice", []), 16)
+            self.refreshed_at = time.monotonic()
+    
+    def _refresh_fee_history(self) -> None:
+        head = int(self._rpc_call("eth_blockNumber", []), 16)
+        last_seen = next(reversed(self.base_fees)) if self.base_fees else head - GAS_HISTORY_BLOCKS
+        count = max(1, min(GAS_HISTORY_BLOCKS, head - last_seen))
+        
+        history = self._rpc_call("eth_feeHistory", [hex(count), hex(head), [GAS_PRIORITY_PERCENTILE]])
+        base_fees = [int(fee, 16) for fee in history.get("baseFeePerGas") or []]
+        if not base_fees or not any(base_fees):
+            raise ValueError("No base fees reported")
+        
+        # baseFeePerGas has one extra trailing entry: the next block's base fee
+        oldest = int(history["oldestBlock"], 16)
+        for offset, fee in enumerate(base_fees[:-1]):
+            self.base_fees[oldest + offset] = fee
+        while len(self.base_fees) > GAS_HISTORY_BLOCKS:
+            self.base_fees.popitem(last=False)
+        self.next_base_fee = base_fees[-1]
+        
+        rewards = [int(reward[0], 16) for reward in history.get("reward") or [] if reward]
+        if rewards:
+            self.priority_fee = int(median(rewards))
+        elif self.priority_fee is None:
+            self.priority_fee = int(self._rpc_call("eth_maxPriorityFeePerGas", []), 16)
+        self.eip1559 = True
+    
+    def fee_fields(self) -> Dict[str, int]:
+        """Fee fields for build_transaction: EIP-1559 when supported, else gasPrice"""
+        self.refresh()
+        if self.eip1559:
+            # Headroom for the base fee doubling before inclusion
+            return {
+                "maxFeePerGas": 2 * self.next_base_fee + self.priority_fee,
+                "maxPriorityFeePerGas": self.priority_fee,
+            }
+        return {"gasPrice": self.gas_price}
+    
+    def target_base_fee(self) -> Optional[int]:
+        if len(self.base_fees) < MIN_HISTORY_FOR_SCHEDULING:
+            return None
+        return _percentile(list(self.base_fees.values()), GAS_TARGET_PERCENTILE)
+    
+    def is_cheap(self) -> bool:
+        """Whether the next block's base fee is at or below the target percentile"""
+        self.refresh()
+        target = self.target_base_fee()
+        if not self.eip1559 or target is None or self.next_base_fee is None:
+            return True
+        return self.next_base_fee <= target
+    
+    def gas_limit(self, estimate: Callable[[], int]) -> int:
+        """Buffered gas limit from the cached estimate, re-estimating after GAS_ESTIMATE_TTL"""
+        with self._lock:
+            if self._estimate is None or time.monotonic() - self._estimated_at > GAS_ESTIMATE_TTL:
+                try:
+                    self._estimate = estimate()
+                except Exception:
+                    self._estimate = FALLBACK_GAS_ESTIMATE
+                self._estimated_at = time.monotonic()
+            return int(self._estimate * GAS_LIMIT_BUFFER)
+    
+    def invalidate_estimate(self) -> None:
+        """Drop the cached estimate, e.g. after a transaction ran out of gas"""
+        with self._lock:
+            self._estimate = None
+    
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "eip1559": self.eip1559,
+            "next_base_fee": self.next_base_fee,
+            "target_base_fee": self.target_base_fee(),
+            "priority_fee": self.priority_fee,
+            "gas_price": self.gas_price,
+            "history_blocks": len(self.base_fees),
+            "cached_gas_estimate": self._estimate,
+        }
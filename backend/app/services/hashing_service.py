@@ -1,17 +1,35 @@
 """
 Hashing service - SHA-256 hashing for audit metadata
+
+Audit events are hashed by one canonical encoder over EVENT_HASH_FIELDS,
+with None read as "". Each row records the hash_version it was hashed with:
+
+1. The original format: compact JSON with sorted keys (json.dumps of the
+   field dict), kept byte for byte so existing hashes stay verifiable. Rows
+   without a hash_version use it.
+2. The current format: a domain tag, then each field in EVENT_HASH_FIELDS
+   order as a 4-byte big-endian length and its UTF-8 bytes.
+
+Both encoders write fields straight from the row or event mapping, without
+an intermediate dict or a json.dumps call.
 """
+import os
 import hashlib
 import json
-from typing import Dict, Any
+from json.encoder import encode_basestring_ascii
+from typing import Any, Callable, Dict, Mapping
+from app.services.metrics_service import HASH_SECONDS, timed
+from app.services.profiling_service import profiled
 
+@timed(HASH_SECONDS)
+@profiled("hash_metadata")
 def hash_metadata(metadata: Dict[str, Any]) -> str:
     """
     Hash metadata dictionary using SHA-256
     
     Args:
         metadata: Dictionary containing audit event metadata
-        
+    
     Returns:
         Hexadecimal hash string
     """
@@ -23,9 +41,94 @@ def hash_metadata(metadata: Dict[str, Any]) -> str:
     
     return hash_object.hexdigest()
 
+# Event fields covered by the event hash, in length-prefixed encoding order
+EVENT_HASH_FIELDS = (
+    "model_id", "model_name", "model_version", "framework",
+    "dataset_name", "dataset_version", "dataset_hash", "source",
+    "event_type", "actor", "environment", "timestamp", "summary"
+)
+
+HASH_VERSION_JSON = 1
+HASH_VERSION_LENGTH_PREFIXED = 2
+# Version new events are hashed with
+CURRENT_HASH_VERSION = int(os.getenv("EVENT_HASH_VERSION", str(HASH_VERSION_LENGTH_PREFIXED)))
+
+# '{"actor":' ... ',"timestamp":', matching json.dumps(sort_keys=True, separators=(',', ':'))
+_JSON_KEYS = tuple(
+    ("{" if index == 0 else ",") + encode_basestring_ascii(field) + ":"
+    for index, field in enumerate(sorted(EVENT_HASH_FIELDS))
+)
+_JSON_FIELDS = tuple(zip(_JSON_KEYS, sorted(EVENT_HASH_FIELDS)))
+
+_LENGTH_PREFIXED_TAG = hashlib.sha256(b"auditchain.event.v2")
 
+def _hash_event_json(event: Mapping[str, Any]) -> str:
+    parts = [key + encode_basestring_ascii(event[field] or "") for key, field in _JSON_FIELDS]
+    parts.append("}")
+    return hashlib.sha256("".join(parts).encode("utf-8")).hexdigest()
+
+def _hash_event_length_prefixed(event: Mapping[str, Any]) -> str:
+    hasher = _LENGTH_PREFIXED_TAG.copy()
+    for field in EVENT_HASH_FIELDS:
+        value = (event[field] or "").encode("utf-8")
+        hasher.update(len(value).to_bytes(4, "big"))
+        hasher.update(value)
+    return hasher.hexdigest()
+
+_EVENT_ENCODERS: Dict[int, Callable[[Mapping[str, Any]], str]] = {
+    HASH_VERSION_JSON: _hash_event_json,
+    HASH_VERSION_LENGTH_PREFIXED: _hash_event_length_prefixed,
+}
+
+HASH_VERSIONS = tuple(sorted(_EVENT_ENCODERS, reverse=True))
+
+def event_encoder(version: int) -> Callable[[Mapping[str, Any]], str]:
+    """
+    Uninstrumented event hash function of one version, for bulk loops
+    
+    Raises:
+        ValueError: if the version is unknown
+    """
+    try:
+        return _EVENT_ENCODERS[version]
+    except KeyError:
+        raise ValueError(f"Unknown event hash version {version}") from None
 
+def event_fields_digest(event: Mapping[str, Any]) -> str:
+    """Digest of an event's hashed fields as stored, whatever its hash version"""
+    return _hash_event_length_prefixed(event)
 
+def stored_hash_version(row: Mapping[str, Any]) -> int:
+    """hash_version of a stored event; rows from before versioning have none"""
+    return row["hash_version"] or HASH_VERSION_JSON
 
+@timed(HASH_SECONDS)
+@profiled("hash_event")
+def hash_event(event: Mapping[str, Any], version: int = CURRENT_HASH_VERSION) -> str:
+    """
+    Canonical hash of an audit event
+    
+    Args:
+        event: Mapping (dict, sqlite3.Row, ...) with every EVENT_HASH_FIELDS key
+        version: Hash format, CURRENT_HASH_VERSION for new events
+    
+    Returns:
+        Hexadecimal hash string
+    """
+    return event_encoder(version)(event)
 
+GENESIS_CHAIN_HASH = "0" * 64
 
+def compute_chain_hash(prev_chain_hash: str, metadata_hash: str) -> str:
+    """
+    Link an event hash to the previous entry of the event log
+    
+    Args:
+        prev_chain_hash: chain_hash of the preceding event (genesis for the first)
+        metadata_hash: Hash of the event being appended
+    
+    Returns:
+        Hexadecimal hash string
+    """
+    combined = prev_chain_hash + metadata_hash
+    return hashlib.sha256(combined.encode('utf-8')).hexdigest()
@@ -0,0 +1,114 @@
+"""
+HTTP cache - Strong ETags and an in-process cache for immutable responses
+
+A sealed batch never changes its root or members, so its proofs never
+change; neither does an anchor once it is final. Such responses are sent
+with a strong ETag and Cache-Control: immutable and kept, encoded, in a
+size-bounded LRU cache. Repeat requests are answered from the cache, and a
+matching If-None-Match gets 304 without touching the database or the chain.
+
+Mutable resources (e.g. the batch list) still get an ETag with no-cache, so
+clients revalidate and receive 304 when nothing changed.
+"""
+import os
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Any, Optional, Tuple
+from fastapi import Request, Response
+from app.services.metrics_service import HTTP_CACHE_BYTES, HTTP_CACHE_RESPONSES
+from app.services.serialization_service import json_response
+
+HTTP_CACHE_MAX_BYTES = int(os.getenv("HTTP_CACHE_MAX_BYTES", str(16 * 1024 * 1024)))
+
+IMMUTABLE = "public, max-age=31536000, immutable"
+REVALIDATE = "no-cache"
+
+
+def strong_etag(body: bytes) -> str:
+    return '"' + hashlib.sha256(body).hexdigest()[:32] + '"'
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """If-None-Match uses weak comparison: W/ prefixes are ignored"""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    return any(tag.strip().removeprefix("W/") == etag for tag in if_none_match.split(","))
+
+
+class ResponseCache:
+    """LRU cache of encoded response bodies, bounded by their total size"""
+    
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self.size = 0
+        # key -> (etag, body)
+        self._entries: "OrderedDict[str, Tuple[str, bytes]]" = OrderedDict()
+        self._lock = threading.Lock()
+    
+    def get(self, key: str) -> Optional[Tuple[str, bytes]]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+            return entry
+    
+    def put(self, key: str, etag: str, body: bytes) -> None:
+        if len(body) > self.max_bytes:
+            return
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self.size -= len(previous[1])
+            self._entries[key] = (etag, body)
+            self.size += len(body)
+            while self.size > self.max_bytes:
+                _, (_, evicted) = self._entries.popitem(last=False)
+                self.size -= len(evicted)
+            HTTP_CACHE_BYTES.set(self.size)
+
+
+# Global instance
+_cache: Optional[ResponseCache] = None
+
+
+def get_response_cache() -> ResponseCache:
+    """Get or create the response cache"""
+    global _cache
+    if _cache is None:
+        _cache = ResponseCache(HTTP_CACHE_MAX_BYTES)
+    return _cache
+
+
+def _respond(request: Request, etag: str, body: bytes, cache_control: str, outcome: str) -> Response:
+    headers = {"ETag": etag, "Cache-Control": cache_control}
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        HTTP_CACHE_RESPONSES.inc(outcome="not_modified")
+        return Response(status_code=304, headers=headers)
+    HTTP_CACHE_RESPONSES.inc(outcome=outcome)
+    return Response(body, media_type="application/json", headers=headers)
+
+
+def cached_response(request: Request, key: str) -> Optional[Response]:
+    """The cached immutable response for key (or a 304), None if not cached"""
+    entry = get_response_cache().get(key)
+    if entry is None:
+        return None
+    etag, body = entry
+    return _respond(request, etag, body, IMMUTABLE, "hit")
+
+
+def immutable_response(request: Request, key: str, content: Any) -> Response:
+    """Respond with content that never changes for key, and cache it"""
+    body = json_response(content).body
+    etag = strong_etag(body)
+    get_response_cache().put(key, etag, body)
+    return _respond(request, etag, body, IMMUTABLE, "miss")
+
+
+def revalidated_response(request: Request, content: Any) -> Response:
+    """Respond with mutable content that clients must revalidate"""
+    body = json_response(content).body
+    return _respond(request, strong_etag(body), body, REVALIDATE, "uncacheable")
@@ -0,0 +1,199 @@
+"""
+Idempotency service - Duplicate detection for event ingest
+
+A retried POST /events must return the event stored by the first attempt
+instead of appending a copy. Retries are matched by the optional
+Idempotency-Key header or, without one, by metadata_hash (which is unique in
+the hot table).
+
+Lookups are layered so the common case stays O(1):
+
+1. LRU caches of recent responses by key and by hash answer quick retries
+   without touching the database.
+2. A Bloom filter over every metadata_hash in the hot table proves most new
+   events are new, skipping the index lookup entirely.
+3. Only a Bloom hit, or a key not in the cache, queries the index.
+
+The filter is filled by a background scan at startup; until it finishes,
+every hash is treated as possibly present.
+"""
+import os
+import math
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Mapping, Optional
+from app.services.metrics_service import DEDUP_LOOKUPS, DEDUPLICATED_EVENTS
+from app.storage import get_storage
+
+DEDUP_BLOOM_CAPACITY = int(os.getenv("DEDUP_BLOOM_CAPACITY", "1000000"))
+DEDUP_BLOOM_ERROR_RATE = float(os.getenv("DEDUP_BLOOM_ERROR_RATE", "0.01"))
+DEDUP_CACHE_SIZE = int(os.getenv("DEDUP_CACHE_SIZE", "10000"))
+
+
+class IdempotencyConflict(ValueError):
+    """An idempotency key was reused for a different event"""
+
+
+class BloomFilter:
+    """
+    Bloom filter over SHA-256 hex digests
+    
+    The digests are already uniformly distributed, so bit positions come
+    from two 64-bit slices of the digest (double hashing) rather than from
+    rehashing.
+    """
+    
+    def __init__(self, capacity: int, error_rate: float):
+        self.size = max(8, int(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.hash_count = max(1, round(self.size / capacity * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+        self.count = 0
+    
+    def _positions(self, digest: str):
+        first = int(digest[:16], 16)
+        second = int(digest[16:32], 16) | 1
+        for i in range(self.hash_count):
+            yield (first + i * second) % self.size
+    
+    def add(self, digest: str) -> None:
+        for position in self._positions(digest):
+            self.bits[position >> 3] |= 1 << (position & 7)
+        self.count += 1
+    
+    def __contains__(self, digest: str) -> bool:
+        return all(self.bits[position >> 3] & (1 << (position & 7)) for position in self._positions(digest))
+
+
+class LRUCache:
+    """Bounded mapping evicting the least recently used entry"""
+    
+    def __init__(self, capacity: int):
+        self.capacity = capacity
+        self._items: "OrderedDict[str, Any]" = OrderedDict()
+    
+    def get(self, key: str) -> Any:
+        value = self._items.get(key)
+        if value is not None:
+            self._items.move_to_end(key)
+        return value
+    
+    def put(self, key: str, value: Any) -> None:
+        self._items[key] = value
+        self._items.move_to_end(key)
+        if len(self._items) > self.capacity:
+            self._items.popitem(last=False)
+    
+    def __len__(self) -> int:
+        return len(self._items)
+
+
+class IngestDeduplicator:
+    """Finds the stored original of a retried create request"""
+    
+    def __init__(self):
+        self.bloom = BloomFilter(DEDUP_BLOOM_CAPACITY, DEDUP_BLOOM_ERROR_RATE)
+        # key -> response, metadata_hash -> response
+        self.by_key = LRUCache(DEDUP_CACHE_SIZE)
+        self.by_hash = LRUCache(DEDUP_CACHE_SIZE)
+        self.warm = False
+        self._lock = threading.Lock()
+    
+    def warm_up(self) -> None:
+        """Add every stored metadata_hash to the Bloom filter"""
+        try:
+            for metadata_hash in get_storage().events.iter_hashes():
+                with self._lock:
+                    self.bloom.add(metadata_hash)
+        except Exception as e:
+            # Stay cold: every lookup keeps going to the index
+            print(f"Warning: Dedup Bloom filter warm-up failed: {e}")
+            return
+        self.warm = True
+    
+    def _may_exist(self, metadata_hash: str) -> bool:
+        if not self.warm:
+            return True
+        with self._lock:
+            return metadata_hash in self.bloom
+    
+    def find_original(self, metadata_hash: str, idempotency_key: Optional[str] = None) -> Optional[Mapping[str, Any]]:
+        """
+        The stored event a create request duplicates, or None if it is new
+        
+        Raises:
+            IdempotencyConflict: if the key belongs to an event with a
+                different metadata_hash
+        """
+        with self._lock:
+            cached = self.by_key.get(idempotency_key) if idempotency_key else None
+            if cached is None:
+                cached = self.by_hash.get(metadata_hash)
+        if cached is not None:
+            DEDUP_LOOKUPS.inc(outcome="cache_hit")
+            return self.replay(cached, metadata_hash, idempotency_key)
+        
+        storage = get_storage()
+        if idempotency_key:
+            existing = storage.events.find_by_idempotency_key(idempotency_key)
+            if existing is not None:
+                DEDUP_LOOKUPS.inc(outcome="index_hit")
+                return self.replay(existing, metadata_hash, idempotency_key)
+        
+        if not self._may_exist(metadata_hash):
+            DEDUP_LOOKUPS.inc(outcome="bloom_skip")
+            return None
+        
+        existing = storage.events.find_by_hash(metadata_hash)
+        DEDUP_LOOKUPS.inc(outcome="index_hit" if existing is not None else "index_miss")
+        if existing is not None:
+            return self.replay(existing, metadata_hash, idempotency_key)
+        return None
+    
+    def replay(
+        self,
+        existing: Mapping[str, Any],
+        metadata_hash: str,
+        idempotency_key: Optional[str]
+    ) -> Mapping[str, Any]:
+        """
+        Check that a stored event is the original of this request
+        
+        Raises:
+            IdempotencyConflict: if its metadata_hash differs
+        """
+        if existing["metadata_hash"] != metadata_hash:
+            raise IdempotencyConflict(
+                f"Idempotency-Key {idempotency_key} was used for event {existing['id']} with different content"
+            )
+        DEDUPLICATED_EVENTS.inc(match="idempotency_key" if idempotency_key else "metadata_hash")
+        return existing
+    
+    def remember(self, response: Dict[str, Any], idempotency_key: Optional[str] = None) -> None:
+        """Record a stored event's response for later retries"""
+        with self._lock:
+            self.bloom.add(response["metadata_hash"])
+            self.by_hash.put(response["metadata_hash"], response)
+            if idempotency_key:
+                self.by_key.put(idempotency_key, response)
+    
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "bloom_warm": self.warm,
+            "bloom_entries": self.bloom.count,
+            "bloom_capacity": DEDUP_BLOOM_CAPACITY,
+            "bloom_bits": self.bloom.size,
+            "cached_keys": len(self.by_key),
+            "cached_hashes": len(self.by_hash),
+        }
+
+
+# Global instance
+_deduplicator: Optional[IngestDeduplicator] = None
+
+
+def get_deduplicator() -> IngestDeduplicator:
+    """Get or create the ingest deduplicator"""
+    global _deduplicator
+    if _deduplicator is None:
+        _deduplicator = IngestDeduplicator()
+    return _deduplicator
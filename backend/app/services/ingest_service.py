@@ -0,0 +1,316 @@
+"""
+Ingest service - Admission control and the event write queue
+
+SQLite has a single writer, so a burst from one producer used to queue every
+other write (and the readers waiting on it) behind lock retries. Ingest now
+goes through two stages:
+
+1. A token bucket per producer (bearer token digest, else source, else
+   actor) admits at most INGEST_RATE_LIMIT events per second with bursts up to
+   INGEST_RATE_BURST. Rejections carry the wait until the next token.
+2. Admitted events join a bounded queue drained by one writer thread. When
+   the queue is full the request is rejected at once instead of waiting on
+   the database.
+
+Both rejections map to 429 with Retry-After.
+
+The writer group-commits: it takes every event that is waiting, up to
+INGEST_BATCH_SIZE, and stores them in one transaction, so concurrent requests
+share one commit (and its fsync and state tree update). While requests are
+arriving concurrently it also lingers up to INGEST_MAX_DELAY_MS for more. Requests are
+answered only after that commit has returned, i.e. once their event is
+durable; an event that was queued but not committed was never acknowledged.
+"""
+import hashlib
+import os
+import math
+import queue
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+from typing import Any, Dict, List, Mapping, Optional, Tuple
+from app.services.metrics_service import INGEST_GROUP_SIZE, INGEST_QUEUE_DEPTH, INGEST_REJECTED
+from app.storage import get_storage
+from app.storage.base import DuplicateEvent
+
+INGEST_RATE_LIMIT = float(os.getenv("INGEST_RATE_LIMIT", "50"))
+INGEST_RATE_BURST = int(os.getenv("INGEST_RATE_BURST", "100"))
+INGEST_MAX_PRODUCERS = int(os.getenv("INGEST_MAX_PRODUCERS", "10000"))
+INGEST_QUEUE_SIZE = int(os.getenv("INGEST_QUEUE_SIZE", "1000"))
+INGEST_BATCH_SIZE = int(os.getenv("INGEST_BATCH_SIZE", "100"))
+INGEST_MAX_DELAY_MS = float(os.getenv("INGEST_MAX_DELAY_MS", "2"))
+
+RATE_LIMITED = "rate_limited"
+QUEUE_FULL = "queue_full"
+
+
+class IngestRejected(Exception):
+    """An event was not admitted; the producer should retry after retry_after seconds"""
+    
+    def __init__(self, reason: str, retry_after: float, message: str):
+        super().__init__(message)
+        self.reason = reason
+        self.retry_after = retry_after
+    
+    @property
+    def retry_after_header(self) -> str:
+        """Retry-After value: whole seconds, at least 1"""
+        return str(max(1, math.ceil(self.retry_after)))
+
+
+def producer_key(authorization: Optional[str], event: Mapping[str, Any]) -> str:
+    """
+    Identity rate limits are applied to
+    
+    Bearer tokens are keyed by a digest so the secret is never held in the
+    bucket table.
+    """
+    if authorization:
+        token = authorization.removeprefix("Bearer ").strip()
+        return "token:" + hashlib.sha256(token.encode()).hexdigest()[:32]
+    if event.get("source"):
+        return "source:" + event["source"]
+    if event.get("actor"):
+        return "actor:" + event["actor"]
+    return "anonymous"
+
+
+class TokenBucket:
+    """Refills rate tokens per second up to capacity"""
+    
+    __slots__ = ("rate", "capacity", "tokens", "updated")
+    
+    def __init__(self, rate: float, capacity: int, now: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = float(capacity)
+        self.updated = now
+    
+    def take(self, now: float) -> float:
+        """Take one token; 0 if one was available, else seconds until there is one"""
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return 0.0
+        return (1 - self.tokens) / self.rate
+
+
+class RateLimiter:
+    """Token buckets per producer, keeping the INGEST_MAX_PRODUCERS most recent"""
+    
+    def __init__(self, rate: float, burst: int, max_producers: int):
+        self.rate = rate
+        self.burst = burst
+        self.max_producers = max_producers
+        self.admitted = 0
+        self.throttled = 0
+        self._buckets: "OrderedDict[str, TokenBucket]" = OrderedDict()
+        self._lock = threading.Lock()
+    
+    def acquire(self, producer: str) -> None:
+        """
+        Admit one event from a producer
+        
+        Raises:
+            IngestRejected: if the producer is over its rate
+        """
+        if self.rate <= 0:
+            return
+        
+        now = time.monotonic()
+        with self._lock:
+            bucket = self._buckets.get(producer)
+            if bucket is None:
+                # An evicted producer starts again with a full bucket
+                bucket = self._buckets[producer] = TokenBucket(self.rate, self.burst, now)
+                if len(self._buckets) > self.max_producers:
+                    self._buckets.popitem(last=False)
+            else:
+                self._buckets.move_to_end(producer)
+            
+            wait = bucket.take(now)
+            if not wait:
+                self.admitted += 1
+                return
+            self.throttled += 1
+        
+        INGEST_REJECTED.inc(reason=RATE_LIMITED)
+        raise IngestRejected(RATE_LIMITED, wait, f"Rate limit of {self.rate:g} events/s exceeded")
+    
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "rate_per_second": self.rate,
+            "burst": self.burst,
+            "producers": len(self._buckets),
+            "admitted": self.admitted,
+            "throttled": self.throttled,
+        }
+
+
+class IngestQueue:
+    """Bounded queue of events to store, committed in groups by one writer thread"""
+    
+    def __init__(self, capacity: int, batch_size: int, max_delay_ms: float):
+        self.capacity = capacity
+        self.batch_size = batch_size
+        self.max_delay_ms = max_delay_ms
+        self.committed = 0
+        self.groups = 0
+        self.rejected = 0
+        self.duplicates = 0
+        self.failed = 0
+        self.last_commit_ms: Optional[float] = None
+        # Committed events per second, smoothed; sizes Retry-After when full
+        self.throughput: Optional[float] = None
+        self._queue: "queue.Queue[Tuple[Dict[str, Any], Optional[str], Future]]" = queue.Queue(capacity)
+        self._writer: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+    
+    def submit(self, record: Dict[str, Any], idempotency_key: Optional[str] = None) -> Future:
+        """
+        Queue one event for storage
+        
+        Returns:
+            A future resolving to the stored row once its group is committed,
+            or to the exception storing it raised (e.g. DuplicateEvent)
+        
+        Raises:
+            IngestRejected: if the queue is full
+        """
+        self._ensure_writer()
+        future: Future = Future()
+        try:
+            self._queue.put_nowait((record, idempotency_key, future))
+        except queue.Full:
+            self.rejected += 1
+            INGEST_REJECTED.inc(reason=QUEUE_FULL)
+            raise IngestRejected(
+                QUEUE_FULL,
+                self.capacity / self.throughput if self.throughput else 1.0,
+                f"Ingest queue is full ({self.capacity} events waiting)"
+            )
+        INGEST_QUEUE_DEPTH.set(self._queue.qsize())
+        return future
+    
+    def _ensure_writer(self) -> None:
+        if self._writer is not None and self._writer.is_alive():
+            return
+        with self._lock:
+            if self._writer is None or not self._writer.is_alive():
+                self._writer = threading.Thread(target=self._run, name="ingest-writer", daemon=True)
+                self._writer.start()
+    
+    def _gather(self, linger: bool) -> List[Tuple[Dict[str, Any], Optional[str], Future]]:
+        """
+        Wait for an event, then collect more until the group is full or, if
+        lingering, max_delay_ms has passed
+        """
+        group = [self._queue.get()]
+        deadline = time.monotonic() + (self.max_delay_ms / 1000 if linger else 0)
+        while len(group) < self.batch_size:
+            try:
+                group.append(self._queue.get_nowait())
+                continue
+            except queue.Empty:
+                pass
+            
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                group.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return group
+    
+    def _run(self) -> None:
+        # A lone producer gains nothing from waiting, so only linger for
+        # company once the previous group showed concurrent requests
+        linger = False
+        while True:
+            group = self._gather(linger)
+            linger = len(group) > 1
+            INGEST_QUEUE_DEPTH.set(self._queue.qsize())
+            
+            try:
+                self._commit(group)
+            except Exception as e:
+                # Never let the writer die with requests waiting on it
+                for _, _, future in group:
+                    if not future.done():
+                        future.set_exception(e)
+    
+    def _commit(self, group: List[Tuple[Dict[str, Any], Optional[str], Future]]) -> None:
+        started = time.perf_counter()
+        events = get_storage().events
+        try:
+            rows = events.insert_many([record for record, _, _ in group], [key for _, key, _ in group])
+        except Exception:
+            # One bad or duplicate event fails the whole transaction; store
+            # the group one by one so each request gets its own outcome
+            rows = None
+        
+        if rows is not None:
+            for (_, _, future), row in zip(group, rows):
+                future.set_result(row)
+            stored = len(group)
+        else:
+            stored = 0
+            for record, key, future in group:
+                try:
+                    future.set_result(events.insert(record, idempotency_key=key))
+                    stored += 1
+                except DuplicateEvent as e:
+                    self.duplicates += 1
+                    future.set_exception(e)
+                except Exception as e:
+                    self.failed += 1
+                    future.set_exception(e)
+        
+        elapsed = time.perf_counter() - started
+        INGEST_GROUP_SIZE.observe(len(group))
+        self.committed += stored
+        self.groups += 1
+        self.last_commit_ms = elapsed * 1000
+        rate = len(group) / elapsed if elapsed > 0 else None
+        if rate is not None:
+            self.throughput = rate if self.throughput is None else 0.8 * self.throughput + 0.2 * rate
+    
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "depth": self._queue.qsize(),
+            "capacity": self.capacity,
+            "batch_size": self.batch_size,
+            "max_delay_ms": self.max_delay_ms,
+            "committed": self.committed,
+            "groups": self.groups,
+            "average_group_size": (self.committed + self.duplicates + self.failed) / self.groups if self.groups else None,
+            "rejected": self.rejected,
+            "duplicates": self.duplicates,
+            "failed": self.failed,
+            "last_commit_ms": self.last_commit_ms,
+            "throughput_per_second": self.throughput,
+        }
+
+
+# Global instances
+_rate_limiter: Optional[RateLimiter] = None
+_ingest_queue: Optional[IngestQueue] = None
+
+
+def get_rate_limiter() -> RateLimiter:
+    """Get or create the per-producer rate limiter"""
+    global _rate_limiter
+    if _rate_limiter is None:
+        _rate_limiter = RateLimiter(INGEST_RATE_LIMIT, INGEST_RATE_BURST, INGEST_MAX_PRODUCERS)
+    return _rate_limiter
+
+
+def get_ingest_queue() -> IngestQueue:
+    """Get or create the ingest queue"""
+    global _ingest_queue
+    if _ingest_queue is None:
+        _ingest_queue = IngestQueue(INGEST_QUEUE_SIZE, INGEST_BATCH_SIZE, INGEST_MAX_DELAY_MS)
+    return _ingest_queue
@@ -0,0 +1,169 @@
+"""
+Lineage service - Model/dataset adjacency index maintained at ingest
+
+Each event that ties a model to a dataset or a deployment environment adds
+one edge to lineage_edges, in the transaction that stores the event:
+
+    Train     model version --trained_on-->   dataset
+    Evaluate  model version --evaluated_on--> dataset
+    Deploy    model version --deployed_to-->  environment
+
+Datasets are keyed by dataset_hash, or name@version when the event carries no
+hash. The table is indexed from both ends, so "which model versions were
+trained on dataset X" and "what is the training and deploy history of model
+Y" are index lookups rather than scans of audit_events. Every edge keeps the
+id and hash of the event that recorded it, which resolves to the event's
+batch and Merkle proof.
+"""
+from typing import Any, Dict, Iterable, List, Mapping, Optional, Tuple
+from app.services.partition_service import find_event
+
+DATASET = "dataset"
+ENVIRONMENT = "environment"
+
+TRAINED_ON = "trained_on"
+EVALUATED_ON = "evaluated_on"
+DEPLOYED_TO = "deployed_to"
+
+# Event types linking a model version to the dataset they name
+DATASET_RELATIONS = {
+    "train": TRAINED_ON,
+    "evaluate": EVALUATED_ON,
+}
+
+# Deploy events without an environment
+UNSPECIFIED_ENVIRONMENT = "unspecified"
+
+EDGE_COLUMNS = """event_id, event_hash, event_type, timestamp, model_id, model_version,
+                  relation, target_kind, target, dataset_name, dataset_version"""
+
+# Event ids per SELECT ... IN (...), under SQLite's bound parameter limit
+REFERENCE_CHUNK = 500
+
+def dataset_key(
+    dataset_hash: Optional[str],
+    dataset_name: Optional[str],
+    dataset_version: Optional[str]
+) -> Optional[str]:
+    """
+    Node key of a dataset: its hash, else name@version, None if unnamed
+    """
+    if dataset_hash:
+        return dataset_hash
+    if dataset_name:
+        return f"{dataset_name}@{dataset_version}" if dataset_version else dataset_name
+    return None
+
+def lineage_edge(event: Mapping[str, Any], event_id: int) -> Optional[Tuple]:
+    """
+    The edge an event contributes (EDGE_COLUMNS order), or None
+    """
+    event_type = event.get("event_type") or ""
+    if event_type.lower() == "deploy":
+        relation, target_kind = DEPLOYED_TO, ENVIRONMENT
+        target = event.get("environment") or UNSPECIFIED_ENVIRONMENT
+    else:
+        relation, target_kind = DATASET_RELATIONS.get(event_type.lower()), DATASET
+        target = dataset_key(event.get("dataset_hash"), event.get("dataset_name"), event.get("dataset_version"))
+        if relation is None or target is None:
+            return None
+    
+    return (
+        event_id, event["metadata_hash"], event_type, event.get("timestamp"),
+        event["model_id"], event.get("model_version"),
+        relation, target_kind, target,
+        event.get("dataset_name") if target_kind == DATASET else None,
+        event.get("dataset_version") if target_kind == DATASET else None
+    )
+
+def update_lineage(cursor, events: Iterable[Tuple[Mapping[str, Any], int]]) -> None:
+    """
+    Add the edges of newly stored (event, event_id) pairs
+    
+    Runs inside the caller's transaction, so the index never disagrees with
+    the events it was built from.
+    """
+    edges = [edge for edge in (lineage_edge(event, event_id) for event, event_id in events) if edge]
+    if not edges:
+        return
+    
+    cursor.executemany(f"""
+        INSERT INTO lineage_edges ({EDGE_COLUMNS})
+        VALUES ({", ".join("?" * 11)})
+    """, edges)
+
+def models_for_dataset(cursor, dataset: str, relation: Optional[str], limit: int) -> List[Mapping[str, Any]]:
+    """
+    Edges into a dataset, oldest first
+    """
+    cursor.execute(f"""
+        SELECT {EDGE_COLUMNS}
+        FROM lineage_edges
+        WHERE target_kind = ? AND target = ? AND (? IS NULL OR relation = ?)
+        ORDER BY event_id
+        LIMIT ?
+    """, (DATASET, dataset, relation, relation, limit))
+    return cursor.fetchall()
+
+def edges_for_model(cursor, model_id: str, model_version: Optional[str], limit: int) -> List[Mapping[str, Any]]:
+    """
+    Edges out of a model (optionally one version), oldest first
+    """
+    cursor.execute(f"""
+        SELECT {EDGE_COLUMNS}
+        FROM lineage_edges
+        WHERE model_id = ? AND (? IS NULL OR model_version = ?)
+        ORDER BY event_id
+        LIMIT ?
+    """, (model_id, model_version, model_version, limit))
+    return cursor.fetchall()
+
+def event_references(conn, edges: List[Mapping[str, Any]]) -> Dict[int, Dict[str, Any]]:
+    """
+    Merkle reference of every event behind the edges, by event id
+    
+    An event sealed into a batch resolves to the batch root and the URL of
+    its inclusion proof; a pending event has neither yet.
+    """
+    event_ids = sorted({edge["event_id"] for edge in edges})
+    cursor = conn.cursor()
+    
+    batch_ids: Dict[int, Optional[str]] = {}
+    for start in range(0, len(event_ids), REFERENCE_CHUNK):
+        chunk = event_ids[start:start + REFERENCE_CHUNK]
+        cursor.execute(f"""
+            SELECT id, batch_id FROM audit_events WHERE id IN ({", ".join("?" * len(chunk))})
+        """, chunk)
+        batch_ids.update((row["id"], row["batch_id"]) for row in cursor.fetchall())
+    
+    # Events no longer in the hot table were archived with their partition
+    for event_id in event_ids:
+        if event_id not in batch_ids:
+            row = find_event(conn, event_id, "id, batch_id")
+            batch_ids[event_id] = row["batch_id"] if row else None
+    
+    batches: Dict[str, Mapping[str, Any]] = {}
+    named = sorted({batch_id for batch_id in batch_ids.values() if batch_id})
+    for start in range(0, len(named), REFERENCE_CHUNK):
+        chunk = named[start:start + REFERENCE_CHUNK]
+        cursor.execute(f"""
+            SELECT batch_id, merkle_root, status
+            FROM merkle_batches
+            WHERE batch_id IN ({", ".join("?" * len(chunk))})
+        """, chunk)
+        batches.update((row["batch_id"], row) for row in cursor.fetchall())
+    
+    references = {}
+    for edge in edges:
+        batch = batches.get(batch_ids.get(edge["event_id"]))
+        references[edge["event_id"]] = {
+            "event_id": edge["event_id"],
+            "event_hash": edge["event_hash"],
+            "event_type": edge["event_type"],
+            "timestamp": edge["timestamp"],
+            "batch_id": batch["batch_id"] if batch else None,
+            "merkle_root": batch["merkle_root"] if batch else None,
+            "batch_status": batch["status"] if batch else None,
+            "proof_url": f"/merkle/batches/{batch['batch_id']}/proof/{edge['event_id']}" if batch else None,
+        }
+    return references
@@ -1,9 +1,17 @@
 """
 Merkle tree service - Build Merkle trees for batch verification
 """
+import os
+import time
 import hashlib
-from typing import List, Tuple
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
 from app.database import get_db
+from app.services.metrics_service import MERKLE_BUILD_SECONDS, size_bucket
+from app.services.profiling_service import span
+
+# Events sealed per batch when a build does not name them
+MERKLE_BATCH_SIZE = int(os.getenv("MERKLE_BATCH_SIZE", "16"))
+MERKLE_MAX_BATCH_SIZE = int(os.getenv("MERKLE_MAX_BATCH_SIZE", "1000000"))
 
 def hash_pair(left: str, right: str) -> str:
     """
@@ -12,6 +20,18 @@ def hash_pair(left: str, right: str) -> str:
     combined = left + right
     return hashlib.sha256(combined.encode('utf-8')).hexdigest()
 
+def anchor_commitment(merkle_root: str, state_root: Optional[str]) -> str:
+    """
+    Root anchored on chain for a batch
+    
+    H(merkle_root || state_root), so one anchor commits to both the batch's
+    events and the model state recorded when it was sealed. A batch without
+    a state root anchors its Merkle root alone.
+    """
+    if not state_root:
+        return merkle_root
+    return hash_pair(merkle_root.lower().replace("0x", ""), state_root.lower().replace("0x", ""))
+
 def build_merkle_tree(hashes: List[str]) -> Tuple[str, List[List[str]]]:
     """
     Build Merkle tree from list of hashes
@@ -22,6 +42,10 @@ def build_merkle_tree(hashes: List[str]) -> Tuple[str, List[List[str]]]:
     if not hashes:
         raise ValueError("Cannot build Merkle tree from empty list")
     
+    with MERKLE_BUILD_SECONDS.time(batch_size=size_bucket(len(hashes))), span("build_merkle_tree"):
+        return _build_tree_levels(hashes)
+
+def _build_tree_levels(hashes: List[str]) -> Tuple[str, List[List[str]]]:
     if len(hashes) == 1:
         return hashes[0], [hashes]
     
@@ -49,6 +73,209 @@ def build_merkle_tree(hashes: List[str]) -> Tuple[str, List[List[str]]]:
     merkle_root = current_level[0]
     return merkle_root, tree_levels
 
+class StreamingMerkleBuilder:
+    """
+    Merkle root (and optionally one proof) over a stream of leaves
+    
+    Keeps one pending node per level instead of the whole tree, so memory is
+    O(log n) in the number of leaves. Roots and proofs are identical to
+    build_merkle_tree / get_merkle_proof, including the odd node at the end
+    of a level being hashed with itself.
+    
+    Leaves can be tracked for a proof (the first one) or a multiproof (all
+    of them). A tracked leaf's left siblings are exactly the pending nodes
+    when it arrives, so it need not be known in advance.
+    """
+    
+    def __init__(self):
+        self.leaf_count = 0
+        self.tracked_index: Optional[int] = None
+        self.tracked_indices: List[int] = []
+        # Complete node waiting for its right sibling, per level
+        self._pending: List[Optional[str]] = []
+        # level -> indices of the tracked leaves' ancestors at that level
+        self._ancestors: Dict[int, Set[int]] = {}
+        # (level, index) -> hash, only for the tracked leaves' paths and siblings
+        self._nodes: Dict[Tuple[int, int], str] = {}
+        self._height: Optional[int] = None
+    
+    def _record(self, level: int, index: int, node: str) -> None:
+        # Kept when its parent is an ancestor of a tracked leaf; above the
+        # first tracked leaf's highest set bit that ancestor is node 0
+        if self.tracked_index is None:
+            return
+        parent = index >> 1
+        if parent in self._ancestors.get(level + 1, ()) or (
+            parent == 0 and level + 1 >= self.tracked_index.bit_length()
+        ):
+            self._nodes[(level, index)] = node
+    
+    def add(self, leaf_hash: str, track: bool = False) -> None:
+        node, level, index = leaf_hash, 0, self.leaf_count
+        if track:
+            if self.tracked_index is None:
+                self.tracked_index = index
+            self.tracked_indices.append(index)
+            for ancestor_level in range(1, index.bit_length() + 1):
+                self._ancestors.setdefault(ancestor_level, set()).add(index >> ancestor_level)
+            for pending_level, pending in enumerate(self._pending):
+                if pending is not None:
+                    self._record(pending_level, (index >> pending_level) - 1, pending)
+        self.leaf_count += 1
+        self._height = None
+        
+        while True:
+            self._record(level, index, node)
+            if level == len(self._pending):
+                self._pending.append(None)
+            
+            left = self._pending[level]
+            if left is None:
+                self._pending[level] = node
+                return
+            
+            self._pending[level] = None
+            node = hash_pair(left, node)
+            level += 1
+            index //= 2
+    
+    def root(self) -> str:
+        """
+        Fold the pending nodes into the root
+        
+        Raises:
+            ValueError: if no leaves were added
+        """
+        if not self.leaf_count:
+            raise ValueError("Cannot build Merkle tree from empty list")
+        
+        # carry is the last, incomplete node of the current level
+        size, level, carry = self.leaf_count, 0, None
+        while size > 1:
+            pending = self._pending[level] if level < len(self._pending) else None
+            if carry is not None:
+                self._record(level, size - 1, carry)
+                carry = hash_pair(pending if pending is not None else carry, carry)
+            elif pending is not None:
+                carry = hash_pair(pending, pending)
+            size = (size + 1) // 2
+            level += 1
+        
+        self._height = level
+        return carry if carry is not None else self._pending[level]
+    
+    def proof(self) -> List[str]:
+        """Sibling hashes for the tracked leaf, as get_merkle_proof returns them"""
+        if self.tracked_index is None:
+            raise ValueError("No leaf was tracked")
+        if self._height is None:
+            self.root()
+        
+        proof = []
+        size = self.leaf_count
+        for level in range(self._height):
+            index = self.tracked_index >> level
+            sibling = index ^ 1
+            proof.append(self._nodes[(level, sibling if sibling < size else index)])
+            size = (size + 1) // 2
+        return proof
+    
+    def multiproof(self) -> List[str]:
+        """Multiproof for all tracked leaves, as get_merkle_multiproof returns it"""
+        if self.tracked_index is None:
+            raise ValueError("No leaf was tracked")
+        if self._height is None:
+            self.root()
+        
+        proof = []
+        size = self.leaf_count
+        known = self.tracked_indices
+        for level in range(self._height):
+            known_set = set(known)
+            for index in known:
+                sibling = index ^ 1
+                if sibling < size and sibling not in known_set:
+                    proof.append(self._nodes[(level, sibling)])
+            known = sorted({index // 2 for index in known})
+            size = (size + 1) // 2
+        return proof
+
+def stream_merkle_root(leaf_hashes: Iterable[str]) -> str:
+    """
+    Merkle root of leaves consumed one at a time
+    
+    Raises:
+        ValueError: if there are no leaves
+    """
+    builder = StreamingMerkleBuilder()
+    start = time.perf_counter()
+    with span("build_merkle_tree"):
+        for leaf_hash in leaf_hashes:
+            builder.add(leaf_hash)
+        merkle_root = builder.root()
+    
+    # The batch size is only known once the stream is exhausted
+    MERKLE_BUILD_SECONDS.observe(time.perf_counter() - start, batch_size=size_bucket(builder.leaf_count))
+    return merkle_root
+
+def stream_merkle_proof(leaves: Iterable[Tuple[int, str]], leaf_id: int) -> Optional[Dict[str, Any]]:
+    """
+    Proof for one leaf of a stream of (id, leaf_hash) pairs in leaf order
+    
+    Returns:
+        merkle_root, leaf_index, leaf_hash, proof and leaf_count, or None if
+        leaf_id is not in the stream
+    """
+    builder = StreamingMerkleBuilder()
+    leaf_hash = None
+    with span("stream_merkle_proof"):
+        for current_id, current_hash in leaves:
+            track = current_id == leaf_id
+            if track:
+                leaf_hash = current_hash
+            builder.add(current_hash, track=track)
+        
+        if builder.tracked_index is None:
+            return None
+        
+        return {
+            "merkle_root": builder.root(),
+            "leaf_index": builder.tracked_index,
+            "leaf_hash": leaf_hash,
+            "proof": builder.proof(),
+            "leaf_count": builder.leaf_count
+        }
+
+def stream_merkle_multiproof(leaves: Iterable[Tuple[int, str]], leaf_ids: Iterable[int]) -> Dict[str, Any]:
+    """
+    Multiproof for several leaves of a stream of (id, leaf_hash) pairs
+    
+    Returns:
+        merkle_root, leaves as (leaf_id, leaf_index, leaf_hash) in leaf
+        order, proof, leaf_count, and missing: requested ids not in the
+        stream (the proof then covers only the ids found)
+    """
+    wanted = set(leaf_ids)
+    builder = StreamingMerkleBuilder()
+    found = []
+    with span("stream_merkle_multiproof"):
+        for current_id, current_hash in leaves:
+            track = current_id in wanted
+            if track:
+                found.append((current_id, builder.leaf_count, current_hash))
+            builder.add(current_hash, track=track)
+        
+        if builder.leaf_count == 0:
+            return {"merkle_root": None, "leaves": [], "proof": [], "leaf_count": 0, "missing": sorted(wanted)}
+        
+        return {
+            "merkle_root": builder.root(),
+            "leaves": found,
+            "proof": builder.multiproof() if found else [],
+            "leaf_count": builder.leaf_count,
+            "missing": sorted(wanted - {leaf_id for leaf_id, _, _ in found})
+        }
+
 def get_merkle_proof(tree_levels: List[List[str]], leaf_index: int, leaf_hash: str) -> List[str]:
     """
     Generate Merkle proof for a specific leaf
@@ -57,7 +284,7 @@ def get_merkle_proof(tree_levels: List[List[str]], leaf_index: int, leaf_hash: s
         tree_levels: All levels of the Merkle tree
         leaf_index: Index of the leaf in the first level
         leaf_hash: Hash of the leaf
-        
+    
     Returns:
         List of sibling hashes needed for verification
     """
@@ -97,7 +324,7 @@ def verify_merkle_proof(leaf_hash: str, proof: List[str], merkle_root: str) -> b
         leaf_hash: Hash of the leaf node
         proof: List of sibling hashes
         merkle_root: Expected root hash
-        
+    
     Returns:
         True if proof is valid
     """
@@ -112,9 +339,99 @@ def verify_merkle_proof(leaf_hash: str, proof: List[str], merkle_root: str) -> b
     
     return current_hash == merkle_root
 
+def get_merkle_multiproof(tree_levels: List[List[str]], leaf_indices: List[int]) -> List[str]:
+    """
+    Generate a compact multiproof for a subset of leaves
+    
+    Only the sibling nodes that cannot be derived from the chosen leaves
+    (or from nodes computed out of them) are included, level by level in
+    ascending index order. Shared ancestors are therefore never repeated.
+    
+    Args:
+        tree_levels: All levels of the Merkle tree
+        leaf_indices: Indices of the leaves to prove
+    
+    Returns:
+        List of hashes needed, together with the leaves, to rebuild the root
+    """
+    if not tree_levels:
+        return []
+    
+    proof = []
+    known = sorted(set(leaf_indices))
+    
+    for level in range(len(tree_levels) - 1):
+        current_level = tree_levels[level]
+        known_set = set(known)
+        
+        for index in known:
+            sibling_index = index ^ 1
+            # Missing sibling at the end of an odd level is the node itself
+            if sibling_index < len(current_level) and sibling_index not in known_set:
+                proof.append(current_level[sibling_index])
+        
+        known = sorted({index // 2 for index in known})
+    
+    return proof
 
-
-
-
-
-
+def verify_merkle_multiproof(
+    leaves: List[Tuple[int, str]],
+    proof: List[str],
+    leaf_count: int,
+    merkle_root: str
+) -> bool:
+    """
+    Verify a multiproof produced by get_merkle_multiproof
+    
+    Args:
+        leaves: (leaf_index, leaf_hash) pairs being proven
+        proof: Multiproof hashes in the order they were generated
+        leaf_count: Number of leaves in the batch tree
+        merkle_root: Expected root hash
+    
+    Returns:
+        True if the leaves and proof rebuild the expected root
+    """
+    if not leaves or leaf_count < 1:
+        return False
+    
+    nodes = {}
+    for index, leaf_hash in leaves:
+        if index < 0 or index >= leaf_count or nodes.get(index, leaf_hash) != leaf_hash:
+            return False
+        nodes[index] = leaf_hash
+    
+    proof_iter = iter(proof)
+    level_size = leaf_count
+    
+    try:
+        while level_size > 1:
+            parents = {}
+            for index in sorted(nodes):
+                parent_index = index // 2
+                if parent_index in parents:
+                    continue
+                
+                sibling_index = index ^ 1
+                if sibling_index >= level_size:
+                    sibling_hash = nodes[index]
+                elif sibling_index in nodes:
+                    sibling_hash = nodes[sibling_index]
+                else:
+                    sibling_hash = next(proof_iter)
+                
+                if index % 2 == 0:
+                    parents[parent_index] = hash_pair(nodes[index], sibling_hash)
+                else:
+                    parents[parent_index] = hash_pair(sibling_hash, nodes[index])
+            
+            nodes = parents
+            level_size = (level_size + 1) // 2
+    except StopIteration:
+        return False
+    
+    # Every proof node must have been consumed
+    if next(proof_iter, None) is not None:
+        return False
+    
+    return nodes.get(0) == merkle_root
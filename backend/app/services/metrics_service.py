@@ -0,0 +1,292 @@
+"""
+Metrics service - Prometheus counters, gauges and histograms
+
+A small in-process registry rendered in the Prometheus text exposition
+format at /metrics. Recording a sample is a dict lookup, a bisect over the
+bucket bounds and a few additions under a per-metric lock, so instrumentation
+can stay on at full load without pulling in an extra dependency.
+"""
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from functools import wraps
+from typing import Callable, Dict, List, Optional, Tuple
+
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+CHAIN_LATENCY_BUCKETS = (0.5, 1.0, 2.5, 5.0, 10.0, 15.0, 30.0, 60.0, 120.0, 300.0)
+
+_registry: List["_Metric"] = []
+
+
+def _format_labels(label_names: Tuple[str, ...], label_values: Tuple[str, ...], extra: str = "") -> str:
+    pairs = [f'{name}="{value}"' for name, value in zip(label_names, label_values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class _Metric:
+    metric_type = ""
+    
+    def __init__(self, name: str, documentation: str, labels: Tuple[str, ...] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.label_names = tuple(labels)
+        self._lock = threading.Lock()
+        _registry.append(self)
+    
+    def _key(self, labels: Dict[str, str]) -> Tuple[str, ...]:
+        return tuple(str(labels.get(name, "")) for name in self.label_names)
+    
+    def render(self) -> List[str]:
+        return [
+            f"# HELP {self.name} {self.documentation}",
+            f"# TYPE {self.name} {self.metric_type}"
+        ] + self._samples()
+    
+    def _samples(self) -> List[str]:
+        raise NotImplementedError
+
+
+class Counter(_Metric):
+    """Monotonically increasing count"""
+    metric_type = "counter"
+    
+    def __init__(self, name: str, documentation: str, labels: Tuple[str, ...] = ()):
+        super().__init__(name, documentation, labels)
+        self._values: Dict[Tuple[str, ...], float] = {}
+    
+    def inc(self, amount: float = 1.0, **labels) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+    
+    def _samples(self) -> List[str]:
+        with self._lock:
+            items = list(self._values.items())
+        return [f"{self.name}{_format_labels(self.label_names, key)} {value}" for key, value in items]
+
+
+class Gauge(_Metric):
+    """Point-in-time value, either set directly or read from a callback at scrape time"""
+    metric_type = "gauge"
+    
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labels: Tuple[str, ...] = (),
+        callback: Optional[Callable[[], float]] = None
+    ):
+        super().__init__(name, documentation, labels)
+        self._values: Dict[Tuple[str, ...], float] = {}
+        self._callback = callback
+    
+    def set(self, value: float, **labels) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+    
+    def _samples(self) -> List[str]:
+        if self._callback is not None:
+            try:
+                return [f"{self.name} {float(self._callback())}"]
+            except Exception:
+                return []
+        with self._lock:
+            items = list(self._values.items())
+        return [f"{self.name}{_format_labels(self.label_names, key)} {value}" for key, value in items]
+
+
+class Histogram(_Metric):
+    """Cumulative-bucket latency/size distribution"""
+    metric_type = "histogram"
+    
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labels: Tuple[str, ...] = (),
+        buckets: Tuple[float, ...] = LATENCY_BUCKETS
+    ):
+        super().__init__(name, documentation, labels)
+        self.buckets = tuple(sorted(buckets))
+        # Per label set: [bucket counts..., +Inf count], sum
+        self._series: Dict[Tuple[str, ...], Tuple[List[int], List[float]]] = {}
+    
+    def observe(self, value: float, **labels) -> None:
+        key = self._key(labels)
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = ([0] * (len(self.buckets) + 1), [0.0])
+                self._series[key] = series
+            series[0][index] += 1
+            series[1][0] += value
+    
+    @contextmanager
+    def time(self, **labels):
+        """Observe the wall time of a block"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+    
+    def _samples(self) -> List[str]:
+        with self._lock:
+            items = [(key, list(counts), total[0]) for key, (counts, total) in self._series.items()]
+        
+        lines = []
+        for key, counts, total in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                le = "+Inf" if bound == float("inf") else repr(bound)
+                bucket_labels = _format_labels(self.label_names, key, 'le="' + le + '"')
+                lines.append(f"{self.name}_bucket{bucket_labels} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(self.label_names, key)} {total}")
+            lines.append(f"{self.name}_count{_format_labels(self.label_names, key)} {cumulative}")
+        return lines
+
+
+def timed(histogram: Histogram, **labels):
+    """Decorator observing a function's duration in a histogram"""
+    def decorator(func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                histogram.observe(time.perf_counter() - start, **labels)
+        return wrapper
+    return decorator
+
+
+def size_bucket(size: int) -> str:
+    """Power-of-two label for a batch size, keeping label cardinality bounded"""
+    bucket = 1
+    while bucket < size:
+        bucket *= 2
+    return str(bucket)
+
+
+def render_metrics() -> str:
+    """All registered metrics in Prometheus text exposition format"""
+    lines = []
+    for metric in list(_registry):
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+
+# Pipeline metrics
+HTTP_REQUEST_SECONDS = Histogram(
+    "auditchain_http_request_duration_seconds",
+    "HTTP request latency by route",
+    labels=("method", "route", "status")
+)
+INGEST_SECONDS = Histogram(
+    "auditchain_ingest_duration_seconds",
+    "Time to validate, hash and durably store one audit event"
+)
+HASH_SECONDS = Histogram(
+    "auditchain_hash_duration_seconds",
+    "Time spent hashing event metadata"
+)
+DB_QUERY_SECONDS = Histogram(
+    "auditchain_db_query_duration_seconds",
+    "Database time per named query",
+    labels=("query",)
+)
+MERKLE_BUILD_SECONDS = Histogram(
+    "auditchain_merkle_build_duration_seconds",
+    "Merkle tree build time by batch size (rounded up to a power of two)",
+    labels=("batch_size",)
+)
+ANCHOR_SECONDS = Histogram(
+    "auditchain_anchor_submit_to_receipt_seconds",
+    "Time from submitting an anchor transaction to receiving its receipt",
+    buckets=CHAIN_LATENCY_BUCKETS
+)
+RPC_CALLS = Counter(
+    "auditchain_rpc_calls_total",
+    "Blockchain RPC calls by method",
+    labels=("method",)
+)
+RPC_ERRORS = Counter(
+    "auditchain_rpc_errors_total",
+    "Failed blockchain RPC calls by method",
+    labels=("method",)
+)
+ANCHOR_FAILURES = Counter(
+    "auditchain_anchor_failures_total",
+    "Batches that could not be anchored on chain"
+)
+REORGED_ANCHORS = Counter(
+    "auditchain_reorged_anchors_total",
+    "Anchors whose block left the canonical chain, by outcome (reincluded or orphaned)",
+    labels=("outcome",)
+)
+DEDUP_LOOKUPS = Counter(
+    "auditchain_ingest_dedup_lookups_total",
+    "Duplicate checks on ingest by outcome (cache_hit, bloom_skip, index_hit, index_miss)",
+    labels=("outcome",)
+)
+DEDUPLICATED_EVENTS = Counter(
+    "auditchain_ingest_deduplicated_total",
+    "Create requests answered with an already stored event, by match (idempotency_key or metadata_hash)",
+    labels=("match",)
+)
+
+INGEST_REJECTED = Counter(
+    "auditchain_ingest_rejected_total",
+    "Create requests turned away with 429, by reason (rate_limited or queue_full)",
+    labels=("reason",)
+)
+INGEST_QUEUE_DEPTH = Gauge(
+    "auditchain_ingest_queue_depth",
+    "Events waiting for the ingest writer"
+)
+INGEST_GROUP_SIZE = Histogram(
+    "auditchain_ingest_group_size",
+    "Events committed per ingest writer transaction",
+    buckets=(1, 2, 5, 10, 25, 50, 100, 250, 500, 1000)
+)
+
+HTTP_CACHE_RESPONSES = Counter(
+    "auditchain_http_cache_responses_total",
+    "ETag-bearing responses by outcome (hit, miss, not_modified, uncacheable)",
+    labels=("outcome",)
+)
+HTTP_CACHE_BYTES = Gauge(
+    "auditchain_http_cache_bytes",
+    "Encoded response bytes held by the immutable response cache"
+)
+
+VERIFY_CACHE_LOOKUPS = Counter(
+    "auditchain_verify_cache_lookups_total",
+    "Verification cache lookups by kind (event_hash, anchored_root) and outcome (hit, miss)",
+    labels=("kind", "outcome")
+)
+
+ANCHOR_LEADER = Gauge(
+    "auditchain_anchor_leader",
+    "1 while this worker holds the anchor leader lease, else 0"
+)
+
+
+def register_backlog_gauges(pending_events: Callable[[], float], anchor_queue: Callable[[], float]) -> None:
+    """Register scrape-time gauges for the ingest backlog and anchoring queue"""
+    Gauge(
+        "auditchain_pending_events",
+        "Events not yet sealed into a Merkle batch",
+        callback=pending_events
+    )
+    Gauge(
+        "auditchain_anchor_queue_depth",
+        "Sealed batches waiting to be anchored on chain",
+        callback=anchor_queue
+    )
@@ -0,0 +1,338 @@
+"""
+Partition service - Monthly archival of sealed audit event partitions
+
+New events always land in the hot audit_events table. Once every event of a
+past month belongs to an anchored batch, the month can be sealed: its rows move
+into a standalone SQLite file under PARTITION_DIR, the file is compacted and
+made read-only, and a summary (id range, Merkle root, chain head, anchors) is
+recorded in the event_partitions catalog. Sealed files are attached only for
+queries whose id or time range needs them.
+"""
+import os
+import stat
+import sqlite3
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+from app.database import DB_PATH, iter_rows
+from app.services.merkle_service import stream_merkle_root
+
+PARTITION_DIR = DB_PATH.parent / "partitions"
+
+HOT_TABLE = "main.audit_events"
+
+# audit_events columns added after partitions may have been sealed, with the
+# value they read as in older partition files
+PARTITION_LATER_COLUMNS = {
+    "hash_version": "NULL",
+}
+
+def partition_key_for(created_at: str) -> str:
+    """
+    Partition key (YYYY-MM) of an event created_at timestamp
+    """
+    return created_at[:7]
+
+def partition_bounds(partition_key: str) -> Tuple[str, str]:
+    """
+    Inclusive start and exclusive end created_at of a partition
+    """
+    try:
+        start = datetime.strptime(partition_key, "%Y-%m")
+    except ValueError:
+        raise ValueError(f"Invalid partition key: {partition_key}. Expected YYYY-MM")
+    
+    if start.month == 12:
+        end = start.replace(year=start.year + 1, month=1)
+    else:
+        end = start.replace(month=start.month + 1)
+    
+    return start.strftime("%Y-%m-%d %H:%M:%S"), end.strftime("%Y-%m-%d %H:%M:%S")
+
+def _partition_alias(partition_key: str) -> str:
+    return "p_" + partition_key.replace("-", "_")
+
+def _partition_path(partition_key: str):
+    return PARTITION_DIR / f"events_{partition_key.replace('-', '_')}.db"
+
+def list_sealed_partitions(
+    cursor,
+    first_id: Optional[int] = None,
+    last_id: Optional[int] = None,
+    descending: bool = False
+) -> List[sqlite3.Row]:
+    """
+    Catalog rows of sealed partitions overlapping an event id range
+    """
+    cursor.execute(f"""
+        SELECT partition_key, file_path, first_event_id, last_event_id, event_count,
+               merkle_root, chain_head
+        FROM event_partitions
+        WHERE status = 'Sealed'
+          AND (? IS NULL OR last_event_id >= ?)
+          AND (? IS NULL OR first_event_id <= ?)
+        ORDER BY first_event_id {"DESC" if descending else "ASC"}
+    """, (first_id, first_id, last_id, last_id))
+    return cursor.fetchall()
+
+@contextmanager
+def event_table(conn, partition: Optional[sqlite3.Row]):
+    """
+    Yield the table name of the hot table (partition=None) or of a sealed
+    partition, attaching the partition file for the duration of the block
+    """
+    if partition is None:
+        yield HOT_TABLE
+        return
+    
+    alias = _partition_alias(partition["partition_key"])
+    conn.execute("ATTACH DATABASE ? AS " + alias, (partition["file_path"],))
+    view = None
+    try:
+        # Partition files are read-only, so columns added to the hot table
+        # after a partition was sealed are filled in by a temporary view
+        columns = {row[1] for row in conn.execute(f"PRAGMA {alias}.table_info(audit_events)")}
+        missing = [
+            f"{value} AS {column}"
+            for column, value in PARTITION_LATER_COLUMNS.items() if column not in columns
+        ]
+        if missing:
+            view = f"{alias}_events"
+            conn.execute(f"""
+                CREATE TEMP VIEW {view} AS
+                SELECT *, {", ".join(missing)} FROM {alias}.audit_events
+            """)
+            yield f"temp.{view}"
+        else:
+            yield f"{alias}.audit_events"
+    finally:
+        if view:
+            conn.execute(f"DROP VIEW IF EXISTS temp.{view}")
+        conn.execute("DETACH DATABASE " + alias)
+
+def query_events(conn, partition: Optional[sqlite3.Row], sql: str, params=()) -> List[sqlite3.Row]:
+    """
+    Run a query against the hot table or one sealed partition
+    
+    The SQL refers to the event table as {events}.
+    """
+    with event_table(conn, partition) as table:
+        return conn.execute(sql.format(events=table), params).fetchall()
+
+def find_event(conn, event_id: int, columns: str) -> Optional[sqlite3.Row]:
+    """
+    Fetch one event by id from the hot table or the partition holding it
+    """
+    sql = f"SELECT {columns} FROM {{events}} WHERE id = ?"
+    
+    rows = query_events(conn, None, sql, (event_id,))
+    if rows:
+        return rows[0]
+    
+    for partition in list_sealed_partitions(conn.cursor(), event_id, event_id):
+        rows = query_events(conn, partition, sql, (event_id,))
+        if rows:
+            return rows[0]
+    
+    return None
+
+def iter_events_in_range(
+    conn,
+    first_id: Optional[int],
+    last_id: Optional[int],
+    sql: str,
+    params=()
+) -> Iterator[sqlite3.Row]:
+    """
+    Stream a query over every event source overlapping an id range, in id order
+    
+    Rows are fetched DB_FETCH_SIZE at a time; each partition stays attached
+    only while its rows are being consumed. A None bound leaves that side of
+    the range open.
+    """
+    for partition in list_sealed_partitions(conn.cursor(), first_id, last_id):
+        with event_table(conn, partition) as table:
+            yield from iter_rows(conn.execute(sql.format(events=table), params))
+    yield from iter_rows(conn.execute(sql.format(events=HOT_TABLE), params))
+
+def find_events_in_range(conn, first_id: int, last_id: int, sql: str, params=()) -> List[sqlite3.Row]:
+    """
+    Run a query over every event source overlapping an id range, in id order
+    """
+    return list(iter_events_in_range(conn, first_id, last_id, sql, params))
+
+def seal_partition(conn, partition_key: str) -> Dict[str, Any]:
+    """
+    Move a fully anchored past month into a read-only partition file
+    
+    The copy into the partition file, the delete from the hot table and the
+    catalog update commit as one multi-database transaction.
+    
+    Raises:
+        ValueError: if the month is current, empty, already sealed, preceded
+            by unsealed events or still has events that are not in an
+            anchored batch
+    """
+    start, end = partition_bounds(partition_key)
+    cursor = conn.cursor()
+    
+    if partition_key >= datetime.utcnow().strftime("%Y-%m"):
+        raise ValueError(f"Partition {partition_key} is still open for writes")
+    
+    cursor.execute("""
+        SELECT status FROM event_partitions WHERE partition_key = ?
+    """, (partition_key,))
+    existing = cursor.fetchone()
+    if existing and existing["status"] == "Sealed":
+        raise ValueError(f"Partition {partition_key} is already sealed")
+    
+    PARTITION_DIR.mkdir(exist_ok=True)
+    file_path = _partition_path(partition_key)
+    if file_path.exists():
+        # Leftover from an interrupted seal; the hot rows were never removed
+        os.chmod(file_path, stat.S_IRUSR | stat.S_IWUSR)
+        file_path.unlink()
+    
+    # ATTACH is not allowed inside a transaction, so attach first
+    alias = _partition_alias(partition_key)
+    cursor.execute("ATTACH DATABASE ? AS " + alias, (str(file_path),))
+    
+    try:
+        cursor.execute("BEGIN IMMEDIATE")
+        
+        cursor.execute("""
+            SELECT MIN(id) as first_id, MAX(id) as last_id, COUNT(*) as event_count
+            FROM main.audit_events
+            WHERE created_at >= ? AND created_at < ?
+        """, (start, end))
+        summary = cursor.fetchone()
+        if not summary["event_count"]:
+            raise ValueError(f"Partition {partition_key} has no events")
+        
+        id_range = (summary["first_id"], summary["last_id"])
+        
+        # Months seal oldest first: the chain head and newest-first listing
+        # both rely on hot rows being newer than every sealed partition
+        cursor.execute("""
+            SELECT COUNT(*) as earlier FROM main.audit_events WHERE id < ?
+        """, (summary["first_id"],))
+        earlier = cursor.fetchone()["earlier"]
+        if earlier:
+            raise ValueError(
+                f"Partition {partition_key} follows {earlier} unsealed earlier events; seal older months first"
+            )
+        
+        # Anchors orphaned by a reorg no longer count
+        cursor.execute("""
+            SELECT COUNT(*) as unanchored
+            FROM main.audit_events e
+            WHERE e.id BETWEEN ? AND ?
+              AND NOT EXISTS (
+                  SELECT 1 FROM blockchain_anchors a
+                  WHERE a.batch_id = e.batch_id AND a.anchor_id IS NOT NULL
+                    AND COALESCE(a.confirmation_status, '') != 'Orphaned'
+              )
+        """, id_range)
+        unanchored = cursor.fetchone()["unanchored"]
+        if unanchored:
+            raise ValueError(f"Partition {partition_key} has {unanchored} events not yet anchored")
+        
+        # Partition summary: Merkle root over its leaves, chain head, anchors
+        cursor.execute("""
+            SELECT COALESCE(merkle_leaf_hash, metadata_hash) as leaf_hash
+            FROM main.audit_events
+            WHERE id BETWEEN ? AND ?
+            ORDER BY id
+        """, id_range)
+        merkle_root = stream_merkle_root(row["leaf_hash"] for row in iter_rows(cursor))
+        
+        cursor.execute("""
+            SELECT chain_hash FROM main.audit_events WHERE id = ?
+        """, (id_range[1],))
+        chain_head = cursor.fetchone()["chain_hash"]
+        
+        cursor.execute("""
+            SELECT COUNT(DISTINCT e.batch_id) as batch_count, MAX(a.anchor_id) as last_anchor_id
+            FROM main.audit_events e
+            JOIN blockchain_anchors a ON a.batch_id = e.batch_id
+            WHERE e.id BETWEEN ? AND ?
+        """, id_range)
+        anchors = cursor.fetchone()
+        
+        sealed_at = datetime.utcnow().isoformat()
+        
+        # Same column layout as the hot table so rows copy verbatim
+        cursor.execute("""
+            SELECT sql FROM main.sqlite_master WHERE type = 'table' AND name = 'audit_events'
+        """)
+        table_sql = cursor.fetchone()["sql"]
+        cursor.execute(table_sql.replace("audit_events", f"{alias}.audit_events", 1))
+        cursor.execute(f"CREATE INDEX {alias}.idx_events_batch_id ON audit_events (batch_id)")
+        cursor.execute(f"CREATE INDEX {alias}.idx_events_metadata_hash ON audit_events (metadata_hash)")
+        
+        cursor.execute(f"""
+            INSERT INTO {alias}.audit_events
+            SELECT * FROM main.audit_events WHERE id BETWEEN ? AND ?
+        """, id_range)
+        cursor.execute("""
+            DELETE FROM main.audit_events WHERE id BETWEEN ? AND ?
+        """, id_range)
+        
+        cursor.execute("""
+            INSERT INTO event_partitions (
+                partition_key, file_path, status, first_event_id, last_event_id,
+                event_count, merkle_root, chain_head, batch_count, last_anchor_id, sealed_at
+            )
+            VALUES (?, ?, 'Sealed', ?, ?, ?, ?, ?, ?, ?, ?)
+            ON CONFLICT(partition_key) DO UPDATE SET
+                file_path = excluded.file_path,
+                status = excluded.status,
+                first_event_id = excluded.first_event_id,
+                last_event_id = excluded.last_event_id,
+                event_count = excluded.event_count,
+                merkle_root = excluded.merkle_root,
+                chain_head = excluded.chain_head,
+                batch_count = excluded.batch_count,
+                last_anchor_id = excluded.last_anchor_id,
+                sealed_at = excluded.sealed_at
+        """, (
+            partition_key,
+            str(file_path),
+            summary["first_id"],
+            summary["last_id"],
+            summary["event_count"],
+            merkle_root,
+            chain_head,
+            anchors["batch_count"],
+            anchors["last_anchor_id"],
+            sealed_at
+        ))
+        
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        cursor.execute("DETACH DATABASE " + alias)
+        file_path.unlink(missing_ok=True)
+        raise
+    
+    cursor.execute("DETACH DATABASE " + alias)
+    
+    # Compact the archive and make it read-only
+    archive = sqlite3.connect(file_path)
+    archive.execute("VACUUM")
+    archive.close()
+    os.chmod(file_path, stat.S_IRUSR | stat.S_IRGRP | stat.S_IROTH)
+    
+    return {
+        "partition_key": partition_key,
+        "file_path": str(file_path),
+        "status": "Sealed",
+        "first_event_id": summary["first_id"],
+        "last_event_id": summary["last_id"],
+        "event_count": summary["event_count"],
+        "merkle_root": merkle_root,
+        "chain_head": chain_head,
+        "batch_count": anchors["batch_count"],
+        "last_anchor_id": anchors["last_anchor_id"],
+        "sealed_at": sealed_at
+    }
@@ -0,0 +1,250 @@
+"""
+Profiling service - Opt-in per-request stack sampling and span timings
+
+A profiled request gets a sampler thread that snapshots the stack of the
+thread serving it every PROFILE_INTERVAL_MS, plus explicit spans recorded
+around database connections, hashing, Merkle builds and RPC calls. Finished
+profiles are kept in a small in-memory ring and exported as collapsed stacks
+(for flamegraph.pl / speedscope) or a speedscope JSON file.
+
+Profiling is off unless PROFILING_ENABLED is set; then a request is profiled
+when it carries the X-Profile header or is picked by PROFILE_SAMPLE_RATE.
+Outside a profiled request, span() costs one ContextVar lookup. Requests
+served concurrently on the same event loop share the sampled thread, so stack
+samples are clearest under low concurrency; spans are always per request.
+"""
+import os
+import random
+import sys
+import threading
+import time
+import uuid
+from collections import Counter, OrderedDict
+from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import datetime
+from functools import wraps
+from typing import Any, Dict, List, Optional, Tuple
+
+PROFILE_HEADER = "X-Profile"
+
+PROFILING_ENABLED = os.getenv("PROFILING_ENABLED", "").lower() in ("1", "true", "yes")
+PROFILE_SAMPLE_RATE = float(os.getenv("PROFILE_SAMPLE_RATE", "0"))
+PROFILE_INTERVAL_MS = float(os.getenv("PROFILE_INTERVAL_MS", "1"))
+PROFILE_MAX_STORED = int(os.getenv("PROFILE_MAX_STORED", "50"))
+PROFILE_MAX_DEPTH = 128
+
+_active_profile: ContextVar[Optional["RequestProfile"]] = ContextVar("active_profile", default=None)
+
+_profiles: "OrderedDict[str, RequestProfile]" = OrderedDict()
+_profiles_lock = threading.Lock()
+
+
+def _frame_name(frame) -> Tuple[str, str, int]:
+    code = frame.f_code
+    return code.co_name, code.co_filename, code.co_firstlineno
+
+
+class RequestProfile:
+    """Stack samples and spans collected while serving one request"""
+    
+    def __init__(self, method: str, path: str):
+        self.profile_id = uuid.uuid4().hex[:16]
+        self.method = method
+        self.path = path
+        self.created_at = datetime.utcnow().isoformat()
+        self.status_code: Optional[int] = None
+        self.duration_ms = 0.0
+        # Collapsed stacks: tuple of frames (root first) -> sample count
+        self.samples: Counter = Counter()
+        # Span open/close events in the order they happened: (kind, name, ms)
+        self.span_events: List[Tuple[str, str, float]] = []
+        self._start = time.perf_counter()
+        self._stop = threading.Event()
+        self._sampler: Optional[threading.Thread] = None
+    
+    def elapsed_ms(self) -> float:
+        return (time.perf_counter() - self._start) * 1000
+    
+    def start_sampling(self, thread_id: int) -> None:
+        self._sampler = threading.Thread(target=self._sample, args=(thread_id,), daemon=True)
+        self._sampler.start()
+    
+    def _sample(self, thread_id: int) -> None:
+        interval = PROFILE_INTERVAL_MS / 1000
+        while not self._stop.wait(interval):
+            frame = sys._current_frames().get(thread_id)
+            stack = []
+            while frame is not None and len(stack) < PROFILE_MAX_DEPTH:
+                stack.append(_frame_name(frame))
+                frame = frame.f_back
+            if stack:
+                self.samples[tuple(reversed(stack))] += 1
+    
+    def finish(self, status_code: int) -> None:
+        self._stop.set()
+        if self._sampler is not None:
+            self._sampler.join()
+        self.status_code = status_code
+        self.duration_ms = self.elapsed_ms()
+    
+    def span_totals(self) -> Dict[str, Dict[str, float]]:
+        """Total time and call count per span name"""
+        totals: Dict[str, Dict[str, float]] = {}
+        open_spans: List[Tuple[str, float]] = []
+        for kind, name, at in self.span_events:
+            if kind == "O":
+                open_spans.append((name, at))
+                continue
+            _, opened_at = open_spans.pop()
+            entry = totals.setdefault(name, {"calls": 0, "total_ms": 0.0})
+            entry["calls"] += 1
+            entry["total_ms"] = round(entry["total_ms"] + at - opened_at, 3)
+        return totals
+    
+    def summary(self) -> Dict[str, Any]:
+        return {
+            "profile_id": self.profile_id,
+            "method": self.method,
+            "path": self.path,
+            "status_code": self.status_code,
+            "duration_ms": round(self.duration_ms, 3),
+            "sample_count": sum(self.samples.values()),
+            "spans": self.span_totals(),
+            "created_at": self.created_at
+        }
+    
+    def collapsed(self) -> str:
+        """Brendan Gregg collapsed-stack format, one 'a;b;c count' per line"""
+        lines = []
+        for stack, count in self.samples.items():
+            names = [f"{name} ({os.path.basename(filename)}:{line})" for name, filename, line in stack]
+            lines.append(f"{';'.join(names)} {count}")
+        return "\n".join(lines) + "\n"
+    
+    def speedscope(self) -> Dict[str, Any]:
+        """speedscope file with a sampled profile and an evented span profile"""
+        frames: List[Dict[str, Any]] = []
+        frame_index: Dict[Tuple[str, str, int], int] = {}
+        
+        def index_of(key: Tuple[str, str, int]) -> int:
+            if key not in frame_index:
+                frame_index[key] = len(frames)
+                name, filename, line = key
+                frames.append({"name": name, "file": filename, "line": line})
+            return frame_index[key]
+        
+        samples = []
+        weights = []
+        for stack, count in self.samples.items():
+            samples.append([index_of(frame) for frame in stack])
+            weights.append(count * PROFILE_INTERVAL_MS)
+        
+        events = [
+            {"type": kind, "frame": index_of((name, "span", 0)), "at": round(at, 3)}
+            for kind, name, at in self.span_events
+        ]
+        
+        title = f"{self.method} {self.path}"
+        return {
+            "$schema": "https://www.speedscope.app/file-format-schema.json",
+            "name": title,
+            "exporter": "auditchain",
+            "activeProfileIndex": 0,
+            "shared": {"frames": frames},
+            "profiles": [
+                {
+                    "type": "sampled",
+                    "name": f"{title} (stack samples)",
+                    "unit": "milliseconds",
+                    "startValue": 0,
+                    "endValue": sum(weights),
+                    "samples": samples,
+                    "weights": weights
+                },
+                {
+                    "type": "evented",
+                    "name": f"{title} (spans)",
+                    "unit": "milliseconds",
+                    "startValue": 0,
+                    "endValue": round(self.duration_ms, 3),
+                    "events": events
+                }
+            ]
+        }
+
+
+def should_profile(headers) -> bool:
+    """Whether a request opts in to profiling"""
+    if not PROFILING_ENABLED:
+        return False
+    if headers.get(PROFILE_HEADER, "").lower() in ("1", "true", "yes"):
+        return True
+    return PROFILE_SAMPLE_RATE > 0 and random.random() < PROFILE_SAMPLE_RATE
+
+
+@contextmanager
+def profile_request(method: str, path: str):
+    """
+    Profile the enclosed request handling, yielding the RequestProfile
+    
+    The caller sets profile.status_code via finish() when the response is
+    known; the profile is stored once the block exits.
+    """
+    profile = RequestProfile(method, path)
+    token = _active_profile.set(profile)
+    profile.start_sampling(threading.get_ident())
+    try:
+        yield profile
+    finally:
+        _active_profile.reset(token)
+        if profile.status_code is None:
+            profile.finish(500)
+        _store(profile)
+
+
+def _store(profile: RequestProfile) -> None:
+    with _profiles_lock:
+        _profiles[profile.profile_id] = profile
+        while len(_profiles) > PROFILE_MAX_STORED:
+            _profiles.popitem(last=False)
+
+
+def get_profile(profile_id: str) -> Optional[RequestProfile]:
+    with _profiles_lock:
+        return _profiles.get(profile_id)
+
+
+def list_profiles() -> List[Dict[str, Any]]:
+    """Summaries of stored profiles, newest first"""
+    with _profiles_lock:
+        profiles = list(_profiles.values())
+    return [profile.summary() for profile in reversed(profiles)]
+
+
+@contextmanager
+def span(name: str):
+    """Record a named span in the active request profile, if any"""
+    profile = _active_profile.get()
+    if profile is None:
+        yield
+        return
+    
+    profile.span_events.append(("O", name, profile.elapsed_ms()))
+    try:
+        yield
+    finally:
+        profile.span_events.append(("C", name, profile.elapsed_ms()))
+
+
+def profiled(name: str):
+    """Decorator recording each call of a function as a span"""
+    def decorator(func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            if _active_profile.get() is None:
+                return func(*args, **kwargs)
+            with span(name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
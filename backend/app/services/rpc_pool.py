@@ -0,0 +1,401 @@
+"""
+RPC pool - JSON-RPC over several endpoints with failover and batching
+
+Each endpoint keeps persistent keep-alive HTTP connections (one per thread),
+a circuit breaker, and EWMA latency and error-rate estimates. Calls go to
+the best-scoring endpoint whose circuit is closed, failing over to the next
+on connection errors. Endpoints whose head block lags the best known head by
+more than RPC_MAX_BLOCK_LAG are only used when nothing fresher is available.
+
+Read-only calls arriving from several threads within RPC_BATCH_WINDOW_MS are
+merged into one JSON-RPC batch request; batch() sends an explicit batch.
+"""
+import http.client
+import itertools
+import json
+import os
+import threading
+import time
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+from urllib.parse import urlsplit
+from app.services.circuit_breaker import CircuitBreaker
+
+RPC_TIMEOUT = float(os.getenv("BLOCKCHAIN_RPC_TIMEOUT", "10"))
+RPC_BREAKER_FAILURES = int(os.getenv("BLOCKCHAIN_BREAKER_FAILURES", "3"))
+RPC_BREAKER_RESET = float(os.getenv("BLOCKCHAIN_BREAKER_RESET", "30"))
+RPC_BATCH_WINDOW_MS = float(os.getenv("BLOCKCHAIN_BATCH_WINDOW_MS", "2"))
+RPC_MAX_BATCH = int(os.getenv("BLOCKCHAIN_MAX_BATCH", "50"))
+RPC_MAX_BLOCK_LAG = int(os.getenv("BLOCKCHAIN_MAX_BLOCK_LAG", "5"))
+
+# Weight of the newest sample in the latency and error-rate averages
+EWMA_ALPHA = 0.2
+# Score assumed for an endpoint that has not answered yet (seconds)
+DEFAULT_LATENCY = 0.05
+# How strongly the error rate inflates an endpoint's score
+ERROR_PENALTY = 10.0
+
+# Methods safe to merge into batches and to retry on another endpoint
+READ_METHODS = {
+    "eth_blockNumber", "eth_call", "eth_chainId", "eth_estimateGas", "eth_feeHistory",
+    "eth_gasPrice", "eth_getBalance", "eth_getBlockByHash", "eth_getBlockByNumber",
+    "eth_getCode", "eth_getLogs", "eth_getTransactionByHash", "eth_getTransactionCount",
+    "eth_getTransactionReceipt", "eth_maxPriorityFeePerGas", "net_version",
+}
+
+
+class RpcError(Exception):
+    """JSON-RPC error response (the endpoint itself is healthy)"""
+    
+    def __init__(self, code: int, message: str, data: Any = None):
+        super().__init__(f"RPC error {code}: {message}")
+        self.code = code
+        self.message = message
+        self.data = data
+
+
+def _json_default(value):
+    if isinstance(value, (bytes, bytearray)):
+        return "0x" + bytes(value).hex()
+    if hasattr(value, "items"):
+        return dict(value.items())
+    raise TypeError(f"Cannot serialize {type(value).__name__} for JSON-RPC")
+
+
+class RpcEndpoint:
+    """One JSON-RPC URL with its connections, breaker and health statistics"""
+    
+    def __init__(self, url: str, timeout: float = RPC_TIMEOUT):
+        parts = urlsplit(url)
+        if parts.scheme not in ("http", "https"):
+            raise ValueError(f"Unsupported RPC URL scheme: {url}")
+        
+        self.url = url
+        self.timeout = timeout
+        self._https = parts.scheme == "https"
+        self._host = parts.hostname
+        self._port = parts.port
+        self._path = (parts.path or "/") + (f"?{parts.query}" if parts.query else "")
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        
+        self.breaker = CircuitBreaker(RPC_BREAKER_FAILURES, RPC_BREAKER_RESET)
+        self.latency: Optional[float] = None
+        self.error_rate = 0.0
+        self.calls = 0
+        self.errors = 0
+        self.head_block: Optional[int] = None
+    
+    def _connection(self) -> Tuple[http.client.HTTPConnection, bool]:
+        """This thread's keep-alive connection and whether it was reused"""
+        conn = getattr(self._local, "conn", None)
+        if conn is not None:
+            return conn, True
+        
+        connection_class = http.client.HTTPSConnection if self._https else http.client.HTTPConnection
+        conn = connection_class(self._host, self._port, timeout=self.timeout)
+        self._local.conn = conn
+        return conn, False
+    
+    def _drop_connection(self) -> None:
+        conn = getattr(self._local, "conn", None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
+    
+    def post(self, body: bytes) -> Any:
+        """
+        POST one JSON-RPC payload and return the decoded response
+        
+        Raises:
+            ConnectionError: on network errors, timeouts or non-200 responses
+        """
+        while True:
+            conn, reused = self._connection()
+            try:
+                conn.request("POST", self._path, body=body, headers={"Content-Type": "application/json"})
+                response = conn.getresponse()
+                payload = response.read()
+            except (OSError, http.client.HTTPException) as e:
+                self._drop_connection()
+                # A kept-alive connection may have been closed by the server
+                # while idle; retry once on a fresh one
+                if reused:
+                    continue
+                raise ConnectionError(f"{self.url}: {e}") from e
+            
+            if response.status != 200:
+                self._drop_connection()
+                raise ConnectionError(f"{self.url}: HTTP {response.status}")
+            
+            try:
+                return json.loads(payload)
+            except ValueError as e:
+                raise ConnectionError(f"{self.url}: invalid JSON-RPC response") from e
+    
+    def record(self, latency: Optional[float], failed: bool) -> None:
+        with self._lock:
+            self.calls += 1
+            self.errors += failed
+            self.error_rate += EWMA_ALPHA * ((1.0 if failed else 0.0) - self.error_rate)
+            if latency is not None:
+                self.latency = latency if self.latency is None else self.latency + EWMA_ALPHA * (latency - self.latency)
+        
+        if failed:
+            self.breaker.record_failure()
+        else:
+            self.breaker.record_success()
+    
+    def score(self) -> float:
+        """Lower is better: average latency inflated by the recent error rate"""
+        latency = self.latency if self.latency is not None else DEFAULT_LATENCY
+        return latency * (1.0 + ERROR_PENALTY * self.error_rate)
+    
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "url": self.url,
+            "circuit": self.breaker.state,
+            "latency_ms": round(self.latency * 1000, 3) if self.latency is not None else None,
+            "error_rate": round(self.error_rate, 4),
+            "calls": self.calls,
+            "errors": self.errors,
+            "head_block": self.head_block,
+            "score": round(self.score(), 6)
+        }
+
+
+class _PendingCall:
+    __slots__ = ("method", "params", "done", "result", "error")
+    
+    def __init__(self, method: str, params: Sequence[Any]):
+        self.method = method
+        self.params = params
+        self.done = threading.Event()
+        self.result = None
+        self.error: Optional[BaseException] = None
+
+
+class RpcPool:
+    """Failover, scoring and batching across several JSON-RPC endpoints"""
+    
+    def __init__(self, urls: List[str], timeout: float = RPC_TIMEOUT):
+        if not urls:
+            raise ValueError("At least one RPC URL is required")
+        self.endpoints = [RpcEndpoint(url, timeout) for url in urls]
+        self._ids = itertools.count(1)
+        self._pending: List[_PendingCall] = []
+        self._pending_lock = threading.Lock()
+        self._flushing = False
+    
+    def _candidates(self) -> List[RpcEndpoint]:
+        """Endpoints to try, best first; lagging ones only as a last resort"""
+        ranked = sorted(self.endpoints, key=RpcEndpoint.score)
+        heads = [endpoint.head_block for endpoint in ranked if endpoint.head_block is not None]
+        if not heads:
+            return ranked
+        
+        best_head = max(heads)
+        fresh = [e for e in ranked if e.head_block is None or best_head - e.head_block <= RPC_MAX_BLOCK_LAG]
+        return fresh + [e for e in ranked if e not in fresh]
+    
+    def _send(self, payload: Any) -> Any:
+        """
+        Send a payload to the best available endpoint, failing over on
+        connection errors
+        
+        Raises:
+            ConnectionError: if every endpoint failed or has an open circuit
+        """
+        body = json.dumps(payload, default=_json_default).encode("utf-8")
+        errors = []
+        
+        for endpoint in self._candidates():
+            if not endpoint.breaker.allow():
+                errors.append(f"{endpoint.url}: circuit open")
+                continue
+            
+            start = time.perf_counter()
+            try:
+                response = endpoint.post(body)
+            except ConnectionError as e:
+                endpoint.record(None, failed=True)
+                errors.append(str(e))
+                continue
+            
+            endpoint.record(time.perf_counter() - start, failed=False)
+            return response
+        
+        raise ConnectionError("All RPC endpoints failed: " + "; ".join(errors))
+    
+    def _request_object(self, method: str, params: Sequence[Any]) -> Dict[str, Any]:
+        return {"jsonrpc": "2.0", "id": next(self._ids), "method": method, "params": list(params)}
+    
+    @staticmethod
+    def _unwrap(response: Dict[str, Any]) -> Any:
+        if "error" in response and response["error"] is not None:
+            error = response["error"]
+            raise RpcError(error.get("code", 0), error.get("message", ""), error.get("data"))
+        return response.get("result")
+    
+    def request(self, method: str, params: Sequence[Any] = ()) -> Any:
+        """
+        One JSON-RPC call, bypassing the read batcher
+        
+        Raises:
+            RpcError: if the node returned a JSON-RPC error
+            ConnectionError: if no endpoint could be reached
+        """
+        return self._unwrap(self._send(self._request_object(method, params)))
+    
+    def batch(self, calls: Sequence[Tuple[str, Sequence[Any]]]) -> List[Any]:
+        """
+        Send several calls as one JSON-RPC batch request
+        
+        Returns:
+            One entry per call, in order: the result, or an RpcError instance
+            for calls the node rejected
+        
+        Raises:
+            ConnectionError: if no endpoint could be reached
+        """
+        if not calls:
+            return []
+        
+        requests = [self._request_object(method, params) for method, params in calls]
+        responses = self._send(requests)
+        if not isinstance(responses, list):
+            # Some nodes answer a rejected batch with a single error object
+            error = RpcError(-32600, "Batch rejected")
+            if isinstance(responses, dict):
+                try:
+                    self._unwrap(responses)
+                except RpcError as e:
+                    error = e
+            return [error] * len(calls)
+        
+        by_id = {response.get("id"): response for response in responses}
+        results = []
+        for request in requests:
+            response = by_id.get(request["id"])
+            if response is None:
+                results.append(RpcError(-32603, "Missing response in batch"))
+                continue
+            try:
+                results.append(self._unwrap(response))
+            except RpcError as e:
+                results.append(e)
+        return results
+    
+    def call(self, method: str, params: Sequence[Any] = ()) -> Any:
+        """
+        One JSON-RPC call; concurrent read-only calls are merged into batches
+        
+        Raises:
+            RpcError: if the node returned a JSON-RPC error
+            ConnectionError: if no endpoint could be reached
+        """
+        if method not in READ_METHODS or RPC_BATCH_WINDOW_MS <= 0:
+            return self.request(method, params)
+        
+        pending = _PendingCall(method, params)
+        with self._pending_lock:
+            self._pending.append(pending)
+            leader = not self._flushing
+            if leader:
+                self._flushing = True
+        
+        if leader:
+            # Give concurrent callers a moment to join, then flush for everyone
+            time.sleep(RPC_BATCH_WINDOW_MS / 1000)
+            self._flush()
+        
+        pending.done.wait()
+        if pending.error is not None:
+            raise pending.error
+        return pending.result
+    
+    def _flush(self) -> None:
+        while True:
+            with self._pending_lock:
+                calls = self._pending[:RPC_MAX_BATCH]
+                del self._pending[:RPC_MAX_BATCH]
+                if not calls:
+                    self._flushing = False
+                    return
+            
+            try:
+                if len(calls) == 1:
+                    results = [self._settle(lambda: self.request(calls[0].method, calls[0].params))]
+                else:
+                    results = self.batch([(call.method, call.params) for call in calls])
+            except Exception as e:
+                results = [e] * len(calls)
+            
+            for call, result in zip(calls, results):
+                if isinstance(result, BaseException):
+                    call.error = result
+                else:
+                    call.result = result
+                call.done.set()
+    
+    @staticmethod
+    def _settle(fn):
+        try:
+            return fn()
+        except RpcError as e:
+            return e
+    
+    def probe(self) -> bool:
+        """
+        Query eth_blockNumber on every endpoint to refresh latency, head
+        block and circuit state
+        
+        Returns:
+            True if at least one endpoint answered
+        """
+        body = json.dumps(self._request_object("eth_blockNumber", [])).encode("utf-8")
+        healthy = False
+        
+        for endpoint in self.endpoints:
+            if not endpoint.breaker.allow():
+                continue
+            
+            start = time.perf_counter()
+            try:
+                endpoint.head_block = int(self._unwrap(endpoint.post(body)), 16)
+            except (ConnectionError, RpcError, TypeError, ValueError):
+                endpoint.record(None, failed=True)
+                continue
+            
+            endpoint.record(time.perf_counter() - start, failed=False)
+            healthy = True
+        
+        return healthy
+    
+    def healthy(self) -> bool:
+        """Whether any endpoint currently accepts calls"""
+        return any(endpoint.breaker.state == "closed" for endpoint in self.endpoints)
+    
+    def stats(self) -> List[Dict[str, Any]]:
+        return [endpoint.stats() for endpoint in self._candidates()]
+
+
+def make_web3_provider(pool: RpcPool):
+    """
+    web3 provider routing every request through the pool
+    
+    Defined lazily because web3 itself is imported lazily.
+    """
+    from web3.providers.base import JSONBaseProvider
+    
+    class PooledProvider(JSONBaseProvider):
+        def make_request(self, method, params):
+            try:
+                result = pool.call(str(method), list(params or []))
+            except RpcError as e:
+                return {"jsonrpc": "2.0", "id": 0, "error": {"code": e.code, "message": e.message, "data": e.data}}
+            return {"jsonrpc": "2.0", "id": 0, "result": result}
+        
+        def is_connected(self, show_traceback: bool = False) -> bool:
+            return pool.healthy()
+    
+    return PooledProvider()
@@ -0,0 +1,140 @@
+"""
+Search service - Full-text and faceted search over audit events
+
+audit_events_fts is an external-content FTS5 index over the summary and the
+main text fields of the hot event table. Triggers keep it in step with every
+insert, update and delete (events leave the hot table when their partition
+is sealed), so no application write path has to know about it.
+
+Filters on framework, environment and actor are added to the MATCH
+expression as column phrases, so they narrow the candidate set inside the
+index before any event row is read, and are then checked exactly. Hits are
+ranked by bm25. Totals and facet counts are taken over at most
+SEARCH_FACET_SCAN_LIMIT of the newest matches, which keeps broad queries on
+large ledgers bounded; the response says when that cap was reached.
+"""
+import os
+import re
+from typing import Any, Dict, List, Mapping, Optional, Tuple
+from app.storage.base import EVENT_COLUMNS
+
+SEARCH_FACET_SCAN_LIMIT = int(os.getenv("SEARCH_FACET_SCAN_LIMIT", "100000"))
+SEARCH_FACET_SIZE = int(os.getenv("SEARCH_FACET_SIZE", "10"))
+
+# Indexed columns, in FTS column order
+FTS_COLUMNS = [
+    "summary", "model_id", "model_name", "model_version", "dataset_name",
+    "event_type", "framework", "environment", "actor"
+]
+
+FACETS = ("framework", "environment", "actor")
+
+_TERM = re.compile(r"\w+", re.UNICODE)
+
+def _phrase(text: str) -> str:
+    return '"' + text.replace('"', '""') + '"'
+
+def match_expression(query: Optional[str], filters: Mapping[str, Optional[str]]) -> Optional[str]:
+    """
+    FTS5 MATCH expression for free text and facet filters, None if empty
+    
+    Free text is split into words that must all occur, the last one as a
+    prefix so partial input still matches; FTS query syntax in the input is
+    not interpreted.
+    """
+    parts = []
+    terms = _TERM.findall(query or "")
+    for index, term in enumerate(terms):
+        parts.append(_phrase(term) + ("*" if index == len(terms) - 1 else ""))
+    
+    for column, value in filters.items():
+        if value is None:
+            continue
+        # A value without any word characters cannot narrow the index; the
+        # exact comparison still applies
+        if _TERM.search(value):
+            parts.append(f"{column} : {_phrase(' '.join(_TERM.findall(value)))}")
+    
+    return " AND ".join(parts) if parts else None
+
+def _filter_sql(filters: Mapping[str, Optional[str]]) -> Tuple[str, List[Any]]:
+    clauses, params = [], []
+    for column, value in filters.items():
+        if value is not None:
+            clauses.append(f"e.{column} = ?")
+            params.append(value)
+    return "".join(f" AND {clause}" for clause in clauses), params
+
+def search_events(
+    cursor,
+    query: Optional[str],
+    filters: Mapping[str, Optional[str]],
+    limit: int,
+    offset: int
+) -> Dict[str, Any]:
+    """
+    Ranked page of matching events with totals and facet counts
+    
+    Raises:
+        ValueError: if there is nothing to search for
+    """
+    expression = match_expression(query, filters)
+    if expression is None:
+        raise ValueError("Provide q or at least one of: " + ", ".join(FACETS))
+    where, params = _filter_sql(filters)
+    
+    cursor.execute(f"""
+        SELECT {", ".join("e." + column.strip() for column in EVENT_COLUMNS.split(","))},
+               bm25(audit_events_fts) AS score,
+               snippet(audit_events_fts, 0, '[', ']', '...', 16) AS snippet
+        FROM audit_events_fts
+        JOIN audit_events e ON e.id = audit_events_fts.rowid
+        WHERE audit_events_fts MATCH ?{where}
+        ORDER BY score
+        LIMIT ? OFFSET ?
+    """, [expression] + params + [limit, offset])
+    hits = cursor.fetchall()
+    
+    # One pass over the (capped) match set yields the total and every facet
+    cursor.execute(f"""
+        SELECT {", ".join("e." + facet for facet in FACETS)}, COUNT(*) AS hits
+        FROM (
+            SELECT rowid
+            FROM audit_events_fts
+            WHERE audit_events_fts MATCH ?
+            ORDER BY rowid DESC
+            LIMIT ?
+        ) m
+        JOIN audit_events e ON e.id = m.rowid
+        WHERE 1 = 1{where}
+        GROUP BY {", ".join("e." + facet for facet in FACETS)}
+    """, [expression, SEARCH_FACET_SCAN_LIMIT] + params)
+    groups = cursor.fetchall()
+    
+    total = 0
+    counts: Dict[str, Dict[Optional[str], int]] = {facet: {} for facet in FACETS}
+    for group in groups:
+        total += group["hits"]
+        for facet in FACETS:
+            counts[facet][group[facet]] = counts[facet].get(group[facet], 0) + group["hits"]
+    
+    # Reads only the index
+    cursor.execute("""
+        SELECT COUNT(*) AS candidates
+        FROM (SELECT rowid FROM audit_events_fts WHERE audit_events_fts MATCH ? LIMIT ?)
+    """, (expression, SEARCH_FACET_SCAN_LIMIT + 1))
+    capped = cursor.fetchone()["candidates"] > SEARCH_FACET_SCAN_LIMIT
+    
+    return {
+        "match": expression,
+        "hits": hits,
+        "total": total,
+        "total_is_estimate": capped,
+        "facets": {
+            facet: [
+                {"value": value, "count": count}
+                for value, count in sorted(values.items(), key=lambda item: -item[1])[:SEARCH_FACET_SIZE]
+            ]
+            for facet, values in counts.items()
+        },
+    }
@@ -0,0 +1,81 @@
+"""
+Serialization service - Stored rows straight to JSON responses
+
+Response models still document endpoints in OpenAPI, but returning a model
+per row makes FastAPI build, validate and re-serialize every object. A
+RowSerializer is compiled once per response model and column layout: one
+positional itemgetter pulls the model's fields out of a row in schema order,
+and the resulting dicts are encoded by orjson when it is installed, or by the
+standard json module.
+"""
+from operator import itemgetter
+from typing import Any, Callable, Dict, List, Mapping, Optional, Sequence, Tuple, Type
+from fastapi.responses import JSONResponse
+from pydantic import BaseModel
+
+try:
+    import orjson
+    from fastapi.responses import ORJSONResponse
+    ORJSON_AVAILABLE = True
+except ImportError:
+    ORJSON_AVAILABLE = False
+
+
+class RowSerializer:
+    """Column-to-field mapping of one response model, for rows whose columns are named like its fields"""
+    
+    def __init__(self, model: Type[BaseModel], defaults: Optional[Mapping[str, Any]] = None):
+        self.fields = tuple(model.model_fields)
+        self._by_name = self._compile(self.fields)
+        # Positional getters per result column layout; sqlite3.Row name lookups are slow
+        self._by_position: Dict[Tuple[str, ...], Callable] = {}
+        # Fields whose NULL column reads as a fixed value, e.g. status -> "Pending"
+        self._defaults = tuple((defaults or {}).items())
+    
+    @staticmethod
+    def _compile(keys: Tuple[Any, ...]) -> Callable:
+        getter = itemgetter(*keys)
+        return getter if len(keys) > 1 else lambda row: (getter(row),)
+    
+    def _getter(self, row: Mapping[str, Any]) -> Callable:
+        if isinstance(row, dict):
+            return self._by_name
+        
+        columns = tuple(row.keys())
+        getter = self._by_position.get(columns)
+        if getter is None:
+            getter = self._compile(tuple(columns.index(field) for field in self.fields))
+            self._by_position[columns] = getter
+        return getter
+    
+    def _to_dict(self, getter: Callable, row: Mapping[str, Any]) -> Dict[str, Any]:
+        item = dict(zip(self.fields, getter(row)))
+        for field, value in self._defaults:
+            if item[field] is None:
+                item[field] = value
+        return item
+    
+    def to_dict(self, row: Mapping[str, Any]) -> Dict[str, Any]:
+        return self._to_dict(self._getter(row), row)
+    
+    def to_list(self, rows: Sequence[Mapping[str, Any]]) -> List[Dict[str, Any]]:
+        """Rows of one result set, which share a column layout"""
+        if not rows:
+            return []
+        getter = self._getter(rows[0])
+        return [self._to_dict(getter, row) for row in rows]
+    
+    def response(self, row: Mapping[str, Any], status_code: int = 200) -> JSONResponse:
+        """Response for one row, bypassing response_model validation"""
+        return json_response(self.to_dict(row), status_code)
+    
+    def list_response(self, rows: Sequence[Mapping[str, Any]], status_code: int = 200) -> JSONResponse:
+        """Response for a list of rows, bypassing response_model validation"""
+        return json_response(self.to_list(rows), status_code)
+
+
+def json_response(content: Any, status_code: int = 200) -> JSONResponse:
+    """ORJSONResponse when orjson is installed, else JSONResponse"""
+    if ORJSON_AVAILABLE:
+        return ORJSONResponse(content, status_code=status_code)
+    return JSONResponse(content, status_code=status_code)
@@ -0,0 +1,466 @@
+"""
+Simulated chain - In-process, deterministic stand-in for an anchoring chain
+
+Mines blocks with EIP-1559 base fees, keeps a mempool with per-sender nonces
+and an AuditAnchor contract state, and answers the JSON-RPC reads the
+service uses (head, blocks, receipts, fee history, nonces). Failure
+behaviour is configurable so anchoring throughput and recovery can be
+load-tested offline:
+
+    SIM_BLOCK_TIME          seconds per block; 0 runs on virtual time, mining
+                            one block per head read or receipt poll
+    SIM_INCLUSION_BLOCKS    blocks a transaction waits before it can be mined
+    SIM_INCLUSION_JITTER    up to this many extra blocks, at random
+    SIM_DROP_RATE           chance a transaction is evicted instead of mined
+    SIM_NONCE_ERROR_RATE    chance a submission is rejected with a nonce error
+    SIM_REORG_RATE          chance per block of a reorg before it is mined
+    SIM_REORG_DEPTH         maximum number of blocks a reorg replaces
+
+Every random choice comes from one generator seeded with SIM_CHAIN_SEED, so
+the same sequence of calls replays the same chain.
+"""
+import hashlib
+import os
+import random
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, List, Mapping, Optional, Sequence, Tuple
+from app.services.chain_backend import (
+    ROOT_ANCHORED_SIGNATURE, ChainBackend, NonceError, TransactionDropped, logged_anchor_id
+)
+from app.services.rpc_pool import RpcError
+
+SIM_CHAIN_SEED = int(os.getenv("SIM_CHAIN_SEED", "0"))
+SIM_BLOCK_TIME = float(os.getenv("SIM_BLOCK_TIME", "0"))
+SIM_INCLUSION_BLOCKS = int(os.getenv("SIM_INCLUSION_BLOCKS", "1"))
+SIM_INCLUSION_JITTER = int(os.getenv("SIM_INCLUSION_JITTER", "0"))
+SIM_DROP_RATE = float(os.getenv("SIM_DROP_RATE", "0"))
+SIM_NONCE_ERROR_RATE = float(os.getenv("SIM_NONCE_ERROR_RATE", "0"))
+SIM_REORG_RATE = float(os.getenv("SIM_REORG_RATE", "0"))
+SIM_REORG_DEPTH = int(os.getenv("SIM_REORG_DEPTH", "2"))
+SIM_BASE_FEE_GWEI = float(os.getenv("SIM_BASE_FEE_GWEI", "20"))
+
+GWEI = 10 ** 9
+ANCHOR_GAS = 48000
+PRIORITY_FEE = 1 * GWEI
+# Blocks kept for eth_getBlockByNumber; older ones are pruned
+KEPT_BLOCKS = 4096
+SUBMITTER = "0x" + "51" * 20
+CONTRACT = "0x" + "a4" * 20
+
+
+def _sha(*parts: Any) -> str:
+    return "0x" + hashlib.sha256(":".join(str(part) for part in parts).encode()).hexdigest()
+
+
+# Stands in for the keccak topic of the event
+ROOT_ANCHORED_TOPIC = _sha(ROOT_ANCHORED_SIGNATURE)
+
+
+class SimulatedChain(ChainBackend):
+    """Deterministic in-memory chain with configurable latency and failures"""
+    
+    simulated = True
+    
+    def __init__(
+        self,
+        chain_id: int,
+        ledger_next_anchor_id: Callable[[], int] = lambda: 1,
+        seed: int = SIM_CHAIN_SEED,
+        block_time: float = SIM_BLOCK_TIME,
+        inclusion_blocks: int = SIM_INCLUSION_BLOCKS,
+        inclusion_jitter: int = SIM_INCLUSION_JITTER,
+        drop_rate: float = SIM_DROP_RATE,
+        nonce_error_rate: float = SIM_NONCE_ERROR_RATE,
+        reorg_rate: float = SIM_REORG_RATE,
+        reorg_depth: int = SIM_REORG_DEPTH
+    ):
+        self.chain_id = chain_id
+        self.seed = seed
+        self.block_time = block_time
+        self.inclusion_blocks = inclusion_blocks
+        self.inclusion_jitter = inclusion_jitter
+        self.drop_rate = drop_rate
+        self.nonce_error_rate = nonce_error_rate
+        self.reorg_rate = reorg_rate
+        self.reorg_depth = reorg_depth
+        
+        self._rng = random.Random(seed)
+        self._lock = threading.RLock()
+        self._fork = 0
+        self._started = time.monotonic()
+        self._genesis_time = int(time.time())
+        
+        genesis = self._new_block(0, "0x" + "0" * 64, int(SIM_BASE_FEE_GWEI * GWEI))
+        self._blocks: "OrderedDict[int, Dict[str, Any]]" = OrderedDict([(0, genesis)])
+        self._head = 0
+        # tx hash -> submitted transaction, while pending
+        self._mempool: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        # tx hash -> receipt fields, once mined on the canonical chain
+        self._mined: Dict[str, Dict[str, Any]] = {}
+        self._dropped: set = set()
+        self._confirmed_nonces: Dict[str, int] = {}
+        # Contract state: anchor id -> (merkle root, timestamp, tx hash)
+        self._anchors: Dict[int, Tuple[bytes, int, str]] = {}
+        # Next free anchor id in the ledger; other workers anchor into it too
+        self._ledger_next_anchor_id = ledger_next_anchor_id
+        self._next_anchor_id: Optional[int] = None
+        
+        self.counters = {"transactions": 0, "mined": 0, "dropped": 0, "nonce_errors": 0, "reorgs": 0, "orphaned": 0}
+    
+    # Block production
+    
+    def _new_block(self, number: int, parent_hash: str, base_fee: int) -> Dict[str, Any]:
+        return {
+            "number": number,
+            "hash": _sha(self.seed, self._fork, number, parent_hash),
+            "parent_hash": parent_hash,
+            "timestamp": self._genesis_time + int(number * (self.block_time or 1)),
+            "base_fee": base_fee,
+            "transactions": [],
+            "gas_used": 0
+        }
+    
+    def _catch_up(self) -> None:
+        """Mine the blocks that are due by wall-clock time (real-time mode only)"""
+        if self.block_time > 0:
+            due = int((time.monotonic() - self._started) / self.block_time)
+            while self._head < due:
+                self._mine_block()
+    
+    def _tick(self) -> None:
+        """Advance the chain for a head read or receipt poll"""
+        if self.block_time > 0:
+            self._catch_up()
+        else:
+            self._mine_block()
+    
+    def _mine_block(self) -> None:
+        if self.reorg_rate and self._head > self.reorg_depth and self._rng.random() < self.reorg_rate:
+            self._reorg(self._rng.randint(1, self.reorg_depth))
+        
+        parent = self._blocks[self._head]
+        # Base fee moves by at most 12.5% per block, as under EIP-1559
+        base_fee = max(GWEI // 10, int(parent["base_fee"] * (1 + self._rng.uniform(-0.125, 0.125))))
+        block = self._new_block(self._head + 1, parent["hash"], base_fee)
+        self._include_transactions(block)
+        
+        self._head = block["number"]
+        self._blocks[self._head] = block
+        while len(self._blocks) > KEPT_BLOCKS:
+            self._blocks.popitem(last=False)
+    
+    def _include_transactions(self, block: Dict[str, Any]) -> None:
+        for tx_hash, tx in list(self._mempool.items()):
+            if tx_hash not in self._mempool:
+                continue  # Evicted along with a dropped transaction
+            if tx["include_at"] > block["number"]:
+                continue
+            if tx["nonce"] != self._confirmed_nonces.get(tx["sender"], 0):
+                continue  # Waiting for an earlier nonce
+            if tx["max_fee"] < block["base_fee"]:
+                continue  # Underpriced until the base fee drops
+            
+            del self._mempool[tx_hash]
+            if self._rng.random() < self.drop_rate:
+                self._drop(tx_hash, tx["sender"])
+                continue
+            
+            gas_used = min(ANCHOR_GAS, tx["gas_limit"])
+            succeeded = tx["gas_limit"] >= ANCHOR_GAS
+            anchor_id = None
+            if succeeded:
+                anchor_id = self._next_anchor_id
+                self._next_anchor_id += 1
+                self._anchors[anchor_id] = (tx["merkle_root"], block["timestamp"], tx_hash)
+            
+            self._confirmed_nonces[tx["sender"]] = tx["nonce"] + 1
+            block["transactions"].append(tx_hash)
+            block["gas_used"] += gas_used
+            self._mined[tx_hash] = {
+                "tx": tx,
+                "block_number": block["number"],
+                "block_hash": block["hash"],
+                "status": 1 if succeeded else 0,
+                "gas_used": gas_used,
+                "effective_gas_price": min(tx["max_fee"], block["base_fee"] + tx["priority_fee"]),
+                "anchor_id": anchor_id
+            }
+            self.counters["mined"] += 1
+    
+    def _drop(self, tx_hash: str, sender: str) -> None:
+        # Later nonces from the same sender can never be mined; evict them too
+        self._dropped.add(tx_hash)
+        self.counters["dropped"] += 1
+        for other_hash, other in list(self._mempool.items()):
+            if other["sender"] == sender:
+                del self._mempool[other_hash]
+                self._dropped.add(other_hash)
+                self.counters["dropped"] += 1
+    
+    def _reorg(self, depth: int) -> None:
+        """Replace the last depth blocks; their transactions return to the mempool"""
+        self.counters["reorgs"] += 1
+        self._fork += 1
+        orphaned: List[str] = []
+        for number in range(self._head, self._head - depth, -1):
+            block = self._blocks.pop(number)
+            orphaned = block["transactions"] + orphaned
+        self._head -= depth
+        
+        for tx_hash in reversed(orphaned):
+            receipt = self._mined.pop(tx_hash)
+            tx = receipt["tx"]
+            if receipt["anchor_id"] is not None:
+                del self._anchors[receipt["anchor_id"]]
+                self._next_anchor_id -= 1
+            self._confirmed_nonces[tx["sender"]] = tx["nonce"]
+            tx["include_at"] = self._head + 1
+            self._mempool[tx_hash] = tx
+            self._mempool.move_to_end(tx_hash, last=False)
+        self.counters["orphaned"] += len(orphaned)
+        
+        # The new branch must end up longer than the one it replaces
+        for _ in range(depth):
+            self._mine_block_without_reorg()
+    
+    def _mine_block_without_reorg(self) -> None:
+        reorg_rate, self.reorg_rate = self.reorg_rate, 0.0
+        try:
+            self._mine_block()
+        finally:
+            self.reorg_rate = reorg_rate
+    
+    def mine(self, blocks: int = 1) -> int:
+        """Mine blocks immediately (load tests, virtual time); returns the new head"""
+        with self._lock:
+            for _ in range(blocks):
+                self._mine_block()
+            return self._head
+    
+    # JSON-RPC reads
+    
+    def _block_number(self, tag: Any) -> int:
+        if tag in ("latest", "pending", "safe", "finalized", None):
+            return self._head
+        if tag == "earliest":
+            return 0
+        return int(tag, 16) if isinstance(tag, str) else int(tag)
+    
+    def _block_json(self, block: Optional[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+        if block is None:
+            return None
+        return {
+            "number": hex(block["number"]),
+            "hash": block["hash"],
+            "parentHash": block["parent_hash"],
+            "timestamp": hex(block["timestamp"]),
+            "baseFeePerGas": hex(block["base_fee"]),
+            "gasUsed": hex(block["gas_used"]),
+            "transactions": list(block["transactions"])
+        }
+    
+    def _receipt_json(self, tx_hash: str) -> Optional[Dict[str, Any]]:
+        receipt = self._mined.get(tx_hash)
+        if receipt is None:
+            return None
+        logs = []
+        if receipt["anchor_id"] is not None:
+            logs.append({
+                "address": CONTRACT,
+                "topics": [
+                    ROOT_ANCHORED_TOPIC,
+                    "0x%064x" % receipt["anchor_id"],
+                    "0x" + receipt["tx"]["merkle_root"].hex()
+                ],
+                "blockNumber": hex(receipt["block_number"]),
+                "transactionHash": tx_hash
+            })
+        return {
+            "transactionHash": tx_hash,
+            "blockNumber": hex(receipt["block_number"]),
+            "blockHash": receipt["block_hash"],
+            "status": hex(receipt["status"]),
+            "gasUsed": hex(receipt["gas_used"]),
+            "effectiveGasPrice": hex(receipt["effective_gas_price"]),
+            "from": receipt["tx"]["sender"],
+            "logs": logs
+        }
+    
+    def _pending_nonce(self, sender: str) -> int:
+        nonce = self._confirmed_nonces.get(sender, 0)
+        pending = {tx["nonce"] for tx in self._mempool.values() if tx["sender"] == sender}
+        while nonce in pending:
+            nonce += 1
+        return nonce
+    
+    def _fee_history(self, count: int, newest: int) -> Dict[str, Any]:
+        newest = min(newest, self._head)
+        oldest = max(min(self._blocks), newest - count + 1)
+        blocks = [self._blocks[number] for number in range(oldest, newest + 1)]
+        next_base_fee = blocks[-1]["base_fee"]
+        return {
+            "oldestBlock": hex(oldest),
+            "baseFeePerGas": [hex(block["base_fee"]) for block in blocks] + [hex(next_base_fee)],
+            "gasUsedRatio": [block["gas_used"] / 30_000_000 for block in blocks],
+            "reward": [[hex(PRIORITY_FEE)] for _ in blocks]
+        }
+    
+    def call(self, method: str, params: Sequence[Any] = ()) -> Any:
+        params = list(params)
+        with self._lock:
+            if method == "eth_blockNumber":
+                self._tick()
+                return hex(self._head)
+            
+            self._catch_up()
+            if method == "eth_chainId":
+                return hex(self.chain_id)
+            if method == "eth_getBlockByNumber":
+                return self._block_json(self._blocks.get(self._block_number(params[0])))
+            if method == "eth_getBlockByHash":
+                return self._block_json(next((b for b in self._blocks.values() if b["hash"] == params[0]), None))
+            if method == "eth_getTransactionReceipt":
+                return self._receipt_json(params[0])
+            if method == "eth_getTransactionCount":
+                sender = params[0]
+                if len(params) > 1 and params[1] == "pending":
+                    return hex(self._pending_nonce(sender))
+                return hex(self._confirmed_nonces.get(sender, 0))
+            if method == "eth_gasPrice":
+                return hex(self._blocks[self._head]["base_fee"] + PRIORITY_FEE)
+            if method == "eth_maxPriorityFeePerGas":
+                return hex(PRIORITY_FEE)
+            if method == "eth_feeHistory":
+                return self._fee_history(self._block_number(params[0]), self._block_number(params[1]))
+            if method == "eth_estimateGas":
+                return hex(ANCHOR_GAS)
+        raise RpcError(-32601, f"Method {method} not supported by the simulated chain")
+    
+    def batch(self, calls: Sequence[Tuple[str, Sequence[Any]]]) -> List[Any]:
+        results = []
+        for method, params in calls:
+            try:
+                results.append(self.call(method, params))
+            except RpcError as e:
+                results.append(e)
+        return results
+    
+    def probe(self) -> bool:
+        return True
+    
+    # Anchoring
+    
+    def check_configured(self) -> None:
+        pass
+    
+    def account_address(self) -> str:
+        return SUBMITTER
+    
+    def estimate_anchor_gas(self, merkle_root: bytes) -> int:
+        return ANCHOR_GAS
+    
+    def send_anchor(self, merkle_root: bytes, nonce: int, gas_limit: int, fees: Mapping[str, int]) -> str:
+        with self._lock:
+            self._catch_up()
+            # Re-read on every send: while another worker led it may have
+            # recorded anchors past the ids counted here
+            self._next_anchor_id = max(self._next_anchor_id or 0, self._ledger_next_anchor_id())
+            
+            sender = self.account_address()
+            expected = self._pending_nonce(sender)
+            if nonce != expected or self._rng.random() < self.nonce_error_rate:
+                self.counters["nonce_errors"] += 1
+                raise NonceError(f"nonce too {'high' if nonce > expected else 'low'}: next nonce {expected}, tx nonce {nonce}")
+            
+            if "maxFeePerGas" in fees:
+                max_fee = fees["maxFeePerGas"]
+                priority_fee = min(fees.get("maxPriorityFeePerGas", 0), max_fee)
+            else:
+                max_fee = priority_fee = fees["gasPrice"]
+            
+            tx_hash = _sha(self.seed, sender, nonce, merkle_root.hex())
+            delay = self.inclusion_blocks + (self._rng.randint(0, self.inclusion_jitter) if self.inclusion_jitter else 0)
+            self._mempool[tx_hash] = {
+                "sender": sender,
+                "nonce": nonce,
+                "merkle_root": merkle_root,
+                "gas_limit": gas_limit,
+                "max_fee": max_fee,
+                "priority_fee": priority_fee,
+                "include_at": self._head + max(delay, 1)
+            }
+            self._dropped.discard(tx_hash)
+            self.counters["transactions"] += 1
+            return tx_hash
+    
+    def wait_for_receipt(self, tx_hash: str, timeout: float) -> Dict[str, Any]:
+        # In virtual time each poll mines a block, and timeout counts blocks
+        polls = int(timeout) if self.block_time <= 0 else None
+        deadline = time.monotonic() + timeout
+        while True:
+            with self._lock:
+                self._catch_up()
+                receipt = self._mined.get(tx_hash)
+                if receipt is not None:
+                    return {
+                        "status": receipt["status"],
+                        "block_number": receipt["block_number"],
+                        "block_hash": receipt["block_hash"],
+                        "transaction_hash": tx_hash,
+                        "gas_used": receipt["gas_used"],
+                        "effective_gas_price": receipt["effective_gas_price"],
+                        "anchor_id": receipt["anchor_id"]
+                    }
+                if tx_hash in self._dropped or tx_hash not in self._mempool:
+                    raise TransactionDropped(f"Transaction {tx_hash} was dropped from the mempool")
+                
+                if polls is not None:
+                    if polls <= 0:
+                        raise TimeoutError(f"Transaction {tx_hash} not mined within {timeout} blocks")
+                    polls -= 1
+                    self._mine_block()
+                    continue
+            
+            if time.monotonic() >= deadline:
+                raise TimeoutError(f"Transaction {tx_hash} not mined within {timeout} seconds")
+            time.sleep(min(self.block_time / 4, 0.25))
+    
+    def receipt_anchor_id(self, receipt: Mapping[str, Any]) -> Optional[int]:
+        return logged_anchor_id(receipt, CONTRACT, ROOT_ANCHORED_TOPIC)
+    
+    def anchor_count(self) -> int:
+        with self._lock:
+            return (self._next_anchor_id or 1) - 1
+    
+    def get_anchor(self, anchor_id: int) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            self._catch_up()
+            anchor = self._anchors.get(anchor_id)
+            if anchor is None:
+                # Mined by another worker or before this process started:
+                # only the ledger has it
+                return None
+        
+        merkle_root, timestamp, _ = anchor
+        return {
+            "merkle_root": "0x" + merkle_root.hex(),
+            "timestamp": timestamp,
+            "submitted_by": SUBMITTER,
+            "anchor_id": anchor_id
+        }
+    
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "head_block": self._head,
+                "base_fee": self._blocks[self._head]["base_fee"],
+                "pending": len(self._mempool),
+                "block_time": self.block_time,
+                "inclusion_blocks": self.inclusion_blocks,
+                "drop_rate": self.drop_rate,
+                "nonce_error_rate": self.nonce_error_rate,
+                "reorg_rate": self.reorg_rate,
+                **self.counters
+            }
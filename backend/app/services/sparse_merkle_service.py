@@ -0,0 +1,396 @@
+"""
+Sparse Merkle tree service - Per-model state index with inclusion proofs
+
+Every (model_id) and (model_id, event_type) key maps to a fixed leaf position
+in a 256-level sparse Merkle tree derived from the SHA-256 of the key. A leaf
+holds the hash of the latest event recorded for that key.
+
+Roots and proofs are those of the full 256-level tree, but it is stored
+compactly: a subtree holding one leaf is a single row (the leaf's key and
+event, hashed up to the subtree's root), and only nodes with leaves on both
+sides get a row of their own. An update therefore touches the O(log n) nodes
+above its leaf instead of all 256 levels.
+
+Sealing a batch records the state root and the tree version it belongs to.
+Later updates write the next version, first copying any node they replace
+into smt_node_history, so proofs stay available against every recorded root.
+"""
+import hashlib
+import json
+from typing import Callable, Dict, Iterable, List, NamedTuple, Optional, Set, Tuple
+from app.services.merkle_service import hash_pair
+
+TREE_DEPTH = 256
+EMPTY_LEAF = "0" * 64
+# Node ids per SELECT ... IN (...), under SQLite's bound parameter limit
+NODE_LOAD_CHUNK = 2048
+# model_state rows re-inserted per pass when the tree is rebuilt
+REBUILD_CHUNK = 10000
+
+NODE_COLUMNS = "node_id, version, hash, leaf_key, leaf_event_id, leaf_event_hash"
+
+def _compute_default_hashes() -> List[str]:
+    """
+    Hash of an empty subtree rooted at each depth (index 0 is the root)
+    """
+    defaults = [EMPTY_LEAF] * (TREE_DEPTH + 1)
+    for depth in range(TREE_DEPTH - 1, -1, -1):
+        defaults[depth] = hash_pair(defaults[depth + 1], defaults[depth + 1])
+    return defaults
+
+DEFAULT_HASHES = _compute_default_hashes()
+
+def state_key_hash(model_id: str, event_type: Optional[str] = None) -> str:
+    """
+    Position of a state key in the tree
+    """
+    key = json.dumps([model_id, event_type], separators=(',', ':'))
+    return hashlib.sha256(key.encode('utf-8')).hexdigest()
+
+def state_leaf_hash(key_hash: str, event_hash: str) -> str:
+    """
+    Leaf commitment binding the key to the latest event hash
+    """
+    return hash_pair(key_hash, event_hash)
+
+class Node(NamedTuple):
+    """A stored tree node; leaf_key is set when its subtree holds one leaf"""
+    hash: Optional[str]
+    leaf_key: Optional[str] = None
+    leaf_event_id: Optional[int] = None
+    leaf_event_hash: Optional[str] = None
+    version: Optional[int] = None
+
+def _node_id(depth: int, path: int) -> str:
+    return f"{depth}:{path:x}"
+
+def _prefix(key_int: int, depth: int) -> int:
+    return key_int >> (TREE_DEPTH - depth)
+
+def _common_depth(key_int: int, other_int: int) -> int:
+    """Depth of the deepest node whose subtree holds both keys"""
+    return TREE_DEPTH - (key_int ^ other_int).bit_length()
+
+def _single_leaf_hash(key_int: int, leaf_hash: str, depth: int) -> str:
+    """Root hash at depth of a subtree whose only leaf is key_int"""
+    node_hash = leaf_hash
+    for level in range(TREE_DEPTH, depth, -1):
+        if (key_int >> (TREE_DEPTH - level)) & 1:
+            node_hash = hash_pair(DEFAULT_HASHES[level], node_hash)
+        else:
+            node_hash = hash_pair(node_hash, DEFAULT_HASHES[level])
+    return node_hash
+
+def _leaf_node(key_hash: str, event_id: int, event_hash: str, depth: int) -> Node:
+    key_int = int(key_hash, 16)
+    return Node(
+        _single_leaf_hash(key_int, state_leaf_hash(key_hash, event_hash), depth),
+        key_hash, event_id, event_hash
+    )
+
+def _row_node(row) -> Node:
+    return Node(row["hash"], row["leaf_key"], row["leaf_event_id"], row["leaf_event_hash"], row["version"])
+
+def _load_nodes(cursor, node_ids: List[str]) -> Dict[str, Node]:
+    nodes = {}
+    for start in range(0, len(node_ids), NODE_LOAD_CHUNK):
+        chunk = node_ids[start:start + NODE_LOAD_CHUNK]
+        placeholders = ','.join('?' * len(chunk))
+        cursor.execute(f"""
+            SELECT {NODE_COLUMNS}
+            FROM smt_nodes
+            WHERE node_id IN ({placeholders})
+        """, chunk)
+        nodes.update((row["node_id"], _row_node(row)) for row in cursor.fetchall())
+    return nodes
+
+def _node_reader(cursor, version: Optional[int]) -> Callable[[str], Optional[Node]]:
+    """
+    Look up single nodes as of a recorded version (None for the current tree)
+    """
+    def read(node_id: str) -> Optional[Node]:
+        cursor.execute(f"SELECT {NODE_COLUMNS} FROM smt_nodes WHERE node_id = ?", (node_id,))
+        row = cursor.fetchone()
+        if row is None or version is None or row["version"] <= version:
+            return _row_node(row) if row else None
+        
+        # Rewritten since: the history holds the node as it was then, and a
+        # node with no earlier copy did not exist yet
+        cursor.execute(f"""
+            SELECT {NODE_COLUMNS}
+            FROM smt_node_history
+            WHERE node_id = ? AND version <= ?
+            ORDER BY version DESC
+            LIMIT 1
+        """, (node_id, version))
+        row = cursor.fetchone()
+        return _row_node(row) if row else None
+    
+    return read
+
+def open_state_version(cursor) -> int:
+    """
+    Version current tree updates are written to: one past the latest version
+    recorded on a sealed batch
+    """
+    cursor.execute("SELECT COALESCE(MAX(state_version), 0) + 1 as version FROM merkle_batches")
+    return cursor.fetchone()["version"]
+
+def get_state_root(cursor, version: Optional[int] = None) -> str:
+    """
+    Root of the model state tree, current or as of a recorded version
+    """
+    root = _node_reader(cursor, version)(_node_id(0, 0))
+    return root.hash if root else DEFAULT_HASHES[0]
+
+def get_state_checkpoint(cursor) -> Tuple[str, int]:
+    """
+    Current root and its version, to record on a batch being sealed
+    
+    Must run in the sealing transaction: once the batch row records the
+    version, later updates copy what they overwrite into the history.
+    """
+    return get_state_root(cursor), open_state_version(cursor)
+
+def _set_leaves(cursor, leaves: Dict[str, Tuple[int, str]]) -> str:
+    """
+    Write leaves (key_hash -> (event_id, event_hash)) and recompute the
+    nodes above them
+    
+    Stored nodes along the keys' paths are read level by level, for all keys
+    at once, down to where each path leaves the stored branching nodes. Keys
+    are then placed in memory, splitting a single-leaf subtree when a second
+    key lands in it, and changed branching nodes are rehashed deepest first.
+    
+    Returns:
+        New state root
+    """
+    keys = {key_hash: int(key_hash, 16) for key_hash in leaves}
+    nodes: Dict[str, Optional[Node]] = {}
+    
+    # Read phase: each path node and its sibling, while the path branches
+    descending = set(keys.values())
+    depth = 0
+    while descending:
+        wanted = set()
+        for key_int in descending:
+            path = _prefix(key_int, depth)
+            wanted.add(_node_id(depth, path))
+            if depth:
+                wanted.add(_node_id(depth, path ^ 1))
+        missing = sorted(wanted - nodes.keys())
+        loaded = _load_nodes(cursor, missing)
+        nodes.update((node_id, loaded.get(node_id)) for node_id in missing)
+        
+        descending = {
+            key_int for key_int in descending
+            if (node := nodes[_node_id(depth, _prefix(key_int, depth))]) is not None and node.leaf_key is None
+        }
+        depth += 1
+    
+    # Placement: anything not read lies below a single-leaf or empty subtree
+    # of the stored tree, so it is either placed here or empty
+    branches: Set[Tuple[int, int]] = set()
+    changed: Set[str] = set()
+    
+    def place(node_id: str, node: Node) -> None:
+        # Keep the stored version, which decides whether history is written
+        previous = nodes.get(node_id)
+        nodes[node_id] = node._replace(version=previous.version if previous else None)
+        changed.add(node_id)
+    
+    for key_hash, (event_id, event_hash) in leaves.items():
+        key_int = keys[key_hash]
+        depth = 0
+        while True:
+            node_id = _node_id(depth, _prefix(key_int, depth))
+            node = nodes.get(node_id)
+            if node is not None and node.leaf_key is None:
+                branches.add((depth, _prefix(key_int, depth)))
+                depth += 1
+                continue
+            
+            if node is None or node.leaf_key == key_hash:
+                place(node_id, _leaf_node(key_hash, event_id, event_hash, depth))
+                break
+            
+            # Another key's single-leaf subtree: branch down to where the
+            # two paths part and hang both leaves there
+            other_int = int(node.leaf_key, 16)
+            split_depth = _common_depth(key_int, other_int)
+            for level in range(depth, split_depth + 1):
+                place(_node_id(level, _prefix(key_int, level)), Node(None))
+                branches.add((level, _prefix(key_int, level)))
+            place(
+                _node_id(split_depth + 1, _prefix(other_int, split_depth + 1)),
+                _leaf_node(node.leaf_key, node.leaf_event_id, node.leaf_event_hash, split_depth + 1)
+            )
+            place(
+                _node_id(split_depth + 1, _prefix(key_int, split_depth + 1)),
+                _leaf_node(key_hash, event_id, event_hash, split_depth + 1)
+            )
+            break
+    
+    for depth, path in sorted(branches, reverse=True):
+        children = []
+        for child in (path << 1, (path << 1) | 1):
+            node = nodes.get(_node_id(depth + 1, child))
+            children.append(node.hash if node is not None else DEFAULT_HASHES[depth + 1])
+        node_id = _node_id(depth, path)
+        place(node_id, nodes[node_id]._replace(hash=hash_pair(*children)))
+    
+    # Nodes last written before the newest recorded version are still part
+    # of that version: keep a copy before overwriting them
+    version = open_state_version(cursor)
+    cursor.executemany(f"""
+        INSERT INTO smt_node_history ({NODE_COLUMNS})
+        SELECT {NODE_COLUMNS} FROM smt_nodes WHERE node_id = ? AND version < ?
+        ON CONFLICT DO NOTHING
+    """, [
+        (node_id, version) for node_id in changed
+        if nodes[node_id].version is not None and nodes[node_id].version < version
+    ])
+    cursor.executemany(f"""
+        INSERT INTO smt_nodes ({NODE_COLUMNS}) VALUES (?, ?, ?, ?, ?, ?)
+        ON CONFLICT(node_id) DO UPDATE SET
+            version = excluded.version,
+            hash = excluded.hash,
+            leaf_key = excluded.leaf_key,
+            leaf_event_id = excluded.leaf_event_id,
+            leaf_event_hash = excluded.leaf_event_hash
+    """, [
+        (node_id, version, node.hash, node.leaf_key, node.leaf_event_id, node.leaf_event_hash)
+        for node_id, node in ((node_id, nodes[node_id]) for node_id in changed)
+    ])
+    
+    return nodes[_node_id(0, 0)].hash
+
+def update_model_states(cursor, events: Iterable[Tuple[str, str, int, str]]) -> str:
+    """
+    Record events, in order, as the latest for their model and their
+    (model, event_type) key
+    
+    Must run inside the transaction that inserts the events so the tree and
+    the event table cannot drift apart.
+    
+    Args:
+        events: (model_id, event_type, event_id, event_hash) per event
+    
+    Returns:
+        New state root
+    """
+    # Later events replace earlier ones for the same key
+    latest: Dict[str, Tuple[str, Optional[str], int, str]] = {}
+    for model_id, event_type, event_id, event_hash in events:
+        for key_event_type in (None, event_type):
+            latest[state_key_hash(model_id, key_event_type)] = (model_id, key_event_type, event_id, event_hash)
+    
+    cursor.executemany("""
+        INSERT INTO model_state (key_hash, model_id, event_type, event_id, event_hash)
+        VALUES (?, ?, ?, ?, ?)
+        ON CONFLICT(key_hash) DO UPDATE SET
+            event_id = excluded.event_id,
+            event_hash = excluded.event_hash,
+            updated_at = CURRENT_TIMESTAMP
+    """, [(key_hash, *state) for key_hash, state in latest.items()])
+    
+    return _set_leaves(cursor, {
+        key_hash: (state[2], state[3]) for key_hash, state in latest.items()
+    })
+
+def update_model_state(cursor, model_id: str, event_type: str, event_id: int, event_hash: str) -> str:
+    """
+    Record an event as the latest for its model and its (model, event_type) key
+    
+    Must run inside the transaction that inserts the event so the tree and
+    the event table cannot drift apart.
+    
+    Returns:
+        New state root
+    """
+    return update_model_states(cursor, [(model_id, event_type, event_id, event_hash)])
+
+def rebuild_state_tree(cursor) -> str:
+    """
+    Rebuild the tree from model_state, as version 1 of an empty tree
+    
+    Returns:
+        State root
+    """
+    cursor.execute("DELETE FROM smt_nodes")
+    cursor.execute("DELETE FROM smt_node_history")
+    cursor.execute("SELECT key_hash, event_id, event_hash FROM model_state ORDER BY key_hash")
+    
+    root = DEFAULT_HASHES[0]
+    while True:
+        rows = cursor.fetchmany(REBUILD_CHUNK)
+        if not rows:
+            return root
+        # _set_leaves reuses the cursor, so the remaining rows are read by key
+        root = _set_leaves(cursor, {row["key_hash"]: (row["event_id"], row["event_hash"]) for row in rows})
+        cursor.execute("""
+            SELECT key_hash, event_id, event_hash FROM model_state
+            WHERE key_hash > ?
+            ORDER BY key_hash
+        """, (rows[-1]["key_hash"],))
+
+def get_state_proof(cursor, key_hash: str, version: Optional[int] = None) -> Tuple[Dict[int, str], Optional[Node]]:
+    """
+    Non-default siblings along a key's path, keyed by depth, and the key's
+    leaf (None when the key is absent)
+    
+    The same proof shape serves inclusion (leaf present) and non-inclusion
+    (leaf empty) checks. With a version, both are as of the root recorded
+    for that version.
+    """
+    read = _node_reader(cursor, version)
+    key_int = int(key_hash, 16)
+    proof = {}
+    depth = 0
+    
+    while True:
+        node = read(_node_id(depth, _prefix(key_int, depth)))
+        if node is None:
+            return proof, None
+        if node.leaf_key == key_hash:
+            return proof, node
+        
+        if node.leaf_key is not None:
+            # Another key's single-leaf subtree: its leaf is the only
+            # non-default sibling, where the two paths part
+            other_int = int(node.leaf_key, 16)
+            split_depth = _common_depth(key_int, other_int)
+            proof[split_depth + 1] = _single_leaf_hash(
+                other_int, state_leaf_hash(node.leaf_key, node.leaf_event_hash), split_depth + 1
+            )
+            return proof, None
+        
+        depth += 1
+        sibling = read(_node_id(depth, _prefix(key_int, depth) ^ 1))
+        if sibling is not None:
+            proof[depth] = sibling.hash
+
+def verify_state_proof(key_hash: str, event_hash: Optional[str], proof: Dict[int, str], state_root: str) -> bool:
+    """
+    Verify an inclusion (event_hash given) or non-inclusion (None) proof
+    
+    Args:
+        key_hash: Position of the key, see state_key_hash
+        event_hash: Latest event hash claimed for the key, or None if absent
+        proof: Non-default siblings keyed by depth
+        state_root: Expected tree root
+    
+    Returns:
+        True if the proof rebuilds the expected root
+    """
+    key_int = int(key_hash, 16)
+    current_hash = state_leaf_hash(key_hash, event_hash) if event_hash else EMPTY_LEAF
+    
+    for depth in range(TREE_DEPTH, 0, -1):
+        sibling_hash = proof.get(depth, DEFAULT_HASHES[depth])
+        if (key_int >> (TREE_DEPTH - depth)) & 1:
+            current_hash = hash_pair(sibling_hash, current_hash)
+        else:
+            current_hash = hash_pair(current_hash, sibling_hash)
+    
+    return current_hash == state_root
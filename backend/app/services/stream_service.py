@@ -0,0 +1,200 @@
+"""
+Stream service - In-process pub/sub feeding GET /stream
+
+Ingest, batch sealing and anchoring publish a message whenever the ledger
+changes, so dashboards follow it live instead of polling the list endpoints.
+Every message gets the next offset of this process, stamped with the
+process epoch ("<epoch>-<n>"). The last STREAM_BUFFER_SIZE messages are
+kept, so a client that reconnects with the last offset it saw (SSE
+Last-Event-ID) receives what it missed first.
+
+The hub lives in one process: it only sees the changes written through that
+process, and its offsets mean nothing to another. Serve the stream from a
+single worker (or pin stream clients to one). An offset from another
+worker, or from before a restart, carries a different epoch and is answered
+with stream.reset and the whole replay buffer instead of being misread.
+
+Subscribers get a bounded queue on their own event loop. Publishing never
+blocks: a subscriber that falls STREAM_SUBSCRIBER_QUEUE messages behind is
+told it lagged and closed, and resumes from its offset like any reconnect.
+"""
+import os
+import uuid
+import asyncio
+import threading
+from collections import deque
+from typing import Any, Deque, Dict, FrozenSet, List, Optional, Set, Tuple
+
+STREAM_BUFFER_SIZE = int(os.getenv("STREAM_BUFFER_SIZE", "10000"))
+STREAM_SUBSCRIBER_QUEUE = int(os.getenv("STREAM_SUBSCRIBER_QUEUE", "1000"))
+STREAM_HEARTBEAT_SECONDS = float(os.getenv("STREAM_HEARTBEAT_SECONDS", "15"))
+
+EVENT_CREATED = "event.created"
+BATCH_SEALED = "batch.sealed"
+BATCH_ANCHORED = "batch.anchored"
+ANCHOR_FINALIZED = "anchor.finalized"
+ANCHOR_ORPHANED = "anchor.orphaned"
+MESSAGE_TYPES = (EVENT_CREATED, BATCH_SEALED, BATCH_ANCHORED, ANCHOR_FINALIZED, ANCHOR_ORPHANED)
+
+# Control messages carry no offset
+STREAM_GAP = "stream.gap"
+STREAM_RESET = "stream.reset"
+STREAM_LAGGED = "stream.lagged"
+
+# (offset id, type, data)
+Message = Tuple[Optional[str], str, Dict[str, Any]]
+
+
+class Subscription:
+    """One subscriber's queue of messages, filled from any thread"""
+    
+    def __init__(self, loop: asyncio.AbstractEventLoop, types: FrozenSet[str], capacity: int):
+        self.loop = loop
+        self.types = types
+        self.queue: "asyncio.Queue[Message]" = asyncio.Queue(capacity)
+        self.lagged = False
+        # Offset of the last message handed to the client
+        self.last_offset: Optional[str] = None
+    
+    def _deliver(self, message: Message) -> None:
+        # Runs on the subscriber's loop
+        if self.lagged:
+            return
+        try:
+            self.queue.put_nowait(message)
+        except asyncio.QueueFull:
+            self.lagged = True
+    
+    async def next(self, timeout: float) -> Optional[Message]:
+        """
+        The next message, None if none arrived within timeout, or a
+        stream.lagged message once the queue overflowed and has drained
+        """
+        if self.lagged and self.queue.empty():
+            return (None, STREAM_LAGGED, {"resume_after": self.last_offset})
+        try:
+            message = await asyncio.wait_for(self.queue.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+        if message[0] is not None:
+            self.last_offset = message[0]
+        return message
+
+
+class StreamHub:
+    """Offsets, replay buffer and subscribers of the ledger change stream"""
+    
+    def __init__(self, buffer_size: int):
+        # Tells this hub's offsets apart from another process's
+        self.epoch = uuid.uuid4().hex[:8]
+        self._buffer: Deque[Tuple[int, Message]] = deque(maxlen=buffer_size)
+        self._offset = 0
+        self._subscribers: Set[Subscription] = set()
+        self._lock = threading.Lock()
+        self.dropped_subscribers = 0
+    
+    def offset_id(self, offset: int) -> str:
+        return f"{self.epoch}-{offset}"
+    
+    def _parse_offset(self, offset_id: str) -> Optional[int]:
+        # None unless the id was stamped by this hub
+        epoch, _, offset = offset_id.rpartition("-")
+        if epoch != self.epoch or not offset.isdigit():
+            return None
+        return int(offset)
+    
+    def publish(self, message_type: str, data: Dict[str, Any]) -> str:
+        """Publish a message from any thread; returns its offset id"""
+        with self._lock:
+            self._offset += 1
+            message = (self.offset_id(self._offset), message_type, data)
+            self._buffer.append((self._offset, message))
+            # Scheduled under the lock so every subscriber sees offsets in order
+            for subscription in list(self._subscribers):
+                if subscription.types and message_type not in subscription.types:
+                    continue
+                try:
+                    subscription.loop.call_soon_threadsafe(subscription._deliver, message)
+                except RuntimeError:
+                    # Its event loop is gone
+                    self._subscribers.discard(subscription)
+                    self.dropped_subscribers += 1
+            return message[0]
+    
+    def subscribe(
+        self,
+        after: Optional[str] = None,
+        types: FrozenSet[str] = frozenset(),
+        capacity: int = STREAM_SUBSCRIBER_QUEUE
+    ) -> Tuple[Subscription, List[Message]]:
+        """
+        Register a subscriber on the running event loop
+        
+        Args:
+            after: Last offset id the client saw; buffered messages after
+                it are returned for replay. None starts with live messages only.
+            types: Message types to receive; empty for all
+        
+        Returns:
+            The subscription and the messages to send before live ones,
+            led by a stream.gap or stream.reset notice when the offset can
+            no longer be resumed exactly: stream.reset for an offset from
+            another process or epoch, which replays the whole buffer
+        """
+        subscription = Subscription(asyncio.get_running_loop(), types, capacity)
+        with self._lock:
+            backlog: List[Message] = []
+            if after is not None:
+                first = self._buffer[0][0] if self._buffer else self._offset + 1
+                resumed = self._parse_offset(after)
+                if resumed is None or resumed > self._offset:
+                    # Another worker's offsets, or this one's before a restart
+                    backlog.append((None, STREAM_RESET, {"epoch": self.epoch, "head": self.offset_id(self._offset)}))
+                    resumed = 0
+                elif resumed < first - 1:
+                    backlog.append((None, STREAM_GAP, {
+                        "missed_from": self.offset_id(resumed + 1), "resumed_from": self.offset_id(first)
+                    }))
+                backlog.extend(
+                    message for offset, message in self._buffer
+                    if offset > resumed and (not types or message[1] in types)
+                )
+            self._subscribers.add(subscription)
+        return subscription, backlog
+    
+    def unsubscribe(self, subscription: Subscription) -> None:
+        with self._lock:
+            self._subscribers.discard(subscription)
+            if subscription.lagged:
+                self.dropped_subscribers += 1
+    
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "epoch": self.epoch,
+                "head": self.offset_id(self._offset),
+                "buffered": len(self._buffer),
+                "first_buffered": self._buffer[0][1][0] if self._buffer else None,
+                "subscribers": len(self._subscribers),
+                "dropped_subscribers": self.dropped_subscribers,
+            }
+
+
+# Global instance
+_hub: Optional[StreamHub] = None
+
+
+def get_stream_hub() -> StreamHub:
+    """Get or create the stream hub"""
+    global _hub
+    if _hub is None:
+        _hub = StreamHub(STREAM_BUFFER_SIZE)
+    return _hub
+
+
+def publish(message_type: str, data: Dict[str, Any]) -> None:
+    """Publish a ledger change; never raises into the caller's write path"""
+    try:
+        get_stream_hub().publish(message_type, data)
+    except Exception as e:
+        print(f"Warning: Stream publish failed: {e}")
@@ -0,0 +1,227 @@
+"""
+Verification cache - Results of repeated event verifications
+
+Re-verifying a sealed event repeats the same work every time: re-hashing it,
+or fetching its anchor over RPC and comparing roots. Its outcome can only
+change if the stored records change, so successful results are kept under
+the stored state they were derived from (VerificationKey): the event's hash
+version, metadata_hash and a digest of its hashed fields, or the batch's
+Merkle and state roots and its anchor's id, block hash and confirmation
+status. A lookup passes the key
+read from the database now and a different key is a miss, so every worker
+notices an edited batch or a re-recorded anchor without being told.
+
+Only outcomes that cannot drift are stored: a matching event hash, and an
+on-chain root match once the anchor is final (the confirmation tracker
+stops watching final anchors, so nothing would reorganise them away).
+Failures are never cached. A verification that detects tampering (hash or
+root mismatch, a broken hash chain) drops the affected entries; as the
+tampered records need not be part of the key (a batch's events, the chain),
+the invalidation is also logged in the database and each worker applies the
+log before answering.
+
+With VERIFY_CACHE_PERSIST=1 entries are also written to verification_results
+and reloaded at startup, so a restart does not send every dashboard back to
+the chain.
+"""
+import os
+import json
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Mapping, NamedTuple, Optional, Tuple, Union
+from app.services.hashing_service import event_fields_digest, stored_hash_version
+from app.services.metrics_service import VERIFY_CACHE_LOOKUPS
+from app.storage import get_storage
+
+VERIFY_CACHE_SIZE = int(os.getenv("VERIFY_CACHE_SIZE", "100000"))
+VERIFY_CACHE_PERSIST = os.getenv("VERIFY_CACHE_PERSIST", "").lower() in ("1", "true", "yes")
+
+# What was verified
+EVENT_HASH = "event_hash"        # POST /verify by event_id
+ANCHORED_ROOT = "anchored_root"  # POST /blockchain/verify
+
+Subject = Union[int, str]
+
+
+class VerificationKey(NamedTuple):
+    event_id: Optional[int] = None
+    hash_version: Optional[int] = None
+    metadata_hash: Optional[str] = None
+    fields_digest: Optional[str] = None
+    batch_root: Optional[str] = None
+    state_root: Optional[str] = None
+    anchor_id: Optional[int] = None
+    block_hash: Optional[str] = None
+    confirmation_status: Optional[str] = None
+
+
+def event_key(row: Mapping[str, Any]) -> VerificationKey:
+    """Key of a stored event's hash verification"""
+    return VerificationKey(
+        event_id=row["id"],
+        hash_version=stored_hash_version(row),
+        metadata_hash=row["metadata_hash"],
+        fields_digest=event_fields_digest(row)
+    )
+
+
+class VerificationCache:
+    """LRU of verification results by (kind, event id or batch id)"""
+    
+    def __init__(self, capacity: int, persist: bool):
+        self.capacity = capacity
+        self.persist = persist
+        self.hits = 0
+        self.misses = 0
+        self.invalidated = 0
+        # (kind, subject) -> (key, batch_id, result)
+        self._entries: "OrderedDict[Tuple[str, Subject], Tuple[VerificationKey, Optional[str], Dict[str, Any]]]" = OrderedDict()
+        # Id of the last logged invalidation applied here; None until first read
+        self._synced: Optional[int] = None
+        self._lock = threading.Lock()
+    
+    def get(self, kind: str, subject: Subject, key: VerificationKey) -> Optional[Dict[str, Any]]:
+        """
+        The cached result for an event (or batch), None on a miss
+        
+        key is what the result would be derived from now; an entry stored
+        under another key is stale and dropped.
+        """
+        self._sync()
+        with self._lock:
+            entry = self._entries.get((kind, subject))
+            if entry is not None and entry[0] != key:
+                del self._entries[(kind, subject)]
+                self.invalidated += 1
+                entry = None
+            if entry is None:
+                self.misses += 1
+            else:
+                self._entries.move_to_end((kind, subject))
+                self.hits += 1
+        VERIFY_CACHE_LOOKUPS.inc(kind=kind, outcome="miss" if entry is None else "hit")
+        return None if entry is None else entry[2]
+    
+    def put(
+        self,
+        kind: str,
+        subject: Subject,
+        key: VerificationKey,
+        result: Dict[str, Any],
+        batch_id: Optional[str] = None
+    ) -> None:
+        """Cache a successful result"""
+        self._sync()
+        with self._lock:
+            self._entries[(kind, subject)] = (key, batch_id, result)
+            self._entries.move_to_end((kind, subject))
+            evicted = self._entries.popitem(last=False)[0] if len(self._entries) > self.capacity else None
+        
+        if self.persist:
+            try:
+                get_storage().verifications.save(
+                    kind, str(subject), key, batch_id, json.dumps(result, default=str),
+                    (evicted[0], str(evicted[1])) if evicted else None
+                )
+            except Exception as e:
+                # Persistence is best effort; the in-memory cache stays usable
+                print(f"Warning: Verification cache write failed: {e}")
+    
+    def invalidate(
+        self,
+        event_id: Optional[int] = None,
+        batch_id: Optional[str] = None,
+        batch_root: Optional[str] = None
+    ) -> int:
+        """
+        Drop every entry for an event, a batch or a batch root, in this
+        worker and (through the log) in the others; returns the number
+        dropped here
+        """
+        get_storage().verifications.invalidate(event_id, batch_id, batch_root)
+        return self._drop(event_id, batch_id, batch_root)
+    
+    def clear(self) -> None:
+        """Drop everything, e.g. once the hash chain no longer verifies"""
+        get_storage().verifications.invalidate()
+        self._drop()
+    
+    def _drop(
+        self,
+        event_id: Optional[int] = None,
+        batch_id: Optional[str] = None,
+        batch_root: Optional[str] = None
+    ) -> int:
+        # Scans the cache, which is fine for events as rare as tampering
+        everything = event_id is None and batch_id is None and batch_root is None
+        with self._lock:
+            stale = [
+                entry for entry, (key, entry_batch, _) in self._entries.items()
+                if everything
+                or (event_id is not None and key.event_id == event_id)
+                or (batch_id is not None and entry_batch == batch_id)
+                or (batch_root is not None and key.batch_root == batch_root)
+            ]
+            for entry in stale:
+                del self._entries[entry]
+            self.invalidated += len(stale)
+        return len(stale)
+    
+    def _sync(self) -> None:
+        """Apply invalidations logged by any worker since the last sync"""
+        verifications = get_storage().verifications
+        if self._synced is None:
+            # Nothing is cached yet that an earlier invalidation could cover
+            self._synced = verifications.last_invalidation()
+            return
+        
+        for row in verifications.invalidations_since(self._synced):
+            self._drop(row["event_id"], row["batch_id"], row["batch_root"])
+            self._synced = row["id"]
+    
+    def warm_up(self) -> None:
+        """Load persisted results, most recently verified last"""
+        if not self.persist:
+            return
+        
+        verifications = get_storage().verifications
+        try:
+            # Read first: invalidations logged during the load are applied later
+            synced = verifications.last_invalidation()
+            rows = verifications.load(self.capacity)
+        except Exception as e:
+            print(f"Warning: Verification cache warm-up failed: {e}")
+            return
+        
+        with self._lock:
+            if self._synced is None:
+                self._synced = synced
+            for row in reversed(rows):
+                # Event ids are stored as text next to batch ids (BATCH-...)
+                subject = int(row["subject"]) if row["subject"].isdigit() else row["subject"]
+                key = VerificationKey(*(row[field] for field in VerificationKey._fields))
+                self._entries.setdefault((row["kind"], subject), (key, row["batch_id"], json.loads(row["result"])))
+    
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "capacity": self.capacity,
+            "persisted": self.persist,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else None,
+            "invalidated": self.invalidated,
+        }
+
+
+# Global instance
+_cache: Optional[VerificationCache] = None
+
+
+def get_verification_cache() -> VerificationCache:
+    """Get or create the verification cache"""
+    global _cache
+    if _cache is None:
+        _cache = VerificationCache(VERIFY_CACHE_SIZE, VERIFY_CACHE_PERSIST)
+    return _cache
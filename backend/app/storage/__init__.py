@@ -0,0 +1,25 @@
+"""
+Storage backends - Event, batch and anchor repositories
+
+The backend is selected by DATABASE_URL: a postgresql:// URL selects the
+PostgreSQL implementation, anything else keeps the local SQLite ledger.
+"""
+import os
+from typing import Optional
+from app.storage.base import Storage
+
+_storage: Optional[Storage] = None
+
+
+def get_storage() -> Storage:
+    """Get or create the configured storage backend"""
+    global _storage
+    if _storage is None:
+        database_url = os.getenv("DATABASE_URL", "")
+        if database_url.startswith(("postgres://", "postgresql://")):
+            from app.storage.postgres import PostgresStorage
+            _storage = PostgresStorage(database_url)
+        else:
+            from app.storage.sqlite import SQLiteStorage
+            _storage = SQLiteStorage()
+    return _storage
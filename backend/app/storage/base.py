@@ -0,0 +1,329 @@
+"""
+Storage interfaces - Repositories shared by the SQLite and PostgreSQL backends
+
+Rows are returned as mappings supporting row["column"] access, so routers can
+treat sqlite3.Row and psycopg dict rows the same way.
+"""
+from abc import ABC, abstractmethod
+from array import array
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Mapping, Optional, Sequence, Tuple
+from app.database import DB_FETCH_SIZE
+from app.services.sparse_merkle_service import Node
+
+EVENT_FIELDS = [
+    "model_id", "model_name", "model_version", "framework",
+    "dataset_name", "dataset_version", "dataset_hash", "source",
+    "event_type", "actor", "environment", "timestamp", "summary",
+    "metadata_hash", "merkle_leaf_hash", "hash_version"
+]
+
+EVENT_COLUMNS = """id, model_id, model_name, model_version, framework,
+                   dataset_name, dataset_version, dataset_hash, source,
+                   event_type, actor, environment, timestamp, summary,
+                   metadata_hash, merkle_leaf_hash, hash_version, batch_id, status,
+                   prev_chain_hash, chain_hash, created_at"""
+
+
+def claim_leaves(cursor, first_rows: Sequence[Mapping[str, Any]], claimed_ids: array) -> Iterator[str]:
+    """
+    Leaf hashes of an executed seal query, fetched DB_FETCH_SIZE at a time
+    
+    Each row's id is appended to claimed_ids as its leaf is consumed.
+    """
+    rows = first_rows
+    while rows:
+        for row in rows:
+            claimed_ids.append(row["id"])
+            yield row["leaf_hash"]
+        rows = cursor.fetchmany(DB_FETCH_SIZE)
+
+
+def format_event_ids(event_ids: Iterable[int]) -> str:
+    """merkle_batches.event_ids text, the repr of a list of ids"""
+    return "[" + ", ".join(map(str, event_ids)) + "]"
+
+
+class DuplicateEvent(Exception):
+    """An event with the same metadata_hash or idempotency key is already stored"""
+    
+    def __init__(self, existing: Mapping[str, Any]):
+        super().__init__(f"Duplicate of event {existing['id']}")
+        self.existing = existing
+
+
+class EventRepository(ABC):
+    """Append-only audit event storage"""
+    
+    @abstractmethod
+    def insert(self, event: Dict[str, Any], idempotency_key: Optional[str] = None) -> Mapping[str, Any]:
+        """
+        Append one event (EVENT_FIELDS) and return the stored row
+        
+        Implementations link the event into the hash chain atomically and
+        record the idempotency key, if any, in the same transaction.
+        
+        Raises:
+            DuplicateEvent: if the metadata_hash or the idempotency key is
+                already stored; nothing is written
+        """
+    
+    @abstractmethod
+    def insert_many(
+        self,
+        events: List[Dict[str, Any]],
+        idempotency_keys: Optional[Sequence[Optional[str]]] = None
+    ) -> List[Mapping[str, Any]]:
+        """
+        Append several events in one transaction, in order
+        
+        idempotency_keys, if given, holds one key (or None) per event. If any
+        event or key collides, the whole transaction fails and nothing is
+        written.
+        """
+    
+    @abstractmethod
+    def get(self, event_id: int) -> Optional[Mapping[str, Any]]:
+        """Fetch one event by id"""
+    
+    @abstractmethod
+    def list(self, limit: int, offset: int) -> List[Mapping[str, Any]]:
+        """Page through events, newest first"""
+    
+    @abstractmethod
+    def count_pending(self) -> int:
+        """Number of events not yet sealed into a batch"""
+    
+    @abstractmethod
+    def find_by_hash(self, metadata_hash: str, include_sealed: bool = False) -> Optional[Mapping[str, Any]]:
+        """
+        Oldest event in the hot table with this metadata_hash
+        
+        With include_sealed, archived events are searched too when the hot
+        table has none (on backends with an archive).
+        """
+    
+    @abstractmethod
+    def find_by_idempotency_key(self, idempotency_key: str) -> Optional[Mapping[str, Any]]:
+        """Event created by the request carrying this idempotency key"""
+    
+    @abstractmethod
+    def iter_hashes(self) -> Iterator[str]:
+        """Stream the metadata_hash of every event in the hot table"""
+    
+    @abstractmethod
+    def iter_chain(self) -> Iterator[Mapping[str, Any]]:
+        """
+        Stream every event, archived ones included, in id order with the
+        columns verify_event_chain checks (CHAIN_COLUMNS)
+        
+        The connection is held until the iterator is exhausted or closed.
+        """
+
+
+class BatchRepository(ABC):
+    """Merkle batch storage"""
+    
+    @abstractmethod
+    def seal(
+        self,
+        batch_id: str,
+        event_ids: Optional[List[int]],
+        limit: int,
+        build_root: Callable[[Iterable[str]], str]
+    ) -> Optional[Tuple[str, int]]:
+        """
+        Claim pending events, build their tree and record the batch atomically
+        
+        Args:
+            batch_id: Identifier of the new batch
+            event_ids: Specific events to batch, or None for the oldest pending
+            limit: Maximum events to claim when event_ids is None
+            build_root: Called with an iterator over the leaf hashes, in event
+                id order, fetched incrementally; returns the Merkle root
+        
+        Returns:
+            (merkle_root, event_count), or None if no events were available
+        """
+    
+    @abstractmethod
+    def leaves(self, batch_id: str) -> Iterator[Tuple[int, str]]:
+        """
+        Stream (event_id, leaf_hash) of a batch in leaf (event id) order
+        
+        The connection is held until the iterator is exhausted or closed.
+        """
+    
+    @abstractmethod
+    def set_status(self, batch_id: str, status: str, event_status: Optional[str] = None) -> None:
+        """Update a batch status and optionally the status of its events"""
+    
+    @abstractmethod
+    def transition(self, batch_id: str, from_status: str, to_status: str) -> bool:
+        """Change a batch status only if it is currently from_status; True if it was"""
+    
+    @abstractmethod
+    def claim(self, batch_id: str, from_status: str, to_status: str, holder: str, lease_seconds: float) -> bool:
+        """
+        Move a batch from from_status to to_status under a lease held by holder
+        
+        A batch already in to_status can be claimed again once its lease has
+        expired, i.e. its holder stopped before finishing. True if claimed.
+        """
+    
+    @abstractmethod
+    def queue(self, batch_id: str, urgent: bool = False) -> None:
+        """Leave a sealed batch to the anchor scheduler; urgent ones skip the gas window"""
+    
+    @abstractmethod
+    def get(self, batch_id: str) -> Optional[Mapping[str, Any]]:
+        """Fetch one batch"""
+    
+    @abstractmethod
+    def list_by_status(self, status: str) -> List[Mapping[str, Any]]:
+        """Batches with the given status, oldest first, with their lease and urgency"""
+    
+    @abstractmethod
+    def list(self) -> List[Mapping[str, Any]]:
+        """All batches, newest first"""
+    
+    @abstractmethod
+    def count_unanchored(self) -> int:
+        """Number of sealed batches not yet anchored on chain"""
+
+
+class AnchorRepository(ABC):
+    """Blockchain anchor records"""
+    
+    @abstractmethod
+    def record(
+        self,
+        merkle_root: str,
+        timestamp: str,
+        batch_id: Optional[str],
+        anchor_id: Optional[int] = None,
+        block_hash: Optional[str] = None,
+        transaction_id: Optional[str] = None,
+        block_number: Optional[int] = None,
+        event_count: Optional[int] = None,
+        gas_used: Optional[int] = None,
+        effective_gas_price: Optional[int] = None
+    ) -> None:
+        """Store an anchor"""
+    
+    @abstractmethod
+    def next_simulated_id(self) -> int:
+        """Next anchor id for simulated anchoring"""
+    
+    @abstractmethod
+    def get(self, anchor_id: int) -> Optional[Mapping[str, Any]]:
+        """Fetch one anchor by on-chain anchor id, preferring one not orphaned by a reorg"""
+    
+    @abstractmethod
+    def latest_for_batch(self, batch_id: str, merkle_root: str) -> Optional[Mapping[str, Any]]:
+        """Most recent anchor for a batch (or its root) that was not orphaned by a reorg"""
+    
+    @abstractmethod
+    def list_unconfirmed(self) -> List[Mapping[str, Any]]:
+        """Anchors with a block hash that have not reached final depth or been orphaned"""
+    
+    @abstractmethod
+    def update_confirmations(self, updates: List[Tuple[int, int, str, int, str]]) -> None:
+        """Apply (id, block_number, block_hash, confirmations, confirmation_status) in one transaction"""
+    
+    @abstractmethod
+    def update_anchor_ids(self, updates: List[Tuple[int, int]]) -> None:
+        """Apply (id, anchor_id) for anchors whose transaction was mined again under another id"""
+    
+    @abstractmethod
+    def cost_summary(self) -> Mapping[str, Any]:
+        """Totals over on-chain anchors: anchors, anchored_events, gas_used, cost_wei"""
+
+
+class StateRepository(ABC):
+    """Per-model state tree (see sparse_merkle_service)"""
+    
+    @abstractmethod
+    def root(self) -> Tuple[str, int]:
+        """Current state root and number of keys, read together"""
+    
+    @abstractmethod
+    def proof(self, key_hash: str, version: Optional[int] = None) -> Tuple[str, Dict[int, str], Optional[Node]]:
+        """
+        (state root, proof, leaf) for a key, read together
+        
+        Against the current tree, or with version against the root recorded
+        for that version on a sealed batch (state_version). leaf is None when
+        the key is absent; the proof then shows non-inclusion.
+        """
+
+
+class LeaseRepository(ABC):
+    """Named leases coordinating the workers that share a database"""
+    
+    @abstractmethod
+    def acquire(self, name: str, holder: str, lease_seconds: float) -> bool:
+        """Take or renew a lease; False while another holder's lease is unexpired"""
+    
+    @abstractmethod
+    def release(self, name: str, holder: str) -> None:
+        """Give up a lease if holder still has it"""
+    
+    @abstractmethod
+    def get(self, name: str) -> Optional[Mapping[str, Any]]:
+        """Current holder, acquired_at and expires_at (epoch seconds) of a lease"""
+
+
+class VerificationRepository(ABC):
+    """Verification cache state shared by the workers (see verification_cache)"""
+    
+    @abstractmethod
+    def invalidate(
+        self,
+        event_id: Optional[int] = None,
+        batch_id: Optional[str] = None,
+        batch_root: Optional[str] = None
+    ) -> None:
+        """
+        Log an invalidation for every worker and delete the stored results it
+        covers; with no argument, everything is invalidated
+        """
+    
+    @abstractmethod
+    def invalidations_since(self, after: int) -> List[Mapping[str, Any]]:
+        """Invalidations (id, event_id, batch_id, batch_root) logged after id after, oldest first"""
+    
+    @abstractmethod
+    def last_invalidation(self) -> int:
+        """Id of the latest invalidation, 0 if there is none"""
+    
+    @abstractmethod
+    def save(
+        self,
+        kind: str,
+        subject: str,
+        key: Sequence[Any],
+        batch_id: Optional[str],
+        result: str,
+        evicted: Optional[Tuple[str, str]] = None
+    ) -> None:
+        """Store a result (JSON) under its VerificationKey, dropping the evicted (kind, subject)"""
+    
+    @abstractmethod
+    def load(self, limit: int) -> List[Mapping[str, Any]]:
+        """Stored results, most recently verified first, with their key columns"""
+
+
+class Storage(ABC):
+    """Bundle of repositories for one backend"""
+    
+    name: str
+    events: EventRepository
+    batches: BatchRepository
+    anchors: AnchorRepository
+    state: StateRepository
+    leases: LeaseRepository
+    verifications: VerificationRepository
+    
+    @abstractmethod
+    def init_schema(self) -> None:
+        """Create tables if they do not exist"""
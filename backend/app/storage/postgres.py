@@ -0,0 +1,925 @@
+"""
+PostgreSQL storage backend - Shared ledger for several API replicas
+
+Connections come from a psycopg pool. Hash-chain appends are serialized with
+a transaction-scoped advisory lock, bulk ingest streams rows with COPY, and
+batch builders claim pending events with FOR UPDATE SKIP LOCKED so replicas
+never seal the same events.
+
+The per-model state tree shares its SQL with SQLite (sparse_merkle_service),
+run through QmarkCursor. The partition archive, lineage index and full-text
+search are SQLite-only; their routes answer 501 on this backend.
+"""
+import os
+import time
+from array import array
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Mapping, Optional, Sequence, Tuple
+from app.database import DB_FETCH_SIZE, iter_rows
+from app.storage.base import (
+    Storage, EventRepository, BatchRepository, AnchorRepository, StateRepository, LeaseRepository,
+    VerificationRepository, DuplicateEvent, EVENT_FIELDS, EVENT_COLUMNS, claim_leaves, format_event_ids
+)
+from app.services.event_chain_service import CHAIN_COLUMNS
+from app.services.metrics_service import DB_QUERY_SECONDS, timed
+from app.services.hashing_service import compute_chain_hash, GENESIS_CHAIN_HASH
+from app.services.sparse_merkle_service import (
+    Node, get_state_checkpoint, get_state_proof, get_state_root, update_model_states
+)
+
+try:
+    import psycopg
+    from psycopg.rows import dict_row
+    from psycopg_pool import ConnectionPool
+    PSYCOPG_AVAILABLE = True
+except ImportError:
+    PSYCOPG_AVAILABLE = False
+
+# Arbitrary application-wide key for pg_advisory_xact_lock
+CHAIN_LOCK_KEY = 0x41554454
+
+UTC_NOW_TEXT = "to_char(now() AT TIME ZONE 'utc', 'YYYY-MM-DD HH24:MI:SS')"
+
+SCHEMA = [
+    f"""
+    CREATE TABLE IF NOT EXISTS audit_events (
+        id BIGSERIAL PRIMARY KEY,
+        model_id TEXT NOT NULL,
+        model_name TEXT,
+        model_version TEXT,
+        framework TEXT,
+        dataset_name TEXT,
+        dataset_version TEXT,
+        dataset_hash TEXT,
+        source TEXT,
+        event_type TEXT NOT NULL,
+        actor TEXT,
+        environment TEXT,
+        timestamp TEXT NOT NULL,
+        summary TEXT,
+        metadata_hash TEXT NOT NULL,
+        merkle_leaf_hash TEXT,
+        batch_id TEXT,
+        status TEXT DEFAULT 'Pending',
+        prev_chain_hash TEXT,
+        chain_hash TEXT,
+        created_at TEXT NOT NULL DEFAULT {UTC_NOW_TEXT}
+    )
+    """,
+    "CREATE INDEX IF NOT EXISTS idx_audit_events_pending ON audit_events (id) WHERE status = 'Pending'",
+    "CREATE INDEX IF NOT EXISTS idx_audit_events_batch_id ON audit_events (batch_id)",
+    "CREATE INDEX IF NOT EXISTS idx_audit_events_created_at ON audit_events (created_at)",
+    f"""
+    CREATE TABLE IF NOT EXISTS merkle_batches (
+        id BIGSERIAL PRIMARY KEY,
+        batch_id TEXT NOT NULL UNIQUE,
+        merkle_root TEXT NOT NULL,
+        event_ids TEXT NOT NULL,
+        status TEXT DEFAULT 'Pending',
+        state_root TEXT,
+        state_version INTEGER,
+        first_event_id BIGINT,
+        last_event_id BIGINT,
+        event_count INTEGER,
+        created_at TEXT NOT NULL DEFAULT {UTC_NOW_TEXT}
+    )
+    """,
+    "CREATE INDEX IF NOT EXISTS idx_merkle_batches_state_version ON merkle_batches (state_version)",
+    f"""
+    CREATE TABLE IF NOT EXISTS blockchain_anchors (
+        id BIGSERIAL PRIMARY KEY,
+        anchor_id BIGINT,
+        merkle_root TEXT NOT NULL,
+        timestamp TEXT NOT NULL,
+        block_hash TEXT,
+        transaction_id TEXT,
+        batch_id TEXT,
+        block_number BIGINT,
+        created_at TEXT NOT NULL DEFAULT {UTC_NOW_TEXT}
+    )
+    """,
+    "CREATE INDEX IF NOT EXISTS idx_blockchain_anchors_batch_id ON blockchain_anchors (batch_id)",
+    "CREATE INDEX IF NOT EXISTS idx_blockchain_anchors_anchor_id ON blockchain_anchors (anchor_id)",
+    # Per-model state index and its compact, versioned sparse Merkle tree
+    """
+    CREATE TABLE IF NOT EXISTS model_state (
+        key_hash TEXT PRIMARY KEY,
+        model_id TEXT NOT NULL,
+        event_type TEXT,
+        event_id BIGINT NOT NULL,
+        event_hash TEXT NOT NULL,
+        updated_at TIMESTAMPTZ NOT NULL DEFAULT now()
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS smt_nodes (
+        node_id TEXT PRIMARY KEY,
+        version INTEGER NOT NULL,
+        hash TEXT NOT NULL,
+        leaf_key TEXT,
+        leaf_event_id BIGINT,
+        leaf_event_hash TEXT
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS smt_node_history (
+        node_id TEXT NOT NULL,
+        version INTEGER NOT NULL,
+        hash TEXT NOT NULL,
+        leaf_key TEXT,
+        leaf_event_id BIGINT,
+        leaf_event_hash TEXT,
+        PRIMARY KEY (node_id, version)
+    )
+    """,
+]
+
+
+
+class QmarkCursor:
+    """
+    psycopg cursor accepting the ? placeholders of SQL shared with SQLite
+    
+    The shared queries contain no literal ? or %.
+    """
+    
+    def __init__(self, cursor):
+        self.cursor = cursor
+    
+    def execute(self, query: str, params: Sequence[Any] = ()) -> "QmarkCursor":
+        self.cursor.execute(query.replace("?", "%s"), params)
+        return self
+    
+    def executemany(self, query: str, params_seq: Iterable[Sequence[Any]]) -> None:
+        params_seq = list(params_seq)
+        if params_seq:
+            self.cursor.executemany(query.replace("?", "%s"), params_seq)
+    
+    def fetchone(self) -> Optional[Mapping[str, Any]]:
+        return self.cursor.fetchone()
+    
+    def fetchmany(self, size: int) -> List[Mapping[str, Any]]:
+        return self.cursor.fetchmany(size)
+    
+    def fetchall(self) -> List[Mapping[str, Any]]:
+        return self.cursor.fetchall()
+
+
+# Ordered schema migrations: (version, description, statements), mirroring
+# app.database.MIGRATIONS for SQLite.
+MIGRATIONS = [
+    (1, "Baseline schema", SCHEMA),
+    (2, "Anchor gas and event counts", [
+        "ALTER TABLE blockchain_anchors ADD COLUMN IF NOT EXISTS event_count INTEGER",
+        "ALTER TABLE blockchain_anchors ADD COLUMN IF NOT EXISTS gas_used BIGINT",
+        "ALTER TABLE blockchain_anchors ADD COLUMN IF NOT EXISTS effective_gas_price NUMERIC",
+    ]),
+    (3, "Anchor confirmation tracking", [
+        "ALTER TABLE blockchain_anchors ADD COLUMN IF NOT EXISTS confirmations INTEGER",
+        "ALTER TABLE blockchain_anchors ADD COLUMN IF NOT EXISTS confirmation_status TEXT",
+        "CREATE INDEX IF NOT EXISTS idx_blockchain_anchors_confirmation_status "
+        "ON blockchain_anchors (confirmation_status)",
+    ]),
+    (4, "Event hash versions", [
+        "ALTER TABLE audit_events ADD COLUMN IF NOT EXISTS hash_version INTEGER",
+    ]),
+    (5, "Event deduplication", [
+        f"""
+        CREATE TABLE IF NOT EXISTS idempotency_keys (
+            key TEXT PRIMARY KEY,
+            event_id BIGINT NOT NULL,
+            created_at TEXT NOT NULL DEFAULT {UTC_NOW_TEXT}
+        )
+        """,
+        # Creating the unique index fails, naming a duplicate, if the
+        # append-only log already holds any; the upgrade stops there
+        "CREATE UNIQUE INDEX IF NOT EXISTS idx_audit_events_metadata_hash ON audit_events (metadata_hash)",
+    ]),
+    # 6 and 7 are SQLite-only (lineage and search)
+    (8, "Verification result cache", [
+        """
+        CREATE TABLE IF NOT EXISTS verification_results (
+            kind TEXT NOT NULL,
+            subject TEXT NOT NULL,
+            event_id BIGINT,
+            hash_version INTEGER,
+            metadata_hash TEXT,
+            fields_digest TEXT,
+            batch_root TEXT,
+            state_root TEXT,
+            anchor_id BIGINT,
+            block_hash TEXT,
+            confirmation_status TEXT,
+            batch_id TEXT,
+            result TEXT NOT NULL,
+            verified_at TIMESTAMPTZ NOT NULL DEFAULT clock_timestamp(),
+            PRIMARY KEY (kind, subject)
+        )
+        """,
+        "CREATE INDEX IF NOT EXISTS idx_verification_results_event_id ON verification_results (event_id)",
+        "CREATE INDEX IF NOT EXISTS idx_verification_results_batch_id ON verification_results (batch_id)",
+    ]),
+    (9, "Worker leases", [
+        """
+        CREATE TABLE IF NOT EXISTS worker_leases (
+            name TEXT PRIMARY KEY,
+            holder TEXT NOT NULL,
+            expires_at DOUBLE PRECISION NOT NULL,
+            acquired_at DOUBLE PRECISION NOT NULL
+        )
+        """,
+        "ALTER TABLE merkle_batches ADD COLUMN IF NOT EXISTS lease_holder TEXT",
+        "ALTER TABLE merkle_batches ADD COLUMN IF NOT EXISTS lease_expires_at DOUBLE PRECISION",
+        "ALTER TABLE merkle_batches ADD COLUMN IF NOT EXISTS urgent BOOLEAN NOT NULL DEFAULT FALSE",
+    ]),
+    (10, "Verification invalidation log", [
+        f"""
+        CREATE TABLE IF NOT EXISTS verification_invalidations (
+            id BIGSERIAL PRIMARY KEY,
+            event_id BIGINT,
+            batch_id TEXT,
+            batch_root TEXT,
+            created_at TEXT NOT NULL DEFAULT {UTC_NOW_TEXT}
+        )
+        """,
+    ]),
+]
+
+# Advisory lock key serializing schema migrations across replicas
+MIGRATION_LOCK_KEY = 0x41554455
+
+# Serializes invalidations so their ids commit in order and a worker reading
+# past one never skips an earlier one
+VERIFICATION_LOCK_KEY = 0x41554456
+
+
+class PostgresEventRepository(EventRepository):
+
+    def __init__(self, pool):
+        self.pool = pool
+    
+    def _lock_chain_head(self, cursor) -> Tuple[str, int]:
+        """Serialize appenders and return (chain head, last event id)"""
+        cursor.execute("SELECT pg_advisory_xact_lock(%s)", (CHAIN_LOCK_KEY,))
+        cursor.execute("""
+            SELECT id, chain_hash
+            FROM audit_events
+            ORDER BY id DESC
+            LIMIT 1
+        """)
+        row = cursor.fetchone()
+        if not row:
+            return GENESIS_CHAIN_HASH, 0
+        return row["chain_hash"] or GENESIS_CHAIN_HASH, row["id"]
+    
+    def _update_state(self, cursor, rows: List[Mapping[str, Any]]) -> None:
+        """Advance the state tree in the append transaction, under the chain lock"""
+        update_model_states(QmarkCursor(cursor), [
+            (row["model_id"], row["event_type"], row["id"], row["metadata_hash"]) for row in rows
+        ])
+    
+    @timed(DB_QUERY_SECONDS, query="events.insert")
+    def insert(self, event: Dict[str, Any], idempotency_key: Optional[str] = None) -> Mapping[str, Any]:
+        try:
+            with self.pool.connection() as conn:
+                with conn.cursor() as cursor:
+                    prev_chain_hash, _ = self._lock_chain_head(cursor)
+                    chain_hash = compute_chain_hash(prev_chain_hash, event["metadata_hash"])
+                    
+                    cursor.execute(f"""
+                        INSERT INTO audit_events (
+                            {", ".join(EVENT_FIELDS)}, status, prev_chain_hash, chain_hash
+                        )
+                        VALUES ({", ".join(["%s"] * (len(EVENT_FIELDS) + 3))})
+                        RETURNING {EVENT_COLUMNS}
+                    """, [event.get(field) for field in EVENT_FIELDS] + ["Pending", prev_chain_hash, chain_hash])
+                    row = cursor.fetchone()
+                    
+                    if idempotency_key:
+                        cursor.execute("""
+                            INSERT INTO idempotency_keys (key, event_id) VALUES (%s, %s)
+                        """, (idempotency_key, row["id"]))
+                    
+                    self._update_state(cursor, [row])
+                    return row
+        except psycopg.IntegrityError:
+            # The transaction was rolled back; report what it collided with
+            existing = (
+                idempotency_key and self.find_by_idempotency_key(idempotency_key)
+            ) or self.find_by_hash(event["metadata_hash"])
+            if existing is None:
+                raise
+            raise DuplicateEvent(existing)
+    
+    @timed(DB_QUERY_SECONDS, query="events.insert_many")
+    def insert_many(
+        self,
+        events: List[Dict[str, Any]],
+        idempotency_keys: Optional[Sequence[Optional[str]]] = None
+    ) -> List[Mapping[str, Any]]:
+        with self.pool.connection() as conn:
+            with conn.cursor() as cursor:
+                prev_chain_hash, last_id = self._lock_chain_head(cursor)
+                
+                columns = EVENT_FIELDS + ["status", "prev_chain_hash", "chain_hash"]
+                with cursor.copy(f"COPY audit_events ({', '.join(columns)}) FROM STDIN") as copy:
+                    for event in events:
+                        chain_hash = compute_chain_hash(prev_chain_hash, event["metadata_hash"])
+                        copy.write_row(
+                            [event.get(field) for field in EVENT_FIELDS]
+                            + ["Pending", prev_chain_hash, chain_hash]
+                        )
+                        prev_chain_hash = chain_hash
+                
+                # Appenders hold the chain lock, so the new rows are exactly
+                # those above the previous head
+                cursor.execute(f"""
+                    SELECT {EVENT_COLUMNS}
+                    FROM audit_events
+                    WHERE id > %s
+                    ORDER BY id
+                """, (last_id,))
+                rows = cursor.fetchall()
+                
+                if idempotency_keys:
+                    cursor.executemany("""
+                        INSERT INTO idempotency_keys (key, event_id) VALUES (%s, %s)
+                    """, [(key, row["id"]) for key, row in zip(idempotency_keys, rows) if key])
+                
+                self._update_state(cursor, rows)
+                return rows
+    
+    @timed(DB_QUERY_SECONDS, query="events.get")
+    def get(self, event_id: int) -> Optional[Mapping[str, Any]]:
+        with self.pool.connection() as conn:
+            with conn.cursor() as cursor:
+                cursor.execute(f"""
+                    SELECT {EVENT_COLUMNS}
+                    FROM audit_events
+                    WHERE id = %s
+                """, (event_id,))
+                return cursor.fetchone()
+    
+    @timed(DB_QUERY_SECONDS, query="events.list")
+    def list(self, limit: int, offset: int) -> List[Mapping[str, Any]]:
+        with self.pool.connection() as conn:
+            with conn.cursor() as cursor:
+                cursor.execute(f"""
+                    SELECT {EVENT_COLUMNS}
+                    FROM audit_events
+                    ORDER BY created_at DESC
+                    LIMIT %s OFFSET %s
+                """, (limit, offset))
+                return cursor.fetchall()
+    
+    @timed(DB_QUERY_SECONDS, query="events.count_pending")
+    def count_pending(self) -> int:
+        with self.pool.connection() as conn:
+            with conn.cursor() as cursor:
+                cursor.execute("SELECT COUNT(*) AS pending FROM audit_events WHERE status = 'Pending'")
+                return cursor.fetchone()["pending"]
+    
+    @timed(DB_QUERY_SECONDS, query="events.find_by_hash")
+    def find_by_hash(self, metadata_hash: str, include_sealed: bool = False) -> Optional[Mapping[str, Any]]:
+        # No archive: every event is in audit_events
+        with self.pool.connection() as conn:
+            with conn.cursor() as cursor:
+                cursor.execute(f"""
+                    SELECT {EVENT_COLUMNS}
+                    FROM audit_events
+                    WHERE metadata_hash = %s
+                    ORDER BY id
+                    LIMIT 1
+                """, (metadata_hash,))
+                return cursor.fetchone()
+    
+    @timed(DB_QUERY_SECONDS, query="events.find_by_idempotency_key")
+    def find_by_idempotency_key(self, idempotency_key: str) -> Optional[Mapping[str, Any]]:
+        with self.pool.connection() as conn:
+            with conn.cursor() as cursor:
+                cursor.execute(f"""
+                    SELECT {EVENT_COLUMNS}
+                    FROM audit_events
+                    WHERE id = (SELECT event_id FROM idempotency_keys WHERE key = %s)
+                """, (idempotency_key,))
+                return cursor.fetchone()
+    
+    def iter_hashes(self) -> Iterator[str]:
+        with self.pool.connection() as conn:
+            with conn.cursor(name="event_hashes") as cursor:
+                cursor.execute("SELECT metadata_hash FROM audit_events")
+                for row in iter_rows(cursor):
+                    yield row["metadata_hash"]
+    
+    def iter_chain(self) -> Iterator[Mapping[str, Any]]:
+        with self.pool.connection() as conn:
+            with conn.cursor(name="event_chain") as cursor:
+                cursor.execute(f"SELECT {CHAIN_COLUMNS} FROM audit_events ORDER BY id")
+                yield from iter_rows(cursor)
+
+
+class PostgresBatchRepository(BatchRepository):
+
+    def __init__(self, pool):
+        self.pool = pool
+    
+    @timed(DB_QUERY_SECONDS, query="batches.seal")
+    def seal(
+        self,
+        batch_id: str,
+        event_ids: Optional[List[int]],
+        limit: int,
+        build_root: Callable[[Iterable[str]], str]
+    ) -> Optional[Tuple[str, int]]:
+        with self.pool.connection() as conn:
+            # Server-side cursor: leaves are fetched DB_FETCH_SIZE at a time;
+            # rows locked by another replica's open claim are skipped
+            with conn.cursor(name=f"seal_{batch_id.lower().replace('-', '_')}") as cursor:
+                if event_ids:
+                    cursor.execute("""
+                        SELECT id, COALESCE(merkle_leaf_hash, metadata_hash) AS leaf_hash
+                        FROM audit_events
+                        WHERE id = ANY(%s) AND (status = 'Pending' OR batch_id IS NULL)
+                        ORDER BY id
+                        FOR UPDATE SKIP LOCKED
+                    """, (event_ids,))
+                else:
+                    cursor.execute("""
+                        SELECT id, COALESCE(merkle_leaf_hash, metadata_hash) AS leaf_hash
+                        FROM audit_events
+                        WHERE status = 'Pending'
+                        ORDER BY id
+                        LIMIT %s
+                        FOR UPDATE SKIP LOCKED
+                    """, (limit,))
+                
+                claimed_ids = array("q")
+                first_rows = cursor.fetchmany(DB_FETCH_SIZE)
+                if not first_rows:
+                    return None
+                
+                merkle_root = build_root(claim_leaves(cursor, first_rows, claimed_ids))
+            
+            with conn.cursor() as cursor:
+                # Record the state root alongside the batch, and the tree
+                # version keeping it provable; the chain lock keeps appenders
+                # from writing the tree between the two reads and the insert
+                cursor.execute("SELECT pg_advisory_xact_lock(%s)", (CHAIN_LOCK_KEY,))
+                state_root, state_version = get_state_checkpoint(QmarkCursor(cursor))
+                
+                cursor.execute("""
+                    INSERT INTO merkle_batches (
+                        batch_id, merkle_root, event_ids, status, state_root, state_version,
+                        first_event_id, last_event_id, event_count
+                    )
+                    VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s)
+                """, (
+                    batch_id, merkle_root, format_event_ids(claimed_ids), "Pending", state_root, state_version,
+                    claimed_ids[0], claimed_ids[-1], len(claimed_ids)
+                ))
+                
+                cursor.execute("""
+                    UPDATE audit_events
+                    SET status = 'Batched', batch_id = %s
+                    WHERE id = ANY(%s)
+                """, (batch_id, claimed_ids.tolist()))
+                
+                return merkle_root, len(claimed_ids)
+    
+    def leaves(self, batch_id: str) -> Iterator[Tuple[int, str]]:
+        with self.pool.connection() as conn:
+            with conn.cursor(name=f"leaves_{batch_id.lower().replace('-', '_')}") as cursor:
+                cursor.execute("""
+                    SELECT id, COALESCE(merkle_leaf_hash, metadata_hash) AS leaf_hash
+                    FROM audit_events
+                    WHERE batch_id = %s
+                    ORDER BY id
+                """, (batch_id,))
+                for row in iter_rows(cursor):
+                    yield row["id"], row["leaf_hash"]
+    
+    @timed(DB_QUERY_SECONDS, query="batches.set_status")
+    def set_status(self, batch_id: str, status: str, event_status: Optional[str] = None) -> None:
+        with self.pool.connection() as conn:
+            with conn.cursor() as cursor:
+                cursor.execute("""
+                    UPDATE merkle_batches
+                    SET status = %s
+                    WHERE batch_id = %s
+                """, (status, batch_id))
+                
+                if event_status:
+                    cursor.execute("""
+                        UPDATE audit_events
+                        SET status = %s
+                        WHERE batch_id = %s
+                    """, (event_status, batch_id))
+    
+    @timed(DB_QUERY_SECONDS, query="batches.transition")
+    def transition(self, batch_id: str, from_status: str, to_status: str) -> bool:
+        with self.pool.connection() as conn:
+            with conn.cursor() as cursor:
+                cursor.execute("""
+                    UPDATE merkle_batches
+                    SET status = %s
+                    WHERE batch_id = %s AND status = %s
+                """, (to_status, batch_id, from_status))
+                return cursor.rowcount == 1
+    
+    @timed(DB_QUERY_SECONDS, query="batches.claim")
+    def claim(self, batch_id: str, from_status: str, to_status: str, holder: str, lease_seconds: float) -> bool:
+        now = time.time()
+        with self.pool.connection() as conn:
+            with conn.cursor() as cursor:
+                cursor.execute("""
+                    UPDATE merkle_batches
+                    SET status = %s, lease_holder = %s, lease_expires_at = %s
+                    WHERE batch_id = %s
+                      AND (status = %s OR (status = %s AND COALESCE(lease_expires_at, 0) < %s))
+                """, (to_status, holder, now + lease_seconds, batch_id, from_status, to_status, now))
+                return cursor.rowcount == 1
+    
+    @timed(DB_QUERY_SECONDS, query="batches.queue")
+    def queue(self, batch_id: str, urgent: bool = False) -> None:
+        with self.pool.connection() as conn:
+            with conn.cursor() as cursor:
+                cursor.execute("""
+                    UPDATE merkle_batches
+                    SET status = 'Queued', urgent = %s
+                    WHERE batch_id = %s
+                """, (urgent, batch_id))
+    
+    @timed(DB_QUERY_SECONDS, query="batches.get")
+    def get(self, batch_id: str) -> Optional[Mapping[str, Any]]:
+        with self.pool.connection() as conn:
+            with conn.cursor() as cursor:
+                cursor.execute("""
+                    SELECT batch_id, merkle_root, event_count, status, state_root, state_version, created_at
+                    FROM merkle_batches
+                    WHERE batch_id = %s
+                """, (batch_id,))
+                return cursor.fetchone()
+    
+    @timed(DB_QUERY_SECONDS, query="batches.list")
+    def list(self) -> List[Mapping[str, Any]]:
+        with self.pool.connection() as conn:
+            with conn.cursor() as cursor:
+                cursor.execute("""
+                    SELECT batch_id, merkle_root, event_count, status, state_root, created_at
+                    FROM merkle_batches
+                    ORDER BY created_at DESC
+                """)
+                return cursor.fetchall()
+    
+    @timed(DB_QUERY_SECONDS, query="batches.list_by_status")
+    def list_by_status(self, status: str) -> List[Mapping[str, Any]]:
+        with self.pool.connection() as conn:
+            with conn.cursor() as cursor:
+                cursor.execute("""
+                    SELECT batch_id, merkle_root, event_count, status, state_root, created_at,
+                           lease_holder, lease_expires_at, urgent
+                    FROM merkle_batches
+                    WHERE status = %s
+                    ORDER BY created_at, id
+                """, (status,))
+                return cursor.fetchall()
+    
+    @timed(DB_QUERY_SECONDS, query="batches.count_unanchored")
+    def count_unanchored(self) -> int:
+        with self.pool.connection() as conn:
+            with conn.cursor() as cursor:
+                cursor.execute("SELECT COUNT(*) AS unanchored FROM merkle_batches WHERE status != 'Anchored'")
+                return cursor.fetchone()["unanchored"]
+
+
+class PostgresAnchorRepository(AnchorRepository):
+
+    def __init__(self, pool):
+        self.pool = pool
+    
+    @timed(DB_QUERY_SECONDS, query="anchors.record")
+    def record(
+        self,
+        merkle_root: str,
+        timestamp: str,
+        batch_id: Optional[str],
+        anchor_id: Optional[int] = None,
+        block_hash: Optional[str] = None,
+        transaction_id: Optional[str] = None,
+        block_number: Optional[int] = None,
+        event_count: Optional[int] = None,
+        gas_used: Optional[int] = None,
+        effective_gas_price: Optional[int] = None
+    ) -> None:
+        with self.pool.connection() as conn:
+            with conn.cursor() as cursor:
+                cursor.execute("""
+                    INSERT INTO blockchain_anchors (
+                        anchor_id, merkle_root, timestamp, block_hash, transaction_id, batch_id, block_number,
+                        event_count, gas_used, effective_gas_price
+                    )
+                    VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
+                """, (
+                    anchor_id, merkle_root, timestamp, block_hash, transaction_id, batch_id, block_number,
+                    event_count, gas_used, effective_gas_price
+                ))
+    
+    @timed(DB_QUERY_SECONDS, query="anchors.next_simulated_id")
+    def next_simulated_id(self) -> int:
+        with self.pool.connection() as conn:
+            with conn.cursor() as cursor:
+                cursor.execute("SELECT MAX(anchor_id) AS max_id FROM blockchain_anchors")
+                return (cursor.fetchone()["max_id"] or 0) + 1
+    
+    @timed(DB_QUERY_SECONDS, query="anchors.get")
+    def get(self, anchor_id: int) -> Optional[Mapping[str, Any]]:
+        with self.pool.connection() as conn:
+            with conn.cursor() as cursor:
+                cursor.execute("""
+                    SELECT anchor_id, merkle_root, timestamp, batch_id, block_hash,
+                           transaction_id, block_number, confirmations, confirmation_status
+                    FROM blockchain_anchors
+                    WHERE anchor_id = %s
+                    ORDER BY confirmation_status IS NOT DISTINCT FROM 'Orphaned', id DESC
+                    LIMIT 1
+                """, (anchor_id,))
+                return cursor.fetchone()
+    
+    @timed(DB_QUERY_SECONDS, query="anchors.latest_for_batch")
+    def latest_for_batch(self, batch_id: str, merkle_root: str) -> Optional[Mapping[str, Any]]:
+        with self.pool.connection() as conn:
+            with conn.cursor() as cursor:
+                cursor.execute("""
+                    SELECT anchor_id, transaction_id AS transaction_hash, block_number, block_hash, merkle_root,
+                           confirmations, confirmation_status
+                    FROM blockchain_anchors
+                    WHERE (batch_id = %s OR merkle_root = %s)
+                      AND confirmation_status IS DISTINCT FROM 'Orphaned'
+                    ORDER BY created_at DESC, id DESC
+                    LIMIT 1
+                """, (batch_id, merkle_root))
+                return cursor.fetchone()
+    
+    @timed(DB_QUERY_SECONDS, query="anchors.list_unconfirmed")
+    def list_unconfirmed(self) -> List[Mapping[str, Any]]:
+        with self.pool.connection() as conn:
+            with conn.cursor() as cursor:
+                cursor.execute("""
+                    SELECT id, anchor_id, batch_id, merkle_root, transaction_id, block_number, block_hash,
+                           confirmations, confirmation_status
+                    FROM blockchain_anchors
+                    WHERE block_hash IS NOT NULL
+                      AND (confirmation_status IS NULL OR confirmation_status = 'Confirming')
+                    ORDER BY block_number
+                """)
+                return cursor.fetchall()
+    
+    @timed(DB_QUERY_SECONDS, query="anchors.update_confirmations")
+    def update_confirmations(self, updates: List[Tuple[int, int, str, int, str]]) -> None:
+        if not updates:
+            return
+        with self.pool.connection() as conn:
+            with conn.cursor() as cursor:
+                cursor.executemany("""
+                    UPDATE blockchain_anchors
+                    SET block_number = %s, block_hash = %s, confirmations = %s, confirmation_status = %s
+                    WHERE id = %s
+                """, [(number, block_hash, depth, status, row_id) for row_id, number, block_hash, depth, status in updates])
+    
+    @timed(DB_QUERY_SECONDS, query="anchors.update_anchor_ids")
+    def update_anchor_ids(self, updates: List[Tuple[int, int]]) -> None:
+        if not updates:
+            return
+        with self.pool.connection() as conn:
+            with conn.cursor() as cursor:
+                cursor.executemany("""
+                    UPDATE blockchain_anchors
+                    SET anchor_id = %s
+                    WHERE id = %s
+                """, [(anchor_id, row_id) for row_id, anchor_id in updates])
+    
+    @timed(DB_QUERY_SECONDS, query="anchors.cost_summary")
+    def cost_summary(self) -> Mapping[str, Any]:
+        with self.pool.connection() as conn:
+            with conn.cursor() as cursor:
+                # Gas figures are only known for on-chain anchors
+                cursor.execute("""
+                    SELECT COUNT(*) AS anchors,
+                           COALESCE(SUM(event_count), 0) AS anchored_events,
+                           COALESCE(SUM(gas_used), 0) AS gas_used,
+                           COALESCE(SUM(gas_used::NUMERIC * effective_gas_price), 0) AS cost_wei
+                    FROM blockchain_anchors
+                    WHERE gas_used IS NOT NULL
+                """)
+                return cursor.fetchone()
+
+
+class PostgresStateRepository(StateRepository):
+
+    def __init__(self, pool):
+        self.pool = pool
+    
+    @timed(DB_QUERY_SECONDS, query="state.root")
+    def root(self) -> Tuple[str, int]:
+        with self.pool.connection() as conn:
+            with conn.cursor() as cursor:
+                # One snapshot, so both see the same commit
+                cursor.execute("SET TRANSACTION ISOLATION LEVEL REPEATABLE READ")
+                cursor.execute("SELECT COUNT(*) AS key_count FROM model_state")
+                key_count = cursor.fetchone()["key_count"]
+                return get_state_root(QmarkCursor(cursor)), key_count
+    
+    @timed(DB_QUERY_SECONDS, query="state.proof")
+    def proof(self, key_hash: str, version: Optional[int] = None) -> Tuple[str, Dict[int, str], Optional[Node]]:
+        with self.pool.connection() as conn:
+            with conn.cursor() as cursor:
+                cursor.execute("SET TRANSACTION ISOLATION LEVEL REPEATABLE READ")
+                proof, leaf = get_state_proof(QmarkCursor(cursor), key_hash, version)
+                return get_state_root(QmarkCursor(cursor), version), proof, leaf
+
+
+class PostgresLeaseRepository(LeaseRepository):
+
+    def __init__(self, pool):
+        self.pool = pool
+    
+    @timed(DB_QUERY_SECONDS, query="leases.acquire")
+    def acquire(self, name: str, holder: str, lease_seconds: float) -> bool:
+        now = time.time()
+        with self.pool.connection() as conn:
+            with conn.cursor() as cursor:
+                # The update only applies when renewing or taking over an expired lease
+                cursor.execute("""
+                    INSERT INTO worker_leases (name, holder, expires_at, acquired_at)
+                    VALUES (%s, %s, %s, %s)
+                    ON CONFLICT (name) DO UPDATE SET
+                        holder = excluded.holder,
+                        expires_at = excluded.expires_at,
+                        acquired_at = CASE WHEN worker_leases.holder = excluded.holder
+                                           THEN worker_leases.acquired_at ELSE excluded.acquired_at END
+                    WHERE worker_leases.holder = excluded.holder OR worker_leases.expires_at < %s
+                """, (name, holder, now + lease_seconds, now, now))
+                return cursor.rowcount == 1
+    
+    @timed(DB_QUERY_SECONDS, query="leases.release")
+    def release(self, name: str, holder: str) -> None:
+        with self.pool.connection() as conn:
+            with conn.cursor() as cursor:
+                cursor.execute("DELETE FROM worker_leases WHERE name = %s AND holder = %s", (name, holder))
+    
+    @timed(DB_QUERY_SECONDS, query="leases.get")
+    def get(self, name: str) -> Optional[Mapping[str, Any]]:
+        with self.pool.connection() as conn:
+            with conn.cursor() as cursor:
+                cursor.execute("""
+                    SELECT name, holder, acquired_at, expires_at
+                    FROM worker_leases
+                    WHERE name = %s
+                """, (name,))
+                return cursor.fetchone()
+
+
+class PostgresVerificationRepository(VerificationRepository):
+
+    def __init__(self, pool):
+        self.pool = pool
+    
+    @timed(DB_QUERY_SECONDS, query="verifications.invalidate")
+    def invalidate(
+        self,
+        event_id: Optional[int] = None,
+        batch_id: Optional[str] = None,
+        batch_root: Optional[str] = None
+    ) -> None:
+        with self.pool.connection() as conn:
+            with conn.cursor() as cursor:
+                cursor.execute("SELECT pg_advisory_xact_lock(%s)", (VERIFICATION_LOCK_KEY,))
+                if event_id is None and batch_id is None and batch_root is None:
+                    # Invalidating everything supersedes the log so far
+                    cursor.execute("DELETE FROM verification_results")
+                    cursor.execute("DELETE FROM verification_invalidations")
+                else:
+                    cursor.execute("""
+                        DELETE FROM verification_results
+                        WHERE event_id = %s OR batch_id = %s OR batch_root = %s
+                    """, (event_id, batch_id, batch_root))
+                cursor.execute("""
+                    INSERT INTO verification_invalidations (event_id, batch_id, batch_root) VALUES (%s, %s, %s)
+                """, (event_id, batch_id, batch_root))
+    
+    @timed(DB_QUERY_SECONDS, query="verifications.invalidations_since")
+    def invalidations_since(self, after: int) -> List[Mapping[str, Any]]:
+        with self.pool.connection() as conn:
+            with conn.cursor() as cursor:
+                cursor.execute("""
+                    SELECT id, event_id, batch_id, batch_root
+                    FROM verification_invalidations
+                    WHERE id > %s
+                    ORDER BY id
+                """, (after,))
+                return cursor.fetchall()
+    
+    @timed(DB_QUERY_SECONDS, query="verifications.last_invalidation")
+    def last_invalidation(self) -> int:
+        with self.pool.connection() as conn:
+            with conn.cursor() as cursor:
+                # A full invalidation prunes older rows but keeps its own
+                cursor.execute("SELECT COALESCE(MAX(id), 0) AS id FROM verification_invalidations")
+                return cursor.fetchone()["id"]
+    
+    @timed(DB_QUERY_SECONDS, query="verifications.save")
+    def save(
+        self,
+        kind: str,
+        subject: str,
+        key: Sequence[Any],
+        batch_id: Optional[str],
+        result: str,
+        evicted: Optional[Tuple[str, str]] = None
+    ) -> None:
+        with self.pool.connection() as conn:
+            with conn.cursor() as cursor:
+                cursor.execute("""
+                    INSERT INTO verification_results (
+                        kind, subject, event_id, hash_version, metadata_hash, fields_digest, batch_root, state_root,
+                        anchor_id, block_hash, confirmation_status, batch_id, result
+                    )
+                    VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
+                    ON CONFLICT (kind, subject) DO UPDATE SET
+                        event_id = excluded.event_id,
+                        hash_version = excluded.hash_version,
+                        metadata_hash = excluded.metadata_hash,
+                        fields_digest = excluded.fields_digest,
+                        batch_root = excluded.batch_root,
+                        state_root = excluded.state_root,
+                        anchor_id = excluded.anchor_id,
+                        block_hash = excluded.block_hash,
+                        confirmation_status = excluded.confirmation_status,
+                        batch_id = excluded.batch_id,
+                        result = excluded.result,
+                        verified_at = excluded.verified_at
+                """, (kind, subject, *key, batch_id, result))
+                if evicted is not None:
+                    cursor.execute("DELETE FROM verification_results WHERE kind = %s AND subject = %s", evicted)
+    
+    @timed(DB_QUERY_SECONDS, query="verifications.load")
+    def load(self, limit: int) -> List[Mapping[str, Any]]:
+        with self.pool.connection() as conn:
+            with conn.cursor() as cursor:
+                cursor.execute("""
+                    SELECT kind, subject, event_id, hash_version, metadata_hash, fields_digest, batch_root, state_root,
+                           anchor_id, block_hash, confirmation_status, batch_id, result
+                    FROM verification_results
+                    ORDER BY verified_at DESC
+                    LIMIT %s
+                """, (limit,))
+                return cursor.fetchall()
+
+
+class PostgresStorage(Storage):
+    """Backend on a PostgreSQL server shared by all API replicas"""
+    
+    name = "postgres"
+    
+    def __init__(self, database_url: str):
+        if not PSYCOPG_AVAILABLE:
+            raise ImportError("PostgreSQL backend requires psycopg. Run: pip install \"psycopg[binary,pool]\"")
+        
+        self.pool = ConnectionPool(
+            database_url,
+            min_size=int(os.getenv("DATABASE_POOL_MIN", "1")),
+            max_size=int(os.getenv("DATABASE_POOL_MAX", "10")),
+            kwargs={"row_factory": dict_row},
+            open=True
+        )
+        self.events = PostgresEventRepository(self.pool)
+        self.batches = PostgresBatchRepository(self.pool)
+        self.anchors = PostgresAnchorRepository(self.pool)
+        self.state = PostgresStateRepository(self.pool)
+        self.leases = PostgresLeaseRepository(self.pool)
+        self.verifications = PostgresVerificationRepository(self.pool)
+    
+    def init_schema(self) -> None:
+        with self.pool.connection() as conn:
+            with conn.cursor() as cursor:
+                cursor.execute("""
+                    CREATE TABLE IF NOT EXISTS schema_version (
+                        version INTEGER PRIMARY KEY,
+                        description TEXT NOT NULL,
+                        applied_at TIMESTAMPTZ NOT NULL DEFAULT now()
+                    )
+                """)
+                conn.commit()
+                
+                # Re-checked under the lock in case another replica migrated first
+                cursor.execute("SELECT pg_advisory_xact_lock(%s)", (MIGRATION_LOCK_KEY,))
+                cursor.execute("SELECT COALESCE(MAX(version), 0) AS version FROM schema_version")
+                current = cursor.fetchone()["version"]
+                
+                for version, description, statements in MIGRATIONS:
+                    if version <= current:
+                        continue
+                    for statement in statements:
+                        cursor.execute(statement)
+                    cursor.execute("""
+                        INSERT INTO schema_version (version, description) VALUES (%s, %s)
+                    """, (version, description))
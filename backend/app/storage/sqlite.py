@@ -0,0 +1,822 @@
+"""
+SQLite storage backend - Single-file ledger (default)
+
+Besides the core tables, SQLite hosts the hash chain, the per-model state
+tree and the monthly partition archive, which are wired into these
+repositories.
+"""
+import time
+import sqlite3
+from array import array
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Mapping, Optional, Sequence, Tuple
+from app.database import get_db, iter_rows, DB_FETCH_SIZE
+from app.storage.base import (
+    Storage, EventRepository, BatchRepository, AnchorRepository, StateRepository, LeaseRepository,
+    VerificationRepository, DuplicateEvent, EVENT_FIELDS, EVENT_COLUMNS, claim_leaves, format_event_ids
+)
+from app.services.event_chain_service import CHAIN_COLUMNS, lock_chain_head
+from app.services.metrics_service import DB_QUERY_SECONDS, timed
+from app.services.hashing_service import compute_chain_hash
+from app.services.sparse_merkle_service import (
+    Node, get_state_checkpoint, get_state_proof, get_state_root, update_model_states
+)
+from app.services.lineage_service import update_lineage
+from app.services.partition_service import (
+    list_sealed_partitions, query_events, find_event, iter_events_in_range, event_table
+)
+
+
+class SQLiteEventRepository(EventRepository):
+
+    def _append(self, cursor, events: List[Dict[str, Any]]) -> List[int]:
+        # Link to the current chain head under the write lock
+        prev_chain_hash = lock_chain_head(cursor)
+        event_ids = []
+        
+        for event in events:
+            chain_hash = compute_chain_hash(prev_chain_hash, event["metadata_hash"])
+            
+            cursor.execute(f"""
+                INSERT INTO audit_events (
+                    {", ".join(EVENT_FIELDS)}, status, prev_chain_hash, chain_hash
+                )
+                VALUES ({", ".join("?" * (len(EVENT_FIELDS) + 3))})
+            """, [event.get(field) for field in EVENT_FIELDS] + ["Pending", prev_chain_hash, chain_hash])
+            
+            event_ids.append(cursor.lastrowid)
+            prev_chain_hash = chain_hash
+        
+        # Advance the per-model state tree and the lineage index in the same
+        # transaction, once for the whole group
+        update_model_states(cursor, [
+            (event["model_id"], event["event_type"], event_id, event["metadata_hash"])
+            for event, event_id in zip(events, event_ids)
+        ])
+        update_lineage(cursor, zip(events, event_ids))
+        
+        return event_ids
+    
+    def _insert(
+        self,
+        events: List[Dict[str, Any]],
+        idempotency_keys: Optional[Sequence[Optional[str]]] = None
+    ) -> List[Mapping[str, Any]]:
+        conn = get_db()
+        cursor = conn.cursor()
+        
+        try:
+            try:
+                event_ids = self._append(cursor, events)
+                if idempotency_keys:
+                    cursor.executemany("""
+                        INSERT INTO idempotency_keys (key, event_id) VALUES (?, ?)
+                    """, [(key, event_id) for key, event_id in zip(idempotency_keys, event_ids) if key])
+                conn.commit()
+            except Exception:
+                # Release the write lock now; close() is deferred while the
+                # failed statement is still referenced by the traceback
+                conn.rollback()
+                raise
+            
+            cursor.execute(f"""
+                SELECT {EVENT_COLUMNS}
+                FROM audit_events
+                WHERE id BETWEEN ? AND ?
+                ORDER BY id
+            """, (event_ids[0], event_ids[-1]))
+            
+            return cursor.fetchall()
+        finally:
+            conn.close()
+    
+    @timed(DB_QUERY_SECONDS, query="events.insert")
+    def insert(self, event: Dict[str, Any], idempotency_key: Optional[str] = None) -> Mapping[str, Any]:
+        try:
+            return self._insert([event], [idempotency_key])[0]
+        except sqlite3.IntegrityError:
+            # Closing the connection rolled back; report what it collided with
+            existing = (
+                idempotency_key and self.find_by_idempotency_key(idempotency_key)
+            ) or self.find_by_hash(event["metadata_hash"])
+            if existing is None:
+                raise
+            raise DuplicateEvent(existing)
+    
+    @timed(DB_QUERY_SECONDS, query="events.insert_many")
+    def insert_many(
+        self,
+        events: List[Dict[str, Any]],
+        idempotency_keys: Optional[Sequence[Optional[str]]] = None
+    ) -> List[Mapping[str, Any]]:
+        return self._insert(events, idempotency_keys)
+    
+    @timed(DB_QUERY_SECONDS, query="events.get")
+    def get(self, event_id: int) -> Optional[Mapping[str, Any]]:
+        conn = get_db()
+        
+        try:
+            return find_event(conn, event_id, EVENT_COLUMNS)
+        finally:
+            conn.close()
+    
+    @timed(DB_QUERY_SECONDS, query="events.list")
+    def list(self, limit: int, offset: int) -> List[Mapping[str, Any]]:
+        conn = get_db()
+        cursor = conn.cursor()
+        
+        try:
+            # Newest events live in the hot table; sealed partitions are only
+            # attached once the requested page reaches past it, and partitions
+            # wholly covered by the offset are skipped using their catalog count
+            sources = [None] + list_sealed_partitions(cursor, descending=True)
+            rows = []
+            remaining_offset = offset
+            
+            for partition in sources:
+                if len(rows) >= limit:
+                    break
+                
+                if partition is not None and remaining_offset >= partition["event_count"]:
+                    remaining_offset -= partition["event_count"]
+                    continue
+                
+                fetched = query_events(conn, partition, f"""
+                    SELECT {EVENT_COLUMNS}
+                    FROM {{events}}
+                    ORDER BY created_at DESC
+                    LIMIT ? OFFSET ?
+                """, (limit - len(rows), remaining_offset))
+                
+                if not fetched and remaining_offset:
+                    cursor.execute("SELECT COUNT(*) as event_count FROM audit_events")
+                    remaining_offset = max(remaining_offset - cursor.fetchone()["event_count"], 0)
+                else:
+                    remaining_offset = 0
+                
+                rows.extend(fetched)
+            
+            return rows
+        finally:
+            conn.close()
+    
+    @timed(DB_QUERY_SECONDS, query="events.count_pending")
+    def count_pending(self) -> int:
+        conn = get_db()
+        cursor = conn.cursor()
+        
+        try:
+            cursor.execute("SELECT COUNT(*) as pending FROM audit_events WHERE status = 'Pending'")
+            return cursor.fetchone()["pending"]
+        finally:
+            conn.close()
+    
+    @timed(DB_QUERY_SECONDS, query="events.find_by_hash")
+    def find_by_hash(self, metadata_hash: str, include_sealed: bool = False) -> Optional[Mapping[str, Any]]:
+        conn = get_db()
+        cursor = conn.cursor()
+        
+        try:
+            cursor.execute(f"""
+                SELECT {EVENT_COLUMNS}
+                FROM audit_events
+                WHERE metadata_hash = ?
+                ORDER BY id
+                LIMIT 1
+            """, (metadata_hash,))
+            row = cursor.fetchone()
+            if row is not None or not include_sealed:
+                return row
+            
+            # Sealed partitions newest to oldest
+            for partition in list_sealed_partitions(cursor, descending=True):
+                rows = query_events(conn, partition, f"""
+                    SELECT {EVENT_COLUMNS}
+                    FROM {{events}}
+                    WHERE metadata_hash = ?
+                    ORDER BY id
+                    LIMIT 1
+                """, (metadata_hash,))
+                if rows:
+                    return rows[0]
+            return None
+        finally:
+            conn.close()
+    
+    @timed(DB_QUERY_SECONDS, query="events.find_by_idempotency_key")
+    def find_by_idempotency_key(self, idempotency_key: str) -> Optional[Mapping[str, Any]]:
+        conn = get_db()
+        cursor = conn.cursor()
+        
+        try:
+            cursor.execute("SELECT event_id FROM idempotency_keys WHERE key = ?", (idempotency_key,))
+            row = cursor.fetchone()
+            # The event may have moved to a sealed partition since
+            return find_event(conn, row["event_id"], EVENT_COLUMNS) if row else None
+        finally:
+            conn.close()
+    
+    def iter_hashes(self) -> Iterator[str]:
+        conn = get_db()
+        
+        try:
+            for row in iter_rows(conn.execute("SELECT metadata_hash FROM audit_events")):
+                yield row["metadata_hash"]
+        finally:
+            conn.close()
+    
+    def iter_chain(self) -> Iterator[Mapping[str, Any]]:
+        conn = get_db()
+        
+        try:
+            # Sealed partitions hold the oldest events, in id order
+            for partition in list_sealed_partitions(conn.cursor()) + [None]:
+                with event_table(conn, partition) as table:
+                    cursor = conn.cursor()
+                    try:
+                        cursor.execute(f"SELECT {CHAIN_COLUMNS} FROM {table} ORDER BY id")
+                        yield from iter_rows(cursor)
+                    finally:
+                        # Finish the statement so the partition can be detached
+                        cursor.close()
+        finally:
+            conn.close()
+
+
+class SQLiteBatchRepository(BatchRepository):
+
+    @timed(DB_QUERY_SECONDS, query="batches.seal")
+    def seal(
+        self,
+        batch_id: str,
+        event_ids: Optional[List[int]],
+        limit: int,
+        build_root: Callable[[Iterable[str]], str]
+    ) -> Optional[Tuple[str, int]]:
+        conn = get_db()
+        cursor = conn.cursor()
+        
+        try:
+            # Claim under the write lock so two builders never share events
+            cursor.execute("BEGIN IMMEDIATE")
+            
+            # Get event hashes (use merkle_leaf_hash if available, otherwise metadata_hash)
+            if event_ids:
+                placeholders = ','.join('?' * len(event_ids))
+                cursor.execute(f"""
+                    SELECT id, COALESCE(merkle_leaf_hash, metadata_hash) as leaf_hash
+                    FROM audit_events
+                    WHERE id IN ({placeholders}) AND (status = 'Pending' OR batch_id IS NULL)
+                    ORDER BY id
+                """, event_ids)
+            else:
+                cursor.execute("""
+                    SELECT id, COALESCE(merkle_leaf_hash, metadata_hash) as leaf_hash
+                    FROM audit_events
+                    WHERE status = 'Pending' OR batch_id IS NULL
+                    ORDER BY id
+                    LIMIT ?
+                """, (limit,))
+            
+            # Leaves are hashed as they are fetched; only the ids are kept
+            claimed_ids = array("q")
+            first_rows = cursor.fetchmany(DB_FETCH_SIZE)
+            if not first_rows:
+                conn.rollback()
+                return None
+            
+            merkle_root = build_root(claim_leaves(cursor, first_rows, claimed_ids))
+            
+            # Record the model state root alongside the batch it was sealed
+            # with, and the tree version that keeps it provable
+            state_root, state_version = get_state_checkpoint(cursor)
+            
+            cursor.execute("""
+                INSERT INTO merkle_batches (
+                    batch_id, merkle_root, event_ids, status, state_root, state_version,
+                    first_event_id, last_event_id, event_count
+                )
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+            """, (
+                batch_id, merkle_root, format_event_ids(claimed_ids), "Pending", state_root, state_version,
+                claimed_ids[0], claimed_ids[-1], len(claimed_ids)
+            ))
+            
+            cursor.executemany("""
+                UPDATE audit_events
+                SET status = 'Batched', batch_id = ?
+                WHERE id = ?
+            """, ((batch_id, event_id) for event_id in claimed_ids))
+            
+            conn.commit()
+            return merkle_root, len(claimed_ids)
+        finally:
+            conn.close()
+    
+    def leaves(self, batch_id: str) -> Iterator[Tuple[int, str]]:
+        conn = get_db()
+        
+        try:
+            bounds = conn.execute("""
+                SELECT first_event_id, last_event_id FROM merkle_batches WHERE batch_id = ?
+            """, (batch_id,)).fetchone()
+            if bounds is None:
+                return
+            
+            # The batch may span the hot table and sealed partitions; only
+            # those overlapping its id range are attached
+            for row in iter_events_in_range(conn, bounds["first_event_id"], bounds["last_event_id"], """
+                SELECT id, COALESCE(merkle_leaf_hash, metadata_hash) as leaf_hash
+                FROM {events}
+                WHERE batch_id = ?
+                ORDER BY id
+            """, (batch_id,)):
+                yield row["id"], row["leaf_hash"]
+        finally:
+            conn.close()
+    
+    @timed(DB_QUERY_SECONDS, query="batches.set_status")
+    def set_status(self, batch_id: str, status: str, event_status: Optional[str] = None) -> None:
+        conn = get_db()
+        cursor = conn.cursor()
+        
+        try:
+            cursor.execute("""
+                UPDATE merkle_batches
+                SET status = ?
+                WHERE batch_id = ?
+            """, (status, batch_id))
+            
+            if event_status:
+                cursor.execute("""
+                    UPDATE audit_events
+                    SET status = ?
+                    WHERE batch_id = ?
+                """, (event_status, batch_id))
+            
+            conn.commit()
+        finally:
+            conn.close()
+    
+    @timed(DB_QUERY_SECONDS, query="batches.transition")
+    def transition(self, batch_id: str, from_status: str, to_status: str) -> bool:
+        conn = get_db()
+        cursor = conn.cursor()
+        
+        try:
+            cursor.execute("""
+                UPDATE merkle_batches
+                SET status = ?
+                WHERE batch_id = ? AND status = ?
+            """, (to_status, batch_id, from_status))
+            conn.commit()
+            return cursor.rowcount == 1
+        finally:
+            conn.close()
+    
+    @timed(DB_QUERY_SECONDS, query="batches.claim")
+    def claim(self, batch_id: str, from_status: str, to_status: str, holder: str, lease_seconds: float) -> bool:
+        conn = get_db()
+        cursor = conn.cursor()
+        now = time.time()
+        
+        try:
+            # Batches leased before versioning (no expiry) count as expired
+            cursor.execute("""
+                UPDATE merkle_batches
+                SET status = ?, lease_holder = ?, lease_expires_at = ?
+                WHERE batch_id = ?
+                  AND (status = ? OR (status = ? AND COALESCE(lease_expires_at, 0) < ?))
+            """, (to_status, holder, now + lease_seconds, batch_id, from_status, to_status, now))
+            conn.commit()
+            return cursor.rowcount == 1
+        finally:
+            conn.close()
+    
+    @timed(DB_QUERY_SECONDS, query="batches.queue")
+    def queue(self, batch_id: str, urgent: bool = False) -> None:
+        conn = get_db()
+        cursor = conn.cursor()
+        
+        try:
+            cursor.execute("""
+                UPDATE merkle_batches
+                SET status = 'Queued', urgent = ?
+                WHERE batch_id = ?
+            """, (int(urgent), batch_id))
+            conn.commit()
+        finally:
+            conn.close()
+    
+    @timed(DB_QUERY_SECONDS, query="batches.get")
+    def get(self, batch_id: str) -> Optional[Mapping[str, Any]]:
+        conn = get_db()
+        cursor = conn.cursor()
+        
+        try:
+            cursor.execute("""
+                SELECT batch_id, merkle_root, event_count, status, state_root, state_version, created_at
+                FROM merkle_batches
+                WHERE batch_id = ?
+            """, (batch_id,))
+            return cursor.fetchone()
+        finally:
+            conn.close()
+    
+    @timed(DB_QUERY_SECONDS, query="batches.list")
+    def list(self) -> List[Mapping[str, Any]]:
+        conn = get_db()
+        cursor = conn.cursor()
+        
+        try:
+            cursor.execute("""
+                SELECT batch_id, merkle_root, event_count, status, state_root, created_at
+                FROM merkle_batches
+                ORDER BY created_at DESC
+            """)
+            return cursor.fetchall()
+        finally:
+            conn.close()
+    
+    @timed(DB_QUERY_SECONDS, query="batches.list_by_status")
+    def list_by_status(self, status: str) -> List[Mapping[str, Any]]:
+        conn = get_db()
+        cursor = conn.cursor()
+        
+        try:
+            cursor.execute("""
+                SELECT batch_id, merkle_root, event_count, status, state_root, created_at,
+                       lease_holder, lease_expires_at, urgent
+                FROM merkle_batches
+                WHERE status = ?
+                ORDER BY created_at, id
+            """, (status,))
+            return cursor.fetchall()
+        finally:
+            conn.close()
+    
+    @timed(DB_QUERY_SECONDS, query="batches.count_unanchored")
+    def count_unanchored(self) -> int:
+        conn = get_db()
+        cursor = conn.cursor()
+        
+        try:
+            cursor.execute("SELECT COUNT(*) as unanchored FROM merkle_batches WHERE status != 'Anchored'")
+            return cursor.fetchone()["unanchored"]
+        finally:
+            conn.close()
+
+
+class SQLiteAnchorRepository(AnchorRepository):
+
+    @timed(DB_QUERY_SECONDS, query="anchors.record")
+    def record(
+        self,
+        merkle_root: str,
+        timestamp: str,
+        batch_id: Optional[str],
+        anchor_id: Optional[int] = None,
+        block_hash: Optional[str] = None,
+        transaction_id: Optional[str] = None,
+        block_number: Optional[int] = None,
+        event_count: Optional[int] = None,
+        gas_used: Optional[int] = None,
+        effective_gas_price: Optional[int] = None
+    ) -> None:
+        conn = get_db()
+        cursor = conn.cursor()
+        
+        try:
+            cursor.execute("""
+                INSERT INTO blockchain_anchors (
+                    anchor_id, merkle_root, timestamp, block_hash, transaction_id, batch_id, block_number,
+                    event_count, gas_used, effective_gas_price
+                )
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            """, (
+                anchor_id, merkle_root, timestamp, block_hash, transaction_id, batch_id, block_number,
+                event_count, gas_used, effective_gas_price
+            ))
+            conn.commit()
+        finally:
+            conn.close()
+    
+    @timed(DB_QUERY_SECONDS, query="anchors.next_simulated_id")
+    def next_simulated_id(self) -> int:
+        conn = get_db()
+        cursor = conn.cursor()
+        
+        try:
+            cursor.execute("SELECT MAX(anchor_id) as max_id FROM blockchain_anchors")
+            return (cursor.fetchone()["max_id"] or 0) + 1
+        finally:
+            conn.close()
+    
+    @timed(DB_QUERY_SECONDS, query="anchors.get")
+    def get(self, anchor_id: int) -> Optional[Mapping[str, Any]]:
+        conn = get_db()
+        cursor = conn.cursor()
+        
+        try:
+            cursor.execute("""
+                SELECT anchor_id, merkle_root, timestamp, batch_id, block_hash,
+                       transaction_id, block_number, confirmations, confirmation_status
+                FROM blockchain_anchors
+                WHERE anchor_id = ?
+                ORDER BY COALESCE(confirmation_status, '') = 'Orphaned', id DESC
+                LIMIT 1
+            """, (anchor_id,))
+            return cursor.fetchone()
+        finally:
+            conn.close()
+    
+    @timed(DB_QUERY_SECONDS, query="anchors.latest_for_batch")
+    def latest_for_batch(self, batch_id: str, merkle_root: str) -> Optional[Mapping[str, Any]]:
+        conn = get_db()
+        cursor = conn.cursor()
+        
+        try:
+            cursor.execute("""
+                SELECT anchor_id, transaction_id as transaction_hash, block_number, block_hash, merkle_root,
+                       confirmations, confirmation_status
+                FROM blockchain_anchors
+                WHERE (batch_id = ? OR merkle_root = ?)
+                  AND COALESCE(confirmation_status, '') != 'Orphaned'
+                ORDER BY created_at DESC, id DESC
+                LIMIT 1
+            """, (batch_id, merkle_root))
+            return cursor.fetchone()
+        finally:
+            conn.close()
+    
+    @timed(DB_QUERY_SECONDS, query="anchors.list_unconfirmed")
+    def list_unconfirmed(self) -> List[Mapping[str, Any]]:
+        conn = get_db()
+        cursor = conn.cursor()
+        
+        try:
+            cursor.execute("""
+                SELECT id, anchor_id, batch_id, merkle_root, transaction_id, block_number, block_hash,
+                       confirmations, confirmation_status
+                FROM blockchain_anchors
+                WHERE block_hash IS NOT NULL
+                  AND (confirmation_status IS NULL OR confirmation_status = 'Confirming')
+                ORDER BY block_number
+            """)
+            return cursor.fetchall()
+        finally:
+            conn.close()
+    
+    @timed(DB_QUERY_SECONDS, query="anchors.update_confirmations")
+    def update_confirmations(self, updates: List[Tuple[int, int, str, int, str]]) -> None:
+        if not updates:
+            return
+        conn = get_db()
+        cursor = conn.cursor()
+        
+        try:
+            cursor.executemany("""
+                UPDATE blockchain_anchors
+                SET block_number = ?, block_hash = ?, confirmations = ?, confirmation_status = ?
+                WHERE id = ?
+            """, [(number, block_hash, depth, status, row_id) for row_id, number, block_hash, depth, status in updates])
+            conn.commit()
+        finally:
+            conn.close()
+    
+    @timed(DB_QUERY_SECONDS, query="anchors.update_anchor_ids")
+    def update_anchor_ids(self, updates: List[Tuple[int, int]]) -> None:
+        if not updates:
+            return
+        conn = get_db()
+        cursor = conn.cursor()
+        
+        try:
+            cursor.executemany("""
+                UPDATE blockchain_anchors
+                SET anchor_id = ?
+                WHERE id = ?
+            """, [(anchor_id, row_id) for row_id, anchor_id in updates])
+            conn.commit()
+        finally:
+            conn.close()
+    
+    @timed(DB_QUERY_SECONDS, query="anchors.cost_summary")
+    def cost_summary(self) -> Mapping[str, Any]:
+        conn = get_db()
+        cursor = conn.cursor()
+        
+        try:
+            # Gas figures are only known for on-chain anchors
+            cursor.execute("""
+                SELECT COUNT(*) as anchors,
+                       COALESCE(SUM(event_count), 0) as anchored_events,
+                       COALESCE(SUM(gas_used), 0) as gas_used,
+                       COALESCE(SUM(gas_used * effective_gas_price), 0) as cost_wei
+                FROM blockchain_anchors
+                WHERE gas_used IS NOT NULL
+            """)
+            return cursor.fetchone()
+        finally:
+            conn.close()
+
+
+class SQLiteStateRepository(StateRepository):
+
+    @timed(DB_QUERY_SECONDS, query="state.root")
+    def root(self) -> Tuple[str, int]:
+        conn = get_db()
+        cursor = conn.cursor()
+        
+        try:
+            # One read transaction, so both see the same commit
+            cursor.execute("BEGIN")
+            cursor.execute("SELECT COUNT(*) as key_count FROM model_state")
+            key_count = cursor.fetchone()["key_count"]
+            return get_state_root(cursor), key_count
+        finally:
+            conn.close()
+    
+    @timed(DB_QUERY_SECONDS, query="state.proof")
+    def proof(self, key_hash: str, version: Optional[int] = None) -> Tuple[str, Dict[int, str], Optional[Node]]:
+        conn = get_db()
+        cursor = conn.cursor()
+        
+        try:
+            cursor.execute("BEGIN")
+            proof, leaf = get_state_proof(cursor, key_hash, version)
+            return get_state_root(cursor, version), proof, leaf
+        finally:
+            conn.close()
+
+
+class SQLiteLeaseRepository(LeaseRepository):
+
+    @timed(DB_QUERY_SECONDS, query="leases.acquire")
+    def acquire(self, name: str, holder: str, lease_seconds: float) -> bool:
+        conn = get_db()
+        cursor = conn.cursor()
+        now = time.time()
+        
+        try:
+            # The update only applies when renewing or taking over an expired lease
+            cursor.execute("""
+                INSERT INTO worker_leases (name, holder, expires_at, acquired_at)
+                VALUES (?, ?, ?, ?)
+                ON CONFLICT (name) DO UPDATE SET
+                    holder = excluded.holder,
+                    expires_at = excluded.expires_at,
+                    acquired_at = CASE WHEN worker_leases.holder = excluded.holder
+                                       THEN worker_leases.acquired_at ELSE excluded.acquired_at END
+                WHERE worker_leases.holder = excluded.holder OR worker_leases.expires_at < ?
+            """, (name, holder, now + lease_seconds, now, now))
+            conn.commit()
+            return cursor.rowcount == 1
+        finally:
+            conn.close()
+    
+    @timed(DB_QUERY_SECONDS, query="leases.release")
+    def release(self, name: str, holder: str) -> None:
+        conn = get_db()
+        cursor = conn.cursor()
+        
+        try:
+            cursor.execute("DELETE FROM worker_leases WHERE name = ? AND holder = ?", (name, holder))
+            conn.commit()
+        finally:
+            conn.close()
+    
+    @timed(DB_QUERY_SECONDS, query="leases.get")
+    def get(self, name: str) -> Optional[Mapping[str, Any]]:
+        conn = get_db()
+        cursor = conn.cursor()
+        
+        try:
+            cursor.execute("""
+                SELECT name, holder, acquired_at, expires_at
+                FROM worker_leases
+                WHERE name = ?
+            """, (name,))
+            return cursor.fetchone()
+        finally:
+            conn.close()
+
+
+class SQLiteVerificationRepository(VerificationRepository):
+
+    @timed(DB_QUERY_SECONDS, query="verifications.invalidate")
+    def invalidate(
+        self,
+        event_id: Optional[int] = None,
+        batch_id: Optional[str] = None,
+        batch_root: Optional[str] = None
+    ) -> None:
+        conn = get_db()
+        cursor = conn.cursor()
+        
+        try:
+            if event_id is None and batch_id is None and batch_root is None:
+                # Invalidating everything supersedes the log so far
+                cursor.execute("DELETE FROM verification_results")
+                cursor.execute("DELETE FROM verification_invalidations")
+            else:
+                cursor.execute("""
+                    DELETE FROM verification_results
+                    WHERE event_id = ? OR batch_id = ? OR batch_root = ?
+                """, (event_id, batch_id, batch_root))
+            cursor.execute("""
+                INSERT INTO verification_invalidations (event_id, batch_id, batch_root) VALUES (?, ?, ?)
+            """, (event_id, batch_id, batch_root))
+            conn.commit()
+        finally:
+            conn.close()
+    
+    @timed(DB_QUERY_SECONDS, query="verifications.invalidations_since")
+    def invalidations_since(self, after: int) -> List[Mapping[str, Any]]:
+        conn = get_db()
+        cursor = conn.cursor()
+        
+        try:
+            cursor.execute("""
+                SELECT id, event_id, batch_id, batch_root
+                FROM verification_invalidations
+                WHERE id > ?
+                ORDER BY id
+            """, (after,))
+            return cursor.fetchall()
+        finally:
+            conn.close()
+    
+    @timed(DB_QUERY_SECONDS, query="verifications.last_invalidation")
+    def last_invalidation(self) -> int:
+        conn = get_db()
+        cursor = conn.cursor()
+        
+        try:
+            # A full invalidation prunes older rows but keeps its own
+            cursor.execute("SELECT COALESCE(MAX(id), 0) as id FROM verification_invalidations")
+            return cursor.fetchone()["id"]
+        finally:
+            conn.close()
+    
+    @timed(DB_QUERY_SECONDS, query="verifications.save")
+    def save(
+        self,
+        kind: str,
+        subject: str,
+        key: Sequence[Any],
+        batch_id: Optional[str],
+        result: str,
+        evicted: Optional[Tuple[str, str]] = None
+    ) -> None:
+        conn = get_db()
+        cursor = conn.cursor()
+        
+        try:
+            cursor.execute("""
+                INSERT OR REPLACE INTO verification_results (
+                    kind, subject, event_id, hash_version, metadata_hash, fields_digest, batch_root, state_root,
+                    anchor_id, block_hash, confirmation_status, batch_id, result
+                )
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            """, (kind, subject, *key, batch_id, result))
+            if evicted is not None:
+                cursor.execute("DELETE FROM verification_results WHERE kind = ? AND subject = ?", evicted)
+            conn.commit()
+        finally:
+            conn.close()
+    
+    @timed(DB_QUERY_SECONDS, query="verifications.load")
+    def load(self, limit: int) -> List[Mapping[str, Any]]:
+        conn = get_db()
+        cursor = conn.cursor()
+        
+        try:
+            cursor.execute("""
+                SELECT kind, subject, event_id, hash_version, metadata_hash, fields_digest, batch_root, state_root,
+                       anchor_id, block_hash, confirmation_status, batch_id, result
+                FROM verification_results
+                ORDER BY verified_at DESC, rowid DESC
+                LIMIT ?
+            """, (limit,))
+            return cursor.fetchall()
+        finally:
+            conn.close()
+
+
+class SQLiteStorage(Storage):
+    """Default backend on the local auditchain.db file"""
+    
+    name = "sqlite"
+    
+    def __init__(self):
+        self.events = SQLiteEventRepository()
+        self.batches = SQLiteBatchRepository()
+        self.anchors = SQLiteAnchorRepository()
+        self.state = SQLiteStateRepository()
+        self.leases = SQLiteLeaseRepository()
+        self.verifications = SQLiteVerificationRepository()
+    
+    def init_schema(self) -> None:
+        # Tables live in the same file as the node-local indexes, which
+        # init_db already creates at startup
+        pass
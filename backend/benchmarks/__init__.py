@@ -0,0 +1,8 @@
+"""
+AuditChain benchmark suite
+
+Run from the backend directory:
+
+    python -m benchmarks --scale 1k
+    python -m benchmarks.compare baseline.json candidate.json
+"""
@@ -0,0 +1,74 @@
+"""
+Run the benchmark suite against a fresh, isolated ledger
+
+    python -m benchmarks --scale 100k --ops 1000 --output results.json
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m benchmarks", description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--scale", default="1k", help="Ledger size: 1k, 100k, 1m or an event count (default: 1k)")
+    parser.add_argument("--ops", type=int, default=1000, help="Operations per latency case (default: 1000)")
+    parser.add_argument("--seed", type=int, default=42, help="Synthetic data seed (default: 42)")
+    parser.add_argument("--case", action="append", help="Run only this case (repeatable)")
+    parser.add_argument("--output", type=Path, help="Result file (default: benchmarks/results/<commit>-<scale>.json)")
+    parser.add_argument("--workdir", type=Path, help="Directory for the benchmark database (default: a temp dir)")
+    args = parser.parse_args(argv)
+    
+    # Point the app at a throwaway database before anything derives paths
+    # from it. The suite always measures the default SQLite backend and
+    # anchors on the simulated chain. Ingest cases come from one producer,
+    # so its rate limit is off.
+    os.environ.pop("DATABASE_URL", None)
+    os.environ["BLOCKCHAIN_BACKEND"] = "simulated"
+    os.environ["INGEST_RATE_LIMIT"] = "0"
+    workdir = args.workdir or Path(tempfile.mkdtemp(prefix="auditchain-bench-"))
+    workdir.mkdir(parents=True, exist_ok=True)
+    
+    import app.database as database
+    database.DB_PATH = workdir / "auditchain.db"
+    if database.DB_PATH.exists():
+        print(f"Refusing to reuse existing database {database.DB_PATH}", file=sys.stderr)
+        return 2
+    
+    from benchmarks.dataset import parse_scale, seed_ledger
+    from benchmarks.harness import environment, write_results, format_table
+    from benchmarks.cases import CASES, Context
+    from app.storage import get_storage
+    
+    scale = parse_scale(args.scale)
+    selected = args.case or list(CASES)
+    unknown = [name for name in selected if name not in CASES]
+    if unknown:
+        parser.error(f"unknown case(s): {', '.join(unknown)}; choose from {', '.join(CASES)}")
+    
+    database.init_db()
+    
+    start = time.perf_counter()
+    leaf_hashes = seed_ledger(scale, args.seed)
+    print(f"Seeded {scale} events in {time.perf_counter() - start:.1f}s ({database.DB_PATH})")
+    
+    ctx = Context(scale, args.seed, args.ops, leaf_hashes)
+    results = {}
+    for name in selected:
+        start = time.perf_counter()
+        results[name] = CASES[name](ctx)
+        print(f"  {name}: {time.perf_counter() - start:.1f}s")
+    
+    meta = environment(scale, args.seed, get_storage().name)
+    meta["ops"] = args.ops
+    output = write_results(meta, results, args.output)
+    
+    print(format_table(results))
+    print(f"Results written to {output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,384 @@
+"""
+Benchmark cases
+
+Each case takes the shared run context and returns the summary produced by
+harness.measure. Cases that go through HTTP use the in-process ASGI app, so
+the numbers include routing, validation and serialization but no network.
+"""
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+from fastapi.responses import JSONResponse
+from fastapi.testclient import TestClient
+from pydantic import TypeAdapter
+from app.main import app
+from app.database import get_db
+from app.models import EventResponse
+from app.routers.events import EVENT_SERIALIZER
+from app.services.blockchain_service import get_blockchain_service
+from app.services.hashing_service import (
+    hash_metadata, hash_event, HASH_VERSION_JSON, HASH_VERSION_LENGTH_PREFIXED, CURRENT_HASH_VERSION
+)
+from app.services.merkle_service import (
+    build_merkle_tree, get_merkle_proof, get_merkle_multiproof, verify_merkle_multiproof,
+    stream_merkle_root
+)
+from app.services.ingest_service import get_ingest_queue
+from app.storage import get_storage
+from benchmarks.dataset import synthetic_events, metadata_for, FRAMEWORKS
+from benchmarks.harness import measure, summarize
+
+INGEST_CONCURRENCY = (1, 4, 16, 64)
+MULTIPROOF_LEAVES = 64
+SERIALIZE_ROWS = 1000
+FULL_PASS_REPEAT = 3
+STARTUP_REPEAT = 5
+WARMUP = 10
+
+
+class Context:
+    """State shared by the cases of one run"""
+    
+    def __init__(self, scale: int, seed: int, ops: int, leaf_hashes: List[str]):
+        self.scale = scale
+        self.seed = seed
+        self.ops = ops
+        self.rng = random.Random(seed)
+        self.client = TestClient(app)
+        self.leaf_hashes = leaf_hashes
+        self._tree = None
+    
+    @property
+    def tree(self):
+        if self._tree is None:
+            self._tree = build_merkle_tree(self.leaf_hashes)
+        return self._tree
+    
+    def random_event_id(self) -> int:
+        return self.rng.randint(1, self.scale)
+
+
+def bench_hash_metadata(ctx: Context) -> Dict[str, Any]:
+    metadata = [metadata_for(event) for event in synthetic_events(ctx.ops, ctx.seed, start=ctx.scale)]
+    return measure(lambda i: hash_metadata(metadata[i]), ctx.ops)
+
+
+def bench_hash_event(version: int) -> Callable[[Context], Dict[str, Any]]:
+    def bench(ctx: Context) -> Dict[str, Any]:
+        events = list(synthetic_events(ctx.ops, ctx.seed, start=ctx.scale))
+        return measure(lambda i: hash_event(events[i], version), ctx.ops)
+    return bench
+
+
+def _event_rows(ctx: Context):
+    conn = get_db()
+    try:
+        return conn.execute(
+            "SELECT * FROM audit_events ORDER BY id LIMIT ?", (min(SERIALIZE_ROWS, ctx.scale),)
+        ).fetchall()
+    finally:
+        conn.close()
+
+
+def bench_serialize_models(ctx: Context) -> Dict[str, Any]:
+    # What a List[EventResponse] endpoint used to cost: a model per row, then
+    # FastAPI's response_model validation, JSON-mode dump and json.dumps
+    rows = _event_rows(ctx)
+    adapter = TypeAdapter(List[EventResponse])
+    ops = max(ctx.ops // 10, 1)
+    
+    def serialize(i):
+        models = [EventResponse(**{**dict(row), "status": row["status"] or "Pending"}) for row in rows]
+        validated = adapter.validate_python(models, from_attributes=True)
+        return JSONResponse(adapter.dump_python(validated, mode="json")).body
+    
+    return measure(serialize, ops, items_per_op=len(rows))
+
+
+def bench_serialize_rows(ctx: Context) -> Dict[str, Any]:
+    rows = _event_rows(ctx)
+    ops = max(ctx.ops // 10, 1)
+    return measure(lambda i: EVENT_SERIALIZER.list_response(rows).body, ops, items_per_op=len(rows))
+
+
+def bench_list_events(ctx: Context) -> Dict[str, Any]:
+    ops = max(ctx.ops // 10, 1)
+    
+    def list_events(i):
+        response = ctx.client.get("/events", params={"limit": SERIALIZE_ROWS})
+        response.raise_for_status()
+    
+    return measure(list_events, ops, items_per_op=min(SERIALIZE_ROWS, ctx.scale))
+
+
+def bench_search_events(selective: bool) -> Callable[[Context], Dict[str, Any]]:
+    def bench(ctx: Context) -> Dict[str, Any]:
+        ops = max(ctx.ops // 10, 1)
+        
+        def search(i):
+            if selective:
+                # Summaries carry their event index, so this matches one event
+                params = {"q": f"benchmark event {ctx.rng.randrange(ctx.scale)}"}
+            else:
+                params = {"q": "synthetic", "framework": ctx.rng.choice(FRAMEWORKS)}
+            response = ctx.client.get("/events/search", params=params)
+            response.raise_for_status()
+        
+        return measure(search, ops)
+    
+    return bench
+
+
+def bench_merkle_build(ctx: Context) -> Dict[str, Any]:
+    return measure(
+        lambda i: build_merkle_tree(ctx.leaf_hashes), FULL_PASS_REPEAT,
+        items_per_op=len(ctx.leaf_hashes)
+    )
+
+
+def bench_merkle_stream_build(ctx: Context) -> Dict[str, Any]:
+    return measure(
+        lambda i: stream_merkle_root(iter(ctx.leaf_hashes)), FULL_PASS_REPEAT,
+        items_per_op=len(ctx.leaf_hashes)
+    )
+
+
+def bench_merkle_proof(ctx: Context) -> Dict[str, Any]:
+    _, levels = ctx.tree
+    indices = [ctx.rng.randrange(len(ctx.leaf_hashes)) for _ in range(ctx.ops)]
+    return measure(lambda i: get_merkle_proof(levels, indices[i], ctx.leaf_hashes[indices[i]]), ctx.ops)
+
+
+def _multiproof_samples(ctx: Context, count: int):
+    leaf_count = len(ctx.leaf_hashes)
+    return [
+        sorted(ctx.rng.sample(range(leaf_count), min(MULTIPROOF_LEAVES, leaf_count)))
+        for _ in range(count)
+    ]
+
+
+def bench_merkle_multiproof(ctx: Context) -> Dict[str, Any]:
+    _, levels = ctx.tree
+    ops = max(ctx.ops // 10, 1)
+    samples = _multiproof_samples(ctx, ops)
+    return measure(lambda i: get_merkle_multiproof(levels, samples[i]), ops, items_per_op=MULTIPROOF_LEAVES)
+
+
+def bench_verify_multiproof(ctx: Context) -> Dict[str, Any]:
+    root, levels = ctx.tree
+    ops = max(ctx.ops // 10, 1)
+    proofs = []
+    for indices in _multiproof_samples(ctx, ops):
+        leaves = [(index, ctx.leaf_hashes[index]) for index in indices]
+        proofs.append((leaves, get_merkle_multiproof(levels, indices)))
+    
+    def verify(i):
+        leaves, proof = proofs[i]
+        if not verify_merkle_multiproof(leaves, proof, len(ctx.leaf_hashes), root):
+            raise AssertionError("multiproof did not verify")
+    
+    return measure(verify, ops, items_per_op=MULTIPROOF_LEAVES)
+
+
+def bench_verify_event(ctx: Context) -> Dict[str, Any]:
+    event_ids = [ctx.random_event_id() for _ in range(ctx.ops + WARMUP)]
+    
+    def verify(i):
+        response = ctx.client.post("/verify", json={"event_id": event_ids[i]})
+        response.raise_for_status()
+    
+    return measure(verify, ctx.ops, warmup=WARMUP)
+
+
+def bench_verify_chain(ctx: Context) -> Dict[str, Any]:
+    def verify(i):
+        response = ctx.client.get("/verify/chain")
+        response.raise_for_status()
+        if not response.json()["valid"]:
+            raise AssertionError(f"chain did not verify: {response.json()}")
+    
+    return measure(verify, FULL_PASS_REPEAT, items_per_op=ctx.scale)
+
+
+def bench_create_event(ctx: Context) -> Dict[str, Any]:
+    payloads = list(synthetic_events(ctx.ops + WARMUP, ctx.seed + 1, start=ctx.scale))
+    
+    def create(i):
+        response = ctx.client.post("/events", json=payloads[i])
+        response.raise_for_status()
+    
+    return measure(create, ctx.ops, warmup=WARMUP)
+
+
+def bench_retry_event(ctx: Context) -> Dict[str, Any]:
+    # Every retry is answered from the dedup cache without an insert
+    payload = next(synthetic_events(1, ctx.seed + 2, start=ctx.scale + ctx.ops + WARMUP))
+    headers = {"Idempotency-Key": f"bench-{ctx.seed}"}
+    ctx.client.post("/events", json=payload, headers=headers).raise_for_status()
+    
+    def retry(i):
+        response = ctx.client.post("/events", json=payload, headers=headers)
+        response.raise_for_status()
+    
+    return measure(retry, ctx.ops, warmup=WARMUP)
+
+
+def _stored_records(ctx: Context, offset: int) -> List[Dict[str, Any]]:
+    """Hashed events as create_event hands them to storage, distinct per case"""
+    records = []
+    for payload in synthetic_events(ctx.ops, ctx.seed + 3, start=ctx.scale + offset * ctx.ops):
+        metadata_hash = hash_event(payload, CURRENT_HASH_VERSION)
+        records.append(dict(
+            payload, metadata_hash=metadata_hash, merkle_leaf_hash=metadata_hash, hash_version=CURRENT_HASH_VERSION
+        ))
+    return records
+
+
+def bench_concurrent_ingest(workers: int, grouped: bool) -> Callable[[Context], Dict[str, Any]]:
+    # Storage-level write path without the in-process HTTP client, whose own
+    # per-request cost would cap throughput before the database does
+    def bench(ctx: Context) -> Dict[str, Any]:
+        offset = 2 * INGEST_CONCURRENCY.index(workers) + grouped
+        records = _stored_records(ctx, offset)
+        queue = get_ingest_queue()
+        events = get_storage().events
+        before = queue.stats()
+        
+        def store(record) -> Optional[float]:
+            started = time.perf_counter()
+            try:
+                if grouped:
+                    queue.submit(record).result()
+                else:
+                    events.insert(record)
+            except Exception:
+                # Lock timeouts under contention are part of the result
+                return None
+            return time.perf_counter() - started
+        
+        # Latency per stored event; throughput from the wall clock of the whole level
+        started = time.perf_counter()
+        with ThreadPoolExecutor(workers) as pool:
+            outcomes = list(pool.map(store, records))
+        elapsed = time.perf_counter() - started
+        
+        samples = [sample for sample in outcomes if sample is not None]
+        result = summarize(samples)
+        result.update(
+            concurrency=workers,
+            errors=len(outcomes) - len(samples),
+            wall_s=round(elapsed, 6),
+            ops_per_s=round(len(samples) / elapsed, 3),
+            items_per_s=round(len(samples) / elapsed, 3)
+        )
+        if grouped:
+            after = queue.stats()
+            result.update(
+                average_group_size=round(
+                    (after["committed"] - before["committed"]) / max(after["groups"] - before["groups"], 1), 2
+                ),
+                max_delay_ms=after["max_delay_ms"],
+                batch_size=after["batch_size"]
+            )
+        return result
+    
+    return bench
+
+
+def bench_build_batch(ctx: Context) -> Dict[str, Any]:
+    # Seals the oldest pending events (streamed root, no proofs) and anchors
+    # in simulated mode
+    ops = max(ctx.ops // 10, 1)
+    
+    def build(i):
+        response = ctx.client.post("/merkle/build", json={})
+        response.raise_for_status()
+    
+    return measure(build, ops)
+
+
+def bench_simulated_anchor(ctx: Context) -> Dict[str, Any]:
+    service = get_blockchain_service()
+    roots = [f"{ctx.rng.getrandbits(256):064x}" for _ in range(ctx.ops)]
+    return measure(lambda i: service.anchor_merkle_root(roots[i], f"bench_{uuid.uuid4().hex[:8]}"), ctx.ops)
+
+
+def _startup_runs(db_path: Path, fresh: bool) -> Dict[str, Any]:
+    """
+    Launch the app in new interpreters and time process start to first
+    response, broken down by phase
+    """
+    env = dict(os.environ)
+    env.pop("DATABASE_URL", None)
+    samples = []
+    phases: Dict[str, List[float]] = {}
+    
+    for _ in range(STARTUP_REPEAT):
+        if fresh:
+            db_path.unlink(missing_ok=True)
+        start = time.perf_counter()
+        output = subprocess.run(
+            [sys.executable, "-m", "benchmarks.startup_probe", str(db_path)],
+            capture_output=True, text=True, check=True, env=env,
+            cwd=Path(__file__).resolve().parent.parent
+        ).stdout
+        samples.append(time.perf_counter() - start)
+        
+        timings = json.loads(output.strip().splitlines()[-1])
+        for phase, value in timings.items():
+            phases.setdefault(phase, []).append(value)
+    
+    result = summarize(samples)
+    for phase, values in phases.items():
+        result[f"{phase}_p50"] = sorted(values)[len(values) // 2]
+    return result
+
+
+def bench_startup_cold(ctx: Context) -> Dict[str, Any]:
+    # Empty database: every schema migration runs
+    with tempfile.TemporaryDirectory(prefix="auditchain-startup-") as tmp:
+        return _startup_runs(Path(tmp) / "auditchain.db", fresh=True)
+
+
+def bench_startup_warm(ctx: Context) -> Dict[str, Any]:
+    # Database already at the latest schema version
+    with tempfile.TemporaryDirectory(prefix="auditchain-startup-") as tmp:
+        db_path = Path(tmp) / "auditchain.db"
+        _startup_runs(db_path, fresh=True)
+        return _startup_runs(db_path, fresh=False)
+
+
+# Read-only cases first, then the ones that append to the ledger
+CASES: Dict[str, Callable[[Context], Dict[str, Any]]] = {
+    "startup.cold": bench_startup_cold,
+    "startup.warm": bench_startup_warm,
+    "hash.metadata": bench_hash_metadata,
+    "hash.event_json": bench_hash_event(HASH_VERSION_JSON),
+    "hash.event": bench_hash_event(HASH_VERSION_LENGTH_PREFIXED),
+    "merkle.build": bench_merkle_build,
+    "merkle.stream_build": bench_merkle_stream_build,
+    "merkle.proof": bench_merkle_proof,
+    "merkle.multiproof": bench_merkle_multiproof,
+    "verify.multiproof": bench_verify_multiproof,
+    "verify.event": bench_verify_event,
+    "serialize.events_models": bench_serialize_models,
+    "serialize.events_rows": bench_serialize_rows,
+    "events.list": bench_list_events,
+    "events.search_selective": bench_search_events(True),
+    "events.search_broad": bench_search_events(False),
+    "verify.chain": bench_verify_chain,
+    "ingest.create_event": bench_create_event,
+    "ingest.retry_event": bench_retry_event,
+    **{f"ingest.commit_each_{workers}": bench_concurrent_ingest(workers, False) for workers in INGEST_CONCURRENCY},
+    **{f"ingest.group_commit_{workers}": bench_concurrent_ingest(workers, True) for workers in INGEST_CONCURRENCY},
+    "merkle.build_batch": bench_build_batch,
+    "anchor.simulated": bench_simulated_anchor,
+}
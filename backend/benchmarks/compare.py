@@ -0,0 +1,63 @@
+"""
+Compare two benchmark result files and flag regressions
+
+    python -m benchmarks.compare baseline.json candidate.json --threshold 0.10
+
+Exits with status 1 when any shared case got slower than the threshold on
+the chosen metric.
+"""
+import argparse
+import json
+import sys
+from pathlib import Path
+from typing import Any, Dict
+
+METRICS = ("p50_ms", "p95_ms", "mean_ms", "min_ms")
+
+
+def load(path: Path) -> Dict[str, Any]:
+    with open(path) as f:
+        return json.load(f)
+
+
+def compare(baseline: Dict[str, Any], candidate: Dict[str, Any], metric: str, threshold: float):
+    """
+    Yield (case, baseline value, candidate value, relative change, regressed)
+    """
+    for name in sorted(set(baseline["results"]) & set(candidate["results"])):
+        before = baseline["results"][name][metric]
+        after = candidate["results"][name][metric]
+        change = (after - before) / before if before else 0.0
+        yield name, before, after, change, change > threshold
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.compare", description=__doc__.strip().splitlines()[0])
+    parser.add_argument("baseline", type=Path)
+    parser.add_argument("candidate", type=Path)
+    parser.add_argument("--metric", choices=METRICS, default="p50_ms", help="Per-op latency to compare (default: p50_ms)")
+    parser.add_argument("--threshold", type=float, default=0.10, help="Allowed relative slowdown (default: 0.10)")
+    args = parser.parse_args(argv)
+    
+    baseline = load(args.baseline)
+    candidate = load(args.candidate)
+    
+    for key in ("suite_version", "scale", "ops", "storage"):
+        if baseline["meta"].get(key) != candidate["meta"].get(key):
+            print(f"Warning: {key} differs ({baseline['meta'].get(key)} vs {candidate['meta'].get(key)})")
+    
+    print(f"{'case':<32} {'baseline':>12} {'candidate':>12} {'change':>9}")
+    regressions = 0
+    for name, before, after, change, regressed in compare(baseline, candidate, args.metric, args.threshold):
+        regressions += regressed
+        flag = "  REGRESSION" if regressed else ""
+        print(f"{name:<32} {before:>12} {after:>12} {change:>+8.1%}{flag}")
+    
+    if regressions:
+        print(f"{regressions} case(s) slower than {args.threshold:.0%} on {args.metric}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,135 @@
+"""
+Synthetic audit events and ledger seeding
+
+Events are generated from a seeded RNG so every run at the same scale sees
+the same ledger. Seeding writes rows straight into audit_events with valid
+metadata and chain hashes, which keeps 1M-event ledgers practical to build;
+the per-model state tree is not populated for seeded rows.
+"""
+import random
+from typing import Any, Dict, Iterator, List
+from app.database import get_db
+from app.services.hashing_service import (
+    event_encoder, compute_chain_hash, CURRENT_HASH_VERSION, GENESIS_CHAIN_HASH
+)
+
+SCALES = {"1k": 1_000, "100k": 100_000, "1m": 1_000_000}
+
+EVENT_TYPES = ["Train", "Evaluate", "Deploy"]
+FRAMEWORKS = ["pytorch", "tensorflow", "sklearn", "xgboost", "jax"]
+ENVIRONMENTS = ["dev", "staging", "production"]
+
+SEED_BATCH_SIZE = 10_000
+
+
+def parse_scale(value: str) -> int:
+    """
+    Event count from a scale name (1k, 100k, 1m) or a plain integer
+    """
+    value = value.lower()
+    if value in SCALES:
+        return SCALES[value]
+    return int(value.replace("_", ""))
+
+
+def synthetic_event(rng: random.Random, index: int) -> Dict[str, Any]:
+    """
+    One POST /events payload
+    """
+    model = rng.randrange(500)
+    return {
+        "model_id": f"model-{model:04d}",
+        "model_name": f"Model {model}",
+        "model_version": f"{rng.randrange(1, 20)}.{rng.randrange(10)}.0",
+        "framework": rng.choice(FRAMEWORKS),
+        "dataset_name": f"dataset-{rng.randrange(200):03d}",
+        "dataset_version": f"v{rng.randrange(1, 6)}",
+        "dataset_hash": f"{rng.getrandbits(256):064x}",
+        "source": "benchmark",
+        "event_type": rng.choice(EVENT_TYPES),
+        "actor": f"user-{rng.randrange(50):02d}",
+        "environment": rng.choice(ENVIRONMENTS),
+        "timestamp": f"2026-01-{1 + index % 28:02d}T{index % 24:02d}:{index % 60:02d}:{(index // 60) % 60:02d}Z",
+        "summary": f"Synthetic benchmark event {index} " + "x" * rng.randrange(0, 200)
+    }
+
+
+def metadata_for(event: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Hashed fields as a dict, as create_event built them before the canonical
+    event encoder (the json.dumps path of hash version 1)
+    """
+    return {
+        "model_id": event["model_id"],
+        "model_name": event["model_name"] or "",
+        "model_version": event["model_version"] or "",
+        "framework": event["framework"] or "",
+        "dataset_name": event["dataset_name"] or "",
+        "dataset_version": event["dataset_version"] or "",
+        "dataset_hash": event["dataset_hash"] or "",
+        "source": event["source"] or "",
+        "event_type": event["event_type"],
+        "actor": event["actor"] or "",
+        "environment": event["environment"] or "",
+        "timestamp": event["timestamp"],
+        "summary": event["summary"] or ""
+    }
+
+
+def synthetic_events(count: int, seed: int, start: int = 0) -> Iterator[Dict[str, Any]]:
+    rng = random.Random(seed * 1_000_003 + start)
+    for index in range(start, start + count):
+        yield synthetic_event(rng, index)
+
+
+def seed_ledger(count: int, seed: int) -> List[str]:
+    """
+    Append count chained Pending events and return their leaf hashes
+    """
+    conn = get_db()
+    cursor = conn.cursor()
+    leaf_hashes = []
+    
+    try:
+        cursor.execute("BEGIN IMMEDIATE")
+        cursor.execute("SELECT chain_hash FROM audit_events ORDER BY id DESC LIMIT 1")
+        row = cursor.fetchone()
+        prev_chain_hash = row["chain_hash"] if row and row["chain_hash"] else GENESIS_CHAIN_HASH
+        
+        rows = []
+        hash_event = event_encoder(CURRENT_HASH_VERSION)
+        for event in synthetic_events(count, seed):
+            metadata_hash = hash_event(event)
+            chain_hash = compute_chain_hash(prev_chain_hash, metadata_hash)
+            rows.append((
+                event["model_id"], event["model_name"], event["model_version"], event["framework"],
+                event["dataset_name"], event["dataset_version"], event["dataset_hash"], event["source"],
+                event["event_type"], event["actor"], event["environment"], event["timestamp"],
+                event["summary"], metadata_hash, metadata_hash, CURRENT_HASH_VERSION,
+                "Pending", prev_chain_hash, chain_hash
+            ))
+            leaf_hashes.append(metadata_hash)
+            prev_chain_hash = chain_hash
+            
+            if len(rows) >= SEED_BATCH_SIZE:
+                _insert_rows(cursor, rows)
+                rows = []
+        
+        if rows:
+            _insert_rows(cursor, rows)
+        
+        conn.commit()
+        return leaf_hashes
+    finally:
+        conn.close()
+
+
+def _insert_rows(cursor, rows: List[tuple]) -> None:
+    cursor.executemany("""
+        INSERT INTO audit_events (
+            model_id, model_name, model_version, framework, dataset_name, dataset_version,
+            dataset_hash, source, event_type, actor, environment, timestamp, summary,
+            metadata_hash, merkle_leaf_hash, hash_version, status, prev_chain_hash, chain_hash
+        )
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+    """, rows)
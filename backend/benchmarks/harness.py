@@ -0,0 +1,121 @@
+"""
+Benchmark harness - Timing, summary statistics and JSON result files
+"""
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+
+RESULTS_DIR = Path(__file__).parent / "results"
+
+# Bumped when case definitions change in a way that makes older results
+# incomparable
+SUITE_VERSION = 1
+
+
+def _percentile(sorted_samples: List[float], fraction: float) -> float:
+    index = min(int(round(fraction * (len(sorted_samples) - 1))), len(sorted_samples) - 1)
+    return sorted_samples[index]
+
+
+def summarize(samples: List[float], items_per_op: int = 1) -> Dict[str, Any]:
+    """
+    Summary statistics for per-operation wall times in seconds
+    """
+    ordered = sorted(samples)
+    total = sum(samples)
+    return {
+        "ops": len(samples),
+        "items_per_op": items_per_op,
+        "total_s": round(total, 6),
+        "ops_per_s": round(len(samples) / total, 3) if total else None,
+        "items_per_s": round(len(samples) * items_per_op / total, 3) if total else None,
+        "min_ms": round(ordered[0] * 1000, 4),
+        "mean_ms": round(statistics.fmean(samples) * 1000, 4),
+        "p50_ms": round(_percentile(ordered, 0.50) * 1000, 4),
+        "p95_ms": round(_percentile(ordered, 0.95) * 1000, 4),
+        "p99_ms": round(_percentile(ordered, 0.99) * 1000, 4),
+        "max_ms": round(ordered[-1] * 1000, 4)
+    }
+
+
+def measure(operation: Callable[[int], Any], ops: int, warmup: int = 0, items_per_op: int = 1) -> Dict[str, Any]:
+    """
+    Time each call of operation(i) for i in range(ops) after warmup calls
+    """
+    for i in range(warmup):
+        operation(i)
+    
+    samples = []
+    for i in range(ops):
+        start = time.perf_counter()
+        operation(warmup + i)
+        samples.append(time.perf_counter() - start)
+    
+    return summarize(samples, items_per_op)
+
+
+def _git(*args: str) -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", *args], capture_output=True, text=True, check=True,
+            cwd=Path(__file__).parent
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def environment(scale: int, seed: int, storage: str) -> Dict[str, Any]:
+    """
+    Run metadata recorded next to the results so runs can be matched up
+    """
+    return {
+        "suite_version": SUITE_VERSION,
+        "commit": _git("rev-parse", "HEAD"),
+        "dirty": bool(_git("status", "--porcelain", "--", "app", "benchmarks")),
+        "timestamp": datetime.utcnow().isoformat(),
+        "python": sys.version.split()[0],
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "storage": storage,
+        "scale": scale,
+        "seed": seed
+    }
+
+
+def write_results(meta: Dict[str, Any], results: Dict[str, Any], output: Optional[Path] = None) -> Path:
+    """
+    Write one run to JSON, by default results/<short commit>-<scale>.json
+    """
+    if output is None:
+        commit = (meta.get("commit") or "nocommit")[:10]
+        suffix = "-dirty" if meta.get("dirty") else ""
+        output = RESULTS_DIR / f"{commit}{suffix}-{meta['scale']}.json"
+    
+    output.parent.mkdir(parents=True, exist_ok=True)
+    with open(output, "w") as f:
+        json.dump({"meta": meta, "results": results}, f, indent=2, sort_keys=True)
+        f.write("\n")
+    
+    return output
+
+
+def format_table(results: Dict[str, Any]) -> str:
+    """
+    Plain-text summary of a run for the console
+    """
+    lines = [f"{'case':<32} {'ops':>6} {'items/s':>12} {'p50 ms':>10} {'p95 ms':>10} {'p99 ms':>10}"]
+    for name, stats in results.items():
+        items_per_s = stats["items_per_s"]
+        lines.append(
+            f"{name:<32} {stats['ops']:>6} "
+            f"{items_per_s if items_per_s is not None else '-':>12} "
+            f"{stats['p50_ms']:>10} {stats['p95_ms']:>10} {stats['p99_ms']:>10}"
+        )
+    return "\n".join(lines)
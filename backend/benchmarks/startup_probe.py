@@ -0,0 +1,53 @@
+"""
+Cold-start probe, run in a fresh interpreter by the startup cases
+
+    python -m benchmarks.startup_probe <database path>
+
+Prints one JSON line with the time to import the app, run its startup
+handlers and serve the first request.
+"""
+import asyncio
+import json
+import sys
+import time
+from pathlib import Path
+
+# The HTTP client is harness, not app: keep it out of the measured import
+import httpx
+
+started = time.perf_counter()
+
+
+async def _serve_first_request(app) -> float:
+    await app.router.startup()
+    ready = time.perf_counter()
+    
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        response = await client.get("/events", params={"limit": 10})
+        response.raise_for_status()
+    
+    await app.router.shutdown()
+    return ready
+
+
+def main() -> None:
+    import app.database as database
+    database.DB_PATH = Path(sys.argv[1])
+    
+    from app.main import app
+    imported = time.perf_counter()
+    
+    ready = asyncio.run(_serve_first_request(app))
+    first_request = time.perf_counter()
+    
+    print(json.dumps({
+        "import_ms": round((imported - started) * 1000, 3),
+        "startup_ms": round((ready - imported) * 1000, 3),
+        "first_request_ms": round((first_request - ready) * 1000, 3),
+        "total_ms": round((first_request - started) * 1000, 3)
+    }))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,131 @@
+"""
+Test fixtures - A fresh ledger per test
+
+Each test gets its own SQLite file and partition directory, and the
+process-wide service instances are reset so no state leaks between tests.
+
+Tests taking the backend fixture run against SQLite and PostgreSQL. The
+PostgreSQL server is TEST_DATABASE_URL (its public schema is dropped before
+each test), else a throwaway cluster started with initdb and pg_ctl from
+PG_BIN or PATH; without either those tests are skipped.
+"""
+import importlib
+import os
+import shutil
+import socket
+import subprocess
+import pytest
+from fastapi.testclient import TestClient
+import app.database as database
+import app.services.partition_service as partition_service
+from app.storage import get_storage
+
+# (module, attribute) of every lazily created global instance
+GLOBAL_INSTANCES = [
+    ("app.storage", "_storage"),
+    ("app.services.blockchain_service", "_blockchain_service"),
+    ("app.services.confirmation_tracker", "_tracker"),
+    ("app.services.coordination_service", "_anchor_leadership"),
+    ("app.services.http_cache", "_cache"),
+    ("app.services.idempotency_service", "_deduplicator"),
+    ("app.services.ingest_service", "_rate_limiter"),
+    ("app.services.ingest_service", "_ingest_queue"),
+    ("app.services.stream_service", "_hub"),
+    ("app.services.verification_cache", "_cache"),
+]
+
+
+@pytest.fixture
+def ledger(tmp_path, monkeypatch):
+    """Path of a migrated, empty SQLite ledger"""
+    monkeypatch.delenv("DATABASE_URL", raising=False)
+    monkeypatch.setattr(database, "DB_PATH", tmp_path / "auditchain.db")
+    monkeypatch.setattr(partition_service, "PARTITION_DIR", tmp_path / "partitions")
+    for module, name in GLOBAL_INSTANCES:
+        monkeypatch.setattr(importlib.import_module(module), name, None)
+    database.init_db()
+    return database.DB_PATH
+
+
+@pytest.fixture
+def client(ledger):
+    from app.main import app
+    return TestClient(app)
+
+
+@pytest.fixture
+def add_events(client):
+    """Post count distinct Train events; returns their ids"""
+    def add(count: int, **fields):
+        ids = []
+        for _ in range(count):
+            n = len(add.posted)
+            payload = {
+                "model_id": f"model-{n % 3}",
+                "event_type": "Train",
+                "timestamp": f"2025-01-01T00:00:{n % 60:02d}",
+                "summary": f"training run {n}",
+            }
+            payload.update(fields)
+            response = client.post("/events", json=payload)
+            assert response.status_code == 200, response.text
+            add.posted.append(response.json()["id"])
+            ids.append(response.json()["id"])
+        return ids
+    add.posted = []
+    return add
+
+
+@pytest.fixture(scope="session")
+def postgres_url(tmp_path_factory):
+    """URL of a PostgreSQL server for backend tests"""
+    pytest.importorskip("psycopg", reason="PostgreSQL tests need psycopg")
+    url = os.getenv("TEST_DATABASE_URL")
+    if url:
+        yield url
+        return
+    
+    search_path = os.getenv("PG_BIN") or os.getenv("PATH")
+    initdb = shutil.which("initdb", path=search_path)
+    pg_ctl = shutil.which("pg_ctl", path=search_path)
+    if not (initdb and pg_ctl):
+        pytest.skip("No PostgreSQL: set TEST_DATABASE_URL, or put initdb and pg_ctl on PATH or in PG_BIN")
+    if os.geteuid() == 0:
+        pytest.skip("PostgreSQL will not run as root: set TEST_DATABASE_URL")
+    
+    data_dir = tmp_path_factory.mktemp("postgres")
+    with socket.socket() as probe:
+        probe.bind(("127.0.0.1", 0))
+        port = probe.getsockname()[1]
+    subprocess.run(
+        [initdb, "-D", str(data_dir), "-U", "postgres", "--auth=trust", "-E", "UTF8", "--locale=C"],
+        check=True, capture_output=True
+    )
+    subprocess.run(
+        [pg_ctl, "-D", str(data_dir), "-l", str(data_dir / "server.log"), "-w",
+         "-o", f"-p {port} -k {data_dir} -c listen_addresses=127.0.0.1", "start"],
+        check=True, capture_output=True
+    )
+    try:
+        yield f"postgresql://postgres@127.0.0.1:{port}/postgres"
+    finally:
+        subprocess.run([pg_ctl, "-D", str(data_dir), "-m", "immediate", "stop"], capture_output=True)
+
+
+@pytest.fixture(params=["sqlite", "postgres"])
+def backend(request, ledger, monkeypatch):
+    """Storage backend under test, with an empty, migrated schema"""
+    if request.param == "postgres":
+        import psycopg
+        url = request.getfixturevalue("postgres_url")
+        with psycopg.connect(url, autocommit=True) as conn:
+            conn.execute("DROP SCHEMA public CASCADE")
+            conn.execute("CREATE SCHEMA public")
+        monkeypatch.setenv("DATABASE_URL", url)
+    
+    storage = get_storage()
+    storage.init_schema()
+    yield request.param
+    
+    if request.param == "postgres":
+        storage.pool.close()
@@ -0,0 +1,62 @@
+from app.services.blockchain_service import get_blockchain_service
+from app.services.confirmation_tracker import CONFIRMING, ORPHANED, get_confirmation_tracker
+from app.storage import get_storage
+
+
+def _anchored_batch(client, add_events):
+    add_events(2)
+    response = client.post("/merkle/build", json={"urgent": True})
+    assert response.json()["anchor_status"] == "simulated", response.text
+    return response.json()["batch_id"]
+
+
+def _reorg_past(chain, anchor, drop_rate=0.0):
+    """Replace every block from the anchor's up to the head"""
+    with chain._lock:
+        chain.drop_rate, kept = drop_rate, chain.drop_rate
+        try:
+            chain._reorg(chain._head - anchor["block_number"] + 1)
+        finally:
+            chain.drop_rate = kept
+
+
+def test_an_orphaned_anchor_requeues_its_batch(backend, client, add_events):
+    batch_id = _anchored_batch(client, add_events)
+    storage = get_storage()
+    tracker = get_confirmation_tracker()
+    tracker.poll_once()
+    anchor = storage.anchors.list_unconfirmed()[0]
+    assert anchor["confirmation_status"] == CONFIRMING
+    
+    # The transaction is dropped instead of being mined on the new branch
+    _reorg_past(get_blockchain_service().get_chain(), anchor, drop_rate=1.0)
+    assert tracker.poll_once()["orphaned"] == 1
+    
+    assert storage.anchors.list_unconfirmed() == []
+    assert storage.anchors.latest_for_batch(batch_id, anchor["merkle_root"]) is None
+    assert storage.batches.get(batch_id)["status"] == "Queued"
+    events = client.get("/events").json()
+    assert {event["status"] for event in events} == {"Batched"}
+
+
+def test_a_reincluded_anchor_follows_its_new_receipt(backend, client, add_events):
+    batch_id = _anchored_batch(client, add_events)
+    storage = get_storage()
+    tracker = get_confirmation_tracker()
+    tracker.poll_once()
+    anchor = storage.anchors.list_unconfirmed()[0]
+    
+    chain = get_blockchain_service().get_chain()
+    _reorg_past(chain, anchor)
+    # Mined again behind an anchor from another submitter, under the next id
+    with chain._lock:
+        mined = chain._mined[anchor["transaction_id"]]
+        chain._anchors[anchor["anchor_id"] + 1] = chain._anchors.pop(mined["anchor_id"])
+        mined["anchor_id"] = anchor["anchor_id"] + 1
+    assert tracker.poll_once()["reincluded"] == 1
+    
+    moved = storage.anchors.list_unconfirmed()[0]
+    assert moved["id"] == anchor["id"]
+    assert moved["block_hash"] != anchor["block_hash"]
+    assert moved["anchor_id"] == anchor["anchor_id"] + 1
+    assert storage.batches.get(batch_id)["status"] == "Anchored"
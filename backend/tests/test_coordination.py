@@ -0,0 +1,253 @@
+import json
+import os
+import signal
+import sqlite3
+import subprocess
+import sys
+import time
+from pathlib import Path
+import pytest
+from app.services.anchor_scheduler import ANCHORING, run_scheduler_once
+from app.services.blockchain_service import BlockchainService, get_blockchain_service
+from app.services.coordination_service import ANCHOR_LEADER_LEASE, get_anchor_leadership
+from app.storage import get_storage
+
+BACKEND_DIR = Path(__file__).resolve().parents[1]
+
+WORKERS = 4
+ROUNDS = 8
+LEADER_TTL = 5.0
+
+# One API worker: ingests, seals (urgent every other round) and runs the
+# anchor scheduler until told to stop, recording whether it ever led
+WORKER = """
+import json, os, sys, time
+from pathlib import Path
+import app.database as database
+database.DB_PATH = Path(sys.argv[1])
+from fastapi.testclient import TestClient
+from app.main import app
+from app.services.anchor_scheduler import run_scheduler_once
+from app.services.coordination_service import get_anchor_leadership
+
+client = TestClient(app)
+workdir = database.DB_PATH.parent
+worker = os.environ["WORKER_ID"]
+leadership = get_anchor_leadership()
+led = False
+
+for round in range(int(sys.argv[2])):
+    for n in range(3):
+        response = client.post("/events", json={
+            "model_id": worker, "event_type": "Train",
+            "timestamp": "2025-01-01T00:00:00", "summary": f"{worker} {round} {n}"
+        })
+        assert response.status_code == 200, response.text
+    client.post("/merkle/build", json={"max_events": 5, "urgent": round % 2 == 0})
+    run_scheduler_once()
+    led |= leadership.leader
+
+(workdir / f"{worker}.built").write_text(json.dumps({"led": led}))
+while not (workdir / "stop").exists():
+    run_scheduler_once()
+    led |= leadership.leader
+    time.sleep(0.1)
+(workdir / f"{worker}.done").write_text(json.dumps({"led": led}))
+"""
+
+
+def _wait_for(condition, timeout: float, message: str):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if condition():
+            return
+        time.sleep(0.1)
+    pytest.fail(message)
+
+
+def _query(ledger, sql, params=()):
+    conn = sqlite3.connect(ledger, timeout=30)
+    try:
+        rows = conn.execute(sql, params).fetchall()
+        conn.commit()
+        return rows
+    finally:
+        conn.close()
+
+
+def _unanchored(ledger) -> int:
+    return _query(ledger, "SELECT COUNT(*) FROM merkle_batches WHERE status != 'Anchored'")[0][0]
+
+
+def _leader(ledger):
+    rows = _query(ledger, "SELECT holder FROM worker_leases WHERE name = 'anchor-leader'")
+    return rows[0][0] if rows else None
+
+
+def test_workers_share_one_database(ledger, monkeypatch):
+    workdir = ledger.parent
+    env = dict(
+        os.environ,
+        ANCHOR_LEADER_TTL=str(LEADER_TTL),
+        BATCH_LEASE_SECONDS=str(LEADER_TTL),
+        ANCHOR_MAX_DELAY_SECONDS="0",
+    )
+    env.pop("DATABASE_URL", None)
+    workers = {
+        f"worker-{n}": subprocess.Popen(
+            [sys.executable, "-c", WORKER, str(ledger), str(ROUNDS)],
+            cwd=BACKEND_DIR, env=dict(env, WORKER_ID=f"worker-{n}"),
+            stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True
+        )
+        for n in range(WORKERS)
+    }
+    
+    try:
+        def built():
+            for name, process in workers.items():
+                assert process.poll() is None, process.stderr.read()
+            return all((workdir / f"{name}.built").exists() for name in workers)
+        _wait_for(built, 120, "workers did not finish sealing")
+        _wait_for(lambda: _unanchored(ledger) == 0, 30, "sealed batches were not all anchored")
+        
+        # Exactly one worker led while all of them were running
+        leaders = [
+            name for name in workers
+            if json.loads((workdir / f"{name}.built").read_text())["led"]
+        ]
+        assert leaders == [_leader(ledger)]
+        
+        # A killed leader is replaced once its lease expires
+        killed = leaders[0]
+        workers[killed].send_signal(signal.SIGKILL)
+        workers[killed].wait()
+        _wait_for(lambda: _leader(ledger) not in (None, killed), LEADER_TTL + 10, "no worker took over")
+        successor = _leader(ledger)
+        
+        # ... and anchors what is sealed afterwards (here by a non-leader)
+        monkeypatch.setenv("WORKER_ID", "test-client")
+        from app.main import app
+        from fastapi.testclient import TestClient
+        client = TestClient(app)
+        for n in range(3):
+            client.post("/events", json={
+                "model_id": "late", "event_type": "Train",
+                "timestamp": "2025-01-01T00:00:00", "summary": f"after takeover {n}"
+            })
+        response = client.post("/merkle/build", json={"urgent": True})
+        assert response.json()["anchor_status"] == "queued"
+        _wait_for(lambda: _unanchored(ledger) == 0, LEADER_TTL + 10, "new leader did not anchor")
+        
+        (workdir / "stop").touch()
+        for name, process in workers.items():
+            if name != killed:
+                assert process.wait(timeout=30) == 0, process.stderr.read()
+    finally:
+        (workdir / "stop").touch()
+        for process in workers.values():
+            if process.poll() is None:
+                process.kill()
+            process.stderr.close()
+    
+    survivors_led = [
+        name for name in workers
+        if name != killed and json.loads((workdir / f"{name}.done").read_text())["led"]
+    ]
+    assert survivors_led == [successor]
+    
+    # Every batch anchored exactly once, every event in one batch
+    assert _query(ledger, """
+        SELECT batch_id FROM blockchain_anchors GROUP BY batch_id HAVING COUNT(*) > 1
+    """) == []
+    assert _query(ledger, """
+        SELECT anchor_id FROM blockchain_anchors GROUP BY anchor_id HAVING COUNT(*) > 1
+    """) == []
+    anchored_batches = _query(ledger, "SELECT COUNT(DISTINCT batch_id) FROM blockchain_anchors")[0][0]
+    assert anchored_batches == _query(ledger, "SELECT COUNT(*) FROM merkle_batches")[0][0]
+    event_ids = [
+        event_id
+        for (ids,) in _query(ledger, "SELECT event_ids FROM merkle_batches")
+        for event_id in json.loads(ids)
+    ]
+    assert len(event_ids) == len(set(event_ids))
+
+
+def _stall(ledger, batch_id):
+    conn = sqlite3.connect(ledger)
+    conn.execute("""
+        UPDATE merkle_batches
+        SET status = ?, lease_holder = 'crashed', lease_expires_at = 1
+        WHERE batch_id = ?
+    """, (ANCHORING, batch_id))
+    conn.commit()
+    conn.close()
+
+
+def _seal(client, add_events):
+    add_events(2)
+    return client.post("/merkle/build", json={"urgent": True}).json()["batch_id"]
+
+
+def test_stalled_batch_with_recorded_anchor_is_not_resent(client, ledger, add_events):
+    batch_id = _seal(client, add_events)
+    _stall(ledger, batch_id)
+    
+    assert run_scheduler_once() == 0
+    assert get_storage().batches.get(batch_id)["status"] == "Anchored"
+    assert _query(ledger, "SELECT COUNT(*) FROM blockchain_anchors")[0][0] == 1
+
+
+def test_stalled_batch_with_only_a_fallback_anchor_is_anchored(client, ledger, add_events):
+    batch_id = _seal(client, add_events)
+    conn = sqlite3.connect(ledger)
+    conn.execute("UPDATE blockchain_anchors SET anchor_id = NULL WHERE batch_id = ?", (batch_id,))
+    conn.commit()
+    conn.close()
+    _stall(ledger, batch_id)
+    
+    assert run_scheduler_once() == 1
+    assert get_storage().batches.get(batch_id)["status"] == "Anchored"
+    assert _query(ledger, """
+        SELECT COUNT(*) FROM blockchain_anchors WHERE batch_id = ? AND anchor_id IS NOT NULL
+    """, (batch_id,))[0][0] == 1
+
+
+def test_request_paths_reuse_a_recent_renewal(ledger):
+    leadership = get_anchor_leadership()
+    assert leadership.renew()
+    
+    # Without another write the lease row stays as the renewal left it
+    _query(ledger, "DELETE FROM worker_leases")
+    assert leadership.is_leader()
+    assert _leader(ledger) is None
+    
+    leadership.last_checked_at -= leadership.ttl
+    assert leadership.is_leader()
+    assert _leader(ledger) is not None
+
+
+def test_other_workers_refuse_direct_anchors(client, ledger):
+    get_storage().leases.acquire("anchor-leader", "another-worker", 60)
+    response = client.post("/blockchain/anchor", json={"batch_id": "BATCH-X", "merkle_root": "0x" + "ab" * 32})
+    assert response.status_code == 503
+    assert response.headers["retry-after"] == "1"
+
+
+def test_anchor_ids_stay_unique_when_leadership_moves_back(client, add_events):
+    # Each worker has its own simulated chain; the lease passes A -> B -> A
+    worker_a, worker_b = get_blockchain_service(), BlockchainService()
+    storage = get_storage()
+    anchor_ids = []
+    for holder, service in (("worker-a", worker_a), ("worker-b", worker_b), ("worker-a", worker_a)):
+        assert storage.leases.acquire(ANCHOR_LEADER_LEASE, holder, 60)
+        add_events(2)
+        batch_id = client.post("/merkle/build", json={}).json()["batch_id"]
+        merkle_root = storage.batches.get(batch_id)["merkle_root"]
+        anchor_ids.append(service.anchor_merkle_root(merkle_root, batch_id)["anchor_id"])
+        storage.leases.release(ANCHOR_LEADER_LEASE, holder)
+    assert len(set(anchor_ids)) == 3
+    
+    # Worker A answers for the anchor B mined from the ledger
+    response = client.get(f"/blockchain/anchor/{anchor_ids[1]}")
+    assert response.status_code == 200, response.text
+    assert response.json()["anchor_id"] == anchor_ids[1]
@@ -0,0 +1,59 @@
+from app.services.hashing_service import (
+    EVENT_HASH_FIELDS, HASH_VERSION_JSON, HASH_VERSION_LENGTH_PREFIXED, hash_event
+)
+from app.storage import get_storage
+from app.storage.base import EVENT_FIELDS
+
+
+def _store(summary, version):
+    """Store an event hashed in the given format (None: written before versioning)"""
+    record = {field: None for field in EVENT_FIELDS}
+    record.update({"model_id": "model-0", "event_type": "Train", "timestamp": "2025-01-01T00:00:00", "summary": summary})
+    record["metadata_hash"] = record["merkle_leaf_hash"] = hash_event(record, version or HASH_VERSION_JSON)
+    record["hash_version"] = version
+    return get_storage().events.insert(record)
+
+
+def _verify(client, **body):
+    return client.post("/verify", json=body).json()
+
+
+def test_the_formats_hash_the_same_event_differently():
+    event = dict.fromkeys(EVENT_HASH_FIELDS, "")
+    event.update({"model_id": "model-0", "event_type": "Train", "timestamp": "2025-01-01T00:00:00"})
+    assert hash_event(event, HASH_VERSION_JSON) != hash_event(event, HASH_VERSION_LENGTH_PREFIXED)
+
+
+def test_events_of_every_hash_version_verify_by_id(backend, client, add_events):
+    legacy = _store("legacy run", None)
+    json_hashed = _store("json run", HASH_VERSION_JSON)
+    current = client.get(f"/events/{add_events(1)[0]}").json()
+    assert current["hash_version"] == HASH_VERSION_LENGTH_PREFIXED
+    
+    for event_id, version in [
+        (legacy["id"], HASH_VERSION_JSON),
+        (json_hashed["id"], HASH_VERSION_JSON),
+        (current["id"], HASH_VERSION_LENGTH_PREFIXED),
+    ]:
+        result = _verify(client, event_id=event_id)
+        assert result["valid"], result
+        assert result["details"]["hash_version"] == version
+    
+    # Mixed formats chain together
+    chain = client.get("/verify/chain").json()
+    assert chain["valid"] and chain["checked"] == 3
+
+
+def test_metadata_verifies_in_the_format_that_reproduces_its_hash(backend, client):
+    stored = _store("json run", HASH_VERSION_JSON)
+    fields = {"model_id": "model-0", "event_type": "Train", "timestamp": "2025-01-01T00:00:00", "summary": "json run"}
+    
+    result = _verify(client, metadata_hash=stored["metadata_hash"], **fields)
+    assert result["valid"] and result["details"] == {
+        "event_id": stored["id"], "hash": stored["metadata_hash"], "hash_version": HASH_VERSION_JSON
+    }
+    
+    # Pinned to the other format, the same hash does not match
+    result = _verify(client, metadata_hash=stored["metadata_hash"], hash_version=HASH_VERSION_LENGTH_PREFIXED, **fields)
+    assert not result["valid"]
+    assert result["details"]["hash_version"] == HASH_VERSION_LENGTH_PREFIXED
@@ -0,0 +1,52 @@
+from app.services.http_cache import IMMUTABLE, REVALIDATE
+from app.storage import get_storage
+
+
+def test_batch_proofs_are_immutable_and_revalidate_to_304(client, add_events):
+    ids = add_events(3)
+    batch_id = client.post("/merkle/build", json={}).json()["batch_id"]
+    url = f"/merkle/batches/{batch_id}/proof/{ids[1]}"
+    
+    first = client.get(url)
+    assert first.status_code == 200
+    assert first.headers["Cache-Control"] == IMMUTABLE
+    etag = first.headers["ETag"]
+    
+    for if_none_match in (etag, "W/" + etag, f'"other", {etag}', "*"):
+        response = client.get(url, headers={"If-None-Match": if_none_match})
+        assert response.status_code == 304 and response.content == b""
+        assert response.headers["ETag"] == etag
+    
+    assert client.get(url, headers={"If-None-Match": '"other"'}).content == first.content
+
+
+def test_anchors_are_revalidated_until_final(client, add_events):
+    add_events(2)
+    client.post("/merkle/build", json={"urgent": True})
+    anchors = get_storage().anchors
+    anchor = anchors.list_unconfirmed()[0]
+    url = f"/blockchain/anchor/{anchor['anchor_id']}"
+    
+    pending = client.get(url)
+    assert pending.status_code == 200
+    assert pending.headers["Cache-Control"] == REVALIDATE
+    response = client.get(url, headers={"If-None-Match": pending.headers["ETag"]})
+    assert response.status_code == 304 and response.headers["Cache-Control"] == REVALIDATE
+    
+    anchors.update_confirmations([(anchor["id"], anchor["block_number"], anchor["block_hash"], 12, "Final")])
+    final = client.get(url)
+    assert final.headers["Cache-Control"] == IMMUTABLE
+    assert client.get(url, headers={"If-None-Match": final.headers["ETag"]}).status_code == 304
+
+
+def test_the_batch_list_changes_its_etag_when_a_batch_is_sealed(client, add_events):
+    add_events(2)
+    client.post("/merkle/build", json={})
+    listed = client.get("/merkle/batches")
+    assert listed.headers["Cache-Control"] == REVALIDATE
+    assert client.get("/merkle/batches", headers={"If-None-Match": listed.headers["ETag"]}).status_code == 304
+    
+    add_events(2)
+    client.post("/merkle/build", json={})
+    response = client.get("/merkle/batches", headers={"If-None-Match": listed.headers["ETag"]})
+    assert response.status_code == 200 and len(response.json()) == 2
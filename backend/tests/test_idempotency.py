@@ -0,0 +1,46 @@
+import app.services.idempotency_service as idempotency_service
+
+
+def _event(summary="run 0"):
+    return {"model_id": "model-0", "event_type": "Train", "timestamp": "2025-01-01T00:00:00", "summary": summary}
+
+
+def test_a_retried_key_replays_the_first_event(backend, client, monkeypatch):
+    first = client.post("/events", json=_event(), headers={"Idempotency-Key": "retry-1"})
+    assert first.status_code == 200 and "Idempotent-Replayed" not in first.headers
+    
+    retry = client.post("/events", json=_event(), headers={"Idempotency-Key": "retry-1"})
+    assert retry.status_code == 200
+    assert retry.headers["Idempotent-Replayed"] == "true"
+    assert retry.json() == first.json()
+    
+    # Answered from the index once the in-process caches are gone
+    monkeypatch.setattr(idempotency_service, "_deduplicator", None)
+    retry = client.post("/events", json=_event(), headers={"Idempotency-Key": "retry-1"})
+    assert retry.headers["Idempotent-Replayed"] == "true"
+    assert retry.json()["id"] == first.json()["id"]
+    assert len(client.get("/events").json()) == 1
+
+
+def test_a_reused_key_with_other_content_conflicts(backend, client):
+    assert client.post("/events", json=_event(), headers={"Idempotency-Key": "retry-1"}).status_code == 200
+    response = client.post("/events", json=_event("run 1"), headers={"Idempotency-Key": "retry-1"})
+    assert response.status_code == 422
+    assert len(client.get("/events").json()) == 1
+
+
+def test_identical_content_without_a_key_is_stored_once(backend, client, monkeypatch):
+    first = client.post("/events", json=_event()).json()
+    retry = client.post("/events", json=_event())
+    assert retry.headers["Idempotent-Replayed"] == "true"
+    assert retry.json()["id"] == first["id"]
+    
+    monkeypatch.setattr(idempotency_service, "_deduplicator", None)
+    retry = client.post("/events", json=_event())
+    assert retry.headers["Idempotent-Replayed"] == "true"
+    assert retry.json()["id"] == first["id"]
+    
+    # A new key does not make a copy of content already stored
+    keyed = client.post("/events", json=_event(), headers={"Idempotency-Key": "retry-2"})
+    assert keyed.json()["id"] == first["id"]
+    assert len(client.get("/events").json()) == 1
@@ -0,0 +1,44 @@
+from concurrent.futures import Future
+import app.services.ingest_service as ingest_service
+from app.services.ingest_service import IngestQueue, RateLimiter, producer_key
+
+
+def _event(n):
+    return {"model_id": "model-0", "event_type": "Train", "timestamp": "2025-01-01T00:00:00", "summary": f"run {n}"}
+
+
+def test_producers_over_their_rate_get_429_with_retry_after(client, monkeypatch):
+    monkeypatch.setattr(ingest_service, "_rate_limiter", RateLimiter(0.5, 2, 10))
+    secret = {"Authorization": "Bearer secret-token"}
+    
+    for n in range(2):
+        assert client.post("/events", json=_event(n), headers=secret).status_code == 200
+    response = client.post("/events", json=_event(2), headers=secret)
+    assert response.status_code == 429
+    assert response.headers["Retry-After"] == "2"
+    assert "secret-token" not in response.text and "token:" not in response.text
+    
+    # Buckets are per producer
+    other = {"Authorization": "Bearer other-token"}
+    assert client.post("/events", json=_event(3), headers=other).status_code == 200
+
+
+def test_a_full_queue_rejects_at_once_with_retry_after(client, monkeypatch):
+    # No writer drains the queue, so its single slot stays taken
+    full = IngestQueue(1, 1, 0)
+    monkeypatch.setattr(full, "_ensure_writer", lambda: None)
+    full._queue.put_nowait((_event(0), None, Future()))
+    monkeypatch.setattr(ingest_service, "_ingest_queue", full)
+    
+    response = client.post("/events", json=_event(1))
+    assert response.status_code == 429
+    assert response.headers["Retry-After"] == "1"
+    assert "queue is full" in response.json()["detail"]
+    assert full.stats()["rejected"] == 1
+
+
+def test_bearer_tokens_are_keyed_by_digest():
+    key = producer_key("Bearer secret-token", {"source": "etl"})
+    assert key.startswith("token:") and "secret-token" not in key
+    assert key == producer_key("Bearer  secret-token ", {})
+    assert producer_key(None, {"source": "etl", "actor": "ci"}) == "source:etl"
@@ -0,0 +1,72 @@
+import sqlite3
+from app.services.merkle_service import hash_pair
+
+
+def _verified(client, reference):
+    """The event's proof URL resolves to a proof of its hash under the batch root"""
+    proof = client.get(reference["proof_url"]).json()
+    assert proof["merkle_root"] == reference["merkle_root"]
+    assert proof["leaf_hash"] == reference["event_hash"]
+    
+    # Siblings bottom-up; the leaf's position decides each side
+    node, index = proof["leaf_hash"], proof["leaf_index"]
+    for sibling in proof["proof"]:
+        node = hash_pair(node, sibling) if index % 2 == 0 else hash_pair(sibling, node)
+        index //= 2
+    return node == proof["merkle_root"]
+
+
+def test_dataset_lineage_references_the_recording_events(client, add_events):
+    trained = add_events(1, model_id="model-a", model_version="1", dataset_hash="sha256:d1")
+    add_events(1, model_id="model-b", model_version="3", dataset_name="reviews", dataset_version="2024")
+    evaluated = add_events(1, model_id="model-a", model_version="1", event_type="Evaluate", dataset_hash="sha256:d1")
+    
+    body = client.get("/lineage/datasets/sha256:d1/models").json()
+    assert [(edge["model_id"], edge["relation"]) for edge in body["models"]] == [
+        ("model-a", "trained_on"), ("model-a", "evaluated_on")
+    ]
+    # Not sealed yet: no batch to prove against
+    assert body["models"][0]["event"]["event_id"] == trained[0]
+    assert body["models"][0]["event"]["proof_url"] is None
+    
+    client.post("/merkle/build", json={})
+    body = client.get("/lineage/datasets/sha256:d1/models", params={"relation": "evaluated_on"}).json()
+    reference = body["models"][0]["event"]
+    assert reference["event_id"] == evaluated[0]
+    assert reference["proof_url"].endswith(f"/proof/{evaluated[0]}")
+    assert _verified(client, reference)
+    
+    named = client.get("/lineage/datasets/reviews@2024/models").json()["models"]
+    assert [edge["model_id"] for edge in named] == ["model-b"]
+    assert client.get("/lineage/datasets/sha256:d1/models", params={"relation": "deployed_to"}).status_code == 400
+
+
+def test_model_lineage_groups_edges_by_version(client, add_events):
+    add_events(2, model_id="model-a", model_version="1", dataset_hash="sha256:d1")
+    add_events(1, model_id="model-a", model_version="1", event_type="Deploy", environment="prod")
+    add_events(1, model_id="model-a", model_version="2", event_type="Deploy")
+    client.post("/merkle/build", json={})
+    
+    body = client.get("/lineage/models/model-a").json()
+    first, second = body["versions"]
+    assert first["model_version"] == "1" and len(first["trained_on"]) == 2
+    assert [edge["target"] for edge in first["deployed_to"]] == ["prod"]
+    assert [edge["target"] for edge in second["deployed_to"]] == ["unspecified"]
+    assert all(_verified(client, edge["event"]) for edge in first["trained_on"])
+    
+    truncated = client.get("/lineage/models/model-a", params={"limit": 2}).json()
+    assert truncated["truncated"] and len(truncated["versions"][0]["trained_on"]) == 2
+
+
+def test_archived_events_keep_their_proof_urls(client, ledger, add_events):
+    trained = add_events(2, model_id="model-a", dataset_hash="sha256:d1")
+    conn = sqlite3.connect(ledger)
+    conn.executemany("UPDATE audit_events SET created_at = '2025-07-10 12:00:00' WHERE id = ?", [(i,) for i in trained])
+    conn.commit()
+    conn.close()
+    client.post("/merkle/build", json={"event_ids": trained, "urgent": True})
+    assert client.post("/partitions/2025-07/seal").status_code == 200
+    
+    models = client.get("/lineage/datasets/sha256:d1/models").json()["models"]
+    assert [edge["event"]["event_id"] for edge in models] == trained
+    assert all(_verified(client, edge["event"]) for edge in models)
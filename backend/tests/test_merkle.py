@@ -0,0 +1,66 @@
+import hashlib
+import random
+import pytest
+from app.services.merkle_service import (
+    build_merkle_tree, get_merkle_multiproof, stream_merkle_multiproof, verify_merkle_multiproof
+)
+from app.storage import get_storage
+
+
+def _leaves(count):
+    return [(n + 1, hashlib.sha256(str(n).encode()).hexdigest()) for n in range(count)]
+
+
+@pytest.mark.parametrize("count", [1, 2, 3, 5, 8, 13, 64, 100])
+def test_streamed_multiproof_matches_the_full_tree(count):
+    leaves = _leaves(count)
+    merkle_root, tree_levels = build_merkle_tree([leaf_hash for _, leaf_hash in leaves])
+    rng = random.Random(count)
+    
+    for size in {1, min(2, count), count // 2 or 1, count}:
+        ids = rng.sample([leaf_id for leaf_id, _ in leaves], size)
+        result = stream_merkle_multiproof(leaves, ids)
+        indices = sorted(leaf_id - 1 for leaf_id in ids)
+        
+        assert result["merkle_root"] == merkle_root
+        assert result["missing"] == []
+        assert [index for _, index, _ in result["leaves"]] == indices
+        assert result["proof"] == get_merkle_multiproof(tree_levels, indices)
+        assert verify_merkle_multiproof(
+            [(index, leaf_hash) for _, index, leaf_hash in result["leaves"]],
+            result["proof"], count, merkle_root
+        )
+
+
+def test_streamed_multiproof_reports_missing_leaves():
+    result = stream_merkle_multiproof(_leaves(4), [2, 9])
+    assert result["missing"] == [9]
+    assert [leaf_id for leaf_id, _, _ in result["leaves"]] == [2]
+
+
+def test_multiproof_route(client, add_events):
+    ids = add_events(7)
+    batch_id = client.post("/merkle/build", json={}).json()["batch_id"]
+    
+    response = client.post("/merkle/multiproof", json={"batch_id": batch_id, "event_ids": [ids[5], ids[1], ids[5]]})
+    assert response.status_code == 200, response.text
+    body = response.json()
+    assert [leaf["event_id"] for leaf in body["leaves"]] == [ids[1], ids[5]]
+    assert verify_merkle_multiproof(
+        [(leaf["leaf_index"], leaf["leaf_hash"]) for leaf in body["leaves"]],
+        body["proof"], body["leaf_count"], body["merkle_root"]
+    )
+    
+    response = client.post("/merkle/multiproof", json={"batch_id": batch_id, "event_ids": [ids[0], 10 ** 6]})
+    assert response.status_code == 400
+    assert client.post("/merkle/multiproof", json={"batch_id": "BATCH-X", "event_ids": [1]}).status_code == 404
+
+
+def test_batches_keep_the_event_count_they_were_sealed_with(client, add_events):
+    add_events(3)
+    batch_id = client.post("/merkle/build", json={}).json()["batch_id"]
+    add_events(2)
+    client.post("/merkle/build", json={})
+    
+    assert get_storage().batches.get(batch_id)["event_count"] == 3
+    assert sorted(batch["event_count"] for batch in client.get("/merkle/batches").json()) == [2, 3]
@@ -0,0 +1,62 @@
+import sqlite3
+import pytest
+import app.database as database
+
+
+def _legacy_ledger(path, hashes):
+    """A ledger written before schema versioning, with the uncompacted state tree"""
+    conn = sqlite3.connect(path)
+    conn.execute("""
+        CREATE TABLE audit_events (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            model_id TEXT NOT NULL,
+            event_type TEXT NOT NULL,
+            timestamp TEXT NOT NULL,
+            summary TEXT,
+            metadata_hash TEXT NOT NULL,
+            created_at TEXT NOT NULL DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+    conn.execute("CREATE TABLE smt_nodes (node_id TEXT PRIMARY KEY, hash TEXT NOT NULL)")
+    conn.execute("INSERT INTO smt_nodes VALUES ('0:0', 'stale')")
+    conn.executemany("""
+        INSERT INTO audit_events (model_id, event_type, timestamp, metadata_hash)
+        VALUES ('model-0', 'Train', '2025-01-01T00:00:00', ?)
+    """, [(metadata_hash,) for metadata_hash in hashes])
+    conn.commit()
+    conn.close()
+
+
+@pytest.fixture
+def legacy_path(tmp_path, monkeypatch):
+    monkeypatch.setattr(database, "DB_PATH", tmp_path / "auditchain.db")
+    return database.DB_PATH
+
+
+def test_a_legacy_ledger_is_upgraded_in_place(legacy_path):
+    _legacy_ledger(legacy_path, ["aa" * 32, "bb" * 32])
+    database.init_db()
+    
+    conn = database.get_db()
+    try:
+        versions = [row["version"] for row in conn.execute("SELECT version FROM schema_version ORDER BY version")]
+        assert versions == [version for version, _, _ in database.MIGRATIONS]
+        assert conn.execute("SELECT COUNT(*) FROM smt_nodes WHERE hash = 'stale'").fetchone()[0] == 0
+        assert conn.execute("SELECT COUNT(*) FROM audit_events_fts").fetchone()[0] == 2
+    finally:
+        conn.close()
+
+
+def test_duplicate_event_hashes_stop_the_upgrade(legacy_path):
+    _legacy_ledger(legacy_path, ["aa" * 32, "bb" * 32, "aa" * 32])
+    with pytest.raises(sqlite3.IntegrityError) as error:
+        database.init_db()
+    assert "events 1,3" in str(error.value)
+    
+    # Nothing past the schema_version table itself was applied
+    conn = database.get_db()
+    try:
+        assert conn.execute("SELECT COUNT(*) FROM schema_version").fetchone()[0] == 0
+        assert conn.execute("SELECT hash FROM smt_nodes").fetchone()["hash"] == "stale"
+    finally:
+        conn.close()
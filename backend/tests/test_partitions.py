@@ -0,0 +1,108 @@
+import sqlite3
+import app.services.partition_service as partition_service
+from app.database import get_db
+from app.services.event_chain_service import lock_chain_head
+from app.services.merkle_service import verify_merkle_multiproof
+
+
+def _backdate(ledger, ids, day):
+    """Move events into a past month, one second apart in id order"""
+    conn = sqlite3.connect(ledger)
+    conn.executemany(
+        "UPDATE audit_events SET created_at = ? WHERE id = ?",
+        [(f"{day} 12:00:{second:02d}", event_id) for second, event_id in enumerate(ids)]
+    )
+    conn.commit()
+    conn.close()
+
+
+def _anchor(client, ids):
+    response = client.post("/merkle/build", json={"event_ids": ids, "urgent": True})
+    assert response.status_code == 200, response.text
+    assert response.json()["anchor_status"] == "simulated"
+    return response.json()["batch_id"]
+
+
+def test_months_seal_oldest_first(client, ledger, add_events):
+    july, august = add_events(3), add_events(3)
+    _backdate(ledger, july, "2025-07-10")
+    _backdate(ledger, august, "2025-08-10")
+    _anchor(client, july + august)
+    
+    response = client.post("/partitions/2025-08/seal")
+    assert response.status_code == 400
+    assert "seal older months first" in response.json()["detail"]
+    
+    assert client.post("/partitions/2025-07/seal").status_code == 200
+    assert client.post("/partitions/2025-08/seal").status_code == 200
+    
+    # The next event links to the archived head rather than forking the chain
+    latest = add_events(1)
+    chain = client.get("/verify/chain").json()
+    assert chain["valid"], chain
+    assert chain["checked"] == 7
+    assert [event["id"] for event in client.get("/events").json()] == latest + august[::-1] + july[::-1]
+
+
+def test_batch_leaves_are_read_from_the_partitions_they_span(client, ledger, add_events, monkeypatch):
+    july, august = add_events(3), add_events(3)
+    _backdate(ledger, july, "2025-07-10")
+    _backdate(ledger, august, "2025-08-10")
+    july_batch = _anchor(client, july)
+    _anchor(client, august)
+    assert client.post("/partitions/2025-07/seal").status_code == 200
+    assert client.post("/partitions/2025-08/seal").status_code == 200
+    
+    attached = []
+    event_table = partition_service.event_table
+    
+    def recording_event_table(conn, partition):
+        attached.append(partition["partition_key"] if partition else None)
+        return event_table(conn, partition)
+    
+    monkeypatch.setattr(partition_service, "event_table", recording_event_table)
+    response = client.post("/merkle/multiproof", json={"batch_id": july_batch, "event_ids": [july[1]]})
+    assert response.status_code == 200, response.text
+    body = response.json()
+    assert verify_merkle_multiproof(
+        [(leaf["leaf_index"], leaf["leaf_hash"]) for leaf in body["leaves"]],
+        body["proof"], body["leaf_count"], body["merkle_root"]
+    )
+    assert "2025-08" not in attached and "2025-07" in attached
+
+
+def test_orphaned_anchor_does_not_count_for_sealing(client, ledger, add_events):
+    july = add_events(3)
+    _backdate(ledger, july, "2025-07-10")
+    batch_id = _anchor(client, july)
+    
+    conn = sqlite3.connect(ledger)
+    conn.execute("UPDATE blockchain_anchors SET confirmation_status = 'Orphaned' WHERE batch_id = ?", (batch_id,))
+    conn.commit()
+    conn.close()
+    
+    response = client.post("/partitions/2025-07/seal")
+    assert response.status_code == 400
+    assert "not yet anchored" in response.json()["detail"]
+
+
+def test_chain_head_is_newest_of_hot_table_and_partitions(client, add_events):
+    add_events(3)
+    conn = get_db()
+    try:
+        hot_head = conn.execute("SELECT chain_hash FROM audit_events ORDER BY id DESC").fetchone()[0]
+        conn.execute("""
+            INSERT INTO event_partitions (
+                partition_key, file_path, first_event_id, last_event_id, event_count,
+                merkle_root, chain_head, sealed_at
+            )
+            VALUES ('2024-01', 'unused.db', 100, 200, 101, 'root', 'archived-head', '2024-02-01')
+        """)
+        assert lock_chain_head(conn.cursor()) == "archived-head"
+        conn.rollback()
+        
+        conn.execute("UPDATE event_partitions SET first_event_id = -2, last_event_id = 0")
+        assert lock_chain_head(conn.cursor()) == hot_head
+        conn.rollback()
+    finally:
+        conn.close()
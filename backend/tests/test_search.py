@@ -0,0 +1,73 @@
+import sqlite3
+
+
+def _search(client, **params):
+    response = client.get("/events/search", params=params)
+    assert response.status_code == 200, response.text
+    return response.json()
+
+
+def test_hits_are_ranked_by_relevance(client, add_events):
+    passing = add_events(1, summary="drift check on a long evaluation report covering many unrelated metrics")
+    focused = add_events(1, summary="drift drift drift detected")
+    add_events(1, summary="nothing to see")
+    
+    body = _search(client, q="drift")
+    assert [hit["id"] for hit in body["results"]] == focused + passing
+    assert body["results"][0]["score"] < body["results"][1]["score"]
+    assert "[drift]" in body["results"][0]["snippet"]
+    
+    # The last word matches as a prefix; every word must match
+    assert body["total"] == _search(client, q="dri")["total"] == 2
+    assert [hit["id"] for hit in _search(client, q="drift detected")["results"]] == focused
+
+
+def test_facets_count_every_match_and_filters_are_exact(client, add_events):
+    add_events(2, summary="nightly training", framework="pytorch", actor="ci")
+    add_events(1, summary="nightly training", framework="jax", actor="alice")
+    add_events(1, summary="nightly training", framework="pytorch lightning", actor="ci")
+    
+    body = _search(client, q="nightly")
+    assert body["total"] == 4 and not body["total_is_estimate"]
+    assert body["facets"]["framework"][0] == {"value": "pytorch", "count": 2}
+    assert {facet["value"]: facet["count"] for facet in body["facets"]["actor"]} == {"ci": 3, "alice": 1}
+    
+    # "pytorch lightning" matches the phrase in the index, not the exact filter
+    filtered = _search(client, q="nightly", framework="pytorch")
+    assert filtered["total"] == 2
+    assert {hit["framework"] for hit in filtered["results"]} == {"pytorch"}
+    assert _search(client, actor="alice")["total"] == 1
+    
+    assert client.get("/events/search").status_code == 400
+    assert client.get("/events/search", params={"q": "nightly", "limit": 0}).status_code == 400
+
+
+def test_pages_partition_the_ranked_matches(client, add_events):
+    add_events(5, summary="calibration sweep")
+    pages = [_search(client, q="calibration", limit=2, offset=offset) for offset in (0, 2, 4)]
+    assert [len(page["results"]) for page in pages] == [2, 2, 1]
+    assert {page["total"] for page in pages} == {5}
+    ids = [hit["id"] for page in pages for hit in page["results"]]
+    assert sorted(ids) == sorted(set(ids)) and len(ids) == 5
+
+
+def test_sealing_a_partition_removes_its_events_from_the_index(client, ledger, add_events):
+    archived = add_events(2, summary="quarterly audit")
+    conn = sqlite3.connect(ledger)
+    conn.executemany("UPDATE audit_events SET created_at = '2025-07-10 12:00:00' WHERE id = ?", [(i,) for i in archived])
+    conn.commit()
+    conn.close()
+    client.post("/merkle/build", json={"event_ids": archived, "urgent": True})
+    assert _search(client, q="quarterly")["total"] == 2
+    
+    assert client.post("/partitions/2025-07/seal").status_code == 200
+    assert _search(client, q="quarterly")["total"] == 0
+    
+    # The index still follows new writes, and stays consistent with its content table
+    latest = add_events(1, summary="quarterly audit")
+    assert [hit["id"] for hit in _search(client, q="quarterly")["results"]] == latest
+    conn = sqlite3.connect(ledger)
+    try:
+        conn.execute("INSERT INTO audit_events_fts (audit_events_fts, rank) VALUES ('integrity-check', 1)")
+    finally:
+        conn.close()
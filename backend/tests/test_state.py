@@ -0,0 +1,140 @@
+import hashlib
+import random
+import pytest
+from app.database import get_db
+from app.services.sparse_merkle_service import (
+    DEFAULT_HASHES, TREE_DEPTH, get_state_checkpoint, get_state_proof, get_state_root,
+    rebuild_state_tree, state_key_hash, state_leaf_hash, update_model_states, verify_state_proof
+)
+from app.services.merkle_service import hash_pair
+
+
+def _reference_root(leaves, depth=0):
+    """Root of the full 256-level tree over {key_int: leaf_hash}"""
+    if not leaves:
+        return DEFAULT_HASHES[depth]
+    if depth == TREE_DEPTH:
+        return next(iter(leaves.values()))
+    bit = TREE_DEPTH - depth - 1
+    left = {key: leaf for key, leaf in leaves.items() if not (key >> bit) & 1}
+    right = {key: leaf for key, leaf in leaves.items() if (key >> bit) & 1}
+    return hash_pair(_reference_root(left, depth + 1), _reference_root(right, depth + 1))
+
+
+def _event_hash(n):
+    return hashlib.sha256(f"event {n}".encode()).hexdigest()
+
+
+@pytest.fixture
+def cursor(ledger):
+    conn = get_db()
+    yield conn.cursor()
+    conn.close()
+
+
+def test_compact_tree_matches_the_full_tree(cursor):
+    rng = random.Random(7)
+    models = [f"model-{n}" for n in range(60)]
+    latest = {}
+    checkpoints = []
+    
+    for round in range(12):
+        events = []
+        for n in range(rng.randint(1, 15)):
+            event_id = round * 100 + n
+            event = (rng.choice(models), rng.choice(["Train", "Evaluate", "Deploy"]), event_id, _event_hash(event_id))
+            events.append(event)
+            for event_type in (None, event[1]):
+                latest[state_key_hash(event[0], event_type)] = event[3]
+        
+        root = update_model_states(cursor, events)
+        assert root == get_state_root(cursor)
+        assert root == _reference_root({
+            int(key_hash, 16): state_leaf_hash(key_hash, event_hash) for key_hash, event_hash in latest.items()
+        })
+        
+        # Seal every few rounds, as a batch would
+        if round % 3 == 1:
+            state_root, version = get_state_checkpoint(cursor)
+            cursor.execute("""
+                INSERT INTO merkle_batches (batch_id, merkle_root, event_ids, status, state_root, state_version)
+                VALUES (?, ?, '[]', 'Pending', ?, ?)
+            """, (f"BATCH-{round}", root, state_root, version))
+            checkpoints.append((version, state_root, dict(latest)))
+    
+    # O(1) rows per key rather than one per level
+    cursor.execute("SELECT COUNT(*) as count FROM smt_nodes")
+    assert cursor.fetchone()["count"] < 3 * len(latest)
+    
+    for key_hash, event_hash in latest.items():
+        proof, leaf = get_state_proof(cursor, key_hash)
+        assert leaf.leaf_event_hash == event_hash
+        assert verify_state_proof(key_hash, event_hash, proof, root)
+        assert not verify_state_proof(key_hash, _event_hash("forged"), proof, root)
+    
+    for model_id in ("absent", "model-x"):
+        key_hash = state_key_hash(model_id)
+        proof, leaf = get_state_proof(cursor, key_hash)
+        assert leaf is None
+        assert verify_state_proof(key_hash, None, proof, root)
+    
+    # Every recorded root stays provable, for keys present then and not
+    for version, state_root, snapshot in checkpoints:
+        for key_hash in latest:
+            proof, leaf = get_state_proof(cursor, key_hash, version)
+            event_hash = snapshot.get(key_hash)
+            assert (leaf.leaf_event_hash if leaf else None) == event_hash
+            assert verify_state_proof(key_hash, event_hash, proof, state_root)
+    
+    assert rebuild_state_tree(cursor) == root
+
+
+def test_proofs_against_a_sealed_batch(client, add_events):
+    first = add_events(3)
+    batch = client.post("/merkle/build", json={}).json()
+    state_root = client.get("/merkle/batches").json()[0]["state_root"]
+    later = add_events(3, summary="later run", model_id="model-0")
+    
+    current = client.get("/state/model-0/proof").json()
+    assert current["event_id"] == later[-1]
+    assert current["state_root"] != state_root
+    
+    sealed = client.get("/state/model-0/proof", params={"batch_id": batch["batch_id"]}).json()
+    assert sealed["batch_id"] == batch["batch_id"]
+    assert sealed["state_root"] == state_root
+    assert sealed["event_id"] == first[0]
+    proof = {node["depth"]: node["hash"] for node in sealed["proof"]}
+    assert verify_state_proof(sealed["key_hash"], sealed["event_hash"], proof, state_root)
+    
+    # A model first seen after the seal is absent from the sealed root
+    add_events(1, model_id="new-model")
+    absent = client.get("/state/new-model/proof", params={"batch_id": batch["batch_id"]}).json()
+    assert not absent["included"]
+    proof = {node["depth"]: node["hash"] for node in absent["proof"]}
+    assert verify_state_proof(absent["key_hash"], None, proof, state_root)
+    
+    assert client.get("/state/model-0/proof", params={"batch_id": "BATCH-X"}).status_code == 404
+
+
+def test_event_type_is_matched_case_insensitively(client, add_events):
+    ids = add_events(1)
+    response = client.get("/state/model-0/proof", params={"event_type": "train"}).json()
+    assert response["event_type"] == "Train"
+    assert response["included"] and response["event_id"] == ids[0]
+    assert client.get("/state/model-0/proof", params={"event_type": "bake"}).status_code == 400
+
+
+def test_anchor_commits_to_the_state_root(client, ledger, add_events):
+    add_events(2)
+    batch_id = client.post("/merkle/build", json={"urgent": True}).json()["batch_id"]
+    
+    response = client.post("/blockchain/verify", json={"batch_id": batch_id}).json()
+    assert response["status"] == "PASS"
+    assert response["details"]["state_root_anchored"]
+    
+    conn = get_db()
+    conn.execute("UPDATE merkle_batches SET state_root = ? WHERE batch_id = ?", ("ab" * 32, batch_id))
+    conn.commit()
+    conn.close()
+    response = client.post("/blockchain/verify", params={"refresh": True}, json={"batch_id": batch_id}).json()
+    assert response["status"] == "FAIL"
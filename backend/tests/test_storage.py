@@ -0,0 +1,181 @@
+import pytest
+from app.services.event_chain_service import verify_event_chain
+from app.services.hashing_service import CURRENT_HASH_VERSION, GENESIS_CHAIN_HASH, compute_chain_hash, hash_event
+from app.services.merkle_service import stream_merkle_root
+from app.services.sparse_merkle_service import state_key_hash, verify_state_proof
+from app.storage import get_storage
+from app.storage.base import DuplicateEvent, EVENT_FIELDS
+
+
+def _event(n, model_id="model-0", event_type="Train"):
+    record = {field: None for field in EVENT_FIELDS}
+    record.update({
+        "model_id": model_id,
+        "event_type": event_type,
+        "timestamp": f"2025-01-01T00:00:{n % 60:02d}",
+        "summary": f"run {n}",
+    })
+    record["metadata_hash"] = record["merkle_leaf_hash"] = hash_event(record, CURRENT_HASH_VERSION)
+    record["hash_version"] = CURRENT_HASH_VERSION
+    return record
+
+
+def test_events_are_chained_and_deduplicated(backend):
+    events = get_storage().events
+    first = events.insert(_event(0), idempotency_key="key-0")
+    assert first["prev_chain_hash"] == GENESIS_CHAIN_HASH
+    assert first["chain_hash"] == compute_chain_hash(GENESIS_CHAIN_HASH, first["metadata_hash"])
+    
+    rows = events.insert_many([_event(1), _event(2)], ["key-1", None])
+    assert [row["summary"] for row in rows] == ["run 1", "run 2"]
+    assert rows[0]["prev_chain_hash"] == first["chain_hash"]
+    assert rows[1]["prev_chain_hash"] == rows[0]["chain_hash"]
+    
+    with pytest.raises(DuplicateEvent) as duplicate:
+        events.insert(_event(1))
+    assert duplicate.value.existing["id"] == rows[0]["id"]
+    with pytest.raises(DuplicateEvent):
+        events.insert(_event(3), idempotency_key="key-0")
+    # A colliding batch fails (with the backend's own error) and writes nothing
+    with pytest.raises(Exception):
+        events.insert_many([_event(4), _event(0)])
+    
+    assert events.count_pending() == 3
+    assert events.get(first["id"])["summary"] == "run 0"
+    assert [row["id"] for row in events.list(2, 0)] == [rows[1]["id"], rows[0]["id"]]
+    assert events.find_by_hash(rows[1]["metadata_hash"])["id"] == rows[1]["id"]
+    assert events.find_by_hash("ab" * 32, include_sealed=True) is None
+    assert events.find_by_idempotency_key("key-1")["id"] == rows[0]["id"]
+    assert sorted(events.iter_hashes()) == sorted(row["metadata_hash"] for row in [first] + rows)
+    
+    chain = events.iter_chain()
+    try:
+        result = verify_event_chain(chain)
+    finally:
+        chain.close()
+    assert result["valid"] and result["checked"] == 3
+
+
+def test_seal_records_the_merkle_and_state_roots(backend):
+    storage = get_storage()
+    rows = storage.events.insert_many([_event(n, model_id=f"model-{n % 2}") for n in range(5)])
+    state_root, keys = storage.state.root()
+    assert keys == 4
+    
+    merkle_root, count = storage.batches.seal("BATCH-1", None, 3, stream_merkle_root)
+    assert count == 3
+    assert merkle_root == stream_merkle_root(row["merkle_leaf_hash"] for row in rows[:3])
+    assert list(storage.batches.leaves("BATCH-1")) == [(row["id"], row["merkle_leaf_hash"]) for row in rows[:3]]
+    
+    batch = storage.batches.get("BATCH-1")
+    assert batch["merkle_root"] == merkle_root
+    assert batch["state_root"] == state_root
+    assert batch["state_version"] is not None
+    assert storage.events.count_pending() == 2
+    
+    storage.batches.seal("BATCH-2", None, 10, stream_merkle_root)
+    assert storage.batches.seal("BATCH-3", None, 10, stream_merkle_root) is None
+    assert storage.batches.get("BATCH-2")["state_version"] > batch["state_version"]
+    assert {batch["batch_id"] for batch in storage.batches.list()} == {"BATCH-1", "BATCH-2"}
+
+
+def test_state_proofs_current_and_at_a_sealed_batch(backend):
+    storage = get_storage()
+    first = storage.events.insert(_event(0))
+    storage.batches.seal("BATCH-1", None, 10, stream_merkle_root)
+    sealed = storage.batches.get("BATCH-1")
+    later = storage.events.insert(_event(1))
+    
+    key_hash = state_key_hash("model-0")
+    state_root, proof, leaf = storage.state.proof(key_hash)
+    assert state_root == storage.state.root()[0] != sealed["state_root"]
+    assert leaf.leaf_event_id == later["id"]
+    assert verify_state_proof(key_hash, later["metadata_hash"], proof, state_root)
+    
+    state_root, proof, leaf = storage.state.proof(key_hash, sealed["state_version"])
+    assert state_root == sealed["state_root"]
+    assert leaf.leaf_event_id == first["id"]
+    assert verify_state_proof(key_hash, first["metadata_hash"], proof, state_root)
+    
+    absent = state_key_hash("model-9")
+    state_root, proof, leaf = storage.state.proof(absent)
+    assert leaf is None and verify_state_proof(absent, None, proof, state_root)
+
+
+def test_batch_lifecycle(backend):
+    batches = get_storage().batches
+    get_storage().events.insert(_event(0))
+    batches.seal("BATCH-1", None, 10, stream_merkle_root)
+    
+    batches.queue("BATCH-1", urgent=True)
+    queued = batches.list_by_status("Queued")
+    assert [batch["batch_id"] for batch in queued] == ["BATCH-1"]
+    assert queued[0]["urgent"]
+    
+    assert batches.claim("BATCH-1", "Queued", "Anchoring", "worker-1", 60)
+    assert not batches.claim("BATCH-1", "Queued", "Anchoring", "worker-2", 60)
+    assert not batches.transition("BATCH-1", "Queued", "Pending")
+    assert batches.count_unanchored() == 1
+    
+    batches.set_status("BATCH-1", "Anchored", event_status="Anchored")
+    assert batches.get("BATCH-1")["status"] == "Anchored"
+    assert batches.count_unanchored() == 0
+
+
+def test_anchors_and_leases(backend):
+    storage = get_storage()
+    anchors = storage.anchors
+    anchor_id = anchors.next_simulated_id()
+    anchors.record("0x" + "ab" * 32, "2025-01-01T00:00:00Z", "BATCH-1", anchor_id=anchor_id,
+                   block_hash="0x" + "cd" * 32, block_number=7, event_count=3, gas_used=50000,
+                   effective_gas_price=2)
+    
+    anchor = anchors.get(anchor_id)
+    assert anchor["batch_id"] == "BATCH-1"
+    assert anchors.latest_for_batch("BATCH-1", "0x" + "ab" * 32)["anchor_id"] == anchor_id
+    assert anchors.next_simulated_id() > anchor_id
+    
+    unconfirmed = anchors.list_unconfirmed()
+    assert [row["anchor_id"] for row in unconfirmed] == [anchor_id]
+    anchors.update_confirmations([(unconfirmed[0]["id"], 7, "0x" + "cd" * 32, 12, "Final")])
+    assert anchors.list_unconfirmed() == []
+    assert anchors.get(anchor_id)["confirmation_status"] == "Final"
+    
+    summary = anchors.cost_summary()
+    assert summary["anchors"] == 1 and summary["anchored_events"] == 3
+    assert summary["gas_used"] == 50000 and summary["cost_wei"] == 100000
+    
+    leases = storage.leases
+    assert leases.acquire("leader", "worker-1", 60)
+    assert not leases.acquire("leader", "worker-2", 60)
+    assert leases.get("leader")["holder"] == "worker-1"
+    leases.release("leader", "worker-1")
+    assert leases.acquire("leader", "worker-2", 60)
+
+
+def test_routes_on_each_backend(backend, client, add_events):
+    ids = add_events(3)
+    batch_id = client.post("/merkle/build", json={}).json()["batch_id"]
+    
+    proof = client.get("/state/model-0/proof", params={"batch_id": batch_id})
+    assert proof.status_code == 200, proof.text
+    assert proof.json()["included"] and proof.json()["event_id"] == ids[0]
+    
+    event = client.get(f"/events/{ids[1]}").json()
+    assert client.post("/verify", json={"event_id": ids[1]}).json()["valid"]
+    by_metadata = client.post("/verify", json={
+        field: event[field] for field in ("model_id", "event_type", "timestamp", "summary", "metadata_hash")
+    }).json()
+    assert by_metadata["valid"] and by_metadata["details"]["event_id"] == ids[1]
+    chain = client.get("/verify/chain").json()
+    assert chain["valid"] and chain["checked"] == 3
+    
+    archive_routes = [
+        client.get("/partitions"),
+        client.get("/lineage/models/model-0"),
+        client.get("/events/search", params={"q": "run"}),
+    ]
+    if backend == "sqlite":
+        assert all(response.status_code != 501 for response in archive_routes)
+    else:
+        assert all(response.status_code == 501 for response in archive_routes)
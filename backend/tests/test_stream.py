@@ -0,0 +1,35 @@
+import asyncio
+from app.services.stream_service import EVENT_CREATED, STREAM_GAP, STREAM_RESET, StreamHub
+
+
+def _resume(hub, after):
+    """The backlog a client resuming after the given offset id receives"""
+    async def subscribe():
+        subscription, backlog = hub.subscribe(after)
+        hub.unsubscribe(subscription)
+        return backlog
+    return asyncio.run(subscribe())
+
+
+def test_offsets_resume_within_the_hub_that_stamped_them():
+    hub = StreamHub(3)
+    offsets = [hub.publish(EVENT_CREATED, {"id": n}) for n in range(5)]
+    assert offsets == [f"{hub.epoch}-{n}" for n in range(1, 6)]
+    
+    assert [message[0] for message in _resume(hub, offsets[3])] == offsets[4:]
+    gap, *replayed = _resume(hub, offsets[0])
+    assert gap == (None, STREAM_GAP, {"missed_from": offsets[1], "resumed_from": offsets[2]})
+    assert [message[0] for message in replayed] == offsets[2:]
+
+
+def test_offsets_from_another_worker_are_reset():
+    hub, other = StreamHub(10), StreamHub(10)
+    assert hub.epoch != other.epoch
+    offsets = [hub.publish(EVENT_CREATED, {"id": n}) for n in range(3)]
+    foreign = [other.publish(EVENT_CREATED, {"id": n}) for n in range(5)]
+    
+    # The other worker is further along, but its offsets say nothing about this one
+    for after in (foreign[1], foreign[-1], "2", "junk"):
+        reset, *replayed = _resume(hub, after)
+        assert reset == (None, STREAM_RESET, {"epoch": hub.epoch, "head": offsets[-1]})
+        assert [message[0] for message in replayed] == offsets
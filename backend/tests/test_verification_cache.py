@@ -0,0 +1,100 @@
+from app.database import get_db
+from app.services.verification_cache import (
+    ANCHORED_ROOT, EVENT_HASH, VerificationCache, VerificationKey, event_key, get_verification_cache
+)
+from app.storage import get_storage
+
+
+def _execute(sql):
+    """Run one literal statement on the backend under test"""
+    storage = get_storage()
+    if storage.name == "sqlite":
+        conn = get_db()
+        conn.execute(sql)
+        conn.commit()
+        conn.close()
+    else:
+        with storage.pool.connection() as conn:
+            conn.execute(sql)
+
+
+def _verify(client, event_id, **params):
+    response = client.post("/verify", params=params, json={"event_id": event_id})
+    return response.headers.get("x-verification-cache"), response.json()["valid"]
+
+
+def test_a_changed_event_hash_is_a_miss(backend, client, add_events):
+    event_id = add_events(1)[0]
+    assert _verify(client, event_id) == ("miss", True)
+    assert _verify(client, event_id) == ("hit", True)
+    
+    _execute(f"UPDATE audit_events SET metadata_hash = '{'ab' * 32}' WHERE id = {event_id}")
+    assert _verify(client, event_id) == (None, False)
+
+
+def test_invalidations_reach_every_worker(backend, client, add_events):
+    event_id = add_events(1)[0]
+    other = VerificationCache(10, persist=False)
+    assert _verify(client, event_id) == ("miss", True)
+    key = event_key(get_storage().events.get(event_id))
+    other.put(EVENT_HASH, event_id, key, {"valid": True, "message": "cached elsewhere"})
+    
+    # Tampering that leaves metadata_hash alone still changes the key
+    _execute(f"UPDATE audit_events SET summary = 'edited' WHERE id = {event_id}")
+    assert event_key(get_storage().events.get(event_id)) != key
+    assert _verify(client, event_id) == (None, False)
+    # The entry under the old key is dropped through the log
+    assert other.get(EVENT_HASH, event_id, key) is None
+    
+    other.put(EVENT_HASH, event_id, key, {"valid": True})
+    get_verification_cache().clear()
+    assert other.get(EVENT_HASH, event_id, key) is None
+
+
+def test_anchored_roots_are_keyed_on_the_anchor_record(backend, client, add_events):
+    add_events(2)
+    batch_id = client.post("/merkle/build", json={"urgent": True}).json()["batch_id"]
+    
+    def verify():
+        response = client.post("/blockchain/verify", json={"batch_id": batch_id})
+        return response.headers.get("x-verification-cache"), response.json()["status"]
+    
+    # Not cached until final
+    assert verify() == (None, "PASS")
+    anchors = get_storage().anchors
+    anchor = anchors.list_unconfirmed()[0]
+    anchors.update_confirmations([(anchor["id"], anchor["block_number"], anchor["block_hash"], 12, "Final")])
+    assert verify() == ("miss", "PASS")
+    assert verify() == ("hit", "PASS")
+    
+    # Re-recorded in another block: verified again
+    anchors.update_confirmations([(anchor["id"], anchor["block_number"] + 1, "0x" + "ef" * 32, 12, "Final")])
+    assert verify() == ("miss", "PASS")
+    
+    # An edited state root is checked against the chain again, and fails
+    _execute(f"UPDATE merkle_batches SET state_root = '{'ab' * 32}' WHERE batch_id = '{batch_id}'")
+    assert verify() == (None, "FAIL")
+
+
+def test_persisted_results_survive_a_restart_but_not_an_invalidation(backend):
+    first = VerificationCache(10, persist=True)
+    keys = {
+        event_id: VerificationKey(event_id=event_id, hash_version=2, metadata_hash=f"hash-{event_id}")
+        for event_id in (1, 2, 3)
+    }
+    for event_id, key in keys.items():
+        first.put(EVENT_HASH, event_id, key, {"valid": True, "event": event_id})
+    first.put(ANCHORED_ROOT, "BATCH-1", VerificationKey(batch_root="root", anchor_id=1), {"status": "PASS"}, "BATCH-1")
+    first.invalidate(event_id=2)
+    first.invalidate(batch_root="root")
+    
+    restarted = VerificationCache(10, persist=True)
+    restarted.warm_up()
+    assert restarted.stats()["entries"] == 2
+    assert restarted.get(EVENT_HASH, 1, keys[1]) == {"valid": True, "event": 1}
+    assert restarted.get(EVENT_HASH, 2, keys[2]) is None
+    assert restarted.get(EVENT_HASH, 3, keys[3]._replace(metadata_hash="changed")) is None
+    
+    # Invalidations logged after the restart are applied on the next lookup
+    first.invalidate(event_id=1)
+    assert restarted.get(EVENT_HASH, 1, keys[1]) is None